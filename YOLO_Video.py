@@ -1,19 +1,28 @@
 from datetime import datetime
-from ultralytics import YOLO
 import cv2
 
 import math
 import os
 import config
 from dotenv import load_dotenv
+from inference_scheduler import inference_scheduler
+from model_registry import get_model, model_lock
+from snapshot_admission import snapshot_admission
+from structured_logging import get_logger
+from thumbnails import thumbnail_store
+from violation_index import violation_index
+from violation_storage import violation_storage
+from violation_stats import violation_stats
 load_dotenv()
 DETECTION_RESULTS_FILE = os.getenv("DETECTION_RESULTS_FILE", "detection_results.txt")
 start_time = datetime.now()
 detection_results = []
+# Per-frame detection events; sampled/rate-limited so they never slow frame delivery
+detection_log = get_logger('yolo.detections')
 
 # --- Violation Alert Integration ---
-import requests
 def send_violation_alert(violation):
+    import requests
     try:
         requests.post('http://localhost:5000/api/violation_alert', json=violation, timeout=1)
     except Exception as e:
@@ -27,7 +36,7 @@ def video_detection(path_x):
     frame_width = int(cap.get(3))
     frame_height = int(cap.get(4))
 
-    model = YOLO("YOLO-Weights/bestest.pt")
+    model = get_model()
     classNames = ['Excavator', 'Gloves', 'Hardhat', 'Ladder', 'Mask', 'NO-hardhat',
                   'NO-Mask', 'NO-Safety Vest', 'Person', 'SUV', 'Safety Cone', 'Safety Vest',
                   'bus', 'dump truck', 'fire hydrant', 'machinery', 'mini-van', 'sedan', 'semi',
@@ -42,7 +51,8 @@ def video_detection(path_x):
         if not success:
             break  # Exit the loop if the video ends or cannot be read
 
-        results = model(img, stream=True)
+        with model_lock(model):
+            results = list(model(img, stream=True))
 
         for r in results:
             boxes = r.boxes
@@ -133,21 +143,29 @@ def manufacturing_video_detection(video_path):
     cv2.destroyAllWindows()
 
 
-def video_detection_single_frame(frame):
-    """Process a single frame with YOLO detection."""
-    model = YOLO("YOLO-Weights/bestest.pt")
+def video_detection_single_frame(frame, preprocessor=None, detections=None, camera=None):
+    """Process a single frame with YOLO detection.
+
+    If a FramePreprocessor is given, the model runs on its letterboxed buffer and
+    boxes are mapped back to ``frame`` arithmetically. If a ``detections`` list is
+    given, every drawn box is appended to it (see _detection_entry). ``camera`` is
+    accepted for a uniform detector signature; general detections are not recorded.
+    """
+    model = get_model()
     classNames = ['Excavator', 'Gloves', 'Hardhat', 'Ladder', 'Mask', 'NO-hardhat',
                   'NO-Mask', 'NO-Safety Vest', 'Person', 'SUV', 'Safety Cone', 'Safety Vest',
                   'bus', 'dump truck', 'fire hydrant', 'machinery', 'mini-van', 'sedan', 'semi',
                   'trailer', 'truck and trailer', 'truck', 'van', 'vehicle', 'wheel loader']
 
-    results = model(frame, stream=True)
+    results, letterbox_info = _run_model(frame, model, preprocessor)
 
     for r in results:
         boxes = r.boxes
         for box in boxes:
             x1, y1, x2, y2 = box.xyxy[0]
             x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+            if letterbox_info is not None:
+                x1, y1, x2, y2 = letterbox_info.to_source((x1, y1, x2, y2))
             conf = math.ceil((box.conf[0] * 100)) / 100
             cls = int(box.cls[0])
             class_name = classNames[cls]
@@ -174,37 +192,130 @@ def video_detection_single_frame(frame):
                 cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
                 cv2.rectangle(frame, (x1, y1), c2, color, -1, cv2.LINE_AA)
                 cv2.putText(frame, label, (x1, y1 - 2), 0, 1, [255, 255, 255], thickness=1, lineType=cv2.LINE_AA)
+                if detections is not None:
+                    detections.append(_detection_entry(class_name, conf, (x1, y1, x2, y2),
+                                                       class_name in GENERAL_VIOLATION_CLASSES))
 
     return frame
 
-def detect_manufacturing_ppe(frame, model):
-    positive_classes = ['Person','Mask','Hardhat', 'Gloves', 'Safety goggles', 'Ear protection', 'Face shield', 'Steel-toe boots', 'Apron', 'Protective suit', 'Respirator','Safety Vest']
-    negative_classes = ['NO-hardhat', 'NO-Mask', 'NO-Safety Vest']
-    return detect_ppe_by_domain(frame, model, positive_classes, negative_classes,domain_name="Manufacturing")
-
-def detect_construction_ppe(frame, model):
-    positive_classes = ['Person','Hardhat', 'Safety Vest', 'Safety boots']
-    negative_classes = ['NO-hardhat', 'NO-Mask', 'NO-Safety Vest']
-    return detect_ppe_by_domain(frame, model, positive_classes, negative_classes,domain_name="Construction")
+# Class names of YOLO-Weights/bestest.pt, indexed by class id
+CLASS_NAMES = [
+    'Excavator', 'Gloves', 'Hardhat', 'Ladder', 'Mask', 'NO-hardhat',
+    'NO-Mask', 'NO-Safety Vest', 'Person', 'SUV', 'Safety Cone', 'Safety Vest',
+    'bus', 'dump truck', 'fire hydrant', 'machinery', 'mini-van', 'sedan', 'semi',
+    'trailer', 'truck and trailer', 'truck', 'van', 'vehicle', 'wheel loader'
+]
+
+# Classes reported as violations by the general (non-domain) detector
+GENERAL_VIOLATION_CLASSES = ['NO-Mask', 'NO-Safety Vest', 'NO-hardhat']
+
+# Boxes below this confidence are neither drawn, reported nor recorded
+DETECTION_CONFIDENCE_THRESHOLD = 0.6
+
+# Per-domain (display name, positive classes, negative classes)
+DOMAIN_CLASSES = {
+    'manufacturing': (
+        "Manufacturing",
+        ['Person','Mask','Hardhat', 'Gloves', 'Safety goggles', 'Ear protection', 'Face shield', 'Steel-toe boots', 'Apron', 'Protective suit', 'Respirator','Safety Vest'],
+        ['NO-hardhat', 'NO-Mask', 'NO-Safety Vest'],
+    ),
+    'construction': (
+        "Construction",
+        ['Person','Hardhat', 'Safety Vest', 'Safety boots'],
+        ['NO-hardhat', 'NO-Mask', 'NO-Safety Vest'],
+    ),
+    'healthcare': (
+        "Healthcare",
+        ['Person','Mask', 'Gloves', 'Face shield', 'Gown', 'N95 mask', 'Safety goggles', 'Shoe cover', 'Hair net', 'Hazmat suit'],
+        ['NO-Mask', 'NO-Gown', 'NO-Gloves'],
+    ),
+    'oilgas': (
+        "Oil & Gas",
+        ['Person','Hardhat', 'Flame-resistant clothing', 'Safety goggles', 'Ear protection', 'Safety boots', 'Gloves', 'Respirator', 'Full-body suit', 'Face shield'],
+        ['NO-hardhat', 'NO-Mask', 'NO-Safety Vest'],
+    ),
+}
+
+def _detect_domain(frame, model, domain, preprocessor=None, detections=None, camera=None):
+    domain_name, positive_classes, negative_classes = DOMAIN_CLASSES[domain]
+    return detect_ppe_by_domain(frame, model, positive_classes, negative_classes, domain_name=domain_name,
+                                preprocessor=preprocessor, detections=detections, camera=camera)
+
+def detect_manufacturing_ppe(frame, model, preprocessor=None, detections=None, camera=None):
+    return _detect_domain(frame, model, 'manufacturing', preprocessor=preprocessor, detections=detections, camera=camera)
+
+def detect_construction_ppe(frame, model, preprocessor=None, detections=None, camera=None):
+    return _detect_domain(frame, model, 'construction', preprocessor=preprocessor, detections=detections, camera=camera)
+
+def detect_healthcare_ppe(frame, model, preprocessor=None, detections=None, camera=None):
+    return _detect_domain(frame, model, 'healthcare', preprocessor=preprocessor, detections=detections, camera=camera)
+
+def detect_oilgas_ppe(frame, model, preprocessor=None, detections=None, camera=None):
+    return _detect_domain(frame, model, 'oilgas', preprocessor=preprocessor, detections=detections, camera=camera)
+
+def _detection_entry(class_name, conf, bbox, violation):
+    """JSON-serialisable description of one drawn detection, sent alongside streamed frames."""
+    return {
+        'class': class_name,
+        'confidence': round(float(conf), 3),
+        'bbox': [int(v) for v in bbox],
+        'violation': bool(violation),
+    }
+
+def _run_model(frame, model, preprocessor=None):
+    """Run the model on ``frame`` or, with a preprocessor, on its letterboxed buffer.
+
+    Returns:
+        tuple: (results, letterbox_info). letterbox_info is None when the model ran on
+        the frame itself; otherwise boxes must be mapped with ``letterbox_info.to_source``.
+    """
+    # Results are materialised under the model's inference lock; with a preprocessor
+    # they must be anyway, as the canvas is reused by the next letterbox() call
+    if preprocessor is None:
+        with model_lock(model):
+            return list(model(frame, stream=True)), None
+    canvas, info = preprocessor.letterbox(frame)
+    with model_lock(model):
+        return list(model(canvas, imgsz=preprocessor.input_size, stream=True)), info
+
+def extract_boxes(results, letterbox_info=None):
+    """Flatten model results into (class_name, conf, (x1, y1, x2, y2)) tuples above the threshold.
+
+    Boxes are in source frame coordinates. The result does not depend on the domain,
+    so one inference can be classified for several domains.
+    """
+    boxes_out = []
+    for r in results:
+        for box in r.boxes:
+            conf = float(box.conf[0])
+            if conf <= DETECTION_CONFIDENCE_THRESHOLD:
+                continue
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            if letterbox_info is not None:
+                x1, y1, x2, y2 = letterbox_info.to_source((x1, y1, x2, y2))
+            cls = int(box.cls[0])
+            class_name = CLASS_NAMES[cls] if 0 <= cls < len(CLASS_NAMES) else f"Unknown({cls})"
+            boxes_out.append((class_name, conf, (x1, y1, x2, y2)))
+    return boxes_out
 
-def detect_healthcare_ppe(frame, model):
-    positive_classes = ['Person','Mask', 'Gloves', 'Face shield', 'Gown', 'N95 mask', 'Safety goggles', 'Shoe cover', 'Hair net', 'Hazmat suit']
-    negative_classes = ['NO-Mask', 'NO-Gown', 'NO-Gloves']
-    return detect_ppe_by_domain(frame, model, positive_classes, negative_classes,domain_name="Healthcare")
+def classify_boxes(boxes, negative_classes):
+    """Turn extracted boxes into detection entries, flagging the domain's negative classes."""
+    return [_detection_entry(class_name, conf, bbox, class_name in negative_classes)
+            for class_name, conf, bbox in boxes]
 
-def detect_oilgas_ppe(frame, model):
-    positive_classes = ['Person','Hardhat', 'Flame-resistant clothing', 'Safety goggles', 'Ear protection', 'Safety boots', 'Gloves', 'Respirator', 'Full-body suit', 'Face shield']
-    negative_classes = ['NO-hardhat', 'NO-Mask', 'NO-Safety Vest']
-    return detect_ppe_by_domain(frame, model, positive_classes, negative_classes, domain_name="Oil & Gas")
+def _draw_text_bottom_right(frame, text):
+    h, w = frame.shape[:2]
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    font_scale = 0.6
+    thickness = 2
+    (text_width, text_height), _ = cv2.getTextSize(text, font, font_scale, thickness)
+    x = w - text_width - 10
+    y = h - 10
+    cv2.putText(frame, text, (x, y), font, font_scale, (0, 0, 0), thickness + 2, cv2.LINE_AA)
+    cv2.putText(frame, text, (x, y), font, font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
 
-def detect_ppe_by_domain(frame, model, positive_classes, negative_classes, domain_name="PPE Detection"):
-    global start_time, detection_results
-    classNames = [
-        'Excavator', 'Gloves', 'Hardhat', 'Ladder', 'Mask', 'NO-hardhat',
-        'NO-Mask', 'NO-Safety Vest', 'Person', 'SUV', 'Safety Cone', 'Safety Vest',
-        'bus', 'dump truck', 'fire hydrant', 'machinery', 'mini-van', 'sedan', 'semi',
-        'trailer', 'truck and trailer', 'truck', 'van', 'vehicle', 'wheel loader'
-    ]
+def draw_domain_overlay(frame, domain_name, boxes, positive_classes, negative_classes):
+    """Burn the domain name, recording status and detection boxes into ``frame``."""
     # Draw the domain name at the top-left
     cv2.putText(frame, domain_name, (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 4, cv2.LINE_AA)
     cv2.putText(frame, domain_name, (10, 40), cv2.FONT_HERSHEY_SIMPLEX,0.5, (255, 255, 255), 2, cv2.LINE_AA)
@@ -214,101 +325,159 @@ def detect_ppe_by_domain(frame, model, positive_classes, negative_classes, domai
     cv2.putText(frame, recording_status, (10, 60), cv2.FONT_HERSHEY_COMPLEX_SMALL, 0.45, (0, 0, 0), 2, cv2.LINE_AA)
     cv2.putText(frame, recording_status, (10, 60), cv2.FONT_HERSHEY_COMPLEX_SMALL, 0.45, (0, 255, 0) if config.violation_recording_enabled else (0, 0, 255), 1, cv2.LINE_AA)
 
-    violation_detected = False  # <-- Initialize here
+    for class_name, conf, (x1, y1, x2, y2) in boxes:
+        label = f'{class_name} {conf:.2f}'
+        if class_name == "Person":
+            color = (255, 255, 255)  # WHITE
+        elif class_name in negative_classes:
+            color = (0, 0, 255)  # RED
+        elif class_name in positive_classes:
+            color = (0, 255, 0)  # GREEN
+        else:
+            color = (85, 45, 255)  # default
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
+        # Set label color: red for violations, white otherwise
+        label_color = (0, 0, 255) if class_name in negative_classes else (255, 255, 255)
+        cv2.putText(frame, label, (x1, y1 - 2), 0, 1, label_color, 1, cv2.LINE_AA)
+    return frame
 
+def record_violations(frame, domain_name, boxes, negative_classes, annotate=None, camera=None):
+    """Log violations to DETECTION_RESULTS_FILE and save a snapshot while recording is enabled.
+
+    Args:
+        frame: The frame the boxes were detected on
+        domain_name (str): Display name of the domain, e.g. "Oil & Gas"
+        boxes (list): (class_name, conf, bbox) tuples from extract_boxes()
+        negative_classes (list): Classes counted as violations in this domain
+        annotate (callable): Optional callable(frame) returning the frame to save.
+            Used when ``frame`` itself carries no overlays (client-side overlay mode);
+            it is only called when a snapshot is actually written.
+        camera (str): Camera the frame came from, for the per-camera counters
+
+    Returns:
+        bool: True if a violation was detected in this frame
+    """
+    global start_time, detection_results
+    violation_detected = False  # <-- Initialize here
 
-    results = model(frame, stream=True)
-    for r in results:
-        boxes = r.boxes
-        for box in boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            conf = float(box.conf[0])
-            cls = int(box.cls[0])
-            if 0 <= cls < len(classNames):
-                class_name = classNames[cls]
-            else:
-                class_name = f"Unknown({cls})"
-            label = f'{class_name} {conf:.2f}'
-            if class_name == "Person":
-                color = (255, 255, 255)  # WHITE
-            elif class_name in negative_classes:
-                color = (0, 0, 255)  # RED
-                if conf > 0.6:
-                    violation_detected = True  # <-- Set to True if violation found
-                      # Add detection result with domain_name
-                   # Generate timestamp ONCE for this violation
-                    violation_time = datetime.now()
-                    violation_time_str = violation_time.strftime('%Y-%m-%d %H:%M:%S')
-                    violation_time_file = violation_time.strftime('%Y%m%d_%H%M%S_%f')
-                    detection_results.append({
-                        'domain': domain_name,
-                        'class': class_name,
-                        'confidence': conf,
-                        'bounding_box': (x1, y1, x2, y2),
-                        'time': violation_time_str,
-                        'file_time': violation_time_file  # Add this for filename use
-                    })
-            elif class_name in positive_classes:
-                color = (0, 255, 0)  # GREEN
-            else:
-                color = (85, 45, 255)  # default
-            if conf > 0.6:
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
-                # Set label color: red for violations, white otherwise
-                label_color = (0, 0, 255) if class_name in negative_classes else (255, 255, 255)
-                cv2.putText(frame, label, (x1, y1 - 2), 0, 1, label_color, 1, cv2.LINE_AA)
+    for class_name, conf, bbox in boxes:
+        if class_name in negative_classes:
+            violation_detected = True  # <-- Set to True if violation found
+            # Generate timestamp ONCE for this violation
+            violation_time = datetime.now()
+            violation_time_str = violation_time.strftime('%Y-%m-%d %H:%M:%S')
+            violation_time_file = violation_time.strftime('%Y%m%d_%H%M%S_%f')
+            detection_results.append({
+                'domain': domain_name,
+                'class': class_name,
+                'confidence': conf,
+                'bounding_box': bbox,
+                'time': violation_time_str,
+                'file_time': violation_time_file  # Add this for filename use
+            })
+
+    if violation_detected:
+        # Cameras with active violations get more inference slots for a while
+        inference_scheduler.note_violation(camera)
+    violation_stats.record_detections(domain_name, boxes, negative_classes)
 
-    
     if (datetime.now() - start_time).seconds >= 30:
+        # One write per flush: the file is opened in append mode, so blocks from
+        # different workers never interleave line by line
+        block = ''.join(
+            f"[{detection['time']}] [{detection['domain']}] {detection['class']} {detection['confidence']} {detection['bounding_box']}\n"
+            for detection in detection_results
+        ) + '\n'  # Add a newline to separate each 30-second interval
         with open(DETECTION_RESULTS_FILE, 'a') as file:
-            for detection in detection_results:
-                file.write(
-                    f"[{detection['time']}] [{detection['domain']}] {detection['class']} {detection['confidence']} {detection['bounding_box']}\n"
-                )
-            file.write('\n')  # Add a newline to separate each 30-second interval
-            print(f"[DEBUG] Finished writing to {DETECTION_RESULTS_FILE}")
+            file.write(block)
+            detection_log.debug("Finished writing %d detections to %s", len(detection_results), DETECTION_RESULTS_FILE)
             start_time = datetime.now()
             detection_results = []
     # Save frame if violation detected and recording is enabled
-    print(f"[DEBUG] violation_detected={violation_detected}, violation_recording_enabled={config.violation_recording_enabled}")
+    log = detection_log.bind(camera=camera, domain=domain_name)
+    log.sampled('violation_detected', "violation_detected=%s, violation_recording_enabled=%s",
+                violation_detected, config.violation_recording_enabled)
+    if violation_detected:
+        violation_classes = {class_name for class_name, _, _ in boxes if class_name in negative_classes}
+        # A frame repeating the last admitted one of these violations is the same event;
+        # it is neither counted on the dashboard nor saved again
+        if not snapshot_admission.admit(frame, camera, domain_name, violation_classes):
+            if config.violation_recording_enabled:
+                # Near-identical to the last snapshot of these violations on this camera
+                violation_stats.add({'snapshots_rejected': 1})
+                log.sampled('snapshot_rejected', "Near-identical violation snapshot skipped")
+            return violation_detected
+        violation_stats.record_event(domain_name, violation_classes, camera)
     if violation_detected and config.violation_recording_enabled:
         # Use the last violation's timestamp for the filename
         last_violation = detection_results[-1] if detection_results else None
         if last_violation:
-            domain_short = ''.join([c for c in domain_name if c.isalnum()])[:4]
-            save_dir = f"static/violations/{domain_short}"
-            os.makedirs(save_dir, exist_ok=True)
-            filename = f"{save_dir}/violation_{domain_name}_{last_violation['file_time']}.jpg"
-            print(f"Violation detected! Saving frame to {filename}")
+            # static/violations/<Dom4>/<YYYY-MM-DD>/<HH>/violation_<domain>_<file_time>.jpg
+            filename = violation_storage.snapshot_path(
+                domain_name, datetime.strptime(last_violation['file_time'], '%Y%m%d_%H%M%S_%f'))
+            log.info("Violation detected! Saving frame to %s", filename)
 
+            snapshot = annotate(frame) if annotate is not None else frame
             # Draw the violation timestamp at the bottom right of the frame
-            violation_time_str = last_violation['time']
-            h, w = frame.shape[:2]
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            font_scale = 0.6
-            thickness = 2
-            (text_width, text_height), _ = cv2.getTextSize(violation_time_str, font, font_scale, thickness)
-            x = w - text_width - 10
-            y = h - 10
-            cv2.putText(frame, violation_time_str, (x, y), font, font_scale, (0, 0, 0), thickness + 2, cv2.LINE_AA)
-            cv2.putText(frame, violation_time_str, (x, y), font, font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
-
-            cv2.imwrite(filename, frame)
-
-    # === Add this block here ===
-    now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    h, w = frame.shape[:2]
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    font_scale = 0.6
-    thickness = 2
-    (text_width, text_height), _ = cv2.getTextSize(now_str, font, font_scale, thickness)
-    x = w - text_width - 10
-    y = h - 10
-    cv2.putText(frame, now_str, (x, y), font, font_scale, (0, 0, 0), thickness + 2, cv2.LINE_AA)
-    cv2.putText(frame, now_str, (x, y), font, font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
-    # ===========================
+            _draw_text_bottom_right(snapshot, last_violation['time'])
+            cv2.imwrite(filename, snapshot)
+            violation_index.add(filename, confidence=last_violation['confidence'], camera=camera,
+                                types=violation_classes)
+            thumbnail_store.submit_frame(violation_index.rel_path(filename), snapshot)
+            violation_storage.start_evictor()
+            violation_stats.record_snapshot(domain_name, violation_classes)
+    return violation_detected
+
+def detect_ppe_by_domain(frame, model, positive_classes, negative_classes, domain_name="PPE Detection", preprocessor=None, detections=None, camera=None):
+    # Letterbox before any overlay is drawn so the model never sees the annotations
+    results, letterbox_info = _run_model(frame, model, preprocessor)
+    boxes = extract_boxes(results, letterbox_info)
+
+    draw_domain_overlay(frame, domain_name, boxes, positive_classes, negative_classes)
+    if detections is not None:
+        detections.extend(classify_boxes(boxes, negative_classes))
+
+    record_violations(frame, domain_name, boxes, negative_classes, camera=camera)
+
+    _draw_text_bottom_right(frame, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
     return frame
 
+def detect_domains(frame, model, domains, preprocessor=None, camera=None):
+    """Run the model once and classify the result for several domains, without drawing.
+
+    Used by the client-side overlay mode: ``frame`` is streamed untouched and the
+    frontend draws the returned boxes. Violations are still logged and recorded per
+    domain; recorded snapshots get the overlays drawn on a copy.
+
+    Args:
+        frame: BGR frame (not modified)
+        model: Loaded YOLO model
+        domains (iterable): Domain keys ('general' or keys of DOMAIN_CLASSES)
+        preprocessor (FramePreprocessor): Optional letterbox preprocessor
+        camera (str): Camera the frame came from, for the per-camera counters
+
+    Returns:
+        dict: domain -> list of detection entries (see _detection_entry)
+    """
+    results, letterbox_info = _run_model(frame, model, preprocessor)
+    boxes = extract_boxes(results, letterbox_info)
+
+    detections = {}
+    for domain in domains:
+        if domain == 'general':
+            detections[domain] = classify_boxes(boxes, GENERAL_VIOLATION_CLASSES)
+            continue
+        if domain not in DOMAIN_CLASSES:
+            continue
+        domain_name, positive_classes, negative_classes = DOMAIN_CLASSES[domain]
+        detections[domain] = classify_boxes(boxes, negative_classes)
+        record_violations(
+            frame, domain_name, boxes, negative_classes,
+            annotate=lambda f, d=DOMAIN_CLASSES[domain]: draw_domain_overlay(f.copy(), d[0], boxes, d[1], d[2]),
+            camera=camera,
+        )
+    return detections
+
 
 if __name__ == "__main__":
     # Replace 'path_to_video.mp4' with the actual path to your video file
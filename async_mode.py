@@ -0,0 +1,111 @@
+"""
+Server concurrency mode (threading, gevent or eventlet).
+
+Set ASYNC_MODE in the environment:
+
+    threading  Flask dev server / sync gunicorn workers / waitress (default)
+    gevent     gunicorn with the gevent-websocket worker, one process serves
+               hundreds of MJPEG and Socket.IO clients
+    eventlet   gunicorn -k eventlet
+
+In the green modes everything that blocks in C code (OpenCV capture and
+encoding, YOLO inference) must leave the event loop, otherwise one stream
+stalls every other client of the worker. run_blocking() runs a call on the
+hub's native thread pool and offload_iter() does the same for every step of a
+frame generator, so the generators themselves stay unchanged.
+
+monkey_patch() must run before anything else is imported; wsgi.py does it.
+"""
+import os
+
+ASYNC_MODE = os.getenv("ASYNC_MODE", "threading").lower()
+
+# Native threads available for blocking OpenCV/inference work in green modes
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "32"))
+
+SUPPORTED_MODES = ('threading', 'gevent', 'eventlet')
+
+if ASYNC_MODE not in SUPPORTED_MODES:
+    print(f"[ASYNC] Unknown ASYNC_MODE '{ASYNC_MODE}', using threading. Supported: {SUPPORTED_MODES}")
+    ASYNC_MODE = 'threading'
+
+_patched = False
+
+
+def monkey_patch():
+    """Patch the standard library for the configured green mode (no-op for threading)."""
+    global _patched
+    if _patched or ASYNC_MODE == 'threading':
+        return
+    if ASYNC_MODE == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+        import gevent
+        gevent.get_hub().threadpool.maxsize = BLOCKING_POOL_SIZE
+    else:
+        import eventlet
+        eventlet.monkey_patch()
+        os.environ.setdefault("EVENTLET_THREADPOOL_SIZE", str(BLOCKING_POOL_SIZE))
+    _patched = True
+    print(f"[ASYNC] Monkey-patched for {ASYNC_MODE}")
+
+
+def native_lock():
+    """A real OS-thread lock, even when threading is monkey-patched.
+
+    Needed for locks taken on the native thread pool (run_blocking), where green
+    locks do not work.
+    """
+    if ASYNC_MODE == 'gevent' and _patched:
+        from gevent import monkey
+        return monkey.get_original('threading', 'Lock')()
+    if ASYNC_MODE == 'eventlet' and _patched:
+        from eventlet import patcher
+        return patcher.original('threading').Lock()
+    import threading
+    return threading.Lock()
+
+
+def socketio_async_mode():
+    """The async_mode argument for SocketIO() matching the server mode."""
+    return ASYNC_MODE
+
+
+def run_blocking(func, *args, **kwargs):
+    """Call func on a native thread when running under gevent/eventlet, directly otherwise."""
+    if ASYNC_MODE == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args, kwargs)
+    if ASYNC_MODE == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
+
+_EXHAUSTED = object()
+
+
+def _next_or_exhausted(iterator):
+    return next(iterator, _EXHAUSTED)
+
+
+def offload_iter(iterable):
+    """Iterate over a blocking generator, producing each item on the native thread pool.
+
+    Closing the returned generator (client disconnect) closes the wrapped one, so
+    camera release in its finally block still runs.
+    """
+    if ASYNC_MODE == 'threading':
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    try:
+        while True:
+            item = run_blocking(_next_or_exhausted, iterator)
+            if item is _EXHAUSTED:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            run_blocking(close)
@@ -0,0 +1,234 @@
+"""
+Registry of the cameras this node serves, keyed by camera id.
+
+flaskapp used to read one CAMERA_IP/CAMERA_USERNAME/CAMERA_PASSWORD and
+point every route at that camera. The registry loads any number of cameras
+from CAMERAS_CONFIG (YAML, default cameras.yaml; see cameras.example.yaml):
+
+    cameras:
+      - id: gate-1
+        name: Main gate
+        ip: 192.168.8.211
+        username: admin
+        password: ${GATE_1_PASSWORD}
+        domain: construction
+        roi: [0.0, 0.25, 1.0, 0.75]
+        fps_budget: 5
+        priority: 2
+        capture: {substream: 1}
+
+Per camera:
+
+* ``urls`` (or ``url``) - candidate stream URLs, tried in order; or ``ip`` with
+  optional ``username``/``password``/``port`` to try the usual RTSP/HTTP paths;
+* ``domain`` - PPE domain of /ipcamera_stable/<id>, /ipcamera_stable_raw/<id> and
+  ``subscribe_stream`` requests that do not name one;
+* ``roi`` - region analysed, as fractions [x, y, width, height] of the frame;
+* ``fps_budget`` - frames per second the pipeline processes at most (0 = no limit);
+* ``priority`` - weight of the camera when inference is scheduled (higher first);
+* ``capture`` - decode options overriding CAPTURE_* (see capture_backends.py).
+
+``${VAR}`` in string values is expanded from the environment, so passwords
+can stay out of the file. Without a config file the registry holds a single
+camera, ``ipcamera``, built from CAMERA_IP/CAMERA_USERNAME/CAMERA_PASSWORD/
+CAMERA_PORT as before.
+"""
+import os
+import re
+from collections import namedtuple
+
+from capture_backends import capture_opener, substream_url
+
+CAMERAS_CONFIG = os.getenv("CAMERAS_CONFIG", "cameras.yaml")
+
+DEFAULT_CAMERA_ID = 'ipcamera'
+DOMAINS = ('general', 'manufacturing', 'construction', 'healthcare', 'oilgas')
+
+_CAMERA_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]*$')
+
+
+class Camera(namedtuple('Camera', 'id name urls domain roi fps_budget priority capture')):
+    """One configured camera; ``roi`` is (x, y, width, height) in fractions of the frame, or None."""
+
+    __slots__ = ()
+
+
+def candidate_urls(ip, username='', password='', port=''):
+    """The RTSP/HTTP URLs a camera at ``ip`` is usually reachable on, most likely first."""
+    auth = f"{username}:{password}@" if username or password else ''
+    host = f"{ip}:{port}" if port else ip
+    return (
+        f"rtsp://{auth}{host}/stream",
+        f"rtsp://{auth}{host}/stream1",
+        f"rtsp://{auth}{host}/live",
+        f"rtsp://{auth}{host}/cam/realmonitor?channel=1&subtype=0",
+        f"http://{auth}{host}/stream",
+        f"http://{auth}{ip}/video.cgi",
+        f"http://{auth}{ip}/videostream.cgi",
+        f"http://{ip}/video.cgi?user={username}&pwd={password}",
+    )
+
+
+def redact_url(url):
+    """``url`` with the password replaced by ***, for logs and APIs."""
+    url = re.sub(r'(://[^:/@]+:)[^@/]*@', r'\1***@', url)
+    return re.sub(r'([?&]pwd=)[^&]*', r'\1***', url)
+
+
+def crop_to_roi(frame, roi):
+    """View of ``frame`` inside ``roi`` (fractions x, y, width, height); the frame itself without one."""
+    if not roi:
+        return frame
+    h, w = frame.shape[:2]
+    x0, y0 = int(roi[0] * w), int(roi[1] * h)
+    x1, y1 = int((roi[0] + roi[2]) * w), int((roi[1] + roi[3]) * h)
+    return frame[y0:max(y1, y0 + 1), x0:max(x1, x0 + 1)]
+
+
+def _expand(value):
+    return os.path.expandvars(value) if isinstance(value, str) else value
+
+
+def _parse_camera(entry, index):
+    if not isinstance(entry, dict):
+        raise ValueError(f"Camera #{index + 1}: expected a mapping, got {type(entry).__name__}")
+    entry = {key: _expand(value) for key, value in entry.items()}
+    camera_id = str(entry.get('id', '')).strip()
+    if not _CAMERA_ID.match(camera_id) or camera_id == 'webcam':
+        raise ValueError(f"Camera #{index + 1}: invalid id '{camera_id}' "
+                         f"(letters, digits, '-' and '_'; 'webcam' is reserved)")
+
+    urls = entry.get('urls') or ([entry['url']] if entry.get('url') else [])
+    if isinstance(urls, str):
+        urls = [urls]
+    urls = [_expand(url) for url in urls]
+    if not urls and entry.get('ip'):
+        urls = candidate_urls(entry['ip'], entry.get('username', ''), entry.get('password', ''),
+                              entry.get('port', ''))
+    if not urls:
+        raise ValueError(f"Camera '{camera_id}': needs 'urls', 'url' or 'ip'")
+
+    domain = entry.get('domain', 'general')
+    if domain not in DOMAINS:
+        raise ValueError(f"Camera '{camera_id}': unknown domain '{domain}'. Valid domains: {list(DOMAINS)}")
+
+    roi = entry.get('roi')
+    if roi is not None:
+        roi = tuple(float(value) for value in roi)
+        if len(roi) != 4 or not all(0 <= value <= 1 for value in roi) or roi[2] <= 0 or roi[3] <= 0:
+            raise ValueError(f"Camera '{camera_id}': roi must be [x, y, width, height] fractions of the frame")
+
+    capture = entry.get('capture') or {}
+    if not isinstance(capture, dict):
+        raise ValueError(f"Camera '{camera_id}': capture must be a mapping of decode options")
+
+    return Camera(
+        id=camera_id,
+        name=str(entry.get('name') or camera_id),
+        urls=tuple(urls),
+        domain=domain,
+        roi=roi,
+        fps_budget=float(entry.get('fps_budget') or 0),
+        priority=int(entry.get('priority', 1)),
+        capture={key: _expand(value) for key, value in capture.items()},
+    )
+
+
+def default_cameras():
+    """The single camera configured by CAMERA_IP/CAMERA_USERNAME/CAMERA_PASSWORD/CAMERA_PORT."""
+    return [Camera(
+        id=DEFAULT_CAMERA_ID,
+        name='IP camera',
+        urls=candidate_urls(os.getenv('CAMERA_IP', '192.168.8.210'), os.getenv('CAMERA_USERNAME', 'admin'),
+                            os.getenv('CAMERA_PASSWORD', 'defaultpassword'), os.getenv('CAMERA_PORT', '554')),
+        domain='general',
+        roi=None,
+        fps_budget=0.0,
+        priority=1,
+        capture={},
+    )]
+
+
+def load_cameras(path):
+    """Cameras defined in the YAML file at ``path``. Raises ValueError on invalid entries."""
+    import yaml
+    with open(path, encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    entries = config.get('cameras', []) if isinstance(config, dict) else config
+    cameras = [_parse_camera(entry, index) for index, entry in enumerate(entries or [])]
+    seen = set()
+    for camera in cameras:
+        if camera.id in seen:
+            raise ValueError(f"Duplicate camera id '{camera.id}' in {path}")
+        seen.add(camera.id)
+    if not cameras:
+        raise ValueError(f"No cameras defined in {path}")
+    return cameras
+
+
+class CameraRegistry:
+    """Cameras by id, in configuration order, with one capture opener per camera."""
+
+    def __init__(self, cameras, source='environment'):
+        self._cameras = {camera.id: camera for camera in cameras}
+        self._openers = {}
+        self.source = source
+
+    @classmethod
+    def from_config(cls, path=CAMERAS_CONFIG):
+        """Registry from the YAML file at ``path``, or the CAMERA_* camera when it does not exist."""
+        if path and os.path.exists(path):
+            cameras = load_cameras(path)
+            print(f"[CAMERAS] Loaded {len(cameras)} camera(s) from {path}")
+            return cls(cameras, source=path)
+        return cls(default_cameras())
+
+    @property
+    def default_id(self):
+        """Camera used by the routes that do not name one (the first configured)."""
+        return DEFAULT_CAMERA_ID if DEFAULT_CAMERA_ID in self._cameras else next(iter(self._cameras))
+
+    def __contains__(self, camera_id):
+        return camera_id in self._cameras
+
+    def ids(self):
+        return list(self._cameras)
+
+    def cameras(self):
+        return list(self._cameras.values())
+
+    def get(self, camera_id):
+        """The camera ``camera_id``. Raises KeyError for unknown ids."""
+        return self._cameras[camera_id]
+
+    def opener(self, camera_id):
+        """CameraSupervisor opener applying the camera's decode options (built once per camera)."""
+        opener = self._openers.get(camera_id)
+        if opener is None:
+            opener = self._openers[camera_id] = capture_opener(camera_id, self.get(camera_id).capture)
+        return opener
+
+    def urls(self, camera_id):
+        """Candidate URLs of the camera, pointing at its substream when CAPTURE_SUBSTREAM is set for it."""
+        urls = self.get(camera_id).urls
+        if self.opener(camera_id).options.substream:
+            urls = tuple(substream_url(url) for url in urls)
+        return list(urls)
+
+    def describe(self, camera_id):
+        """JSON-safe view of a camera with passwords redacted (/api/cameras)."""
+        camera = self.get(camera_id)
+        opener = self.opener(camera_id)
+        return {
+            "id": camera.id,
+            "name": camera.name,
+            "urls": [redact_url(url) for url in camera.urls],
+            "domain": camera.domain,
+            "roi": list(camera.roi) if camera.roi else None,
+            "fps_budget": camera.fps_budget,
+            "priority": camera.priority,
+            "capture": dict(opener.options._asdict(), backend=opener.backend),
+        }
+
+
+camera_registry = CameraRegistry.from_config()
@@ -0,0 +1,349 @@
+"""
+Camera capture supervision: one owner for a capture's connect/read/reconnect lifecycle.
+
+Every generator used to open cv2.VideoCapture itself and handle failures its
+own way: the stable generator slept 2s and gave up after 3 reconnects (and
+reopened at 640x480 instead of the 1280x720 it asked for at first), the
+adaptive one slept 3s for up to 5 attempts, and the basic generators simply
+stopped at the first run of failures. CameraSupervisor wraps one capture:
+
+    camera = CameraSupervisor(url, name='ipcamera', settings=IP_CAMERA_STABLE_SETTINGS)
+    if not camera.connect():
+        return
+    while True:
+        success, frame = camera.read(skip=2)
+        if not success:
+            if camera.state == FAILED:
+                break
+            continue
+
+States:
+
+* connecting - opening the capture;
+* streaming  - frames are being read;
+* degraded   - the last read(s) failed, fewer than CAMERA_MAX_READ_FAILURES in a row;
+* backoff    - the capture was released after too many failures (or failed to
+               open) and the supervisor waits base * 2**attempt seconds, with
+               jitter and capped at CAMERA_BACKOFF_MAX, before reconnecting;
+* failed     - CAMERA_MAX_RECONNECTS consecutive reconnects failed (0 = retry forever);
+* closed     - close() was called, possibly from another thread (the webcam is
+               released on request this way); nothing reconnects it.
+
+Reconnects reapply the same capture settings, and happen inside read(), so
+the HTTP or Socket.IO stream consuming the generator resumes by itself once
+the camera is back. Every state change is published to the supervisor's
+subscribers and to CameraHealth (camera_health), which keeps the current state
+of every open capture for /api/camera_health.
+"""
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+
+CAMERA_BACKOFF_BASE = float(os.getenv("CAMERA_BACKOFF_BASE", "1"))
+CAMERA_BACKOFF_MAX = float(os.getenv("CAMERA_BACKOFF_MAX", "30"))
+CAMERA_MAX_RECONNECTS = int(os.getenv("CAMERA_MAX_RECONNECTS", "8"))
+CAMERA_MAX_READ_FAILURES = int(os.getenv("CAMERA_MAX_READ_FAILURES", "10"))
+
+CONNECTING = 'connecting'
+STREAMING = 'streaming'
+DEGRADED = 'degraded'
+BACKOFF = 'backoff'
+FAILED = 'failed'
+CLOSED = 'closed'
+
+# Capture settings, applied in order on every (re)connect; names are cv2 attributes
+IP_CAMERA_SETTINGS = (
+    ('CAP_PROP_BUFFERSIZE', 1),
+    ('CAP_PROP_FRAME_WIDTH', 640),
+    ('CAP_PROP_FRAME_HEIGHT', 480),
+    ('CAP_PROP_FPS', 15),
+    ('CAP_PROP_OPEN_TIMEOUT_MSEC', 5000),
+    ('CAP_PROP_READ_TIMEOUT_MSEC', 5000),
+)
+IP_CAMERA_STABLE_SETTINGS = (
+    ('CAP_PROP_BUFFERSIZE', 1),  # Minimal buffer to reduce latency
+    ('CAP_PROP_FRAME_WIDTH', 1280),
+    ('CAP_PROP_FRAME_HEIGHT', 720),
+    ('CAP_PROP_FPS', 10),  # Reduced FPS for stability
+    ('CAP_PROP_OPEN_TIMEOUT_MSEC', 3000),
+    ('CAP_PROP_READ_TIMEOUT_MSEC', 3000),
+    ('CAP_PROP_FOURCC', 'MJPG'),  # Some cameras don't support it; ignored then
+)
+# Let the camera use its native resolution; frames are resized by the generator
+IP_CAMERA_ADAPTIVE_SETTINGS = (
+    ('CAP_PROP_BUFFERSIZE', 1),
+    ('CAP_PROP_FPS', 10),
+    ('CAP_PROP_OPEN_TIMEOUT_MSEC', 5000),
+    ('CAP_PROP_READ_TIMEOUT_MSEC', 5000),
+)
+WEBCAM_SETTINGS = (
+    ('CAP_PROP_BUFFERSIZE', 1),
+    ('CAP_PROP_FRAME_WIDTH', 640),
+    ('CAP_PROP_FRAME_HEIGHT', 480),
+    ('CAP_PROP_FPS', 30),
+)
+# Moderate FPS for the webcam streams that run detection
+WEBCAM_DETECTION_SETTINGS = (
+    ('CAP_PROP_BUFFERSIZE', 1),
+    ('CAP_PROP_FRAME_WIDTH', 640),
+    ('CAP_PROP_FRAME_HEIGHT', 480),
+    ('CAP_PROP_FPS', 15),
+)
+
+
+def open_capture(source, settings=(), params=None):
+    """cv2.VideoCapture for ``source`` with ``settings`` applied (the default opener).
+
+    ``params`` are open parameters for the FFmpeg backend (see capture_backends.py).
+    """
+    import cv2
+    cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG, params) if params else cv2.VideoCapture(source)
+    for name, value in settings:
+        prop = getattr(cv2, name, None)
+        if prop is None:
+            continue
+        if name == 'CAP_PROP_FOURCC' and isinstance(value, str):
+            value = cv2.VideoWriter_fourcc(*value)
+        try:
+            cap.set(prop, value)
+        except Exception:
+            pass  # Some backends reject some properties
+    return cap
+
+
+def backoff_delay(attempt, base=CAMERA_BACKOFF_BASE, maximum=CAMERA_BACKOFF_MAX, rand=random.random):
+    """Seconds to wait before reconnect ``attempt`` (1-based): exponential, capped, with jitter.
+
+    Half of the delay is fixed and half random, so cameras that dropped together
+    do not all reconnect at the same moment.
+    """
+    delay = min(maximum, base * (2 ** (attempt - 1)))
+    return delay / 2 + rand() * delay / 2
+
+
+class CameraHealth:
+    """Current state of every supervised capture in this worker, plus recent events."""
+
+    def __init__(self, history=100):
+        self._cameras = {}
+        self._subscribers = []
+        self._events = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """Call callback(event) for every state change of every supervised capture."""
+        self._subscribers.append(callback)
+
+    def register(self, supervisor):
+        with self._lock:
+            self._cameras[supervisor.id] = supervisor
+
+    def unregister(self, supervisor):
+        with self._lock:
+            self._cameras.pop(supervisor.id, None)
+
+    def publish(self, event):
+        self._events.append(event)
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[CAMERA] Health subscriber failed: {e}")
+
+    def status(self):
+        with self._lock:
+            cameras = [supervisor.status() for supervisor in self._cameras.values()]
+        return {"cameras": cameras, "events": list(self._events)}
+
+
+camera_health = CameraHealth()
+
+
+class CameraSupervisor:
+    """Owns one capture: opens it with fixed settings, reads, and reconnects with backoff."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, source, name='camera', settings=(), opener=open_capture,
+                 max_read_failures=CAMERA_MAX_READ_FAILURES, max_reconnects=CAMERA_MAX_RECONNECTS,
+                 backoff_base=CAMERA_BACKOFF_BASE, backoff_max=CAMERA_BACKOFF_MAX,
+                 health=camera_health, clock=time.time, sleep=time.sleep, rand=random.random):
+        """
+        Args:
+            source: Camera URL or device index
+            name (str): Camera name used in health events ('ipcamera', 'webcam', ...)
+            settings (tuple): (cv2 property name, value) pairs applied on every connect
+            opener (callable): opener(source, settings) -> capture; replaceable in tests
+            max_read_failures (int): Consecutive failed reads before reconnecting
+            max_reconnects (int): Consecutive failed connects before giving up (0 = never)
+            backoff_base (float): First reconnect delay in seconds (doubled per attempt)
+            backoff_max (float): Longest reconnect delay in seconds
+            health (CameraHealth): Registry the capture reports to (None for none)
+            clock, sleep, rand: Replaceable in tests
+        """
+        self.id = next(self._ids)
+        self.source = source
+        self.name = name
+        self.settings = tuple(settings)
+        self.max_read_failures = max_read_failures
+        self.max_reconnects = max_reconnects
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._opener = opener
+        self._health = health
+        self._clock = clock
+        self._sleep = sleep
+        self._rand = rand
+        self._subscribers = []
+        self.cap = None
+        self.closed = False
+        self.state = CONNECTING
+        self.since = clock()
+        self.read_failures = 0
+        self.attempt = 0
+        self.stats = {"frames": 0, "read_failures": 0, "reconnects": 0}
+
+    def subscribe(self, callback):
+        """Call callback(event) on every state change of this capture."""
+        self._subscribers.append(callback)
+
+    @property
+    def stopped(self):
+        """True once the capture failed for good or was closed; reads will not succeed again."""
+        return self.state in (FAILED, CLOSED)
+
+    def _set_state(self, state, error=None, delay=None):
+        if state == self.state and error is None:
+            return
+        if self.state == CLOSED:
+            return  # a read that was in progress when close() was called
+        event = {
+            "camera": self.name,
+            "id": self.id,
+            "state": state,
+            "previous": self.state,
+            "attempt": self.attempt,
+            "at": self._clock(),
+        }
+        if error is not None:
+            event["error"] = error
+        if delay is not None:
+            event["retry_in"] = round(delay, 2)
+        self.state = state
+        self.since = event["at"]
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[CAMERA] Subscriber failed: {e}")
+        if self._health is not None:
+            self._health.publish(event)
+
+    def _connect_once(self):
+        self._set_state(CONNECTING)
+        try:
+            cap = self._opener(self.source, self.settings)
+        except Exception as e:
+            return str(e)
+        if cap is not None and cap.isOpened():
+            self.cap = cap
+            self.attempt = 0
+            self.read_failures = 0
+            self._set_state(STREAMING)
+            return None
+        if cap is not None:
+            cap.release()
+        return "could not open capture"
+
+    def connect(self):
+        """Open the capture, backing off between attempts. False once it has failed for good or was closed."""
+        if self.closed:
+            return False
+        if self._health is not None:
+            self._health.register(self)
+        while True:
+            error = self._connect_once()
+            if error is None:
+                return True
+            self.attempt += 1
+            if self.max_reconnects and self.attempt >= self.max_reconnects:
+                self._set_state(FAILED, error=error)
+                return False
+            delay = backoff_delay(self.attempt, self.backoff_base, self.backoff_max, self._rand)
+            self._set_state(BACKOFF, error=error, delay=delay)
+            self._sleep(delay)
+            if self.closed:
+                return False
+
+    def _reconnect(self, error):
+        if self.closed:
+            return False
+        self.stats["reconnects"] += 1
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        self.attempt = 1
+        delay = backoff_delay(self.attempt, self.backoff_base, self.backoff_max, self._rand)
+        self._set_state(BACKOFF, error=error, delay=delay)
+        self._sleep(delay)
+        return self.connect()
+
+    def read(self, skip=0):
+        """Read the next frame, dropping ``skip`` buffered frames first.
+
+        Returns (success, frame). A failed read moves the capture to ``degraded``;
+        after max_read_failures in a row it is reopened (with backoff) before
+        returning. Once ``failed`` or ``closed`` every read returns (False, None).
+        """
+        if self.stopped:
+            return False, None
+        if self.cap is None and not self.connect():
+            return False, None
+        try:
+            if skip:
+                for _ in range(skip):
+                    self.cap.grab()
+                success, frame = self.cap.retrieve()
+            else:
+                success, frame = self.cap.read()
+        except Exception as e:
+            success, frame, error = False, None, str(e)
+        else:
+            error = "read failed"
+        if self.closed:
+            return False, None
+        if success and frame is not None:
+            self.read_failures = 0
+            self.stats["frames"] += 1
+            self._set_state(STREAMING)
+            return True, frame
+        self.read_failures += 1
+        self.stats["read_failures"] += 1
+        if self.read_failures >= self.max_read_failures:
+            self._reconnect(f"{self.read_failures} consecutive read failures")
+        else:
+            self._set_state(DEGRADED, error=error if self.state != DEGRADED else None)
+        return False, None
+
+    def get(self, prop):
+        return self.cap.get(prop) if self.cap is not None else 0
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        if self._health is not None:
+            self._health.unregister(self)
+
+    def close(self):
+        """Release the capture for good, from any thread: later reads fail and nothing reconnects."""
+        self.closed = True
+        self._set_state(CLOSED)
+        self.release()
+
+    def status(self):
+        return dict(self.stats, id=self.id, camera=self.name, state=self.state, since=self.since,
+                    read_failures=self.read_failures, attempt=self.attempt)
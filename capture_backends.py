@@ -0,0 +1,345 @@
+"""
+Decode options for RTSP/HTTP camera inputs, selectable per camera.
+
+OpenCV's default FFmpeg capture decodes every full-resolution H.264/H.265
+frame, and the stable generator then throws most of those pixels away with a
+resize. The options here cut decode work before inference starts:
+
+    CAPTURE_BACKEND         auto | opencv | ffmpeg | pyav (default: auto)
+    CAPTURE_DECODE_THREADS  decoder threads (0 = decoder default)
+    CAPTURE_HWACCEL         hardware decode: auto, cuda, vaapi, qsv, ... (empty = off)
+    CAPTURE_SUBSTREAM       1 = use the camera's substream (subtype=1 of cam/realmonitor URLs)
+    CAPTURE_SCALE           WxH to scale to while decoding, e.g. 1280x720 (empty = native)
+    CAPTURE_KEYFRAMES_ONLY  1 = decode keyframes only (low-FPS monitoring)
+    CAPTURE_TIMEOUT         seconds before a stalled ffmpeg/PyAV input is given up
+
+Each option can be set for one camera with CAPTURE_<CAMERA>_<OPTION>, e.g.
+CAPTURE_IPCAMERA_SCALE=1280x720, or passed as ``overrides``.
+
+Backends:
+
+* opencv - cv2.VideoCapture; decoder threads and hardware acceleration are
+  passed as open parameters where the OpenCV build supports them. It cannot
+  scale or skip non-keyframes while decoding;
+* ffmpeg - an ffmpeg subprocess (-skip_frame nokey, -vf scale=W:H, -hwaccel)
+  writing raw BGR frames to a pipe;
+* pyav   - PyAV (optional dependency, ``pip install av``) decoding in-process
+  with the same options, scaling through swscale.
+
+``auto`` uses ffmpeg when scaling or keyframe-only decode is asked for and the
+ffmpeg binary is installed, and opencv otherwise. The ffmpeg and PyAV captures
+keep only the newest decoded frame, read by a background thread, and provide
+the subset of the cv2.VideoCapture interface the generators use (isOpened,
+read, grab, retrieve, get, set, release).
+"""
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+from collections import namedtuple
+
+CAPTURE_OPTION_DEFAULTS = {
+    'backend': 'auto',
+    'decode_threads': '0',
+    'hwaccel': '',
+    'substream': '0',
+    'scale': '',
+    'keyframes_only': '0',
+    'timeout': '10',
+}
+
+# cv2.CAP_PROP_* values, so get() callers can pass the cv2 constants without this module importing cv2
+_PROP_FRAME_WIDTH = 3
+_PROP_FRAME_HEIGHT = 4
+_PROP_FPS = 5
+
+
+class CaptureOptions(namedtuple('CaptureOptions',
+                                'backend decode_threads hwaccel substream scale keyframes_only timeout')):
+    """Decode options of one camera; ``scale`` is (width, height) or None."""
+
+    __slots__ = ()
+
+
+def _flag(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def parse_scale(value):
+    """'1280x720' -> (1280, 720); empty -> None. Raises ValueError on anything else."""
+    if value in (None, '') or isinstance(value, (tuple, list)):
+        return tuple(value) if value else None
+    match = re.fullmatch(r'\s*(\d+)\s*[xX]\s*(\d+)\s*', str(value))
+    if not match:
+        raise ValueError(f"Invalid capture scale '{value}', expected WIDTHxHEIGHT")
+    width, height = int(match.group(1)), int(match.group(2))
+    # Even sizes: most pixel formats and hardware scalers need them
+    return width - width % 2, height - height % 2
+
+
+def capture_options(camera, overrides=None, environ=os.environ):
+    """Decode options for ``camera``: overrides, then CAPTURE_<CAMERA>_<OPTION>, then CAPTURE_<OPTION>."""
+    overrides = overrides or {}
+    prefix = 'CAPTURE_' + re.sub(r'\W', '_', camera).upper() + '_'
+    raw = {}
+    for key, default in CAPTURE_OPTION_DEFAULTS.items():
+        if key in overrides and overrides[key] is not None:
+            raw[key] = overrides[key]
+        else:
+            raw[key] = environ.get(prefix + key.upper(), environ.get('CAPTURE_' + key.upper(), default))
+    backend = str(raw['backend']).strip().lower() or 'auto'
+    if backend not in ('auto', 'opencv', 'ffmpeg', 'pyav'):
+        raise ValueError(f"Unknown capture backend '{backend}' for {camera}")
+    return CaptureOptions(
+        backend=backend,
+        decode_threads=int(raw['decode_threads'] or 0),
+        hwaccel=str(raw['hwaccel'] or '').strip(),
+        substream=_flag(raw['substream']),
+        scale=parse_scale(raw['scale']),
+        keyframes_only=_flag(raw['keyframes_only']),
+        timeout=float(raw['timeout'] or 0),
+    )
+
+
+def substream_url(url):
+    """The substream variant of a cam/realmonitor URL (subtype=1); other URLs unchanged."""
+    if 'cam/realmonitor' not in url:
+        return url
+    if re.search(r'([?&])subtype=\d+', url):
+        return re.sub(r'([?&])subtype=\d+', r'\1subtype=1', url)
+    return url + ('&' if '?' in url else '?') + 'subtype=1'
+
+
+def resolve_backend(options, which=shutil.which):
+    """The backend that will actually be used for ``options``."""
+    if options.backend != 'auto':
+        return options.backend
+    if (options.scale or options.keyframes_only) and which('ffmpeg'):
+        return 'ffmpeg'
+    return 'opencv'
+
+
+def ffmpeg_command(url, options, size):
+    """ffmpeg arguments decoding ``url`` to raw BGR frames of ``size`` (width, height) on stdout."""
+    command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin']
+    if options.hwaccel:
+        command += ['-hwaccel', options.hwaccel]
+    if options.decode_threads:
+        command += ['-threads', str(options.decode_threads)]
+    if options.keyframes_only:
+        command += ['-skip_frame', 'nokey']
+    if url.startswith('rtsp://'):
+        command += ['-rtsp_transport', 'tcp']
+        if options.timeout:
+            command += ['-timeout', str(int(options.timeout * 1_000_000))]
+    command += ['-i', url, '-an', '-sn', '-vsync', 'passthrough']
+    if options.scale:
+        command += ['-vf', f"scale={size[0]}:{size[1]}"]
+    command += ['-pix_fmt', 'bgr24', '-f', 'rawvideo', 'pipe:1']
+    return command
+
+
+def probe_stream(url, timeout=10):
+    """(width, height, fps) of the first video stream of ``url`` via ffprobe."""
+    command = ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+               '-show_entries', 'stream=width,height,avg_frame_rate', '-of', 'json']
+    if url.startswith('rtsp://'):
+        command += ['-rtsp_transport', 'tcp']
+    output = subprocess.run(command + [url], capture_output=True, timeout=timeout, check=True).stdout
+    stream = json.loads(output)['streams'][0]
+    num, _, den = stream.get('avg_frame_rate', '0/1').partition('/')
+    fps = float(num) / float(den) if den and float(den) else 0.0
+    return int(stream['width']), int(stream['height']), fps
+
+
+class _LatestFrameCapture:
+    """Background reader keeping the newest decoded frame; cv2.VideoCapture-like interface.
+
+    Subclasses open their input and pass an iterator of BGR frames to _start().
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout or None
+        self.width = 0
+        self.height = 0
+        self.fps = 0.0
+        self._frame = None
+        self._seq = 0
+        self._retrieved = 0
+        self._opened = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def _start(self, frames):
+        self._opened = True
+        self._thread = threading.Thread(target=self._run, args=(frames,), name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def _run(self, frames):
+        try:
+            for frame in frames:
+                with self._condition:
+                    self._frame = frame
+                    self._seq += 1
+                    self._condition.notify_all()
+                if not self._opened:
+                    break
+        except Exception as e:
+            print(f"[CAPTURE] {type(self).__name__} stopped: {e}")
+        with self._condition:
+            self._opened = False
+            self._condition.notify_all()
+
+    def isOpened(self):
+        return self._opened
+
+    def grab(self):
+        """Wait for a frame newer than the last one retrieved (repeated grabs do not wait again)."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._seq > self._retrieved or not self._opened,
+                                            self.timeout):
+                return False
+            return self._seq > self._retrieved
+
+    def retrieve(self):
+        with self._condition:
+            if self._seq <= self._retrieved:
+                return False, None
+            self._retrieved = self._seq
+            return True, self._frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        return {_PROP_FRAME_WIDTH: self.width, _PROP_FRAME_HEIGHT: self.height, _PROP_FPS: self.fps}.get(prop, 0)
+
+    def set(self, prop, value):
+        return False  # Options are fixed when the capture is opened
+
+    def release(self):
+        with self._condition:
+            self._opened = False
+            self._condition.notify_all()
+
+
+class FFmpegCapture(_LatestFrameCapture):
+    """Frames decoded (and scaled) by an ffmpeg subprocess, read from its stdout."""
+
+    def __init__(self, url, options, popen=subprocess.Popen, probe=probe_stream):
+        super().__init__(options.timeout)
+        self._process = None
+        try:
+            if options.scale:
+                self.width, self.height = options.scale
+            else:
+                self.width, self.height, self.fps = probe(url, timeout=options.timeout or None)
+            self._process = popen(ffmpeg_command(url, options, (self.width, self.height)),
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        except Exception as e:
+            print(f"[CAPTURE] Could not start ffmpeg: {e}")
+            return
+        self._start(self._read_frames())
+
+    def _read_frames(self):
+        import numpy as np
+        size = self.width * self.height * 3
+        stdout = self._process.stdout
+        while True:
+            # A new array per frame: consumers keep and draw on the frames they get
+            frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+            view = memoryview(frame).cast('B')
+            filled = 0
+            while filled < size:
+                count = stdout.readinto(view[filled:])
+                if not count:
+                    return
+                filled += count
+            yield frame
+
+    def release(self):
+        super().release()
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+
+class PyAVCapture(_LatestFrameCapture):
+    """Frames decoded in-process by PyAV, scaled by swscale."""
+
+    def __init__(self, url, options, av_module=None):
+        super().__init__(options.timeout)
+        self._container = None
+        try:
+            av = av_module or __import__('av')
+            container_options = {'rtsp_transport': 'tcp'} if url.startswith('rtsp://') else {}
+            self._container = av.open(url, options=container_options, timeout=options.timeout or None)
+            stream = self._container.streams.video[0]
+            stream.thread_type = 'AUTO'
+            if options.decode_threads:
+                stream.codec_context.thread_count = options.decode_threads
+            if options.keyframes_only:
+                stream.codec_context.skip_frame = 'NONKEY'
+            self._stream = stream
+            self.width, self.height = options.scale or (stream.codec_context.width, stream.codec_context.height)
+            self.fps = float(stream.average_rate or 0)
+        except Exception as e:
+            print(f"[CAPTURE] Could not open PyAV input: {e}")
+            return
+        self._start(self._decode_frames())
+
+    def _decode_frames(self):
+        for frame in self._container.decode(self._stream):
+            yield frame.to_ndarray(format='bgr24', width=self.width, height=self.height)
+
+    def release(self):
+        super().release()
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+
+
+def open_opencv(source, options, settings=()):
+    """cv2.VideoCapture with decoder threads / hardware acceleration where the build supports them."""
+    import cv2
+    from camera_supervisor import open_capture
+    params = []
+    if isinstance(source, str):
+        if options.hwaccel and hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+            params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        if options.decode_threads and hasattr(cv2, 'CAP_PROP_N_THREADS'):
+            params += [cv2.CAP_PROP_N_THREADS, options.decode_threads]
+    return open_capture(source, settings, params=params)
+
+
+def capture_opener(camera, overrides=None):
+    """opener(source, settings) for CameraSupervisor applying ``camera``'s decode options."""
+    options = capture_options(camera, overrides)
+    backend = resolve_backend(options)
+    if backend == 'pyav':
+        try:
+            __import__('av')
+        except ImportError:
+            print(f"[CAPTURE] CAPTURE_BACKEND=pyav for {camera} but PyAV is not installed, using OpenCV")
+            backend = 'opencv'
+    if backend == 'opencv' and (options.scale or options.keyframes_only):
+        print(f"[CAPTURE] {camera}: OpenCV cannot scale or skip frames while decoding; "
+              f"install ffmpeg or PyAV for CAPTURE_SCALE/CAPTURE_KEYFRAMES_ONLY")
+
+    def opener(source, settings=()):
+        if isinstance(source, str) and options.substream:
+            source = substream_url(source)
+        if backend == 'ffmpeg' and isinstance(source, str):
+            return FFmpegCapture(source, options)
+        if backend == 'pyav' and isinstance(source, str):
+            return PyAVCapture(source, options)
+        return open_opencv(source, options, settings)
+
+    opener.options = options
+    opener.backend = backend
+    return opener
@@ -0,0 +1,190 @@
+"""
+Alert deduplication backends.
+
+should_send_alert() used to do a GET and a SETEX on a module-level Redis client
+for every alert, so a missing or slow Redis blocked or broke alerting. A backend
+has one operation:
+
+    claim(key, ttl) -> True if this is the first claim of ``key`` within ``ttl``
+                       seconds (send the alert), False if it is a duplicate
+
+Implementations:
+
+* LocalDedupBackend: an in-process TTLCache (heap-ordered expiry, bounded size);
+  correct for one process, no network;
+* RedisDedupBackend: one atomic ``SET key value NX EX ttl`` per claim, shared by
+  every worker and host;
+* TieredDedupBackend: the local cache as a read-through tier in front of Redis.
+  Keys known to be in their cooldown are answered locally, so a burst of the
+  same violation costs one Redis round trip. When Redis fails the backend
+  switches to the local cache and retries Redis after DEDUP_REDIS_RETRY seconds.
+
+make_backend() picks one from DEDUP_BACKEND (auto, local or redis).
+"""
+import heapq
+import os
+import threading
+import time
+
+DEDUP_BACKEND = os.getenv("DEDUP_BACKEND", "auto").lower()
+DEDUP_LOCAL_MAXSIZE = int(os.getenv("DEDUP_LOCAL_MAXSIZE", "10000"))
+# Seconds before Redis is tried again after an error
+DEDUP_REDIS_RETRY = float(os.getenv("DEDUP_REDIS_RETRY", "30"))
+# Socket timeout for dedup Redis calls, so a slow server cannot stall alerting
+DEDUP_REDIS_TIMEOUT = float(os.getenv("DEDUP_REDIS_TIMEOUT", "0.5"))
+
+
+class TTLCache:
+    """Set of keys with per-key expiry and a size bound.
+
+    Expiry is kept in a min-heap of (expires_at, key); expired entries are purged
+    lazily when the cache is full or a purge is due. When the cache is still full
+    after purging, the entry closest to expiry is evicted.
+    """
+
+    def __init__(self, maxsize=DEDUP_LOCAL_MAXSIZE, clock=time.monotonic):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._expiry = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def __contains__(self, key):
+        expires_at = self._expiry.get(key)
+        return expires_at is not None and expires_at > self._clock()
+
+    def ttl(self, key):
+        """Seconds until ``key`` expires, or None if it is not cached."""
+        expires_at = self._expiry.get(key)
+        if expires_at is None:
+            return None
+        remaining = expires_at - self._clock()
+        return remaining if remaining > 0 else None
+
+    def add(self, key, ttl):
+        """Cache ``key`` for ``ttl`` seconds, replacing any earlier expiry."""
+        with self._lock:
+            self._set(key, self._clock() + ttl)
+
+    def add_if_absent(self, key, ttl):
+        """Cache ``key`` unless it is already cached and unexpired. Returns True if added."""
+        with self._lock:
+            now = self._clock()
+            expires_at = self._expiry.get(key)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._set(key, now + ttl)
+            return True
+
+    def _set(self, key, expires_at):
+        self._expiry[key] = expires_at
+        heapq.heappush(self._heap, (expires_at, key))
+        if len(self._expiry) > self.maxsize or len(self._heap) > 2 * self.maxsize:
+            self._purge()
+
+    def _purge(self):
+        now = self._clock()
+        heap = self._heap
+        while heap:
+            expires_at, key = heap[0]
+            current = self._expiry.get(key)
+            if current != expires_at:
+                heapq.heappop(heap)  # stale heap entry, key was re-added or removed
+            elif expires_at <= now or len(self._expiry) > self.maxsize:
+                heapq.heappop(heap)
+                del self._expiry[key]
+            else:
+                break
+
+
+class LocalDedupBackend:
+    """Deduplication within this process only."""
+
+    name = 'local'
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else TTLCache()
+
+    def claim(self, key, ttl):
+        return self.cache.add_if_absent(key, ttl)
+
+
+class RedisDedupBackend:
+    """Deduplication shared through Redis with one atomic SET NX EX per claim."""
+
+    name = 'redis'
+
+    def __init__(self, client, prefix="dedup:"):
+        self.client = client
+        self.prefix = prefix
+
+    def claim(self, key, ttl):
+        return bool(self.client.set(self.prefix + key, int(time.time()), nx=True, ex=max(1, int(ttl))))
+
+    def remaining(self, key):
+        """Seconds left in the cooldown of ``key`` (0 if it has none)."""
+        ms = self.client.pttl(self.prefix + key)
+        return ms / 1000.0 if ms and ms > 0 else 0.0
+
+
+class TieredDedupBackend:
+    """Local TTL cache in front of Redis, falling back to the cache alone while Redis is failing."""
+
+    name = 'tiered'
+
+    def __init__(self, remote, local=None, retry_after=DEDUP_REDIS_RETRY, clock=time.monotonic):
+        self.remote = remote
+        self.local = local if local is not None else LocalDedupBackend()
+        self.retry_after = retry_after
+        self._clock = clock
+        self._remote_down_until = 0.0
+        self.stats = {"local_hits": 0, "remote_calls": 0, "remote_errors": 0}
+
+    @property
+    def remote_available(self):
+        return self._clock() >= self._remote_down_until
+
+    def claim(self, key, ttl):
+        cache = self.local.cache
+        if key in cache:
+            self.stats["local_hits"] += 1
+            return False
+        if not self.remote_available:
+            return self.local.claim(key, ttl)
+        try:
+            self.stats["remote_calls"] += 1
+            if self.remote.claim(key, ttl):
+                cache.add(key, ttl)
+                return True
+            # Claimed elsewhere: cache it for the rest of that cooldown
+            remaining = self.remote.remaining(key)
+            if remaining > 0:
+                cache.add(key, remaining)
+            return False
+        except Exception as e:
+            self.stats["remote_errors"] += 1
+            self._remote_down_until = self._clock() + self.retry_after
+            print(f"[DEDUP] Redis unavailable ({e}); using the local cache for {self.retry_after:.0f}s")
+            return self.local.claim(key, ttl)
+
+    def status(self):
+        return dict(self.stats, remote_available=self.remote_available, local_keys=len(self.local.cache))
+
+
+def make_backend(redis_client_factory, mode=DEDUP_BACKEND):
+    """Build the configured backend.
+
+    Args:
+        redis_client_factory (callable): Returns a Redis client; only called when
+            Redis is used
+        mode (str): 'auto' (tiered local + Redis), 'redis' or 'local'
+    """
+    if mode == 'local':
+        return LocalDedupBackend()
+    remote = RedisDedupBackend(redis_client_factory())
+    if mode == 'redis':
+        return remote
+    return TieredDedupBackend(remote)
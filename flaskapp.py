@@ -1,8 +1,12 @@
 # --- Violation Alert API endpoint for testing ---
+# Time module imports and init phases (see /api/startup_report); must come first
+import startup_timing
+startup_timing.install()
+
 from flask import request, jsonify
 
 
-from flask import Flask, render_template, Response,jsonify,request,session,make_response,send_from_directory
+from flask import Flask, render_template, Response,jsonify,request,session,make_response,send_file,send_from_directory
 
 from flask_wtf import FlaskForm
 
@@ -28,59 +32,50 @@ from flask_cors import CORS
 #Video Detection is the Function which performs Object Detection on Input Video
 from YOLO_Video import video_detection, video_detection_single_frame
 from YOLO_Video import detect_manufacturing_ppe, detect_construction_ppe, detect_healthcare_ppe, detect_oilgas_ppe
-from ultralytics import YOLO
+from YOLO_Video import detect_domains
+from model_registry import ensure_ready_async, get_model, is_ready, model_status, preload_from_env
+from frame_preprocess import FramePreprocessor
+from frame_quality import FrameQualityChecker, quality_report
+from jpeg_encoder import FrameEncoder, encoder_stats, get_backend, multipart_chunk, profile_from_request_args
+from stream_broadcaster import StreamBroadcaster, register_stream_socket_handlers
+from violation_broadcaster import ViolationBroadcaster, register_violation_socket_handlers
+from http_cache import VIOLATION_IMAGE_MAX_AGE, ResponseCache, cached_by_generation, immutable
+from snapshot_admission import snapshot_admission
+from thumbnails import thumbnail_store
+from violation_index import (VIOLATION_PAGE_DEFAULT, parse_fields, parse_limit, project, split_types,
+                             violation_index)
+from violation_stats import RESOLUTIONS, compliance, violation_stats
+from violation_storage import violation_storage
+from async_mode import offload_iter, run_blocking, socketio_async_mode
+from camera_registry import DOMAINS, camera_registry, crop_to_roi, redact_url
+from inference_scheduler import inference_scheduler
+from camera_supervisor import (DEGRADED, FAILED, IP_CAMERA_ADAPTIVE_SETTINGS, IP_CAMERA_SETTINGS,
+                               IP_CAMERA_STABLE_SETTINGS, WEBCAM_DETECTION_SETTINGS, WEBCAM_SETTINGS,
+                               CameraSupervisor, camera_health)
 from config import violation_recording_enabled
 import config
+from shared_state import shared_state
 # Add near your other imports
-from collections import defaultdict
 import re
 import time
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
 import logging
 import sys
 import os
-from logging.handlers import RotatingFileHandler
+import structured_logging
+from structured_logging import get_logger, logging_status
+startup_timing.mark('imports')
 
 # Configure comprehensive logging
 def setup_logging():
-    """Set up comprehensive logging for Flask app with file output."""
-    # Create logs directory if it doesn't exist
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    
-    # Set up the main logger
+    """Set up logging for the Flask app; file and console output go through a queue.
+
+    See structured_logging.py: log calls only enqueue the record, a listener thread
+    writes logs/flaskapp.log and the console.
+    """
     logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-    
-    # Clear any existing handlers
-    logger.handlers.clear()
-    
-    # Create formatters
-    detailed_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
-    )
-    console_formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s'
-    )
-    
-    # File handler with rotation (max 10MB, keep 5 backups)
-    file_handler = RotatingFileHandler(
-        os.path.join(log_dir, 'flaskapp.log'),
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(detailed_formatter)
-    
-    # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(console_formatter)
-    
-    # Add handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    structured_logging.setup_logging()
     
     # Set up Flask app logger
     app_logger = logging.getLogger('flaskapp')
@@ -98,11 +93,19 @@ def setup_logging():
 
 # Initialize logging
 app_logger = setup_logging()
+# Frame generators log per-frame events through this (rate-limited/sampled, never blocking)
+stream_log = get_logger('flaskapp.stream')
+startup_timing.mark('logging')
 app_logger.info("="*80)
 app_logger.info("FLASK PPE DETECTION APP STARTING")
 app_logger.info("="*80)
 
 config.violation_recording_enabled = False
+# The recording flag is shared by all workers; config.violation_recording_enabled is this
+# worker's cached copy, kept current by the shared-state pub/sub listener
+shared_state.watch_flag('violation_recording_enabled',
+                        lambda value: setattr(config, 'violation_recording_enabled', bool(value)))
+shared_state.init_flag('violation_recording_enabled', False)
 
 # Camera configuration from environment variables
 CAMERA_IP = os.getenv('CAMERA_IP', '192.168.8.210')
@@ -118,8 +121,8 @@ FLASK_SECRET_KEY = os.getenv('FLASK_SECRET_KEY', 'default-secret-key')
 FLASK_HOST = os.getenv('FLASK_HOST', '0.0.0.0')
 FLASK_PORT = int(os.getenv('FLASK_PORT', '5000'))
 FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
-# Global variable to hold the webcam capture object
-webcam_cap = None
+# Supervised capture of the local webcam, closed by the release_webcam command
+webcam_camera = None
 app = Flask(__name__)
 
 # Enhanced CORS configuration for React frontend
@@ -128,6 +131,7 @@ CORS(app,
      origins=["http://localhost:3000", "http://127.0.0.1:3000"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
      allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
+     expose_headers=["X-Next-Cursor"],
      supports_credentials=True)
 
 # Remove the duplicate @app.after_request CORS handler to avoid conflicts
@@ -141,9 +145,24 @@ app.config['SECRET_KEY'] = FLASK_SECRET_KEY
  # Use SocketIO for real-time violation alerts
 from flask_socketio import SocketIO
 import redis
-from violation_alerts import should_send_alert, send_email, send_sms, broadcast_violation
-
-socketio = SocketIO(app, cors_allowed_origins="*")
+from violation_alerts import (should_send_alert, send_email, send_sms,
+                              notification_dispatcher, notification_status)
+
+# async_mode follows ASYNC_MODE (see async_mode.py); with several gunicorn workers set
+# SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) so emits reach every worker
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=socketio_async_mode(),
+                    message_queue=os.getenv("SOCKETIO_MESSAGE_QUEUE") or None)
+# Violations go out as rate-limited per camera/domain batches (see violation_broadcaster.py)
+violation_broadcaster = ViolationBroadcaster(socketio)
+register_violation_socket_handlers(socketio)
+startup_timing.mark('socketio')
+
+# Redis is only contacted, and the snapshot evictor only started, once the first
+# request comes in, not at import time (so nothing runs in a forking gunicorn master)
+@app.before_request
+def start_background_services():
+    shared_state.start()
+    violation_storage.start_evictor()
 
 # WebSocket endpoint for frontend
 @socketio.on('connect')
@@ -153,6 +172,7 @@ def handle_connect():
 @socketio.on('disconnect')
 def handle_disconnect():
     print('Client disconnected')
+    stream_broadcaster.unsubscribe(request.sid)
 
 
 # API endpoint for YOLO or other modules to call
@@ -160,13 +180,14 @@ def handle_disconnect():
 def violation_alert():
     violation = request.json
     if should_send_alert(violation):
-        # Send via WebSocket
-        broadcast_violation(socketio, violation)
-        # Optionally send email/SMS
-        send_email("PPE Violation Alert", str(violation))
-        send_sms(f"PPE Violation: {violation['type']} at {violation['location']}")
+        # Send via WebSocket, batched with the room's other violations
+        violation_broadcaster.publish(violation)
+        # Email/SMS go out from the notification thread, not this request
+        notification_dispatcher.submit(send_email, "PPE Violation Alert", str(violation))
+        notification_dispatcher.submit(send_sms, f"PPE Violation: {violation['type']} at {violation['location']}")
         return jsonify({"alert": "sent"}), 200
     else:
+        violation_broadcaster.publish(violation, suppressed=True)
         return jsonify({"alert": "suppressed"}), 200
 # Domain folder naming function to match YOLO_Video.py logic
 def get_domain_short(domain_name):
@@ -189,25 +210,99 @@ DOMAIN_SHORT_TO_FULL = {v: k for k, v in DOMAIN_MAPPINGS.items()}
 
 app.config['UPLOAD_FOLDER'] = 'static/files'
 
-def get_camera_urls():
-    """Generate camera URLs using environment variables."""
-    base_urls = [
-        f"rtsp://{CAMERA_USERNAME}:{CAMERA_PASSWORD}@{CAMERA_IP}:{CAMERA_PORT}/stream",
-        f"rtsp://{CAMERA_USERNAME}:{CAMERA_PASSWORD}@{CAMERA_IP}:{CAMERA_PORT}/stream1",
-        f"rtsp://{CAMERA_USERNAME}:{CAMERA_PASSWORD}@{CAMERA_IP}:{CAMERA_PORT}/live",
-        f"rtsp://{CAMERA_USERNAME}:{CAMERA_PASSWORD}@{CAMERA_IP}:{CAMERA_PORT}/cam/realmonitor?channel=1&subtype=0",
-        f"http://{CAMERA_USERNAME}:{CAMERA_PASSWORD}@{CAMERA_IP}:{CAMERA_PORT}/stream",
-        f"http://{CAMERA_USERNAME}:{CAMERA_PASSWORD}@{CAMERA_IP}/video.cgi",
-        f"http://{CAMERA_USERNAME}:{CAMERA_PASSWORD}@{CAMERA_IP}/videostream.cgi",
-        f"http://{CAMERA_IP}/video.cgi?user={CAMERA_USERNAME}&pwd={CAMERA_PASSWORD}"
-    ]
-    return base_urls
+# Camera used by the routes that do not name one (CAMERA_IP, or the first camera in CAMERAS_CONFIG)
+DEFAULT_CAMERA_ID = camera_registry.default_id
+
+# Inference slots are shared by camera priority and capped by each camera's FPS budget
+for _camera in camera_registry.cameras():
+    inference_scheduler.configure(_camera.id, priority=_camera.priority, fps_budget=_camera.fps_budget)
+
+
+def get_camera_urls(camera_id=None):
+    """Candidate stream URLs of a registered camera (default: DEFAULT_CAMERA_ID).
+
+    With CAPTURE_SUBSTREAM the cam/realmonitor URL asks for the substream (subtype=1).
+    """
+    return camera_registry.urls(camera_id or DEFAULT_CAMERA_ID)
 
 def get_primary_camera_url():
     """Get the primary camera URL for direct access."""
     return f"http://{CAMERA_USERNAME}:{CAMERA_PASSWORD}@{CAMERA_IP}:{CAMERA_PORT}/stream"
 
 
+def find_working_camera_url(log_prefix="[CAMERA]", camera_id=None):
+    """Return the first URL of the camera (default: DEFAULT_CAMERA_ID) that delivers a frame, or None.
+
+    Opening RTSP/HTTP captures blocks for seconds; call it through run_blocking()
+    from request handlers so green workers keep serving other clients.
+    """
+    camera_urls = get_camera_urls(camera_id)
+    for i, url in enumerate(camera_urls):
+        app_logger.info(f"{log_prefix} Testing camera URL {i+1}/{len(camera_urls)}: {redact_url(url)}")
+        test_cap = cv2.VideoCapture(url)
+        test_cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        try:
+            if test_cap.isOpened():
+                ret, frame = test_cap.read()
+                if ret and frame is not None:
+                    app_logger.info(f"{log_prefix} Successfully connected to: {redact_url(url)}")
+                    return url
+                app_logger.warning(f"{log_prefix} Connected but no frames from: {redact_url(url)}")
+            else:
+                app_logger.warning(f"{log_prefix} Failed to connect to: {redact_url(url)}")
+        except Exception as url_error:
+            app_logger.error(f"{log_prefix} Exception testing URL {redact_url(url)}: {str(url_error)}")
+        finally:
+            test_cap.release()
+    app_logger.error(f"{log_prefix} All {len(camera_urls)} camera URLs failed")
+    return None
+
+def stream_encoder_args():
+    """JPEG profile selection for a stream request (?profile=<name>&bandwidth_kbps=<n>)."""
+    profile, bandwidth_kbps = profile_from_request_args(request.args)
+    return {"profile": profile, "bandwidth_kbps": bandwidth_kbps}
+
+
+def mjpeg_response(frames):
+    """Multipart MJPEG response; each frame is produced off the event loop in gevent/eventlet mode.
+
+    The stream is listed in the cross-worker registry while it is being served.
+    """
+    stream_id = f"{shared_state.worker_id}:{request.path}:{uuid.uuid4().hex[:8]}"
+    return Response(tracked_stream(offload_iter(frames), stream_id, path=request.path),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+def tracked_stream(frames, stream_id, **info):
+    """Register a stream in shared state for as long as the client consumes it."""
+    shared_state.register_stream(stream_id, **info)
+    try:
+        for chunk in frames:
+            shared_state.touch_stream(stream_id)
+            yield chunk
+    finally:
+        frames.close()
+        shared_state.unregister_stream(stream_id)
+
+
+def stream_frame_meta(frame_id, domain, frame, detections):
+    """Detection JSON sent with every frame over the Socket.IO frame channel.
+
+    ``detections`` is a list for burned-in streams and a {domain: list} dict for
+    overlay streams, where the client draws the boxes itself.
+    """
+    h, w = frame.shape[:2]
+    return {
+        "frame_id": frame_id,
+        "domain": domain,
+        "width": w,
+        "height": h,
+        "timestamp": time.time(),
+        "recording": config.violation_recording_enabled,
+        "detections": detections,
+    }
+
+
 #Use FlaskForm to get input video file  from user
 class UploadFileForm(FlaskForm):
     #We store the uploaded video file path in the FileField in the variable file
@@ -237,111 +332,74 @@ def generate_frames_web(path_x):
 
 # filepath: [flaskapp.py](http://_vscodecontentref_/0)
 
-def generate_frames_ip_camera(ip_camera_url):
+def generate_frames_ip_camera(ip_camera_url, profile=None, bandwidth_kbps=None):
     """Generate frames from the IP camera."""
-    cap = None
+    camera = None
+    log = stream_log.bind(camera='ipcamera')
     try:
-        print(f"Attempting to connect to IP camera: {ip_camera_url}")
-        cap = cv2.VideoCapture(ip_camera_url)
-        
-        # Set properties to improve connection
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_FPS, 15)
-        
-        # Set timeout for network streams (in milliseconds)
-        cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 5000)
-        cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000)
-        
-        # Check if camera opened successfully
-        if not cap.isOpened():
-            print(f"Error: Could not open camera stream: {ip_camera_url}")
+        log.info(f"Attempting to connect to IP camera: {redact_url(ip_camera_url)}")
+        # The supervisor reapplies these settings and reconnects with backoff on failures
+        camera = CameraSupervisor(ip_camera_url, name='ipcamera', opener=camera_registry.opener(DEFAULT_CAMERA_ID),
+                                  settings=IP_CAMERA_SETTINGS)
+        if not camera.connect():
+            log.error(f"Could not open camera stream: {redact_url(ip_camera_url)}")
             return
         
-        print("Camera connection successful, starting frame generation...")
+        log.info("Camera connection successful, starting frame generation...")
         frame_count = 0
-        consecutive_failures = 0
-        max_consecutive_failures = 10
+        preprocessor = FramePreprocessor()
+        encoder = FrameEncoder(label='ipcamera', profile_name=profile, bandwidth_kbps=bandwidth_kbps)
         
         while True:
-            success, frame = cap.read()
+            success, frame = camera.read()
             if not success:
-                consecutive_failures += 1
-                print(f"Failed to read frame {frame_count}, consecutive failures: {consecutive_failures}")
-                
-                if consecutive_failures >= max_consecutive_failures:
-                    print(f"Too many consecutive failures ({consecutive_failures}), stopping stream")
+                if camera.state == FAILED:
+                    log.error("Camera unavailable after repeated reconnects, stopping stream")
                     break
+                log.every('read_failed', logging.WARNING, "Failed to read frame (camera %s)",
+                          camera.state, extra={'frame_id': frame_count})
                 continue
             
-            # Reset failure counter on successful read
-            consecutive_failures = 0
             frame_count += 1
             
-            if frame_count % 30 == 0:  # Log every 30 frames
-                print(f"Processed {frame_count} frames")
+            log.sampled('progress', "Processed %d frames", frame_count, extra={'frame_id': frame_count})
             
             # Apply YOLO detection to the IP camera frame
             try:
                 # Apply YOLO detection to the IP camera frame
-                processed_frame = video_detection_single_frame(frame)
+                processed_frame = video_detection_single_frame(frame, preprocessor=preprocessor)
                 
-                ref, buffer = cv2.imencode('.jpg', processed_frame)
-                if not ref:
-                    print("Error encoding frame")
+                chunk = encoder.encode_multipart(processed_frame)
+                if chunk is None:
+                    log.every('encode_failed', logging.WARNING, "Error encoding frame",
+                              extra={'frame_id': frame_count})
                     continue
                     
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                yield chunk
                        
             except Exception as e:
-                print(f"Error processing frame: {str(e)}")
+                log.every('process_failed', logging.ERROR, "Error processing frame: %s", e,
+                          extra={'frame_id': frame_count})
                 continue
                 
     except Exception as e:
-        print(f"Error in generate_frames_ip_camera: {str(e)}")
+        log.error(f"Error in generate_frames_ip_camera: {str(e)}")
     finally:
-        if cap is not None:
-            cap.release()
-            print("Camera released")
+        if camera is not None:
+            camera.release()
+            log.info("Camera released")
 
 @app.route('/ipcamera')
 def ipcamera():
     """Route to display IP camera feed."""
     try:
-        # Get camera URLs from environment variables
-        camera_urls = get_camera_urls()
-        
-        working_url = None
-        
-        # Try each URL format
-        for url in camera_urls:
-            print(f"Testing camera URL: {url}")
-            test_cap = cv2.VideoCapture(url)
-            test_cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
-            test_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
-            test_cap.set(cv2.CAP_PROP_BUFFERSIZE, CAMERA_BUFFER_SIZE)
-            
-            if test_cap.isOpened():
-                # Try to read a frame to confirm it works
-                ret, frame = test_cap.read()
-                test_cap.release()
-                if ret and frame is not None:
-                    working_url = url
-                    print(f"✓ Successfully connected to: {url}")
-                    break
-                else:
-                    print(f"✗ Connected but no frames from: {url}")
-            else:
-                test_cap.release()
-                print(f"✗ Failed to connect to: {url}")
+        # Probing RTSP/HTTP URLs blocks for seconds; keep it off the event loop
+        working_url = run_blocking(find_working_camera_url, "[IPCAMERA]")
         
         if not working_url:
             return jsonify({
                 "error": "Cannot connect to IP camera with any URL format",
-                "tried_urls": camera_urls,
+                "tried_urls": [redact_url(url) for url in get_camera_urls()],
                 "suggestions": [
                     "Check if the camera is powered on and connected to network",
                     f"Verify the IP address ({CAMERA_IP}) is correct",
@@ -352,9 +410,8 @@ def ipcamera():
                 ]
             }), 500
         
-        print(f"Using working camera URL: {working_url}")
-        return Response(generate_frames_ip_camera_with_yolo(working_url, apply_yolo=True), 
-                       mimetype='multipart/x-mixed-replace; boundary=frame')
+        print(f"Using working camera URL: {redact_url(working_url)}")
+        return mjpeg_response(generate_frames_ip_camera_with_yolo(working_url, apply_yolo=True, **stream_encoder_args()))
     except Exception as e:
         print(f"Error in ipcamera route: {str(e)}")
         return jsonify({"error": str(e)}), 500        
@@ -388,34 +445,43 @@ def front():
 @app.route('/video')
 def video():
     #return Response(generate_frames(path_x='static/files/bikes.mp4'), mimetype='multipart/x-mixed-replace; boundary=frame')
-    return Response(generate_frames(path_x = session.get('video_path', None)),mimetype='multipart/x-mixed-replace; boundary=frame')
+    return mjpeg_response(generate_frames(path_x = session.get('video_path', None)))
 
 # To display the Output Video on Webcam page
 @app.route('/webapp')
 def webapp():
     """Route to display webcam feed with YOLO detection."""
     try:
-        return Response(generate_frames_webcam(), 
-                       mimetype='multipart/x-mixed-replace; boundary=frame')
+        return mjpeg_response(generate_frames_webcam(**stream_encoder_args()))
     except Exception as e:
         print(f"Error in webapp route: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def probe_camera(url):
+    """Open ``url`` and read one frame. Returns (opened, read_ok, frame_shape); blocks, use run_blocking()."""
+    cap = cv2.VideoCapture(url)
+    try:
+        if not cap.isOpened():
+            return False, False, None
+        success, frame = cap.read()
+        return True, bool(success), frame.shape if success and frame is not None else None
+    finally:
+        cap.release()
+
 @app.route('/test_camera')
 def test_camera():
     """Test route to check IP camera connectivity."""
     ip_camera_url = get_primary_camera_url()
     
     try:
-        print(f"Testing camera connection to: {ip_camera_url}")
-        cap = cv2.VideoCapture(ip_camera_url)
+        print(f"Testing camera connection to: {redact_url(ip_camera_url)}")
+        opened, success, frame_shape = run_blocking(probe_camera, ip_camera_url)
         
-        if not cap.isOpened():
-            cap.release()
+        if not opened:
             return jsonify({
                 "status": "failed",
                 "message": "Cannot connect to IP camera",
-                "url": ip_camera_url,
+                "url": redact_url(ip_camera_url),
                 "suggestions": [
                     "Check if the camera is powered on",
                     "Verify the IP address and port",
@@ -425,15 +491,11 @@ def test_camera():
                 ]
             })
         
-        # Try to read one frame
-        success, frame = cap.read()
-        cap.release()
-        
         if success:
             return jsonify({
                 "status": "success",
                 "message": "Camera connection successful",
-                "frame_shape": frame.shape if frame is not None else None
+                "frame_shape": frame_shape
             })
         else:
             return jsonify({
@@ -451,192 +513,189 @@ def camera_debug():
     """Debug page for IP camera testing."""
     return render_template('camera_debug.html')
 
-def generate_frames_ip_camera_with_yolo(ip_camera_url, apply_yolo=True):
+def generate_frames_ip_camera_with_yolo(ip_camera_url, apply_yolo=True, profile=None, bandwidth_kbps=None):
     """Generate frames from the IP camera with optional YOLO detection."""
-    cap = None
+    log = stream_log.bind(camera='ipcamera')
+    camera = None
     try:
-        print(f"Attempting to connect to IP camera: {ip_camera_url}")
-        print(f"YOLO detection: {'Enabled' if apply_yolo else 'Disabled'}")
-        cap = cv2.VideoCapture(ip_camera_url)
-        
-        # Set properties to improve connection
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_FPS, 15)
-        
-        # Set timeout for network streams (in milliseconds)
-        cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 5000)
-        cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000)
-        
-        # Check if camera opened successfully
-        if not cap.isOpened():
-            print(f"Error: Could not open camera stream: {ip_camera_url}")
+        log.info(f"Attempting to connect to IP camera: {redact_url(ip_camera_url)}")
+        log.info(f"YOLO detection: {'Enabled' if apply_yolo else 'Disabled'}")
+        # The supervisor reapplies these settings and reconnects with backoff on failures
+        camera = CameraSupervisor(ip_camera_url, name='ipcamera', opener=camera_registry.opener(DEFAULT_CAMERA_ID),
+                                  settings=IP_CAMERA_SETTINGS)
+        if not camera.connect():
+            log.error(f"Could not open camera stream: {redact_url(ip_camera_url)}")
             return
         
-        print("Camera connection successful, starting frame generation...")
+        log.info("Camera connection successful, starting frame generation...")
         frame_count = 0
-        consecutive_failures = 0
-        max_consecutive_failures = 10
+        preprocessor = FramePreprocessor()
+        encoder = FrameEncoder(label='ipcamera_yolo' if apply_yolo else 'ipcamera_raw', profile_name=profile, bandwidth_kbps=bandwidth_kbps)
         
         while True:
-            success, frame = cap.read()
+            success, frame = camera.read()
             if not success:
-                consecutive_failures += 1
-                print(f"Failed to read frame {frame_count}, consecutive failures: {consecutive_failures}")
-                
-                if consecutive_failures >= max_consecutive_failures:
-                    print(f"Too many consecutive failures ({consecutive_failures}), stopping stream")
+                if camera.state == FAILED:
+                    log.error("Camera unavailable after repeated reconnects, stopping stream")
                     break
+                log.every('read_failed', logging.WARNING, "Failed to read frame (camera %s)",
+                          camera.state, extra={'frame_id': frame_count})
                 continue
             
-            # Reset failure counter on successful read
-            consecutive_failures = 0
             frame_count += 1
             
-            if frame_count % 30 == 0:  # Log every 30 frames
-                print(f"Processed {frame_count} frames")
+            log.sampled('progress', "Processed %d frames", frame_count, extra={'frame_id': frame_count})
             
             # Apply YOLO detection if enabled
             try:
                 if apply_yolo:
-                    processed_frame = video_detection_single_frame(frame)
+                    processed_frame = video_detection_single_frame(frame, preprocessor=preprocessor)
                 else:
                     processed_frame = frame
                 
-                ref, buffer = cv2.imencode('.jpg', processed_frame)
-                if not ref:
-                    print("Error encoding frame")
+                chunk = encoder.encode_multipart(processed_frame)
+                if chunk is None:
+                    log.every('encode_failed', logging.WARNING, "Error encoding frame",
+                              extra={'frame_id': frame_count})
                     continue
                     
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                yield chunk
                        
             except Exception as e:
-                print(f"Error processing frame: {str(e)}")
+                log.every('process_failed', logging.ERROR, "Error processing frame: %s", e,
+                          extra={'frame_id': frame_count})
                 continue
                 
     except Exception as e:
-        print(f"Error in generate_frames_ip_camera_with_yolo: {str(e)}")
+        log.error(f"Error in generate_frames_ip_camera_with_yolo: {str(e)}")
     finally:
-        if cap is not None:
-            cap.release()
-            print("Camera released")
+        if camera is not None:
+            camera.release()
+            log.info("Camera released")
 
 @app.route('/ipcamera_raw')
 def ipcamera_raw():
     """Route to display raw IP camera feed without YOLO detection."""
     try:
-        # Get camera URLs from environment variables
-        camera_urls = get_camera_urls()
-        
-        working_url = None
-        
-        # Try each URL format
-        for url in camera_urls:
-            print(f"Testing camera URL (raw): {url}")
-            test_cap = cv2.VideoCapture(url)
-            test_cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            
-            if test_cap.isOpened():
-                ret, frame = test_cap.read()
-                test_cap.release()
-                if ret and frame is not None:
-                    working_url = url
-                    print(f"✓ Successfully connected to (raw): {url}")
-                    break
-            else:
-                test_cap.release()
+        working_url = run_blocking(find_working_camera_url, "[IPCAMERA-RAW]")
         
         if not working_url:
             return jsonify({
                 "error": "Cannot connect to IP camera (raw)"
             }), 500
         
-        print(f"Using working camera URL (raw): {working_url}")
-        return Response(generate_frames_ip_camera_with_yolo(working_url, apply_yolo=False), 
-                       mimetype='multipart/x-mixed-replace; boundary=frame')
+        print(f"Using working camera URL (raw): {redact_url(working_url)}")
+        return mjpeg_response(generate_frames_ip_camera_with_yolo(working_url, apply_yolo=False, **stream_encoder_args()))
     except Exception as e:
         print(f"Error in ipcamera_raw route: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-def generate_frames_webcam():
+def generate_frames_webcam(profile=None, bandwidth_kbps=None):
     """Generate frames from webcam with YOLO detection."""
-    cap = None
+    log = stream_log.bind(camera='webcam')
+    camera = None
     try:
-        print("Attempting to connect to webcam...")
-        cap = cv2.VideoCapture(0)  # Use default webcam
-        
-        # Set properties
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_FPS, 30)
-        
-        if not cap.isOpened():
-            print("Error: Could not open webcam")
+        log.info("Attempting to connect to webcam...")
+        # Default webcam; reopened with the same settings if it stops delivering frames
+        camera = CameraSupervisor(0, name='webcam', settings=WEBCAM_SETTINGS)
+        if not camera.connect():
+            log.error("Could not open webcam")
             return
         
-        print("Webcam connection successful, starting frame generation...")
+        log.info("Webcam connection successful, starting frame generation...")
         frame_count = 0
+        preprocessor = FramePreprocessor()
+        encoder = FrameEncoder(label='webcam', profile_name=profile, bandwidth_kbps=bandwidth_kbps)
         
         while True:
-            success, frame = cap.read()
+            success, frame = camera.read()
+            captured_at = time.monotonic()
             if not success:
-                print("Failed to read frame from webcam")
-                break
+                if camera.state == FAILED:
+                    log.error("Webcam unavailable after repeated reconnects, stopping stream")
+                    break
+                log.every('read_failed', logging.WARNING, "Failed to read frame from webcam (camera %s)",
+                          camera.state, extra={'frame_id': frame_count})
+                continue
             
             frame_count += 1
             
-            if frame_count % 30 == 0:  # Log every 30 frames
-                print(f"Processed {frame_count} webcam frames")
+            log.sampled('progress', "Processed %d webcam frames", frame_count, extra={'frame_id': frame_count})
             
             try:
-                # Apply YOLO detection to webcam frame
-                processed_frame = video_detection_single_frame(frame)
+                if not inference_scheduler.acquire('webcam', captured_at):
+                    continue
+                try:
+                    # Apply YOLO detection to webcam frame
+                    processed_frame = video_detection_single_frame(frame, preprocessor=preprocessor)
+                finally:
+                    inference_scheduler.release('webcam')
                 
-                ref, buffer = cv2.imencode('.jpg', processed_frame)
-                if not ref:
-                    print("Error encoding webcam frame")
+                chunk = encoder.encode_multipart(processed_frame)
+                if chunk is None:
+                    log.every('encode_failed', logging.WARNING, "Error encoding webcam frame",
+                              extra={'frame_id': frame_count})
                     continue
                     
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                yield chunk
                        
             except Exception as e:
-                print(f"Error processing webcam frame: {str(e)}")
+                log.every('process_failed', logging.ERROR, "Error processing webcam frame: %s", e,
+                          extra={'frame_id': frame_count})
                 continue
                 
     except Exception as e:
-        print(f"Error in generate_frames_webcam: {str(e)}")
+        log.error(f"Error in generate_frames_webcam: {str(e)}")
     finally:
-        if cap is not None:
-            cap.release()
-            print("Webcam released")
+        if camera is not None:
+            camera.release()
+            log.info("Webcam released")
 
 @app.route('/webcam_feed')
 def webcam_feed():
     """Route to display webcam feed with YOLO detection."""
     try:
-        return Response(generate_frames_webcam(), mimetype='multipart/x-mixed-replace; boundary=frame')
+        return mjpeg_response(generate_frames_webcam(**stream_encoder_args()))
     except Exception as e:
         print(f"Error in webcam_feed route: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-def generate_frames_ip_camera_stable(ip_camera_url, apply_yolo=True, domain='general'):
+def generate_frames_ip_camera_stable(ip_camera_url, apply_yolo=True, domain='general', profile=None, bandwidth_kbps=None,
+                                     camera_id=None):
+    """Multipart MJPEG wrapper around iter_ip_camera_stable_frames (same arguments)."""
+    frames = iter_ip_camera_stable_frames(ip_camera_url, apply_yolo=apply_yolo, domain=domain,
+                                          profile=profile, bandwidth_kbps=bandwidth_kbps, camera_id=camera_id)
+    try:
+        for frame_bytes, _ in frames:
+            yield multipart_chunk(frame_bytes)
+    finally:
+        frames.close()
+
+def iter_ip_camera_stable_frames(ip_camera_url, apply_yolo=True, domain='general', profile=None, bandwidth_kbps=None,
+                                 overlay_domains=None, camera_id=None):
     """Generate frames from IP camera with enhanced stability and domain-specific PPE detection.
     
+    Yields (jpeg_bytes, meta) tuples; meta carries the frame id, size and the detections
+    drawn on the frame. jpeg_bytes is only valid until the next frame is requested.
+    
     Args:
         ip_camera_url (str): The IP camera URL to connect to
         apply_yolo (bool): Whether to apply YOLO detection (default: True)
         domain (str): PPE domain - 'general', 'manufacturing', 'construction', 'healthcare', or 'oilgas' (default: 'general')
+        profile (str): JPEG encoder profile name (default: chosen from bandwidth/frame size)
+        bandwidth_kbps (float): Client bandwidth used to pick a profile when none is given
+        overlay_domains (callable): Client-side overlay mode. Returns the domains currently
+            watched; frames are streamed raw and meta['detections'] maps each domain to its
+            detections instead (``domain`` is ignored)
+        camera_id (str): Registered camera the URL belongs to (default: DEFAULT_CAMERA_ID); its
+            ROI, FPS budget and decode options apply, and metrics/snapshots are keyed by it
     """
-    cap = None
+    camera = None
+    camera_id = camera_id or DEFAULT_CAMERA_ID
+    camera_config = camera_registry.get(camera_id)
     
     app_logger.info(f"[FRAME-GEN-{domain.upper()}] Starting frame generation")
-    app_logger.info(f"[FRAME-GEN-{domain.upper()}] Parameters: url={ip_camera_url}, yolo={apply_yolo}, domain={domain}")
+    app_logger.info(f"[FRAME-GEN-{domain.upper()}] Parameters: url={redact_url(ip_camera_url)}, yolo={apply_yolo}, domain={domain}")
     
     # Domain detection function mapping
     domain_functions = {
@@ -655,140 +714,86 @@ def generate_frames_ip_camera_stable(ip_camera_url, apply_yolo=True, domain='gen
     
     detect_function = domain_functions[domain]
     app_logger.info(f"[FRAME-GEN-{domain.upper()}] Using detection function: {detect_function.__name__}")
+    log = stream_log.bind(camera=camera_id, domain=domain)
     model = None  # Initialize model variable
     
     try:
-        app_logger.info(f"[FRAME-GEN-{domain.upper()}] Attempting to connect to IP camera: {ip_camera_url}")
-        cap = cv2.VideoCapture(ip_camera_url)
-        
-        # Enhanced camera properties for stability
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Minimal buffer to reduce latency
-        
-        # Try to set reasonable resolution first
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        cap.set(cv2.CAP_PROP_FPS, 10)  # Reduced FPS for stability
-        
-        # Network timeout settings
-        cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 3000)
-        cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 3000)
-        
-        # Additional stability settings
-        try:
-            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
-        except:
-            pass  # Some cameras don't support FOURCC setting
-        
-        if not cap.isOpened():
-            print(f"Error: Could not open camera stream: {ip_camera_url}")
+        app_logger.info(f"[FRAME-GEN-{domain.upper()}] Attempting to connect to IP camera: {redact_url(ip_camera_url)}")
+        # Same settings on every reconnect (the old reconnect path fell back to 640x480)
+        camera = CameraSupervisor(ip_camera_url, name=camera_id, opener=camera_registry.opener(camera_id),
+                                  settings=IP_CAMERA_STABLE_SETTINGS,
+                                  max_read_failures=5)
+        if not camera.connect():
+            log.error(f"Could not open camera stream: {redact_url(ip_camera_url)}")
             return
         
         # Check actual resolution after opening
-        actual_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        actual_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        actual_fps = cap.get(cv2.CAP_PROP_FPS)
-        print(f"Camera opened with resolution: {actual_width}x{actual_height} @ {actual_fps:.1f}fps")
+        actual_width = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH))
+        actual_height = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        actual_fps = camera.get(cv2.CAP_PROP_FPS)
+        log.info(f"Camera opened with resolution: {actual_width}x{actual_height} @ {actual_fps:.1f}fps")
         
-        print("Camera connection successful, starting stable frame generation...")
+        log.info("Camera connection successful, starting stable frame generation...")
         
         # Load YOLO model if domain-specific detection is needed
-        if apply_yolo and domain != 'general':
-            print(f"Loading YOLO model for {domain} domain...")
-            model = YOLO("YOLO-Weights/bestest.pt")
+        if apply_yolo and (domain != 'general' or overlay_domains is not None):
+            log.info(f"Loading YOLO model for {domain} domain...")
+            model = get_model()
         
         frame_count = 0
-        consecutive_failures = 0
-        max_consecutive_failures = 5
-        last_valid_frame = None
+        # Frames above 1080p are streamed at 1280x720; the model input is letterboxed separately
+        preprocessor = FramePreprocessor(max_display_size=(1280, 720))
+        stream_domain = 'overlay' if overlay_domains is not None else domain
+        # Up to 4K; black (<=5) and white (>=250) frames are corrupt
+        quality_checker = FrameQualityChecker(camera=camera_id, min_size=(50, 50), max_size=(4000, 4000))
+        encoder = FrameEncoder(label=f'{camera_id}_stable_{stream_domain}', profile_name=profile, bandwidth_kbps=bandwidth_kbps)
         frame_skip_counter = 0
-        reconnect_count = 0
-        max_reconnects = 3
         
         while True:
-            # Clear buffer by reading multiple frames quickly to get the latest frame
-            for _ in range(2):  # Skip 2 frames to reduce latency
-                cap.grab()
-            
-            success, frame = cap.retrieve()
+            # Skip 2 buffered frames to reduce latency; reconnects happen inside read()
+            success, frame = camera.read(skip=2)
+            captured_at = time.monotonic()
             
-            if not success or frame is None:
-                consecutive_failures += 1
-                print(f"Failed to read frame {frame_count}, consecutive failures: {consecutive_failures}")
-                
-                # Use last valid frame if available during temporary failures
-                if last_valid_frame is not None and consecutive_failures < 3:
-                    frame = last_valid_frame.copy()
-                    success = True
-                    print("Using cached frame during temporary failure")
-                
-                if consecutive_failures >= max_consecutive_failures:
-                    print(f"Too many consecutive failures ({consecutive_failures}), attempting reconnection...")
-                    cap.release()
-                    
-                    if reconnect_count < max_reconnects:
-                        # Attempt to reconnect
-                        import time
-                        time.sleep(2)  # Wait before reconnection
-                        cap = cv2.VideoCapture(ip_camera_url)
-                        
-                        # Reapply settings
-                        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                        cap.set(cv2.CAP_PROP_FPS, 10)
-                        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                        
-                        if cap.isOpened():
-                            print(f"Reconnection successful (attempt {reconnect_count + 1})")
-                            consecutive_failures = 0
-                            reconnect_count += 1
-                            continue
-                    
-                    print("Max reconnection attempts reached or reconnection failed, stopping stream")
+            if not success:
+                if camera.state == FAILED:
+                    log.error("Max reconnection attempts reached or reconnection failed, stopping stream")
                     break
+                log.every('read_failed', logging.WARNING, "Failed to read frame (camera %s)",
+                          camera.state, extra={'frame_id': frame_count})
                 
-                if not success:
+                # Use last valid frame if available during temporary failures
+                if not (camera.state == DEGRADED and preprocessor.has_cached() and camera.read_failures < 3):
                     continue
+                frame = preprocessor.restore_cached()
+                log.every('cached_frame', logging.INFO, "Using cached frame during temporary failure",
+                          extra={'frame_id': frame_count})
             
-            # Validate frame quality and detect corruption
+            # Validate frame quality and detect corruption (black/white, dimensions, gray bands, frozen)
             if frame is not None and frame.size > 0:
-                # Check if frame is corrupted (all black, too bright, or unusual dimensions)
-                frame_mean = frame.mean()
+                quality = quality_checker.check(frame)
                 h, w = frame.shape[:2]
                 
-                # More flexible frame validation criteria
-                is_valid_frame = (
-                    frame_mean > 5 and frame_mean < 250 and  # Not all black or all white
-                    h > 50 and w > 50 and  # Minimum reasonable dimensions
-                    h < 4000 and w < 4000 and  # Allow larger resolutions (up to 4K)
-                    len(frame.shape) == 3  # Ensure it's a color frame
-                )
-                
-                if is_valid_frame:
-                    # Resize frame if it's too large for processing
-                    if h > 1080 or w > 1920:  # If larger than 1080p
-                        # Calculate aspect ratio and resize
-                        aspect_ratio = w / h
-                        if aspect_ratio > 1:  # Landscape
-                            new_w = 1280
-                            new_h = int(new_w / aspect_ratio)
-                        else:  # Portrait or square
-                            new_h = 720
-                            new_w = int(new_h * aspect_ratio)
-                        
-                        frame = cv2.resize(frame, (new_w, new_h))
-                        print(f"Resized frame from {w}x{h} to {new_w}x{new_h}")
+                if quality.valid:
+                    # Only the camera's region of interest is analysed and streamed
+                    if camera_config.roi:
+                        frame = crop_to_roi(frame, camera_config.roi)
+                        h, w = frame.shape[:2]
+                    # Downscale frames larger than 1080p into a reused buffer
+                    if h > 1080 or w > 1920:
+                        frame = preprocessor.fit_display(frame)
                     
-                    last_valid_frame = frame.copy()
-                    consecutive_failures = 0
-                    reconnect_count = 0  # Reset reconnect counter on success
+                    preprocessor.cache(frame)
                 else:
-                    print(f"Detected corrupted frame (mean: {frame_mean:.2f}, size: {h}x{w}), using cached frame...")
-                    if last_valid_frame is not None:
-                        frame = last_valid_frame.copy()
+                    log.every('corrupted_frame', logging.WARNING,
+                              "Detected corrupted frame (%s, mean: %.2f, size: %dx%d), using cached frame...",
+                              quality.reason, quality.mean, w, h, extra={'frame_id': frame_count})
+                    if preprocessor.has_cached():
+                        frame = preprocessor.restore_cached()
                     else:
                         continue
             else:
-                print("Invalid frame detected, skipping...")
+                log.every('invalid_frame', logging.WARNING, "Invalid frame detected, skipping...",
+                          extra={'frame_id': frame_count})
                 continue
             
             frame_count += 1
@@ -798,98 +803,81 @@ def generate_frames_ip_camera_stable(ip_camera_url, apply_yolo=True, domain='gen
             if frame_skip_counter % 2 != 0:  # Process every 2nd frame
                 continue
             
-            if frame_count % 50 == 0:  # Log every 50 processed frames
-                print(f"Processed {frame_count} stable frames ({domain} domain, failures: {consecutive_failures})")
+            log.sampled('progress', "Processed %d stable frames (reconnects: %d)", frame_count,
+                        camera.stats['reconnects'], extra={'frame_id': frame_count})
             
             try:
-                if apply_yolo:
-                    # Resize frame for YOLO processing if it's too large
-                    h, w = frame.shape[:2]
-                    if h > 720 or w > 1280:
-                        # Resize to a more manageable size for YOLO
-                        yolo_frame = cv2.resize(frame, (1280, 720))
-                        
-                        # Apply domain-specific or general detection
+                frame_detections = []
+                # Wait for an inference slot; frames over the camera's FPS budget or gone stale are dropped
+                if apply_yolo and not inference_scheduler.acquire(camera_id, captured_at):
+                    continue
+                try:
+                    if overlay_domains is not None:
+                        # Raw frame out; every watched domain's boxes travel in the metadata
+                        processed_frame = frame
+                        if apply_yolo:
+                            frame_detections = detect_domains(frame, model, overlay_domains(), preprocessor=preprocessor,
+                                                              camera=camera_id)
+                    elif apply_yolo:
+                        # The model runs on the letterboxed buffer; boxes are drawn on the frame itself
                         if domain != 'general':
-                            processed_frame = detect_function(yolo_frame, model)
+                            processed_frame = detect_function(frame, model, preprocessor=preprocessor, detections=frame_detections,
+                                                              camera=camera_id)
                         else:
-                            processed_frame = video_detection_single_frame(yolo_frame)
-                        
-                        # Resize back to original size if needed
-                        processed_frame = cv2.resize(processed_frame, (w, h))
+                            processed_frame = video_detection_single_frame(frame, preprocessor=preprocessor, detections=frame_detections)
                     else:
-                        # Apply domain-specific or general detection
-                        if domain != 'general':
-                            processed_frame = detect_function(frame, model)
-                        else:
-                            processed_frame = video_detection_single_frame(frame)
-                else:
-                    processed_frame = frame
+                        processed_frame = frame
+                finally:
+                    if apply_yolo:
+                        inference_scheduler.release(camera_id)
                 
-                # Enhanced JPEG encoding for better quality and stability
-                # Adjust quality based on frame size
-                h, w = processed_frame.shape[:2]
-                if h * w > 1920 * 1080:  # If larger than 1080p
-                    quality = 60  # Lower quality for large frames
-                else:
-                    quality = 80  # Higher quality for smaller frames
-                
-                encode_params = [
-                    cv2.IMWRITE_JPEG_QUALITY, quality,
-                    cv2.IMWRITE_JPEG_OPTIMIZE, 1   # Optimize for size
-                ]
-                ref, buffer = cv2.imencode('.jpg', processed_frame, encode_params)
+                # Quality/subsampling come from the stream's encoder profile
+                frame_bytes = encoder.encode(processed_frame)
                 
-                if not ref or buffer is None or len(buffer) == 0:
-                    print("Error encoding frame, skipping...")
+                if frame_bytes is None:
+                    log.every('encode_failed', logging.WARNING, "Error encoding frame, skipping...",
+                              extra={'frame_id': frame_count})
                     continue
-                    
-                frame_bytes = buffer.tobytes()
                 
                 # Ensure frame is properly formatted
                 if len(frame_bytes) > 100:  # Minimum size check
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                    yield frame_bytes, stream_frame_meta(frame_count, stream_domain, processed_frame, frame_detections)
                 else:
-                    print("Frame too small, skipping...")
+                    log.every('frame_too_small', logging.WARNING, "Frame too small, skipping...",
+                              extra={'frame_id': frame_count})
                     continue
                        
             except Exception as e:
-                print(f"Error processing frame: {str(e)}")
+                log.every('process_failed', logging.ERROR, "Error processing frame: %s", e,
+                          extra={'frame_id': frame_count})
                 continue
                 
     except Exception as e:
-        print(f"Error in generate_frames_ip_camera_stable: {str(e)}")
+        log.error(f"Error in iter_ip_camera_stable_frames: {str(e)}")
     finally:
-        if cap is not None:
-            cap.release()
-            print(f"Stable camera released ({domain} domain)")
+        if camera is not None:
+            camera.release()
+            log.info("Stable camera released")
 
-def generate_frames_ip_camera_adaptive(ip_camera_url, apply_yolo=True):
+def generate_frames_ip_camera_adaptive(ip_camera_url, apply_yolo=True, profile=None, bandwidth_kbps=None):
     """Generate frames from IP camera with adaptive resolution handling for high-res cameras."""
-    cap = None
+    log = stream_log.bind(camera='ipcamera')
+    camera = None
     try:
-        print(f"Attempting to connect to IP camera (adaptive): {ip_camera_url}")
-        cap = cv2.VideoCapture(ip_camera_url)
-        
-        # Start with minimal settings and let camera use its native resolution
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        cap.set(cv2.CAP_PROP_FPS, 10)
-        
-        # Network timeout settings
-        cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 5000)
-        cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000)
-        
-        if not cap.isOpened():
-            print(f"Error: Could not open camera stream: {ip_camera_url}")
+        log.info(f"Attempting to connect to IP camera (adaptive): {redact_url(ip_camera_url)}")
+        # Minimal settings, the camera keeps its native resolution; reapplied on reconnect
+        camera = CameraSupervisor(ip_camera_url, name='ipcamera', opener=camera_registry.opener(DEFAULT_CAMERA_ID),
+                                  settings=IP_CAMERA_ADAPTIVE_SETTINGS)
+        if not camera.connect():
+            log.error(f"Could not open camera stream: {redact_url(ip_camera_url)}")
             return
         
         # Get camera's native resolution
-        native_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        native_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        native_fps = cap.get(cv2.CAP_PROP_FPS)
+        native_width = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH))
+        native_height = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        native_fps = camera.get(cv2.CAP_PROP_FPS)
         
-        print(f"Camera native resolution: {native_width}x{native_height} @ {native_fps:.1f}fps")
+        log.info(f"Camera native resolution: {native_width}x{native_height} @ {native_fps:.1f}fps")
         
         # Determine optimal streaming resolution
         if native_width > 1920 or native_height > 1080:
@@ -902,20 +890,20 @@ def generate_frames_ip_camera_adaptive(ip_camera_url, apply_yolo=True):
                 target_height = 720
                 target_width = int(target_height * aspect_ratio)
             
-            print(f"Will resize frames from {native_width}x{native_height} to {target_width}x{target_height}")
+            log.info(f"Will resize frames from {native_width}x{native_height} to {target_width}x{target_height}")
         else:
             target_width = native_width
             target_height = native_height
-            print("Using native resolution for streaming")
+            log.info("Using native resolution for streaming")
         
-        print("Camera connection successful, starting adaptive frame generation...")
+        log.info("Camera connection successful, starting adaptive frame generation...")
         frame_count = 0
-        consecutive_failures = 0
-        max_consecutive_failures = 10
-        last_valid_frame = None
+        preprocessor = FramePreprocessor(max_display_size=(target_width, target_height))
+        # Wider brightness range and ultra-high resolutions for high-res cameras
+        quality_checker = FrameQualityChecker(camera='ipcamera', dark=3, bright=252, min_size=(100, 100),
+                                              max_size=(5000, 8000))
+        encoder = FrameEncoder(label='ipcamera_adaptive', profile_name=profile, bandwidth_kbps=bandwidth_kbps)
         frame_skip_counter = 0
-        reconnect_count = 0
-        max_reconnects = 5
         processing_time_sum = 0
         
         import time
@@ -923,86 +911,47 @@ def generate_frames_ip_camera_adaptive(ip_camera_url, apply_yolo=True):
         while True:
             start_time = time.time()
             
-            # Clear buffer by reading multiple frames
-            for _ in range(2):
-                cap.grab()
-            
-            success, frame = cap.retrieve()
+            # Skip 2 buffered frames; reconnects happen inside read()
+            success, frame = camera.read(skip=2)
             
-            if not success or frame is None:
-                consecutive_failures += 1
-                print(f"Failed to read adaptive frame {frame_count}, consecutive failures: {consecutive_failures}")
-                
-                # Use cached frame during temporary failures
-                if last_valid_frame is not None and consecutive_failures < 5:
-                    frame = last_valid_frame.copy()
-                    success = True
-                    print("Using cached frame during adaptive failure")
-                
-                if consecutive_failures >= max_consecutive_failures:
-                    print(f"Too many consecutive failures ({consecutive_failures}), attempting reconnection...")
-                    cap.release()
-                    
-                    if reconnect_count < max_reconnects:
-                        time.sleep(3)  # Wait before reconnection
-                        cap = cv2.VideoCapture(ip_camera_url)
-                        
-                        # Reapply minimal settings
-                        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                        cap.set(cv2.CAP_PROP_FPS, 10)
-                        
-                        if cap.isOpened():
-                            print(f"Adaptive reconnection successful (attempt {reconnect_count + 1})")
-                            consecutive_failures = 0
-                            reconnect_count += 1
-                            continue
-                    
-                    print("Max adaptive reconnection attempts reached, stopping stream")
+            if not success:
+                if camera.state == FAILED:
+                    log.error("Max adaptive reconnection attempts reached, stopping stream")
                     break
+                log.every('read_failed', logging.WARNING, "Failed to read adaptive frame (camera %s)",
+                          camera.state, extra={'frame_id': frame_count})
                 
-                if not success:
+                # Use cached frame during temporary failures
+                if not (camera.state == DEGRADED and preprocessor.has_cached() and camera.read_failures < 5):
                     continue
+                frame = preprocessor.restore_cached()
+                log.every('cached_frame', logging.INFO, "Using cached frame during adaptive failure",
+                          extra={'frame_id': frame_count})
             
-            # Enhanced frame validation for high-resolution cameras
+            # Enhanced frame validation for high-resolution cameras, on a strided sample
             if frame is not None and frame.size > 0:
-                frame_mean = frame.mean()
+                quality = quality_checker.check(frame)
                 h, w = frame.shape[:2]
                 
-                # Very flexible validation for high-res cameras (supports up to 4K and beyond)
-                is_valid_frame = (
-                    frame_mean > 3 and frame_mean < 252 and  # Allow wider brightness range
-                    h > 100 and w > 100 and  # Minimum dimensions
-                    h < 5000 and w < 8000 and  # Support ultra-high resolutions
-                    len(frame.shape) == 3  # Color frame
-                )
-                
-                if is_valid_frame:
-                    # Adaptive resizing based on resolution
+                if quality.valid:
+                    # Adaptive resizing based on resolution, into a reused buffer
                     if h > target_height or w > target_width:
-                        # Resize maintaining aspect ratio
-                        aspect_ratio = w / h
-                        if aspect_ratio > 1:  # Landscape
-                            new_w = target_width
-                            new_h = int(new_w / aspect_ratio)
-                        else:  # Portrait or square
-                            new_h = target_height
-                            new_w = int(new_h * aspect_ratio)
-                        
-                        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_AREA)
-                        if frame_count % 100 == 0:  # Log occasionally
-                            print(f"Adaptive resize: {w}x{h} -> {new_w}x{new_h}")
+                        frame = preprocessor.fit_display(frame)
+                        log.sampled('resize', "Adaptive resize: %dx%d -> %dx%d", w, h, frame.shape[1], frame.shape[0],
+                                    extra={'frame_id': frame_count})
                     
-                    last_valid_frame = frame.copy()
-                    consecutive_failures = 0
-                    reconnect_count = 0
+                    preprocessor.cache(frame)
                 else:
-                    print(f"Detected corrupted adaptive frame (mean: {frame_mean:.2f}, size: {h}x{w})")
-                    if last_valid_frame is not None:
-                        frame = last_valid_frame.copy()
+                    log.every('corrupted_frame', logging.WARNING,
+                              "Detected corrupted adaptive frame (%s, mean: %.2f, size: %dx%d)", quality.reason,
+                              quality.mean, w, h, extra={'frame_id': frame_count})
+                    if preprocessor.has_cached():
+                        frame = preprocessor.restore_cached()
                     else:
                         continue
             else:
-                print("Invalid adaptive frame detected, skipping...")
+                log.every('invalid_frame', logging.WARNING, "Invalid adaptive frame detected, skipping...",
+                          extra={'frame_id': frame_count})
                 continue
             
             frame_count += 1
@@ -1022,47 +971,26 @@ def generate_frames_ip_camera_adaptive(ip_camera_url, apply_yolo=True):
             if frame_skip_counter % skip_rate != 0:
                 continue
             
-            if frame_count % 100 == 0:
-                print(f"Processed {frame_count} adaptive frames (avg: {avg_processing_time:.3f}s, skip: {skip_rate})")
+            log.sampled('progress', "Processed %d adaptive frames (avg: %.3fs, skip: %d)",
+                        frame_count, avg_processing_time, skip_rate, extra={'frame_id': frame_count})
             
             try:
                 if apply_yolo:
-                    # Additional resizing for YOLO if frame is still large
-                    h, w = frame.shape[:2]
-                    if h > 720 or w > 1280:
-                        yolo_frame = cv2.resize(frame, (1280, 720))
-                        processed_frame = video_detection_single_frame(yolo_frame)
-                        # Resize back if needed
-                        processed_frame = cv2.resize(processed_frame, (w, h))
-                    else:
-                        processed_frame = video_detection_single_frame(frame)
+                    processed_frame = video_detection_single_frame(frame, preprocessor=preprocessor)
                 else:
                     processed_frame = frame
                 
-                # Adaptive quality encoding based on frame size and performance
-                h, w = processed_frame.shape[:2]
-                if h * w > 1920 * 1080:  # 1080p+
-                    quality = 50
-                elif h * w > 1280 * 720:  # 720p+
-                    quality = 70
-                else:
-                    quality = 80
-                
-                encode_params = [
-                    cv2.IMWRITE_JPEG_QUALITY, quality,
-                    cv2.IMWRITE_JPEG_OPTIMIZE, 1
-                ]
-                ref, buffer = cv2.imencode('.jpg', processed_frame, encode_params)
+                # Adaptive quality encoding based on frame size and client bandwidth
+                frame_bytes = encoder.encode(processed_frame)
                 
-                if ref and buffer is not None and len(buffer) > 100:
-                    frame_bytes = buffer.tobytes()
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                if frame_bytes is not None and len(frame_bytes) > 100:
+                    yield multipart_chunk(frame_bytes)
                 else:
                     continue
                        
             except Exception as e:
-                print(f"Error processing adaptive frame: {str(e)}")
+                log.every('process_failed', logging.ERROR, "Error processing adaptive frame: %s", e,
+                          extra={'frame_id': frame_count})
                 continue
             
             # Track processing time
@@ -1070,19 +998,44 @@ def generate_frames_ip_camera_adaptive(ip_camera_url, apply_yolo=True):
             processing_time_sum += processing_time
                 
     except Exception as e:
-        print(f"Error in generate_frames_ip_camera_adaptive: {str(e)}")
+        log.error(f"Error in generate_frames_ip_camera_adaptive: {str(e)}")
     finally:
-        if cap is not None:
-            cap.release()
-            print("Adaptive camera released")
+        if camera is not None:
+            camera.release()
+            log.info("Adaptive camera released")
 
 # Domain-specific IP camera routes
+def unknown_camera_response(camera_id):
+    """404 JSON response for a camera id that is not in the registry."""
+    return jsonify({"error": f"Unknown camera '{camera_id}'. Cameras: {camera_registry.ids()}"}), 404
+
+def camera_domain(camera_id):
+    """PPE domain configured for a camera ('general' for the webcam and unknown ids)."""
+    return camera_registry.get(camera_id).domain if camera_id in camera_registry else 'general'
+
+def stable_stream_target(domain, camera_id):
+    """(camera_id, domain) of a /ipcamera_stable* request.
+
+    A single path segment is a domain on the default camera, or else a registered
+    camera id streamed with the camera's configured domain.
+    """
+    if camera_id is None and domain not in DOMAINS and domain in camera_registry:
+        return domain, camera_domain(domain)
+    return camera_id or DEFAULT_CAMERA_ID, domain
+
 @app.route('/ipcamera_stable/<domain>')
-def ipcamera_stable_domain(domain):
-    """Route to display stable IP camera feed with domain-specific PPE detection."""
-    app_logger.info(f"[DOMAIN-{domain.upper()}] ipcamera_stable_domain called with domain: {domain}")
+@app.route('/ipcamera_stable/<camera_id>/<domain>')
+def ipcamera_stable_domain(domain, camera_id=None):
+    """Route to display a stable IP camera feed (default camera, or ``camera_id``) with domain-specific PPE detection.
+
+    /ipcamera_stable/<camera_id> uses the camera's configured domain.
+    """
+    camera_id, domain = stable_stream_target(domain, camera_id)
+    app_logger.info(f"[DOMAIN-{domain.upper()}] ipcamera_stable_domain called with camera: {camera_id}, domain: {domain}")
     
     try:
+        if camera_id not in camera_registry:
+            return unknown_camera_response(camera_id)
         # Validate domain
         valid_domains = ['general', 'manufacturing', 'construction', 'healthcare', 'oilgas']
         if domain not in valid_domains:
@@ -1092,57 +1045,34 @@ def ipcamera_stable_domain(domain):
         
         app_logger.info(f"[DOMAIN-{domain.upper()}] Domain validation passed")
         
-        # Get camera URLs from environment variables
-        camera_urls = get_camera_urls()
-        app_logger.info(f"[DOMAIN-{domain.upper()}] Generated {len(camera_urls)} camera URLs to test")
-        app_logger.debug(f"[DOMAIN-{domain.upper()}] Camera URLs: {camera_urls}")
-        
-        working_url = None
-        
-        # Try each URL format
-        for i, url in enumerate(camera_urls):
-            app_logger.info(f"[DOMAIN-{domain.upper()}] Testing camera URL {i+1}/{len(camera_urls)}: {url}")
-            
-            try:
-                test_cap = cv2.VideoCapture(url)
-                test_cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                
-                if test_cap.isOpened():
-                    app_logger.debug(f"[DOMAIN-{domain.upper()}] Camera opened successfully, testing frame read...")
-                    ret, frame = test_cap.read()
-                    test_cap.release()
-                    if ret and frame is not None:
-                        working_url = url
-                        app_logger.info(f"[DOMAIN-{domain.upper()}] Successfully connected to: {url}")
-                        break
-                    else:
-                        app_logger.warning(f"[DOMAIN-{domain.upper()}] Connected but no frames from: {url}")
-                else:
-                    test_cap.release()
-                    app_logger.warning(f"[DOMAIN-{domain.upper()}] Failed to connect to: {url}")
-            except Exception as url_error:
-                app_logger.error(f"[DOMAIN-{domain.upper()}] Exception testing URL {url}: {str(url_error)}")
+        working_url = run_blocking(find_working_camera_url, f"[DOMAIN-{domain.upper()}]", camera_id)
         
         if not working_url:
-            error_msg = f"Cannot connect to IP camera (stable {domain})"
+            error_msg = f"Cannot connect to IP camera {camera_id} (stable {domain})"
             app_logger.error(f"[DOMAIN-{domain.upper()}] {error_msg}")
-            app_logger.error(f"[DOMAIN-{domain.upper()}] All {len(camera_urls)} camera URLs failed")
             return jsonify({"error": error_msg}), 500
         
-        app_logger.info(f"[DOMAIN-{domain.upper()}] Using working camera URL: {working_url}")
+        app_logger.info(f"[DOMAIN-{domain.upper()}] Using working camera URL: {redact_url(working_url)}")
         app_logger.info(f"[DOMAIN-{domain.upper()}] Starting frame generation with YOLO detection...")
         
-        return Response(generate_frames_ip_camera_stable(working_url, apply_yolo=True, domain=domain), 
-                       mimetype='multipart/x-mixed-replace; boundary=frame')
+        return mjpeg_response(generate_frames_ip_camera_stable(working_url, apply_yolo=True, domain=domain,
+                                                               camera_id=camera_id, **stream_encoder_args()))
     except Exception as e:
         app_logger.error(f"[DOMAIN-{domain.upper()}] Error in ipcamera_stable_domain: {str(e)}")
         app_logger.exception(f"[DOMAIN-{domain.upper()}] Full exception details:")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/ipcamera_stable_raw/<domain>')
-def ipcamera_stable_raw_domain(domain):
-    """Route to display stable IP camera feed without YOLO detection for specific domain."""
+@app.route('/ipcamera_stable_raw/<camera_id>/<domain>')
+def ipcamera_stable_raw_domain(domain, camera_id=None):
+    """Route to display stable IP camera feed (default camera, or ``camera_id``) without YOLO detection for specific domain.
+
+    /ipcamera_stable_raw/<camera_id> uses the camera's configured domain.
+    """
+    camera_id, domain = stable_stream_target(domain, camera_id)
     try:
+        if camera_id not in camera_registry:
+            return unknown_camera_response(camera_id)
         # Validate domain
         valid_domains = ['general', 'manufacturing', 'construction', 'healthcare', 'oilgas']
         if domain not in valid_domains:
@@ -1150,35 +1080,16 @@ def ipcamera_stable_raw_domain(domain):
                 "error": f"Invalid domain '{domain}'. Valid domains: {valid_domains}"
             }), 400
         
-        # Get camera URLs from environment variables
-        camera_urls = get_camera_urls()
-        
-        working_url = None
-        
-        # Try each URL format
-        for url in camera_urls:
-            print(f"Testing camera URL (stable raw {domain}): {url}")
-            test_cap = cv2.VideoCapture(url)
-            test_cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            
-            if test_cap.isOpened():
-                ret, frame = test_cap.read()
-                test_cap.release()
-                if ret and frame is not None:
-                    working_url = url
-                    print(f"✓ Successfully connected to (stable raw {domain}): {url}")
-                    break
-            else:
-                test_cap.release()
+        working_url = run_blocking(find_working_camera_url, f"[STABLE-RAW-{domain.upper()}]", camera_id)
         
         if not working_url:
             return jsonify({
-                "error": f"Cannot connect to IP camera (stable raw {domain})"
+                "error": f"Cannot connect to IP camera {camera_id} (stable raw {domain})"
             }), 500
         
-        print(f"Using working camera URL (stable raw {domain}): {working_url}")
-        return Response(generate_frames_ip_camera_stable(working_url, apply_yolo=False, domain=domain), 
-                       mimetype='multipart/x-mixed-replace; boundary=frame')
+        print(f"Using working camera URL (stable raw {domain}): {redact_url(working_url)}")
+        return mjpeg_response(generate_frames_ip_camera_stable(working_url, apply_yolo=False, domain=domain,
+                                                               camera_id=camera_id, **stream_encoder_args()))
     except Exception as e:
         print(f"Error in ipcamera_stable_raw_{domain} route: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -1219,174 +1130,196 @@ def ipcamera_oilgas():
     return ipcamera_stable_domain('oilgas')
 
 
+@app.route('/api/stream_stats')
+def api_stream_stats():
+    """Per-stream JPEG encode timing for the active encoders, and the log queue's backlog/drops."""
+    return jsonify({
+        "encoder_backend": get_backend().name,
+        "streams": encoder_stats(),
+        "socket_streams": stream_broadcaster.stats(),
+        "active_streams": shared_state.active_streams(),
+        "logging": logging_status(),
+    })
+
+
+def log_camera_health(event):
+    """Camera supervisor subscriber: state changes go to the stream log."""
+    level = logging.ERROR if event['state'] == 'failed' else (
+        logging.WARNING if event['state'] in ('degraded', 'backoff') else logging.INFO)
+    detail = f" ({event['error']})" if 'error' in event else ''
+    retry = f", retrying in {event['retry_in']}s" if 'retry_in' in event else ''
+    # Rate-limited: a flaky camera flips between streaming and degraded on every dropped frame
+    stream_log.bind(camera=event['camera']).every(
+        f"health_{event['state']}", level, f"Camera {event['previous']} -> {event['state']}{detail}{retry}")
+
+
+camera_health.subscribe(log_camera_health)
+
+
+@app.route('/api/camera_health')
+def api_camera_health():
+    """State of every supervised camera capture in this worker, recent state changes and frame quality."""
+    return jsonify(dict(camera_health.status(), quality=quality_report(), capture={
+        camera_id: camera_registry.describe(camera_id)["capture"] for camera_id in camera_registry.ids()
+    }))
+
+
+@app.route('/api/scheduler')
+def api_scheduler():
+    """Inference slot usage and, per camera, target vs achieved FPS, weight, waits and dropped frames."""
+    return jsonify(inference_scheduler.status())
+
+
+@app.route('/api/cameras')
+def api_cameras():
+    """Registered cameras (URLs without passwords), their domain, ROI, FPS budget, priority and decode options."""
+    return jsonify({
+        "default": DEFAULT_CAMERA_ID,
+        "source": camera_registry.source,
+        "cameras": [camera_registry.describe(camera_id) for camera_id in camera_registry.ids()],
+    })
+
+
 @app.route('/api/dashboard')
 def dashboard():
+    """Compliance and alert figures from the pre-aggregated violation counters.
+
+    - overall_compliance / ppe_compliance: % of PPE boxes that were compliant today
+    - ppe_alerts: violation events per PPE item today
+    - alerts: violation events in each of the last 6 hours (oldest first)
+    - violation_over_time: violation events on each of the last 10 days (oldest first)
+
+    A violation event is a frame admitted by snapshot_admission, not every box of every frame.
+    """
     print("[DEBUG] /api/dashboard endpoint called")
-    # Example dummy data
+    now = datetime.now()
+    overall, per_item, item_alerts = compliance(violation_stats.day(now))
+    hours = violation_stats.buckets('hour', now - timedelta(hours=5), now)
+    days = violation_stats.buckets('day', now - timedelta(days=9), now)
     return jsonify({
-        "overall_compliance": 70,
-        "ppe_compliance": {
-            "Helmet": 50,
-            "Boots": 88,
-            "Glasses": 72,
-            "Mask": 45,
-            "Gloves": 80
-        },
-        "ppe_alerts": {
-            "Helmet": 40,
-            "Boots": 20,
-            "Glasses": 72,
-            "Mask": 30,
-            "Gloves": 10
-        },
-        "alerts": [34, 32, 41, 85, 88, 60],
-        "violation_over_time": [10, 20, 30, 40, 50, 60, 55, 45, 35, 25]
+        "overall_compliance": overall,
+        "ppe_compliance": per_item,
+        "ppe_alerts": item_alerts,
+        "alerts": [counts.get('violations', 0) for _, counts in hours],
+        "violation_over_time": [counts.get('violations', 0) for _, counts in days],
     })
 
 
 import time
-def generate_frames_webcam_raw():
-    """Generate frames from webcam without YOLO detection, using global webcam_cap."""
-    global webcam_cap
-    max_retries = 5
-    retry_delay = 1  # seconds
-
-    # Try to open the webcam with retries
-    for attempt in range(max_retries):
-        webcam_cap = cv2.VideoCapture(0)
-        if webcam_cap.isOpened():
-            print("Webcam (raw) connection successful, starting frame generation...")
-            break
-        else:
-            print(f"Error: Could not open webcam (raw) (attempt {attempt+1}/{max_retries})")
-            webcam_cap.release()
-            time.sleep(retry_delay)
-    else:
-        print("Failed to open webcam (raw) after retries.")
+def open_webcam(log, settings=WEBCAM_SETTINGS, max_read_failures=10):
+    """Open the webcam as the module-level webcam_camera so release_webcam can close it.
+
+    Args:
+        log: Bound stream logger
+        settings: Capture properties, reapplied on every reconnect
+        max_read_failures: Consecutive failed reads before the webcam is reopened
+
+    Returns:
+        CameraSupervisor: The connected webcam, or None if it could not be opened
+    """
+    global webcam_camera
+    camera = CameraSupervisor(0, name='webcam', settings=settings, max_read_failures=max_read_failures)
+    webcam_camera = camera
+    if not camera.connect():
+        log.error("Could not open webcam")
+        close_webcam(camera)
+        return None
+    return camera
+
+def close_webcam(camera):
+    """Release a webcam opened by open_webcam, clearing webcam_camera if it still points to it."""
+    global webcam_camera
+    camera.release()
+    if webcam_camera is camera:
+        webcam_camera = None
+
+def generate_frames_webcam_raw(profile=None, bandwidth_kbps=None):
+    """Generate frames from webcam without YOLO detection, using the shared webcam_camera."""
+    log = stream_log.bind(camera='webcam')
+    camera = open_webcam(log)
+    if camera is None:
         return
 
     try:
-        # Set properties
-        webcam_cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        webcam_cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        webcam_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        webcam_cap.set(cv2.CAP_PROP_FPS, 30)
-
-        if not webcam_cap.isOpened():
-            print("Error: Could not open webcam (raw) after setup")
-            return
-
-        print("Webcam (raw) connection confirmed, starting frame generation...")
+        log.info("Webcam (raw) connection confirmed, starting frame generation...")
         frame_count = 0
+        encoder = FrameEncoder(label='webcam_raw', profile_name=profile, bandwidth_kbps=bandwidth_kbps)
 
         while True:
-
-            if webcam_cap is None:
-                print("generate_frames_webcam_raw - Webcam has been released, stopping frame generation.")
-                break
-            success, frame = webcam_cap.read()
+            # Reconnects happen inside read(); it stops succeeding once the webcam is released
+            success, frame = camera.read()
             if not success:
-                print("Failed to read frame from webcam (raw)")
-                break
+                if camera.stopped:
+                    log.info("generate_frames_webcam_raw - Webcam %s, stopping frame generation.", camera.state)
+                    break
+                log.every('read_failed', logging.WARNING, "Failed to read frame from webcam (raw) (camera %s)",
+                          camera.state, extra={'frame_id': frame_count})
+                continue
 
             frame_count += 1
 
-            if frame_count % 30 == 0:
-                print(f"Processed {frame_count} webcam (raw) frames")
+            log.sampled('progress', "Processed %d webcam (raw) frames", frame_count, extra={'frame_id': frame_count})
 
             try:
-                ref, buffer = cv2.imencode('.jpg', frame)
-                if not ref:
-                    print("Error encoding webcam (raw) frame")
+                chunk = encoder.encode_multipart(frame)
+                if chunk is None:
+                    log.every('encode_failed', logging.WARNING, "Error encoding webcam (raw) frame",
+                              extra={'frame_id': frame_count})
                     continue
 
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                yield chunk
 
             except Exception as e:
-                print(f"Error processing webcam (raw) frame: {str(e)}")
+                log.every('process_failed', logging.ERROR, "Error processing webcam (raw) frame: %s", e,
+                          extra={'frame_id': frame_count})
                 continue
 
     except Exception as e:
-        print(f"Error in generate_frames_webcam_raw: {str(e)}")
+        log.error(f"Error in generate_frames_webcam_raw: {str(e)}")
     finally:
-        if webcam_cap is not None:
-            webcam_cap.release()
-            webcam_cap = None
-            print("Webcam (raw) released")
+        close_webcam(camera)
+        log.info("Webcam (raw) released")
 
-def api_generate_frames_webcam_yolo():
+def api_generate_frames_webcam_yolo(profile=None, bandwidth_kbps=None):
     """Generate frames from webcam with enhanced stability."""
-    global webcam_cap
-    max_retries = 15
-    retry_delay = 1  # seconds
-
-    # Try to open the webcam with retries
-    for attempt in range(max_retries):
-        webcam_cap = cv2.VideoCapture(0)
-        if webcam_cap.isOpened():
-            print("Webcam connection successful, starting frame generation...")
-            break
-        else:
-            print(f"Error: Could not open webcam (attempt {attempt+1}/{max_retries})")
-            webcam_cap.release()
-            time.sleep(retry_delay)
-    else:
-        print("Failed to open webcam after retries.")
+    log = stream_log.bind(camera='webcam')
+    camera = open_webcam(log, settings=WEBCAM_DETECTION_SETTINGS)
+    if camera is None:
         return
 
     try:
-        print("Attempting to connect to webcam (stable)...")
-        # Set properties
-        webcam_cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        webcam_cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        webcam_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        webcam_cap.set(cv2.CAP_PROP_FPS, 15)  # Moderate FPS for stability
-
-        if not webcam_cap.isOpened():
-            print("Error: Could not open webcam")
-            return
-
-        print("Webcam connection successful, starting stable frame generation...")
+        log.info("Webcam connection successful, starting stable frame generation...")
         frame_count = 0
-        consecutive_failures = 0
-        last_valid_frame = None
+        preprocessor = FramePreprocessor()
+        # Not black and larger than 100x100; no upper brightness limit for webcams
+        quality_checker = FrameQualityChecker(camera='webcam', bright=256, min_size=(100, 100),
+                                              max_size=(100000, 100000))
+        encoder = FrameEncoder(label='webcam_yolo', profile_name=profile, bandwidth_kbps=bandwidth_kbps)
         frame_skip_counter = 0
 
         while True:
-            if webcam_cap is None:
-                print("api_generate_frames_webcam_yolo - Webcam has been released, stopping frame generation.")
-                break
-
-            webcam_cap.grab()
-            success, frame = webcam_cap.retrieve()
-
-            if not success or frame is None:
-                consecutive_failures += 1
-                print(f"Failed to read webcam frame {frame_count}, consecutive failures: {consecutive_failures}")
+            # Reconnects happen inside read(); it stops succeeding once the webcam is released
+            success, frame = camera.read()
+            captured_at = time.monotonic()
 
-                if last_valid_frame is not None and consecutive_failures < 5:
-                    frame = last_valid_frame.copy()
-                    success = True
-
-                if consecutive_failures >= 10:
-                    print("Too many webcam failures, stopping stream")
+            if not success:
+                if camera.stopped:
+                    log.info("api_generate_frames_webcam_yolo - Webcam %s, stopping frame generation.", camera.state)
                     break
+                log.every('read_failed', logging.WARNING, "Failed to read webcam frame (camera %s)",
+                          camera.state, extra={'frame_id': frame_count})
 
-                if not success:
+                # Use last valid frame if available during temporary failures
+                if not (camera.state == DEGRADED and preprocessor.has_cached() and camera.read_failures < 5):
                     continue
+                frame = preprocessor.restore_cached()
 
             if frame is not None and frame.size > 0:
-                frame_mean = frame.mean()
-                h, w = frame.shape[:2]
-
-                if frame_mean > 5 and h > 100 and w > 100:
-                    last_valid_frame = frame.copy()
-                    consecutive_failures = 0
+                if quality_checker.check(frame).valid:
+                    preprocessor.cache(frame)
                 else:
-                    if last_valid_frame is not None:
-                        frame = last_valid_frame.copy()
+                    if preprocessor.has_cached():
+                        frame = preprocessor.restore_cached()
                     else:
                         continue
             else:
@@ -1397,45 +1330,64 @@ def api_generate_frames_webcam_yolo():
             if frame_skip_counter % 2 != 0:
                 continue
 
-            if frame_count % 50 == 0:
-                print(f"Processed {frame_count} stable webcam frames")
+            log.sampled('progress', "Processed %d stable webcam frames", frame_count, extra={'frame_id': frame_count})
 
             try:
-                # Apply YOLO detection to webcam frame
-                processed_frame = video_detection_single_frame(frame)
-                encode_params = [cv2.IMWRITE_JPEG_QUALITY, 80]
-                ref, buffer = cv2.imencode('.jpg', processed_frame, encode_params)
+                if not inference_scheduler.acquire('webcam', captured_at):
+                    continue
+                try:
+                    # Apply YOLO detection to webcam frame
+                    processed_frame = video_detection_single_frame(frame, preprocessor=preprocessor)
+                finally:
+                    inference_scheduler.release('webcam')
+                frame_bytes = encoder.encode(processed_frame)
 
-                if not ref or buffer is None:
+                if frame_bytes is None:
                     continue
 
-                frame_bytes = buffer.tobytes()
                 if len(frame_bytes) > 100:
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                    yield multipart_chunk(frame_bytes)
 
             except Exception as e:
-                print(f"Error processing webcam frame: {str(e)}")
+                log.every('process_failed', logging.ERROR, "Error processing webcam frame: %s", e,
+                          extra={'frame_id': frame_count})
                 continue
 
     except Exception as e:
-        print(f"Error in api_generate_frames_webcam_raw: {str(e)}")
+        log.error(f"Error in api_generate_frames_webcam_raw: {str(e)}")
     finally:
-        if webcam_cap is not None:
-            webcam_cap.release()
-            print("Stable webcam released")
+        close_webcam(camera)
+        log.info("Stable webcam released")
 
 # Unified domain-specific webcam streaming
-def api_generate_frames_webcam_unified(domain='manufacturing'):
+def api_generate_frames_webcam_unified(domain='manufacturing', profile=None, bandwidth_kbps=None):
+    """Multipart MJPEG wrapper around iter_webcam_frames (same arguments)."""
+    frames = iter_webcam_frames(domain=domain, profile=profile, bandwidth_kbps=bandwidth_kbps)
+    try:
+        for frame_bytes, _ in frames:
+            yield multipart_chunk(frame_bytes)
+    finally:
+        frames.close()
+
+def _detect_general(frame, model, preprocessor=None, detections=None, camera=None):
+    """Adapter giving the general detector the same signature as the domain detectors."""
+    return video_detection_single_frame(frame, preprocessor=preprocessor, detections=detections)
+
+def iter_webcam_frames(domain='manufacturing', profile=None, bandwidth_kbps=None, overlay_domains=None):
     """Generate frames from webcam with domain-specific PPE detection.
     
+    Yields (jpeg_bytes, meta) tuples like iter_ip_camera_stable_frames.
+    
     Args:
-        domain (str): PPE domain - 'manufacturing', 'construction', 'healthcare', or 'oilgas'
+        domain (str): PPE domain - 'general', 'manufacturing', 'construction', 'healthcare', or 'oilgas'
+        profile (str): JPEG encoder profile name (optional)
+        bandwidth_kbps (float): Client bandwidth used to pick a profile (optional)
+        overlay_domains (callable): Client-side overlay mode, as in iter_ip_camera_stable_frames
     """
-    global webcam_cap
     
     # Domain detection function mapping
     domain_functions = {
+        'general': _detect_general,
         'manufacturing': detect_manufacturing_ppe,
         'construction': detect_construction_ppe,
         'healthcare': detect_healthcare_ppe,
@@ -1443,81 +1395,52 @@ def api_generate_frames_webcam_unified(domain='manufacturing'):
     }
     
     if domain not in domain_functions:
-        print(f"Error: Unsupported domain '{domain}'. Supported: {list(domain_functions.keys())}")
+        stream_log.error(f"Unsupported domain '{domain}'. Supported: {list(domain_functions.keys())}")
         return
     
     detect_function = domain_functions[domain]
-    max_retries = 15
-    retry_delay = 1  # seconds
-
-    # Try to open the webcam with retries
-    for attempt in range(max_retries):
-        webcam_cap = cv2.VideoCapture(0)
-        if webcam_cap.isOpened():
-            print(f"Webcam connection successful, starting frame generation ({domain})...")
-            break
-        else:
-            print(f"Error: Could not open webcam (attempt {attempt+1}/{max_retries})")
-            webcam_cap.release()
-            time.sleep(retry_delay)
-    else:
-        print(f"Failed to open webcam after retries ({domain}).")
+    if overlay_domains is not None:
+        domain = 'overlay'
+    log = stream_log.bind(camera='webcam', domain=domain)
+    camera = open_webcam(log, settings=WEBCAM_DETECTION_SETTINGS)
+    if camera is None:
         return
 
     try:
-        print(f"Attempting to connect to webcam ({domain})...")
-        # Set properties
-        webcam_cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        webcam_cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        webcam_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        webcam_cap.set(cv2.CAP_PROP_FPS, 15)  # Moderate FPS for stability
-
-        if not webcam_cap.isOpened():
-            print(f"Error: Could not open webcam ({domain})")
-            return
-
-        print(f"Webcam connection successful, starting stable frame generation ({domain})...")
+        log.info("Webcam connection successful, starting stable frame generation...")
         frame_count = 0
-        consecutive_failures = 0
-        last_valid_frame = None
+        preprocessor = FramePreprocessor()
+        quality_checker = FrameQualityChecker(camera='webcam', bright=256, min_size=(100, 100),
+                                              max_size=(100000, 100000))
+        encoder = FrameEncoder(label=f'webcam_{domain}', profile_name=profile, bandwidth_kbps=bandwidth_kbps)
         frame_skip_counter = 0
 
         # Load YOLO model once for efficiency
-        model = YOLO("YOLO-Weights/bestest.pt")
+        model = get_model()
 
         while True:
-            if webcam_cap is None:
-                print(f"api_generate_frames_webcam_unified ({domain}) - Webcam has been released, stopping frame generation.")
-                break
-
-            webcam_cap.grab()
-            success, frame = webcam_cap.retrieve()
-
-            if not success or frame is None:
-                consecutive_failures += 1
-                print(f"Failed to read webcam frame {frame_count}, consecutive failures: {consecutive_failures}")
+            # Reconnects happen inside read(); it stops succeeding once the webcam is released
+            success, frame = camera.read()
+            captured_at = time.monotonic()
 
-                if last_valid_frame is not None and consecutive_failures < 5:
-                    frame = last_valid_frame.copy()
-                    success = True
-
-                if consecutive_failures >= 10:
-                    print(f"Too many webcam failures, stopping stream ({domain})")
+            if not success:
+                if camera.stopped:
+                    log.info("iter_webcam_frames - Webcam %s, stopping frame generation.", camera.state)
                     break
+                log.every('read_failed', logging.WARNING, "Failed to read webcam frame (camera %s)",
+                          camera.state, extra={'frame_id': frame_count})
 
-                if not success:
+                # Use last valid frame if available during temporary failures
+                if not (camera.state == DEGRADED and preprocessor.has_cached() and camera.read_failures < 5):
                     continue
+                frame = preprocessor.restore_cached()
 
             if frame is not None and frame.size > 0:
-                frame_mean = frame.mean()
-                h, w = frame.shape[:2]
-
-                if frame_mean > 5 and h > 100 and w > 100:
-                    last_valid_frame = frame.copy()
-                    consecutive_failures = 0
+                if quality_checker.check(frame).valid:
+                    preprocessor.cache(frame)
                 else:
-                    if last_valid_frame is not None:
-                        frame = last_valid_frame.copy()
+                    if preprocessor.has_cached():
+                        frame = preprocessor.restore_cached()
                     else:
                         continue
             else:
@@ -1528,33 +1451,101 @@ def api_generate_frames_webcam_unified(domain='manufacturing'):
             if frame_skip_counter % 2 != 0:
                 continue
 
-            if frame_count % 50 == 0:
-                print(f"Processed {frame_count} stable webcam frames ({domain})")
+            log.sampled('progress', "Processed %d stable webcam frames", frame_count, extra={'frame_id': frame_count})
 
             try:
                 # Apply domain-specific PPE detection to webcam frame
-                processed_frame = detect_function(frame, model)
-                encode_params = [cv2.IMWRITE_JPEG_QUALITY, 80]
-                ref, buffer = cv2.imencode('.jpg', processed_frame, encode_params)
+                frame_detections = []
+                if not inference_scheduler.acquire('webcam', captured_at):
+                    continue
+                try:
+                    if overlay_domains is not None:
+                        processed_frame = frame
+                        frame_detections = detect_domains(frame, model, overlay_domains(), preprocessor=preprocessor,
+                                                          camera='webcam')
+                    else:
+                        processed_frame = detect_function(frame, model, preprocessor=preprocessor, detections=frame_detections,
+                                                          camera='webcam')
+                finally:
+                    inference_scheduler.release('webcam')
+                frame_bytes = encoder.encode(processed_frame)
 
-                if not ref or buffer is None:
+                if frame_bytes is None:
                     continue
 
-                frame_bytes = buffer.tobytes()
                 if len(frame_bytes) > 100:
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                    yield frame_bytes, stream_frame_meta(frame_count, domain, processed_frame, frame_detections)
 
             except Exception as e:
-                print(f"Error processing webcam frame ({domain}): {str(e)}")
+                log.every('process_failed', logging.ERROR, "Error processing webcam frame: %s", e,
+                          extra={'frame_id': frame_count})
                 continue
 
     except Exception as e:
-        print(f"Error in api_generate_frames_webcam_unified ({domain}): {str(e)}")
+        log.error(f"Error in iter_webcam_frames: {str(e)}")
     finally:
-        if webcam_cap is not None:
-            webcam_cap.release()
-            print(f"Stable webcam released ({domain})")
+        close_webcam(camera)
+        log.info("Stable webcam released")
+
+
+STREAM_DOMAINS = ['general', 'manufacturing', 'construction', 'healthcare', 'oilgas']
+
+def socket_stream_source(camera, domain, overlay_domains=None):
+    """Frame source for the Socket.IO frame channel: iterator of (jpeg_bytes, meta) or None.
+
+    With overlay_domains the frames are raw and carry per-domain detections for
+    client-side drawing.
+    """
+    if camera == 'webcam':
+        return iter_webcam_frames(domain=domain or 'general', overlay_domains=overlay_domains)
+    # 'ipcamera' is the default camera; other names are registered camera ids
+    camera_id = DEFAULT_CAMERA_ID if camera == 'ipcamera' else camera
+    working_url = find_working_camera_url("[STREAM]", camera_id)
+    if not working_url:
+        print(f"[STREAM] Cannot connect to IP camera {camera_id} for {domain or 'overlay'}")
+        return None
+    return iter_ip_camera_stable_frames(working_url, apply_yolo=True, domain=domain or 'general',
+                                        overlay_domains=overlay_domains, camera_id=camera_id)
+
+# Binary frames over Socket.IO: one producer per camera/domain, shared by all subscribers
+stream_broadcaster = StreamBroadcaster(socketio, socket_stream_source)
+register_stream_socket_handlers(socketio, stream_broadcaster,
+                                sorted(set(camera_registry.ids()) | {'ipcamera', 'webcam'}), STREAM_DOMAINS,
+                                default_domain=lambda camera: camera_domain(
+                                    DEFAULT_CAMERA_ID if camera == 'ipcamera' else camera))
+
+
+def release_local_webcam(payload=None):
+    """Release this worker's webcam capture, if it holds one. Returns True if released.
+
+    Closing the supervisor stops the generator reading from it; it does not reconnect.
+    """
+    global webcam_camera
+    camera, webcam_camera = webcam_camera, None
+    if camera is None:
+        return False
+    camera.close()
+    print(f"[DEBUG] Webcam released in worker {shared_state.worker_id}")
+    return True
+
+shared_state.on_command('release_webcam', release_local_webcam)
+
+def release_webcam_everywhere():
+    """Release the webcam in whichever worker holds it.
+
+    Returns:
+        str: "released" (this worker held it), "release requested" (another worker
+        serves a webcam stream and was told to release it) or "no webcam to release"
+    """
+    remote_webcam_streams = [
+        stream_id for stream_id, info in shared_state.active_streams().items()
+        if 'webcam' in info.get('path', '') and info.get('worker') != shared_state.worker_id
+    ]
+    if any(shared_state.broadcast('release_webcam')):
+        return "released"
+    if remote_webcam_streams:
+        return "release requested"
+    return "no webcam to release"
 
 
 @app.route('/api/release_webcam', methods=['POST', 'OPTIONS'])
@@ -1567,14 +1558,12 @@ def release_webcam():
         response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         return response
 
-    global webcam_cap
     print("[DEBUG] /api/release_webcam endpoint called")
     try:
-        if webcam_cap is not None:
-            webcam_cap.release()
-            webcam_cap = None
-            print("[DEBUG] Webcam released by API call")
-            response = jsonify({"status": "released"})
+        status = release_webcam_everywhere()
+        if status != "no webcam to release":
+            print(f"[DEBUG] Webcam release by API call: {status}")
+            response = jsonify({"status": status})
             response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
             return response, 200
         else:
@@ -1602,17 +1591,15 @@ def release_feed():
         response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         return response
 
-    global webcam_cap
     data = request.get_json() or {}
     feed_type = data.get("feed_type", "webcam")
 
     if feed_type == "webcam":
         try:
-            if webcam_cap is not None:
-                webcam_cap.release()
-                webcam_cap = None
-                print("[DEBUG] Webcam released by generic API call")
-                response = jsonify({"status": "released"})
+            status = release_webcam_everywhere()
+            if status != "no webcam to release":
+                print(f"[DEBUG] Webcam release by generic API call: {status}")
+                response = jsonify({"status": status})
                 response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
                 return response, 200
             else:
@@ -1642,7 +1629,7 @@ def webcam_raw():
     """Route to display webcam feed without YOLO detection."""
     print("[DEBUG] /api/webcam_raw endpoint called")
     try:
-        return Response(generate_frames_webcam_raw(), mimetype='multipart/x-mixed-replace; boundary=frame')
+        return mjpeg_response(generate_frames_webcam_raw(**stream_encoder_args()))
     except Exception as e:
         print(f"Error in webcam_raw route: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -1652,7 +1639,7 @@ def webcam_yolo():
     """Route to display webcam feed with YOLO detection."""
     print("[DEBUG] /api/webcam_yolo endpoint called")
     try:
-        return Response(api_generate_frames_webcam_yolo(), mimetype='multipart/x-mixed-replace; boundary=frame')
+        return mjpeg_response(api_generate_frames_webcam_yolo(**stream_encoder_args()))
     except Exception as e:
         print(f"Error in webcam_yolo route: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -1685,67 +1672,61 @@ def webcam_oilgas():
 
 @app.route('/api/start_violation_recording', methods=['POST'])
 def start_violation_recording():
-    config.violation_recording_enabled = True
+    shared_state.set_flag('violation_recording_enabled', True)
     print("[DEBUG] Violation recording ENABLED")
     return jsonify({"status": "recording started"})
 
 @app.route('/api/stop_violation_recording', methods=['POST'])
 def stop_violation_recording():
-    config.violation_recording_enabled = False
-    violation_recording_enabled = False
+    shared_state.set_flag('violation_recording_enabled', False)
     print("[DEBUG] Violation recording DISABLED")
     return jsonify({"status": "recording stopped"})
 
 
 
+def scan_violation_snapshots():
+    """Yield (datetime, domain display name, violation classes) for every snapshot on disk (flat or sharded layout)."""
+    violation_index.sync(force=True)
+    fill_missing_violation_types()
+    for row in violation_index.iter_rows(domains=list(DOMAIN_SHORT_TO_FULL)):
+        yield (datetime.strptime(row['timestamp'], "%Y-%m-%d %H:%M:%S"), DOMAIN_SHORT_TO_FULL[row['domain_short']],
+               split_types(row['types']))
+
+
+def ensure_violation_stats_backfilled():
+    """Seed the snapshot counters from files saved before the counters existed (once).
+
+    Without Redis the counters are read from the index, which only needs to be current.
+    """
+    violation_index.sync()
+    fill_missing_violation_types()
+    violation_stats.backfill_once(scan_violation_snapshots)
+
+
 @app.route('/api/violations/count')
 def api_violations_count():
     """
-    Returns a count of violations per domain for a given date.
+    Returns a count of saved violation snapshots per domain for a given date
+    (every retained day without one), from the day counters.
     Example: /api/violations/count?date=2025-07-12
     """
     date_str = request.args.get('date')
-    base_dir = "static/violations"
-    counts = defaultdict(int)
-
-    # Regex for: violation_<domain>_<YYYYMMDD>_<HHMMSS>_<microseconds>.jpg
-    pattern = re.compile(r"violation_(?P<domain>.+?)_(?P<date>\d{8})_(?P<time>\d{6})_\d+\.jpg")
-
-    # Use the correct domain folder names based on YOLO_Video.py logic
-    expected_domains = list(DOMAIN_MAPPINGS.values())  # ['Manu', 'Cons', 'Heal', 'OilG']
-    
-    if os.path.exists(base_dir):
-        all_domains = os.listdir(base_dir)
-        # Filter to only process the correctly named domain folders
-        domain_list = [d for d in all_domains if d in expected_domains and os.path.isdir(os.path.join(base_dir, d))]
-    else:
-        domain_list = []
-
-    for domain in domain_list:
-        domain_dir = os.path.join(base_dir, domain)
-        if not os.path.isdir(domain_dir):
-            continue
-        for fname in os.listdir(domain_dir):
-            match = pattern.match(fname)
-            if not match:
-                continue
-            file_date_str = match.group("date")  # e.g. 20250712
-            file_date = datetime.strptime(file_date_str, "%Y%m%d").strftime("%Y-%m-%d")
-            if date_str and file_date != date_str:
-                continue
-            file_domain = match.group("domain")
-            # Use the full domain name for the count
-            full_domain_name = DOMAIN_SHORT_TO_FULL.get(domain, file_domain)
-            counts[full_domain_name] += 1
-
-    # Return as a list of {domain, count}
-    result = [{"domain": domain, "count": count} for domain, count in counts.items()]
+    ensure_violation_stats_backfilled()
+    try:
+        counts = violation_stats.day(datetime.strptime(date_str, "%Y-%m-%d")) if date_str else violation_stats.all_days()
+    except ValueError:
+        return jsonify([])
+    result = [
+        {"domain": field.split(':', 1)[1], "count": count}
+        for field, count in counts.items() if field.startswith('snap_domain:') and count
+    ]
     return jsonify(result)
 
 @app.route('/api/violations/timeline')
 def api_violations_timeline():
     """
-    Returns a timeline (violations per day) for a given date range.
+    Returns a timeline (saved violation snapshots per day) for a given date range,
+    from the day counters.
     Example: /api/violations/timeline?from=2025-07-01&to=2025-07-10
     """
     from_date = request.args.get('from')
@@ -1757,128 +1738,88 @@ def api_violations_timeline():
         to_dt = datetime.strptime(to_date, "%Y-%m-%d")
     except Exception as e:
         return jsonify([])  # or return an error message
+    # Nothing outside the retained days can have counts; keeps the number of buckets read bounded
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    from_dt = max(from_dt, today - timedelta(days=RESOLUTIONS['day'][2] - 1))
+    to_dt = min(to_dt, today)
     if from_dt > to_dt:
         return jsonify([])  # or return an error message
-    
-    base_dir = "static/violations"
-    timeline = {}
-
-    # Regex for: violation_<domain>_<YYYYMMDD>_<HHMMSS>_<microseconds>.jpg
-    pattern = re.compile(r"violation_(?P<domain>.+?)_(?P<date>\d{8})_(?P<time>\d{6})_\d+\.jpg")
-
-    # Parse date range
-    from_dt = datetime.strptime(from_date, "%Y-%m-%d") if from_date else None
-    to_dt = datetime.strptime(to_date, "%Y-%m-%d") if to_date else None
-
-    for domain in os.listdir(base_dir):
-        domain_dir = os.path.join(base_dir, domain)
-        if not os.path.isdir(domain_dir):
-            continue
-        for fname in os.listdir(domain_dir):
-            match = pattern.match(fname)
-            if not match:
-                continue
-            file_date_str = match.group("date")  # e.g. 20250712
-            file_dt = datetime.strptime(file_date_str, "%Y%m%d")
-            file_date = file_dt.strftime("%Y-%m-%d")
 
-            # Filter by date range
-            if from_dt and file_dt < from_dt:
-                continue
-            if to_dt and file_dt > to_dt:
-                continue
+    ensure_violation_stats_backfilled()
+    result = [
+        {"date": date, "count": counts['snapshots']}
+        for date, counts in violation_stats.buckets('day', from_dt, to_dt) if counts.get('snapshots')
+    ]
+    return jsonify(result)
 
-            timeline[file_date] = timeline.get(file_date, 0) + 1
+# Server-side cache of listing responses, invalidated by new index generations
+listing_cache = ResponseCache()
+# Snapshots deleted by retention or moved into shards lose their thumbnails
+violation_storage.on_evict(thumbnail_store.discard)
+
+
+def violation_listing_generation():
+    """Current violation index generation (after picking up changes on disk)."""
+    violation_index.sync()
+    return violation_index.generation()
+
+
+# Fields of /api/violations and /api/violations/recent entries
+VIOLATION_FILE_FIELDS = ('filename', 'domain', 'timestamp')
+
+
+def _listing_response(entries, next_cursor):
+    """JSON array response; X-Next-Cursor is set when there are more results."""
+    response = jsonify(entries)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def _violation_files_page(default_limit=VIOLATION_PAGE_DEFAULT, **filters):
+    """One page of violation files from the index, using the limit/cursor/fields query parameters."""
+    try:
+        fields = parse_fields(request.args.get('fields'), VIOLATION_FILE_FIELDS)
+        rows, next_cursor = violation_index.page(
+            limit=parse_limit(request.args.get('limit'), default_limit),
+            cursor=request.args.get('cursor'), **filters)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    entries = [
+        project({"filename": row['path'], "domain": row['domain'], "timestamp": row['timestamp']}, fields)
+        for row in rows
+    ]
+    return _listing_response(entries, next_cursor)
 
-    # Return sorted list of {date, count}
-    result = [{"date": date, "count": timeline[date]} for date in sorted(timeline.keys())]
-    return jsonify(result)
 
 @app.route('/api/violations/recent')
+@cached_by_generation(violation_listing_generation, listing_cache)
 def api_violations_recent():
     """
-    Returns the most recent violation files, limited by the 'limit' query parameter.
+    Returns the most recent violation files, newest first, limited by the 'limit'
+    query parameter (default 10). Pass the X-Next-Cursor response header back as
+    'cursor' for older files; 'fields' selects a subset of filename, domain, timestamp.
     Example: /api/violations/recent?limit=10
     """
-    try:
-        limit = int(request.args.get('limit', 10))
-    except Exception:
-        limit = 10
-
-    base_dir = "static/violations"
-    results = []
-
-    # Regex for: violation_<domain>_<YYYYMMDD>_<HHMMSS>_<microseconds>.jpg
-    pattern = re.compile(r"violation_(?P<domain>.+?)_(?P<date>\d{8})_(?P<time>\d{6})_\d+\.jpg")
-
-    for domain in os.listdir(base_dir):
-        domain_dir = os.path.join(base_dir, domain)
-        if not os.path.isdir(domain_dir):
-            continue
-        for fname in os.listdir(domain_dir):
-            match = pattern.match(fname)
-            if not match:
-                continue
-            file_domain = match.group("domain")
-            file_date_str = match.group("date")
-            file_time_str = match.group("time")
-            file_dt = datetime.strptime(file_date_str + file_time_str, "%Y%m%d%H%M%S")
-            results.append({
-                "filename": f"{domain}/{fname}",
-                "domain": file_domain,
-                "timestamp": file_dt.strftime("%Y-%m-%d %H:%M:%S")
-            })
-
-    # Sort by timestamp descending (most recent first)
-    results.sort(key=lambda x: x["timestamp"], reverse=True)
-    return jsonify(results[:limit])
+    return _violation_files_page(default_limit=10)
 
 @app.route('/api/violations/by_type')
 def api_violations_by_type():
     """
-    Returns a count of violations by type for a given date,
-    considering only those violations that have a saved image file.
+    Returns a count of violations by type for a given date, considering only
+    violations that have a saved image (snapshot counters).
+    Example: /api/violations/by_type?date=2025-07-12
     """
     date_str = request.args.get('date')
-    DETECTION_RESULTS_FILE = os.getenv("DETECTION_RESULTS_FILE", "detection_results.txt")
-    base_dir = "static/violations"
-    type_counts = defaultdict(int)
-
-    # Step 1: Build a set of (domain, timestamp) from saved images for the date
-    pattern = re.compile(r"violation_(?P<domain>.+?)_(?P<date>\d{8})_(?P<time>\d{6})_(?P<micro>\d+)\.jpg")
-    saved_violations = set()
-    for domain in os.listdir(base_dir):
-        domain_dir = os.path.join(base_dir, domain)
-        if not os.path.isdir(domain_dir):
-            continue
-        for fname in os.listdir(domain_dir):
-            match = pattern.match(fname)
-            if not match:
-                continue
-            file_date_str = match.group("date")  # e.g. 20250713
-            file_time_str = match.group("time")  # e.g. 214703
-            file_micro = match.group("micro")
-            file_domain = match.group("domain")
-            file_date = f"{file_date_str[:4]}-{file_date_str[4:6]}-{file_date_str[6:]}"
-            if file_date != date_str:
-                continue
-            # Compose a timestamp string for matching (to second precision)
-            file_timestamp = f"{file_date} {file_time_str[:2]}:{file_time_str[2:4]}:{file_time_str[4:6]}"
-            saved_violations.add((file_domain, file_timestamp))
-
-    # Step 2: Parse DETECTION_RESULTS_FILE and count only those with a matching saved image
-    if os.path.exists(DETECTION_RESULTS_FILE):
-        with open(DETECTION_RESULTS_FILE, "r") as f:
-            for line in f:
-                # Example: [2025-07-13 21:47:03] [Manufacturing] NO-hardhat 0.99 (x1, y1, x2, y2)
-                m = re.match(r"\[(.*?)\] \[(.*?)\] ([\w\-]+) ([\d\.]+) \((.*?)\)", line)
-                if m:
-                    time_str, domain, vtype, conf, bbox = m.groups()
-                    # Only consider if this detection has a saved image
-                    if (domain, time_str) in saved_violations:
-                        type_counts[vtype] += 1
-
-    result = [{"type": vtype, "count": count} for vtype, count in type_counts.items()]
+    ensure_violation_stats_backfilled()
+    try:
+        counts = violation_stats.day(datetime.strptime(date_str, "%Y-%m-%d")) if date_str else violation_stats.all_days()
+    except ValueError:
+        return jsonify([])
+    result = [
+        {"type": field.split(':', 1)[1], "count": count}
+        for field, count in counts.items() if field.startswith('snap_type:') and count
+    ]
     return jsonify(result)
 
 @app.route('/api/violations', methods=['OPTIONS'])
@@ -1892,9 +1833,13 @@ def api_violations_options():
     return response
 
 @app.route('/api/violations')
+@cached_by_generation(violation_listing_generation, listing_cache)
 def api_violations():
     """
-    Returns a list of violation files filtered by date and time range.
+    Returns a page of violation files (newest first) filtered by date and time range.
+    Query parameters: date, from/to (HH:MM, both required for a time filter),
+    limit (default VIOLATION_PAGE_DEFAULT), cursor (X-Next-Cursor of the previous
+    page) and fields (comma separated subset of filename, domain, timestamp).
     Example: /api/violations?date=2025-07-12&from=21:00&to=22:00
     """
     date_str = request.args.get('date')
@@ -1902,261 +1847,209 @@ def api_violations():
     time_to = request.args.get('to')
     # violation_type = request.args.get('type')  # Not used
 
-    base_dir = "static/violations"
-    results = []
+    filters = {}
+    if date_str:
+        filters['date'] = date_str
+    if time_from and time_to:
+        # Minutes are inclusive at both ends, as before
+        filters['time_from'] = time_from[:5] + ':00'
+        filters['time_to'] = time_to[:5] + ':59'
+    return _violation_files_page(**filters)
 
-    # Updated regex for: violation_<domain>_<YYYYMMDD>_<HHMMSS>_<microseconds>.jpg
-    pattern = re.compile(r"violation_(?P<domain>.+?)_(?P<date>\d{8})_(?P<time>\d{6})_\d+\.jpg")
-
-    for domain in os.listdir(base_dir):
-        domain_dir = os.path.join(base_dir, domain)
-        if not os.path.isdir(domain_dir):
-            continue
-        for fname in os.listdir(domain_dir):
-            match = pattern.match(fname)
-            if not match:
-                continue
-            file_domain = match.group("domain")
-
-            file_date_str = match.group("date")      # e.g. 20250712
-            file_time_str = match.group("time")      # e.g. 214703
+def lookup_detection_confidences(keys):
+    """
+    Confidences for many violations in one pass over detection_results.txt.
 
-            # Parse datetime
-            file_dt = datetime.strptime(file_date_str + file_time_str, "%Y%m%d%H%M%S")
-            file_date = file_dt.strftime("%Y-%m-%d")
-            file_time = file_dt.strftime("%H:%M")
+    Args:
+        keys: Set of (domain name, "YYYY-MM-DD HH:MM:SS") pairs
 
-            # Filter by date
-            if date_str and file_date != date_str:
-                continue
-            # Filter by time range
-            if time_from and time_to:
-                if not (time_from <= file_time <= time_to):
+    Returns:
+        dict: (domain, timestamp) -> confidence of the first matching line
+    """
+    found = {}
+    if not keys or not os.path.exists(DETECTION_RESULTS_FILE):
+        return found
+    line_pattern = re.compile(r"\[(.*?)\] \[(.*?)\] (.+?) ([\d\.]+) \((.*?)\)")
+    try:
+        with open(DETECTION_RESULTS_FILE, "r") as f:
+            for line in f:
+                m = line_pattern.match(line.strip())
+                if not m:
                     continue
+                key = (m.group(2), m.group(1))
+                if key in keys and key not in found:
+                    found[key] = float(m.group(4))
+                    if len(found) == len(keys):
+                        break
+    except Exception as e:
+        print(f"[ERROR] Error extracting confidence: {e}")
+    return found
 
-            results.append({
-                "filename": f"{domain}/{fname}",
-                "domain": file_domain,
-                "timestamp": file_dt.strftime("%Y-%m-%d %H:%M:%S")
-            })
-
-    results.sort(key=lambda x: x["timestamp"], reverse=True)
-    return jsonify(results)
 
-def extract_confidence_from_detection_file(target_domain, target_timestamp):
+def lookup_detection_classes(keys):
     """
-    Extract confidence value from detection_results.txt for a specific violation.
-    
+    Violation classes logged for many snapshots in one pass over detection_results.txt.
+
     Args:
-        target_domain: Domain name (e.g., "Manufacturing", "Healthcare")
-        target_timestamp: Timestamp string in format "YYYY-MM-DD HH:MM:SS"
-    
+        keys: Set of (domain name, "YYYY-MM-DD HH:MM:SS") pairs
+
     Returns:
-        float: Confidence value (0.0-1.0) or 0.85 as default
+        dict: (domain, timestamp) -> set of classes logged for that domain in that second
     """
+    found = {}
+    if not keys or not os.path.exists(DETECTION_RESULTS_FILE):
+        return found
+    line_pattern = re.compile(r"\[(.*?)\] \[(.*?)\] (.+?) ([\d\.]+) \((.*?)\)")
     try:
-        if not os.path.exists(DETECTION_RESULTS_FILE):
-            print(f"[DEBUG] Detection results file not found: {DETECTION_RESULTS_FILE}")
-            return 0.85
-        
-        print(f"[DEBUG] Searching for confidence: domain='{target_domain}', timestamp='{target_timestamp}'")
-        
         with open(DETECTION_RESULTS_FILE, "r") as f:
             for line in f:
-                line = line.strip()
-                if not line:
+                m = line_pattern.match(line.strip())
+                if not m:
                     continue
-                    
-                # Parse line format: [2025-07-13 21:47:03] [Manufacturing] NO-hardhat 0.99 (x1, y1, x2, y2)
-                m = re.match(r"\[(.*?)\] \[(.*?)\] (.+?) ([\d\.]+) \((.*?)\)", line)
-                if m:
-                    time_str, domain, vtype, conf_str, bbox = m.groups()
-                    
-                    # Check if this matches our target violation
-                    if domain == target_domain and time_str == target_timestamp:
-                        confidence = float(conf_str)
-                        print(f"[DEBUG] Found matching confidence: {confidence} for {domain} at {time_str}")
-                        return confidence
-        
-        print(f"[DEBUG] No matching confidence found for {target_domain} at {target_timestamp}")
-        return 0.85  # Default confidence if not found
-        
+                key = (m.group(2), m.group(1))
+                if key in keys:
+                    found.setdefault(key, set()).add(m.group(3))
     except Exception as e:
-        print(f"[ERROR] Error extracting confidence: {e}")
-        return 0.85  # Default confidence on error
+        print(f"[ERROR] Error extracting violation classes: {e}")
+    return found
+
+
+def fill_missing_violation_types(batch=10000):
+    """Store the violation classes of index rows that have none (snapshots found on disk
+    rather than recorded), from detection_results.txt; rows with no logged classes get none."""
+    while True:
+        rows = violation_index.untyped(limit=batch)
+        if not rows:
+            return
+        keys = {row['id']: (DOMAIN_SHORT_TO_FULL.get(row['domain_short'], row['domain']), row['timestamp'])
+                for row in rows}
+        found = lookup_detection_classes(set(keys.values()))
+        violation_index.set_types({row_id: found.get(key, ()) for row_id, key in keys.items()})
+
+
+def fill_missing_confidences(rows):
+    """Set 'confidence' on index rows that have none and store it in the index, so the
+    detection file is read at most once per snapshot."""
+    missing = {}
+    for row in rows:
+        if row['confidence'] is None:
+            domain_name = DOMAIN_SHORT_TO_FULL.get(row['domain_short'], row['domain'])
+            missing.setdefault((domain_name, row['timestamp']), []).append(row)
+    if not missing:
+        return
+    found = lookup_detection_confidences(set(missing))
+    updates = {}
+    for key, key_rows in missing.items():
+        for row in key_rows:
+            row['confidence'] = found.get(key, 0.85)  # Default confidence if not found
+            updates[row['id']] = row['confidence']
+    violation_index.set_confidence(updates)
+
+
+# Fields of /api/violation_images entries
+VIOLATION_IMAGE_FIELDS = ('id', 'filename', 'timestamp', 'violation_type', 'confidence',
+                          'camera_location', 'file_path', 'thumbnail_path')
+
 
 @app.route('/api/violation_images')
+@cached_by_generation(violation_listing_generation, listing_cache)
 def api_violation_images():
     """
-    Returns violation images with metadata, filtered by date and time range.
+    Returns a page of violation images with metadata (newest first), filtered by date and time range.
     Query parameters:
     - date: YYYY-MM-DD format (optional)
     - time_from: HH:MM format (optional)
     - time_to: HH:MM format (optional)
+    - limit: page size (optional, default VIOLATION_PAGE_DEFAULT, at most VIOLATION_PAGE_MAX)
+    - cursor: X-Next-Cursor header of the previous page (optional)
+    - fields: comma separated subset of VIOLATION_IMAGE_FIELDS (optional)
     Example: /api/violation_images?date=2025-07-12&time_from=07:00&time_to=08:00
     """
     date_str = request.args.get('date')
     time_from = request.args.get('time_from')  # e.g., "07:00"
     time_to = request.args.get('time_to')      # e.g., "08:00"
-    
-    print(f"[DEBUG] API violation_images called with params:")
-    print(f"[DEBUG]   - date: {date_str}")
-    print(f"[DEBUG]   - time_from: {time_from}")
-    print(f"[DEBUG]   - time_to: {time_to}")
-    
-    base_dir = "static/violations"
-    print(f"[DEBUG] Looking for violations in base_dir: {base_dir}")
-    print(f"[DEBUG] Base dir exists: {os.path.exists(base_dir)}")
-    
-    # Use the correct domain folder names based on YOLO_Video.py logic
-    expected_domains = list(DOMAIN_MAPPINGS.values())  # ['Manu', 'Cons', 'Heal', 'OilG']
-    print(f"[DEBUG] Expected domain folders (from YOLO_Video.py logic): {expected_domains}")
-    
-    if os.path.exists(base_dir):
-        try:
-            all_domains = os.listdir(base_dir)
-            # Filter to only process the correctly named domain folders
-            domain_list = [d for d in all_domains if d in expected_domains and os.path.isdir(os.path.join(base_dir, d))]
-            print(f"[DEBUG] All folders in base_dir: {all_domains}")
-            print(f"[DEBUG] Correctly named domain folders to process: {domain_list}")
-        except Exception as e:
-            print(f"[DEBUG] Error listing base_dir: {e}")
-            domain_list = []
-    else:
-        print(f"[DEBUG] Creating base_dir as it doesn't exist")
-        os.makedirs(base_dir, exist_ok=True)
-        domain_list = []
-    
-    results = []
-    
-    # Pattern for: violation_<domain>_<YYYYMMDD>_<HHMMSS>_<microseconds>.jpg
-    pattern = re.compile(r"violation_(?P<domain>.+?)_(?P<date>\d{8})_(?P<time>\d{6})_(?P<micro>\d+)\.jpg")
-    
+
     try:
-        # Parse time range if provided
-        time_from_dt = None
-        time_to_dt = None
-        if time_from:
-            time_from_dt = datetime.strptime(time_from, "%H:%M").time()
-            print(f"[DEBUG] Parsed time_from: {time_from_dt}")
-        if time_to:
-            time_to_dt = datetime.strptime(time_to, "%H:%M").time()
-            print(f"[DEBUG] Parsed time_to: {time_to_dt}")
-        
-        # Convert date filter if provided
-        filter_date = None
         if date_str:
-            filter_date = datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y%m%d")
-            print(f"[DEBUG] Converted date filter from {date_str} to {filter_date}")
-        
-        total_files_checked = 0
-        for domain in domain_list:
-            domain_dir = os.path.join(base_dir, domain)
-            print(f"[DEBUG] Checking domain: {domain} at path: {domain_dir}")
-            
-            if not os.path.isdir(domain_dir):
-                print(f"[DEBUG] Skipping {domain} - not a directory")
-                continue
-                
-            try:
-                files_in_domain = os.listdir(domain_dir)
-                print(f"[DEBUG] Found {len(files_in_domain)} files in {domain}: {files_in_domain[:5]}...")  # Show first 5
-                total_files_checked += len(files_in_domain)
-            except Exception as e:
-                print(f"[DEBUG] Error listing files in {domain_dir}: {e}")
-                continue
-                
-            for fname in files_in_domain:
-                match = pattern.match(fname)
-                if not match:
-                    continue
-                
-                file_domain = match.group("domain")
-                file_date_str = match.group("date")  # YYYYMMDD
-                file_time_str = match.group("time")  # HHMMSS
-                file_micro = match.group("micro")
-                
-                print(f"[DEBUG] Processing file: {fname}")
-                print(f"[DEBUG]   - file_domain: {file_domain}")
-                print(f"[DEBUG]   - file_date_str: {file_date_str}")
-                print(f"[DEBUG]   - file_time_str: {file_time_str}")
-                
-                # Filter by date if specified
-                if filter_date and file_date_str != filter_date:
-                    print(f"[DEBUG]   - Date filter mismatch: {file_date_str} != {filter_date}, skipping")
-                    continue
-                
-                # Parse file timestamp
-                try:
-                    file_dt = datetime.strptime(file_date_str + file_time_str, "%Y%m%d%H%M%S")
-                    file_time = file_dt.time()
-                    print(f"[DEBUG]   - Parsed file_dt: {file_dt}, file_time: {file_time}")
-                    
-                    # Filter by time range if specified
-                    if time_from_dt and file_time < time_from_dt:
-                        print(f"[DEBUG]   - Time too early: {file_time} < {time_from_dt}, skipping")
-                        continue
-                    if time_to_dt and file_time > time_to_dt:
-                        print(f"[DEBUG]   - Time too late: {file_time} > {time_to_dt}, skipping")
-                        continue
-                    
-                except Exception as e:
-                    print(f"[ERROR] Failed to parse timestamp for {fname}: {e}")
-                    continue
-                
-                # Build result entry
-                # Get the full domain name from the short domain folder name
-                full_domain_name = DOMAIN_SHORT_TO_FULL.get(domain, file_domain)
-                
-                # Extract real confidence from detection results file
-                # Convert timestamp format from YYYYMMDD_HHMMSS to YYYY-MM-DD HH:MM:SS
-                try:
-                    detection_timestamp = file_dt.strftime('%Y-%m-%d %H:%M:%S')
-                    print(f"[DEBUG]   - Looking for confidence with domain='{full_domain_name}', timestamp='{detection_timestamp}'")
-                    real_confidence = extract_confidence_from_detection_file(full_domain_name, detection_timestamp)
-                    print(f"[DEBUG]   - Found confidence: {real_confidence}")
-                except Exception as e:
-                    print(f"[DEBUG]   - Error extracting confidence: {e}, using default")
-                    real_confidence = 0.85
-                
-                violation_data = {
-                    "id": f"{domain}_{file_date_str}_{file_time_str}_{file_micro}",
-                    "filename": fname,
-                    "timestamp": file_dt.isoformat(),
-                    "violation_type": f"PPE Violation ({full_domain_name})",
-                    "confidence": real_confidence,  # Real confidence extracted from detection data
-                    "camera_location": full_domain_name,
-                    "file_path": f"{domain}/{fname}",
-                    "thumbnail_path": f"{domain}/{fname}"  # Same as file_path for now
-                }
-                
-                print(f"[DEBUG]   - Added to results: {violation_data['id']}")
-                results.append(violation_data)
-        
-        print(f"[DEBUG] Total files checked: {total_files_checked}")
-        print(f"[DEBUG] Total violations found: {len(results)}")
-        
-        # Sort by timestamp descending (most recent first)
-        results.sort(key=lambda x: x["timestamp"], reverse=True)
-        
-        print(f"[DEBUG] Found {len(results)} violation images for filters: date={date_str}, time_from={time_from}, time_to={time_to}")
-        
-        return jsonify(results)
-        
+            datetime.strptime(date_str, "%Y-%m-%d")
+        time_from_str = datetime.strptime(time_from, "%H:%M").strftime("%H:%M:%S") if time_from else None
+        time_to_str = datetime.strptime(time_to, "%H:%M").strftime("%H:%M:%S") if time_to else None
+        fields = parse_fields(request.args.get('fields'), VIOLATION_IMAGE_FIELDS)
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # Use the correct domain folder names based on YOLO_Video.py logic
+        rows, next_cursor = violation_index.page(
+            limit=limit, cursor=request.args.get('cursor'), domains=list(DOMAIN_MAPPINGS.values()),
+            date=date_str, time_from=time_from_str, time_to=time_to_str)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"[ERROR] Failed to fetch violation images: {e}")
-        import traceback
-        traceback.print_exc()
+        app_logger.exception(f"[ERROR] Failed to fetch violation images: {e}")
         return jsonify({"error": "Failed to fetch violation images"}), 500
 
+    if fields is None or 'confidence' in fields:
+        fill_missing_confidences(rows)
+    if fields is None or 'thumbnail_path' in fields:
+        # Thumbnails of snapshots saved before thumbnails existed, newest first
+        thumbnail_store.start_backfill(lambda: violation_index.iter_paths(domains=list(DOMAIN_MAPPINGS.values())))
+
+    results = []
+    for row in rows:
+        # Get the full domain name from the short domain folder name
+        full_domain_name = DOMAIN_SHORT_TO_FULL.get(row['domain_short'], row['domain'])
+        results.append(project({
+            "id": row['id'],
+            "filename": row['filename'],
+            "timestamp": row['timestamp'].replace(' ', 'T'),
+            "violation_type": f"PPE Violation ({full_domain_name})",
+            "confidence": row['confidence'],  # Real confidence extracted from detection data
+            "camera_location": full_domain_name,
+            "file_path": row['path'],
+            "thumbnail_path": f"thumb/{row['path']}"  # Served by /violations/thumb/<path>
+        }, fields))
+
+    app_logger.debug("Found %d violation images for filters: date=%s, time_from=%s, time_to=%s, more=%s",
+                     len(results), date_str, time_from, time_to, bool(next_cursor))
+    return _listing_response(results, next_cursor)
+
+@app.route('/violations/thumb/<path:filepath>')
+def serve_violation_thumbnail(filepath):
+    """
+    Serve a small thumbnail of a violation image, rendering it first if needed.
+    Example: /violations/thumb/Manu/violation_Manufacturing_20250712_143022_123456.jpg
+    """
+    thumb_path = run_blocking(thumbnail_store.get, filepath)
+    if thumb_path is None:
+        return "Image not found", 404
+    return immutable(send_file(thumb_path, mimetype=thumbnail_store.mimetype, max_age=VIOLATION_IMAGE_MAX_AGE))
+
+
+@app.route('/api/storage_status')
+def api_storage_status():
+    """Snapshot bytes/files per domain, retention limits, evictor counts and
+    near-duplicate snapshots rejected by admission control."""
+    return jsonify(dict(violation_storage.status(), admission=snapshot_admission.status()))
+
+
+@app.route('/api/thumbnail_status')
+def api_thumbnail_status():
+    """Thumbnail counts, queue depth and disk usage against THUMBNAIL_CACHE_MB."""
+    return jsonify(thumbnail_store.status())
+
+
 @app.route('/violations/<path:filepath>')
 def serve_violation_image(filepath):
     """
-    Serve violation images from the static/violations directory
+    Serve violation images from the static/violations directory.
+    Snapshot names carry their capture time, so responses are cacheable forever
+    (send_from_directory also answers If-None-Match/If-Modified-Since with 304).
     Example: /violations/domain1/violation_domain1_20250712_143022_123456.jpg
     """
     try:
-        return send_from_directory("static/violations", filepath)
+        return immutable(send_from_directory("static/violations", filepath, max_age=VIOLATION_IMAGE_MAX_AGE))
     except Exception as e:
         print(f"[ERROR] Failed to serve violation image {filepath}: {e}")
         return "Image not found", 404
@@ -2175,6 +2068,50 @@ def register_violation_recording_status_api(app):
             return jsonify({"violation_recording_enabled": False}), 500
 
 
+# API to inspect email/SMS delivery
+def register_notification_status_api(app):
+    @app.route('/api/notification_status')
+    def api_notification_status():
+        """Sent/failed/retried counts, circuit breaker state and queue depth per channel."""
+        return jsonify(notification_status())
+
+
+# API to inspect startup cost and model load state
+def register_startup_report_api(app):
+    @app.route('/api/startup_report')
+    def api_startup_report():
+        """Import/init timing of this worker and whether the model has been loaded yet."""
+        return jsonify({**startup_timing.report(), "models": model_status()})
+
+
+# Readiness probe for load balancers: only route stream traffic to warmed workers
+def register_readiness_api(app):
+    @app.route('/ready')
+    def ready():
+        """200 once the detection model is loaded and warmed up, 503 until then.
+
+        A worker that loads lazily starts loading and warming in the background on
+        the first probe, so it becomes ready without a stream request paying for it.
+        """
+        models = model_status()
+        if is_ready():
+            return jsonify({"ready": True, "models": models})
+        ensure_ready_async()
+        return jsonify({"ready": False, "models": models}), 503
+
+
+register_violation_recording_status_api(app)
+register_startup_report_api(app)
+register_readiness_api(app)
+register_notification_status_api(app)
+
+startup_timing.mark('routes')
+startup_timing.log_summary(app_logger)
+startup_timing.uninstall()
+
+# MODEL_PRELOAD=background|eager loads and warms the model now instead of on the first inference request
+preload_from_env()
+
 
 
 # Ensure debug_mode, port, and host are defined before calling socketio.run
@@ -2212,6 +2149,7 @@ if __name__ == "__main__":
     app_logger.info(f"[STARTUP]   - Camera IP: {CAMERA_IP}")
     app_logger.info(f"[STARTUP]   - Camera Port: {CAMERA_PORT}")
     app_logger.info(f"[STARTUP]   - Camera Username: {CAMERA_USERNAME}")
+    app_logger.info(f"[STARTUP]   - Cameras ({camera_registry.source}): {', '.join(camera_registry.ids())}")
     
     print(f"Flask app running on http://{host}:{port}")
     print("Available endpoints:")
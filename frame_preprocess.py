@@ -0,0 +1,143 @@
+"""
+Shared frame preprocessing for the streaming generators.
+
+Every generator used to resize the same frame several times (display
+downscale, a second resize for YOLO, ultralytics' own letterbox and a final
+resize of the annotated frame back to the original size) and copied each
+frame into ``last_valid_frame``.  FramePreprocessor does the work once per
+frame into buffers that are allocated when the geometry changes and reused
+afterwards:
+
+    pre = FramePreprocessor()
+    frame = pre.fit_display(frame)          # optional downscale for streaming
+    canvas, info = pre.letterbox(frame)     # model input, fixed size
+    x1, y1, x2, y2 = info.to_source(box)    # map detections back by arithmetic
+
+One instance belongs to one generator; it is not thread safe.
+"""
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# Default YOLOv8 input size and the gray ultralytics pads with
+MODEL_INPUT_SIZE = 640
+LETTERBOX_PAD_VALUE = 114
+
+
+class LetterboxInfo(namedtuple('LetterboxInfo', 'scale pad_x pad_y src_w src_h')):
+    """Geometry of one letterbox operation, used to map boxes back to the source frame."""
+
+    __slots__ = ()
+
+    def to_source(self, box):
+        """Map an (x1, y1, x2, y2) box in letterbox coordinates to source pixel coordinates."""
+        x1, y1, x2, y2 = box
+        x1 = int((x1 - self.pad_x) / self.scale)
+        y1 = int((y1 - self.pad_y) / self.scale)
+        x2 = int((x2 - self.pad_x) / self.scale)
+        y2 = int((y2 - self.pad_y) / self.scale)
+        return (
+            min(max(x1, 0), self.src_w - 1),
+            min(max(y1, 0), self.src_h - 1),
+            min(max(x2, 0), self.src_w - 1),
+            min(max(y2, 0), self.src_h - 1),
+        )
+
+
+class FramePreprocessor:
+    """Letterbox and display-resize frames into reusable, preallocated buffers."""
+
+    def __init__(self, input_size=MODEL_INPUT_SIZE, max_display_size=None, pad_value=LETTERBOX_PAD_VALUE):
+        """
+        Args:
+            input_size (int): Square model input size in pixels (default: 640)
+            max_display_size (tuple): Optional (width, height) bound for streamed frames.
+                Larger frames are downscaled once, keeping their aspect ratio.
+            pad_value (int): Gray level used for letterbox padding (default: 114, as ultralytics)
+        """
+        self.input_size = input_size
+        self.max_display_size = max_display_size
+        self.pad_value = pad_value
+
+        self._canvas = np.full((input_size, input_size, 3), pad_value, dtype=np.uint8)
+        self._canvas_key = None      # (src_h, src_w) the canvas padding was laid out for
+        self._info = None
+        self._scaled = None          # resize target inside the canvas
+        self._display = None         # downscaled display frame
+        self._cache = None           # last valid frame
+        self._work = None            # scratch copy handed out by restore_cached()
+
+    def fit_display(self, frame):
+        """Return the frame downscaled to max_display_size, or the frame itself if it already fits.
+
+        The returned array is a reused buffer: it is overwritten by the next call.
+        """
+        if self.max_display_size is None:
+            return frame
+        max_w, max_h = self.max_display_size
+        h, w = frame.shape[:2]
+        if w <= max_w and h <= max_h:
+            return frame
+
+        scale = min(max_w / w, max_h / h)
+        new_w, new_h = max(int(w * scale), 1), max(int(h * scale), 1)
+        if self._display is None or self._display.shape[:2] != (new_h, new_w):
+            self._display = np.empty((new_h, new_w, 3), dtype=np.uint8)
+        cv2.resize(frame, (new_w, new_h), dst=self._display, interpolation=cv2.INTER_AREA)
+        return self._display
+
+    def letterbox(self, frame):
+        """Letterbox a BGR frame into the model input canvas.
+
+        Returns:
+            tuple: (canvas, LetterboxInfo). The canvas is reused by the next call,
+            so the model must consume it before letterbox() is called again.
+        """
+        h, w = frame.shape[:2]
+        if self._canvas_key != (h, w):
+            self._layout(h, w)
+
+        info = self._info
+        new_h, new_w = self._scaled.shape[:2]
+        if (new_h, new_w) == (h, w):
+            self._scaled[...] = frame
+        else:
+            interpolation = cv2.INTER_AREA if info.scale < 1 else cv2.INTER_LINEAR
+            cv2.resize(frame, (new_w, new_h), dst=self._scaled, interpolation=interpolation)
+        self._canvas[info.pad_y:info.pad_y + new_h, info.pad_x:info.pad_x + new_w] = self._scaled
+        return self._canvas, info
+
+    def _layout(self, h, w):
+        """Recompute letterbox geometry and repaint the padding for a new source size."""
+        size = self.input_size
+        scale = min(size / h, size / w)
+        new_w, new_h = max(int(round(w * scale)), 1), max(int(round(h * scale)), 1)
+        pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+
+        self._canvas.fill(self.pad_value)
+        self._scaled = np.empty((new_h, new_w, 3), dtype=np.uint8)
+        self._info = LetterboxInfo(scale, pad_x, pad_y, w, h)
+        self._canvas_key = (h, w)
+
+    def cache(self, frame):
+        """Remember a valid frame without allocating a new array per frame."""
+        if self._cache is None or self._cache.shape != frame.shape:
+            self._cache = np.empty_like(frame)
+        np.copyto(self._cache, frame)
+
+    def has_cached(self):
+        return self._cache is not None
+
+    def restore_cached(self):
+        """Return a writable copy of the cached frame (reused buffer) or None.
+
+        A separate buffer is used so annotations drawn on the returned frame never
+        leak into the cache.
+        """
+        if self._cache is None:
+            return None
+        if self._work is None or self._work.shape != self._cache.shape:
+            self._work = np.empty_like(self._cache)
+        np.copyto(self._work, self._cache)
+        return self._work
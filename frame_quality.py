@@ -0,0 +1,145 @@
+"""
+Cheap per-frame validity checks for the streaming generators.
+
+The generators used to call frame.mean() on every full-resolution frame to
+spot black or white corruption: 25M values per 4K frame, before frame
+skipping. FrameQualityChecker looks at a strided view instead (every
+FRAME_QUALITY_STRIDE-th row and column, 1/64 of the pixels by default) and
+from that one sample detects:
+
+* empty or out-of-range frames (dimensions);
+* black or white frames (sample mean outside FRAME_DARK..FRAME_BRIGHT);
+* partial decode corruption: a band of flat rows (no variation along the row,
+  the gray/green fill a decoder leaves when a slice is lost) reaching the
+  bottom edge and covering at least FRAME_BAND_FRACTION of the height;
+* frozen frames: the sample's CRC equals the previous frame's. A camera
+  repeating its last buffer is still shown, but after FRAME_FROZEN_LIMIT
+  identical frames in a row they are reported invalid.
+
+Each result also carries ``motion``, the mean absolute difference between
+this sample and the previous one (0-255), so a motion gate can reuse it
+instead of diffing frames again. Counts per camera and reason are kept for
+quality_report() (/api/camera_health).
+"""
+import os
+import threading
+import zlib
+from collections import Counter, namedtuple
+
+import numpy as np
+
+FRAME_QUALITY_STRIDE = int(os.getenv("FRAME_QUALITY_STRIDE", "8"))
+FRAME_DARK = float(os.getenv("FRAME_DARK", "5"))
+FRAME_BRIGHT = float(os.getenv("FRAME_BRIGHT", "250"))
+FRAME_BAND_FRACTION = float(os.getenv("FRAME_BAND_FRACTION", "0.15"))
+FRAME_FROZEN_LIMIT = int(os.getenv("FRAME_FROZEN_LIMIT", "50"))
+
+# A sampled row whose values spread less than this is "flat"
+_FLAT_ROW_STD = 1.5
+
+
+class FrameQuality(namedtuple('FrameQuality', 'valid reason mean motion frozen')):
+    """Result of one check: ``reason`` says why a frame is invalid (None when valid).
+
+    mean is the sample's mean brightness, motion the mean absolute difference to the
+    previous sample (None for the first frame), frozen the number of identical
+    frames in a row before this one.
+    """
+
+    __slots__ = ()
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def quality_report():
+    """Frames checked and rejected per camera and reason, with the latest motion score."""
+    with _stats_lock:
+        return {camera: dict(counts) for camera, counts in _stats.items()}
+
+
+class FrameQualityChecker:
+    """Validates the frames of one stream from a strided sample. Not thread safe."""
+
+    def __init__(self, camera='camera', stride=FRAME_QUALITY_STRIDE, dark=FRAME_DARK, bright=FRAME_BRIGHT,
+                 min_size=(50, 50), max_size=(4000, 4000), band_fraction=FRAME_BAND_FRACTION,
+                 frozen_limit=FRAME_FROZEN_LIMIT):
+        """
+        Args:
+            camera (str): Name the metrics are reported under
+            stride (int): Sample every stride-th row and column
+            dark (float): Frames with a sample mean at or below this are black
+            bright (float): Frames with a sample mean at or above this are white
+            min_size (tuple): Smallest valid (height, width), exclusive
+            max_size (tuple): Largest valid (height, width), exclusive
+            band_fraction (float): Flat rows at the bottom covering this much of the
+                height mark a partially decoded frame (0 disables the check)
+            frozen_limit (int): Identical frames in a row before they are invalid (0 disables)
+        """
+        self.camera = camera
+        self.stride = max(1, stride)
+        self.dark = dark
+        self.bright = bright
+        self.min_size = min_size
+        self.max_size = max_size
+        self.band_fraction = band_fraction
+        self.frozen_limit = frozen_limit
+        self._previous_crc = None
+        self._previous_sample = None
+        self._frozen = 0
+        with _stats_lock:
+            self._counts = _stats.setdefault(camera, Counter())
+
+    def _record(self, result):
+        with _stats_lock:
+            self._counts['checked'] += 1
+            if result.reason is not None:
+                self._counts[result.reason] += 1
+            if result.motion is not None:
+                self._counts['last_motion'] = round(result.motion, 2)
+        return result
+
+    def _bottom_band_rows(self, sample):
+        # Spread of each sampled row across columns and channels
+        row_std = sample.reshape(sample.shape[0], -1).std(axis=1)
+        flat = row_std < _FLAT_ROW_STD
+        if not flat[-1]:
+            return 0
+        # Length of the run of flat rows ending at the bottom edge
+        not_flat = np.flatnonzero(~flat)
+        return len(flat) if not_flat.size == 0 else len(flat) - 1 - not_flat[-1]
+
+    def check(self, frame):
+        """Check one frame (H x W x 3 array). Returns a FrameQuality."""
+        if frame is None or frame.size == 0 or frame.ndim != 3:
+            return self._record(FrameQuality(False, 'empty', 0.0, None, 0))
+        h, w = frame.shape[:2]
+        if not (self.min_size[0] < h < self.max_size[0] and self.min_size[1] < w < self.max_size[1]):
+            return self._record(FrameQuality(False, 'dimensions', 0.0, None, 0))
+
+        sample = np.ascontiguousarray(frame[::self.stride, ::self.stride])
+        mean = float(sample.mean())
+
+        crc = zlib.crc32(sample)
+        self._frozen = self._frozen + 1 if crc == self._previous_crc else 0
+        current = sample.astype(np.int16)
+        motion = None
+        if self._previous_sample is not None and self._previous_sample.shape == current.shape:
+            motion = float(np.abs(current - self._previous_sample).mean())
+        self._previous_crc = crc
+        self._previous_sample = current
+
+        reason = None
+        if mean <= self.dark:
+            reason = 'dark'
+        elif mean >= self.bright:
+            reason = 'bright'
+        elif self.frozen_limit and self._frozen >= self.frozen_limit:
+            reason = 'frozen'
+        elif self.band_fraction > 0:
+            band = self._bottom_band_rows(sample)
+            # A frame flat from top to bottom is a uniform scene, not a lost slice
+            if band < sample.shape[0] and band >= self.band_fraction * sample.shape[0]:
+                reason = 'band'
+        return self._record(FrameQuality(reason is None, reason, mean, motion, self._frozen))
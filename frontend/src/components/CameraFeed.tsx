@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { cameraFeeds, CameraFeedConfig } from '../config/cameraFeedConfig';
+import OverlayFeed from './OverlayFeed';
 
 const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || "http://localhost:5000/api";
 
@@ -303,8 +304,15 @@ const CameraFeed: React.FC<CameraFeedProps> = ({ onDateTimeChange }) => {
         {/* Video Area */}
         <div style={{ background: '#fff', borderRadius: 12, padding: 16, minHeight: 400 }}>
           {selectedFeed ? (
-            showFeed && (
-              // All camera feeds (webcam and ipcamera) are MJPEG streams, so use img tag
+            showFeed && selectedFeed.overlay ? (
+              <OverlayFeed
+                key={imgKey}
+                camera={selectedFeed.overlay.camera}
+                domain={selectedFeed.overlay.domain}
+                onError={setFeedError}
+              />
+            ) : showFeed && (
+              // All other camera feeds (webcam and ipcamera) are MJPEG streams, so use img tag
               <img
                 key={imgKey}
                 src={selectedFeed.url}
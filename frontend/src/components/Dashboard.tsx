@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 
 // Helper functions for time formatting and generation
@@ -59,6 +59,11 @@ const Dashboard: React.FC = () => {
   const [selectedImage, setSelectedImage] = useState<ViolationImage | null>(null);
   const [violationsLoading, setViolationsLoading] = useState<boolean>(false);
   const [violationsError, setViolationsError] = useState<string | null>(null);
+  // X-Next-Cursor of the last page loaded; null once every matching image is listed
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
+  // Bumped on every filter change so a late page of the previous filters is ignored
+  const violationsRequest = useRef(0);
   const [selectedDate, setSelectedDate] = useState<string>(getToday());
   const [selectedTimeRange, setSelectedTimeRange] = useState<{ from: string; to: string }>({ from: '07:00', to: '08:00' });
 
@@ -76,10 +81,16 @@ const Dashboard: React.FC = () => {
       });
   }, []);
 
-  // Function to fetch violation images based on date/time filters
-  const fetchViolationImages = async (date?: string, timeRange?: { from: string; to: string }) => {
-    console.log('[DEBUG] Dashboard fetchViolationImages called with:', { date, timeRange });
-    setViolationsLoading(true);
+  // Function to fetch violation images based on date/time filters; with a cursor the next page is appended
+  const fetchViolationImages = async (date?: string, timeRange?: { from: string; to: string }, cursor?: string) => {
+    console.log('[DEBUG] Dashboard fetchViolationImages called with:', { date, timeRange, cursor });
+    const requestId = cursor ? violationsRequest.current : ++violationsRequest.current;
+    if (cursor) {
+      setLoadingMore(true);
+    } else {
+      setViolationsLoading(true);
+      setNextCursor(null);
+    }
     setViolationsError(null);
     
     try {
@@ -97,18 +108,29 @@ const Dashboard: React.FC = () => {
         console.log('[DEBUG] Dashboard adding time_to filter:', timeRange.to);
         params.append('time_to', timeRange.to);
       }
+      if (cursor) {
+        params.append('cursor', cursor);
+      }
 
       const apiUrl = `${API_BASE_URL}/violation_images?${params.toString()}`;
       console.log('🔍 [Dashboard] Fetching violations from URL:', apiUrl);
       console.log('🔍 [Dashboard] Full params string:', params.toString());
       
       const response = await axios.get<ViolationImage[]>(apiUrl);
+      if (requestId !== violationsRequest.current) {
+        return;  // the filters changed while this page was loading
+      }
       
       console.log('📸 [Dashboard] API Response status:', response.status);
       console.log('📸 [Dashboard] API Response data type:', typeof response.data);
       console.log('📸 [Dashboard] Fetched violation images count:', response.data.length);
       console.log('📸 [Dashboard] First few images:', response.data.slice(0, 3));
       
+      setNextCursor(response.headers['x-next-cursor'] || null);
+      if (cursor) {
+        setViolationImages(images => [...images, ...response.data]);
+        return;
+      }
       setViolationImages(response.data);
       
       // Auto-select first image if available
@@ -121,6 +143,9 @@ const Dashboard: React.FC = () => {
       }
       
     } catch (err: any) {
+      if (requestId !== violationsRequest.current) {
+        return;
+      }
       console.error('❌ [Dashboard] Error fetching violation images:', err);
       console.error('❌ [Dashboard] Error details:', {
         message: err?.message || 'Unknown error',
@@ -129,10 +154,21 @@ const Dashboard: React.FC = () => {
         url: err?.config?.url
       });
       setViolationsError('Failed to load violation images');
-      setViolationImages([]);
-      setSelectedImage(null);
+      if (!cursor) {
+        setViolationImages([]);
+        setSelectedImage(null);
+      }
     } finally {
-      setViolationsLoading(false);
+      if (requestId === violationsRequest.current) {
+        setViolationsLoading(false);
+        setLoadingMore(false);
+      }
+    }
+  };
+
+  const loadMoreViolationImages = () => {
+    if (nextCursor && !loadingMore) {
+      fetchViolationImages(selectedDate, selectedTimeRange, nextCursor);
     }
   };
 
@@ -360,7 +396,7 @@ const Dashboard: React.FC = () => {
                     fontWeight: 600,
                     fontSize: 14
                   }}>
-                    Violation Files ({violationImages.length})
+                    Violation Files ({violationImages.length}{nextCursor ? '+' : ''})
                   </div>
                   <div style={{ 
                     maxHeight: 350, 
@@ -391,6 +427,14 @@ const Dashboard: React.FC = () => {
                           }
                         }}
                       >
+                        {image.thumbnail_path && (
+                          <img
+                            src={getImageUrl(image.thumbnail_path)}
+                            alt=""
+                            loading="lazy"
+                            style={{ float: 'right', width: 96, marginLeft: 8, borderRadius: 4 }}
+                          />
+                        )}
                         <div style={{ fontWeight: 600, fontSize: 13, marginBottom: 4, color: '#333' }}>
                           {image.filename}
                         </div>
@@ -425,6 +469,25 @@ const Dashboard: React.FC = () => {
                         )}
                       </div>
                     ))}
+                    {nextCursor && (
+                      <button
+                        onClick={loadMoreViolationImages}
+                        disabled={loadingMore}
+                        style={{
+                          width: '100%',
+                          padding: 8,
+                          marginTop: 4,
+                          border: '1px solid #1976d2',
+                          borderRadius: 6,
+                          background: '#fff',
+                          color: '#1976d2',
+                          fontWeight: 600,
+                          cursor: loadingMore ? 'default' : 'pointer'
+                        }}
+                      >
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                      </button>
+                    )}
                   </div>
                 </div>
 
@@ -0,0 +1,202 @@
+import React, { useEffect, useRef, useState } from 'react';
+import { io, Socket } from 'socket.io-client';
+
+const SOCKET_URL = process.env.REACT_APP_SOCKET_URL || "http://localhost:5000";
+
+const DOMAIN_LABELS: Record<string, string> = {
+  general: "General",
+  manufacturing: "Manufacturing",
+  construction: "Construction",
+  healthcare: "Healthcare",
+  oilgas: "Oil & Gas",
+};
+
+type Detection = {
+  class: string;
+  confidence: number;
+  bbox: [number, number, number, number];
+  violation: boolean;
+};
+
+type FrameMessage = {
+  meta: { frame_id: number; width: number; height: number; room: string };
+  jpeg: ArrayBuffer;
+};
+
+type DetectionsMessage = {
+  frame_id: number;
+  domain: string;
+  recording: boolean;
+  detections: Detection[];
+};
+
+interface OverlayFeedProps {
+  camera: 'webcam' | 'ipcamera';
+  domain: string;
+  onError?: (message: string) => void;
+}
+
+function boxColor(det: Detection) {
+  if (det.violation) return '#ff0000';
+  if (det.class === 'Person') return '#ffffff';
+  return '#00ff00';
+}
+
+function drawOverlay(ctx: CanvasRenderingContext2D, domain: string, msg: DetectionsMessage) {
+  ctx.lineWidth = 3;
+  ctx.font = '16px sans-serif';
+  for (const det of msg.detections) {
+    const [x1, y1, x2, y2] = det.bbox;
+    ctx.strokeStyle = boxColor(det);
+    ctx.strokeRect(x1, y1, x2 - x1, y2 - y1);
+    ctx.fillStyle = det.violation ? '#ff0000' : '#ffffff';
+    ctx.fillText(`${det.class} ${det.confidence.toFixed(2)}`, x1, Math.max(y1 - 4, 14));
+  }
+
+  ctx.lineWidth = 4;
+  ctx.strokeStyle = '#000000';
+  ctx.font = '14px sans-serif';
+  const label = DOMAIN_LABELS[domain] || domain;
+  ctx.strokeText(label, 10, 40);
+  ctx.fillStyle = '#ffffff';
+  ctx.fillText(label, 10, 40);
+
+  const status = `Recording: ${msg.recording ? 'ON' : 'OFF'}`;
+  ctx.strokeText(status, 10, 60);
+  ctx.fillStyle = msg.recording ? '#00ff00' : '#ff0000';
+  ctx.fillText(status, 10, 60);
+}
+
+/**
+ * Camera feed over the Socket.IO frame channel in overlay mode: the server sends the
+ * raw frame once per camera plus this domain's detections, and the boxes are drawn here.
+ */
+const OverlayFeed: React.FC<OverlayFeedProps> = ({ camera, domain, onError }) => {
+  const canvasRef = useRef<HTMLCanvasElement>(null);
+  const [connected, setConnected] = useState(false);
+
+  useEffect(() => {
+    const socket: Socket = io(SOCKET_URL);
+    let room: string | null = null;
+    // The frame decodes asynchronously and its detections usually arrive first, so
+    // both are buffered by frame id and drawn once the pair is complete
+    const frames = new Map<number, ImageBitmap>();
+    const detections = new Map<number, DetectionsMessage>();
+    let closed = false;
+
+    const acknowledge = (frameId: number) => {
+      // The server sends the next frame only after this
+      socket.emit('frame_ack', { room, frame_id: frameId });
+    };
+
+    const discardBefore = (frameId: number) => {
+      frames.forEach((bitmap, id) => {
+        if (id < frameId) {
+          bitmap.close();
+          frames.delete(id);
+        }
+      });
+      detections.forEach((_, id) => {
+        if (id < frameId) detections.delete(id);
+      });
+    };
+
+    const drawIfComplete = (frameId: number) => {
+      const bitmap = frames.get(frameId);
+      const msg = detections.get(frameId);
+      if (!bitmap || !msg) return;
+      frames.delete(frameId);
+      detections.delete(frameId);
+      discardBefore(frameId);
+
+      const canvas = canvasRef.current;
+      if (canvas) {
+        if (canvas.width !== bitmap.width || canvas.height !== bitmap.height) {
+          canvas.width = bitmap.width;
+          canvas.height = bitmap.height;
+        }
+        const ctx = canvas.getContext('2d');
+        if (ctx) {
+          ctx.drawImage(bitmap, 0, 0);
+          drawOverlay(ctx, domain, msg);
+        }
+      }
+      bitmap.close();
+      acknowledge(frameId);
+    };
+
+    const subscribe = () => {
+      socket.emit('subscribe_stream', { camera, domain, overlay: true }, (reply: { room?: string; error?: string }) => {
+        if (reply?.error) {
+          console.error('[OverlayFeed] Subscribe failed:', reply.error);
+          onError?.(reply.error);
+          return;
+        }
+        room = reply.room || null;
+        setConnected(true);
+        console.log('[OverlayFeed] Subscribed to', room);
+      });
+    };
+
+    socket.on('connect', subscribe);
+
+    socket.on('stream_frame', async (msg: FrameMessage) => {
+      const frameId = msg.meta.frame_id;
+      let bitmap: ImageBitmap;
+      try {
+        bitmap = await createImageBitmap(new Blob([msg.jpeg], { type: 'image/jpeg' }));
+      } catch (err) {
+        console.error('[OverlayFeed] Could not decode frame', frameId, err);
+        detections.delete(frameId);
+        acknowledge(frameId);
+        return;
+      }
+      if (closed) {
+        bitmap.close();
+        return;
+      }
+      frames.set(frameId, bitmap);
+      drawIfComplete(frameId);
+    });
+
+    socket.on('stream_detections', (msg: DetectionsMessage) => {
+      detections.set(msg.frame_id, msg);
+      drawIfComplete(msg.frame_id);
+    });
+
+    socket.on('stream_error', (msg: { error: string }) => {
+      console.error('[OverlayFeed] Stream error:', msg.error);
+      onError?.(`Stream error: ${msg.error}`);
+    });
+
+    return () => {
+      closed = true;
+      if (room) socket.emit('unsubscribe_stream', { room });
+      frames.forEach((bitmap) => bitmap.close());
+      frames.clear();
+      detections.clear();
+      socket.disconnect();
+      setConnected(false);
+    };
+  }, [camera, domain, onError]);
+
+  return (
+    <div>
+      <canvas
+        ref={canvasRef}
+        style={{
+          width: '100%',
+          borderRadius: 8,
+          maxHeight: 500,
+          objectFit: 'contain',
+          border: '1px solid #ddd'
+        }}
+      />
+      {!connected && (
+        <div style={{ color: '#888', textAlign: 'center', padding: 8 }}>Connecting...</div>
+      )}
+    </div>
+  );
+};
+
+export default OverlayFeed;
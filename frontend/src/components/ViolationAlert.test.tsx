@@ -18,6 +18,16 @@ import ViolationAlert from './ViolationAlert';
 
 // ...rest of your test code...
 
+const batch = (violations: any[], extra: any = {}) => ({
+  room: 'violations:Zone A:general',
+  camera: 'Zone A',
+  domain: 'general',
+  violations,
+  suppressed: 0,
+  dropped: 0,
+  ...extra,
+});
+
 describe('ViolationAlert', () => {
   beforeEach(() => {
     // Always re-assign .on and .off before each test to ensure they're defined
@@ -27,12 +37,20 @@ describe('ViolationAlert', () => {
     mockSocket.off = jest.fn((event: string) => {
       delete mockSocket[`__cb_${event}`];
     });
+    mockSocket.emit = jest.fn();
+    mockSocket.connected = true;
     // Remove any previously registered event handlers
     Object.keys(mockSocket)
       .filter(k => k.startsWith('__cb_'))
       .forEach(k => delete mockSocket[k]);
   });
 
+  it('subscribes only to the rooms it displays', () => {
+    const rooms = [{ camera: 'ipcamera', domain: 'construction' }];
+    render(<ViolationAlert rooms={rooms} />);
+    expect(mockSocket.emit).toHaveBeenCalledWith('subscribe_violations', { rooms });
+  });
+
   it('renders alerts received via WebSocket', async () => {
     render(<ViolationAlert />);
     const violation = {
@@ -41,7 +59,7 @@ describe('ViolationAlert', () => {
       timestamp: '2025-07-14T12:00:00Z',
     };
     act(() => {
-      mockSocket['__cb_violation_alert'](violation);
+      mockSocket['__cb_violation_batch'](batch([violation]));
     });
     expect(await screen.findByText(/No Helmet/)).toBeInTheDocument();
     expect(screen.getByText(/Zone A/)).toBeInTheDocument();
@@ -53,11 +71,22 @@ describe('ViolationAlert', () => {
     const v1 = { type: 'No Vest', location: 'Zone B', timestamp: '2025-07-14T12:01:00Z' };
     const v2 = { type: 'No Gloves', location: 'Zone C', timestamp: '2025-07-14T12:02:00Z' };
     act(() => {
-      mockSocket['__cb_violation_alert'](v1);
-      mockSocket['__cb_violation_alert'](v2);
+      mockSocket['__cb_violation_batch'](batch([v1]));
+      mockSocket['__cb_violation_batch'](batch([v2]));
     });
     const alertBoxes = screen.getAllByText(/Zone/);
     expect(alertBoxes[0]).toHaveTextContent('Zone C');
     expect(alertBoxes[1]).toHaveTextContent('Zone B');
   });
-});
\ No newline at end of file
+
+  it('shows repeat counts and suppressed duplicates from a batch', async () => {
+    render(<ViolationAlert />);
+    expect(mockSocket.emit).toHaveBeenCalledWith('subscribe_violations', { all: true });
+    const v = { type: 'No Helmet', location: 'Zone A', timestamp: '2025-07-14T12:03:00Z', count: 3 };
+    act(() => {
+      mockSocket['__cb_violation_batch'](batch([v], { suppressed: 4 }));
+    });
+    expect(await screen.findByText(/×3/)).toBeInTheDocument();
+    expect(screen.getByText(/4 repeated alerts suppressed/)).toBeInTheDocument();
+  });
+});
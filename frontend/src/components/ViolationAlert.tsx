@@ -7,25 +7,66 @@ type Violation = {
   type: string;
   location: string;
   timestamp: string;
+  count?: number;
 };
 
-const ViolationAlert: React.FC = () => {
+type ViolationBatch = {
+  room: string;
+  camera: string;
+  domain: string;
+  violations: Violation[];
+  suppressed: number;
+  dropped: number;
+};
+
+type ViolationRoom = { camera: string; domain: string };
+
+interface ViolationAlertProps {
+  // Camera/domain pairs to receive violations for; omit to receive every room
+  rooms?: ViolationRoom[];
+}
+
+const MAX_ALERTS = 100;
+
+/**
+ * Violation alerts from the server's batched `violation_batch` events. Only the rooms
+ * this view displays are joined, so other cameras' traffic never reaches the browser.
+ */
+const ViolationAlert: React.FC<ViolationAlertProps> = ({ rooms }) => {
   const [alerts, setAlerts] = useState<Violation[]>([]);
+  const [suppressed, setSuppressed] = useState(0);
+  const roomsKey = JSON.stringify(rooms ?? null);
 
   useEffect(() => {
-    socket.on('violation_alert', (violation: Violation) => {
-      setAlerts(prev => [violation, ...prev]);
+    const subscription = rooms ? { rooms } : { all: true };
+    const subscribe = () => socket.emit('subscribe_violations', subscription);
+
+    socket.on('connect', subscribe);
+    if (socket.connected) subscribe();
+
+    socket.on('violation_batch', (batch: ViolationBatch) => {
+      // Each batch lists violations oldest first; show the newest on top
+      const incoming = [...batch.violations].reverse();
+      setAlerts(prev => [...incoming, ...prev].slice(0, MAX_ALERTS));
+      if (batch.suppressed) setSuppressed(prev => prev + batch.suppressed);
     });
     return () => {
-      socket.off('violation_alert');
+      socket.off('connect', subscribe);
+      socket.off('violation_batch');
+      socket.emit('unsubscribe_violations', subscription);
     };
-  }, []);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [roomsKey]);
 
   return (
     <div style={{ position: 'fixed', top: 20, right: 20, zIndex: 1000 }}>
+      {suppressed > 0 && (
+        <div style={{ margin: 8, fontSize: 12, color: '#555' }}>{suppressed} repeated alerts suppressed</div>
+      )}
       {alerts.map((alert, idx) => (
         <div key={idx} style={{ background: '#ffeb3b', margin: 8, padding: 12, borderRadius: 6, boxShadow: '0 2px 8px #888' }}>
           <b>{alert.type}</b> at <b>{alert.location}</b> <span style={{ fontSize: 12, color: '#555' }}>({alert.timestamp})</span>
+          {(alert.count ?? 1) > 1 && <span style={{ marginLeft: 6, fontWeight: 'bold' }}>×{alert.count}</span>}
         </div>
       ))}
     </div>
@@ -6,6 +6,8 @@ export type CameraFeedConfig = {
   location: string;
   type: string;
   url: string;
+  // Stream raw frames over Socket.IO and draw detections in the browser
+  overlay?: { camera: 'webcam' | 'ipcamera'; domain: string };
 };
 
 export const cameraFeeds: CameraFeedConfig[] = [
@@ -51,6 +53,14 @@ export const cameraFeeds: CameraFeedConfig[] = [
     type: "webcam",
     url: `${API_BASE_URL}/webcam_oilgas`
   },
+  {
+    id: "webcam_healthcare_overlay",
+    name: "Webcam - Healthcare PPE (client overlay)",
+    location: "Healthcare Facility",
+    type: "webcam",
+    url: `${API_BASE_URL}/webcam_raw`,
+    overlay: { camera: "webcam", domain: "healthcare" }
+  },
   // IP Camera feeds (disabled until physical camera is available)
   // {
   //   id: "gate2",
@@ -0,0 +1,92 @@
+"""
+Gunicorn configuration: one model in the master, shared copy-on-write by the workers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app the master imports the application before forking, and this
+file makes that import load and warm up the detection model (MODEL_PRELOAD=eager).
+Warming up in the master matters for sharing: ultralytics fuses Conv+BatchNorm
+layers on the first prediction, which writes new weight tensors, and doing that
+after the fork would give every worker a private copy again. gc.freeze() then
+moves everything the master allocated out of the collector's reach, so workers
+do not dirty those pages just by running a garbage collection.
+
+post_fork sets each worker's torch thread count and replaces the inference locks,
+the shared-state listener, the violation index connections, the logging
+listener thread and the inference scheduler's lock inherited from the master.
+
+Use measure_worker_rss.py to compare per-worker memory with GUNICORN_PRELOAD=1
+and GUNICORN_PRELOAD=0.
+
+Environment:
+    ASYNC_MODE            threading (sync workers), gevent or eventlet
+    GUNICORN_WORKERS      worker processes (default: 4 for sync workers, 1 otherwise)
+    GUNICORN_CONNECTIONS  connections per gevent/eventlet worker (default: 1000)
+    GUNICORN_PRELOAD      load the app and model in the master (default: 1)
+    GUNICORN_BIND         listen address (default: 0.0.0.0:5000)
+    TORCH_THREADS         torch intra-op threads per worker (default: CPUs / workers)
+"""
+import gc
+import os
+import sys
+
+_async_mode = os.getenv("ASYNC_MODE", "threading").lower()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+timeout = 120
+
+if _async_mode == 'gevent':
+    worker_class = 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker'
+elif _async_mode == 'eventlet':
+    worker_class = 'eventlet'
+else:
+    worker_class = 'sync'
+
+workers = int(os.getenv("GUNICORN_WORKERS", "4" if worker_class == 'sync' else "1"))
+worker_connections = int(os.getenv("GUNICORN_CONNECTIONS", "1000"))
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
+
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", str(max(1, (os.cpu_count() or 1) // workers))))
+
+# Only a local model can be shared; with the inference service the workers hold
+# nothing but a client, which must not be created before the fork
+_share_model = preload_app and not os.getenv("INFERENCE_SERVICE_ADDRESS")
+
+if _share_model:
+    # flaskapp loads and warms the model while the master imports it
+    os.environ["MODEL_PRELOAD"] = "eager"
+    # Keep torch single-threaded in the master: forking while an OpenMP pool is
+    # running can deadlock the children. Workers raise it in post_fork.
+    os.environ["OMP_NUM_THREADS"] = "1"
+
+
+def on_starting(server):
+    if not preload_app:
+        return
+    if _share_model:
+        from model_registry import model_status
+        server.log.info(f"[GUNICORN] Model loaded in master before fork: {model_status()}")
+    gc.freeze()
+    server.log.info(f"[GUNICORN] Froze {gc.get_freeze_count()} objects for copy-on-write sharing")
+
+
+def post_fork(server, worker):
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(TORCH_THREADS)
+    else:
+        # torch is imported lazily later and reads this then
+        os.environ["OMP_NUM_THREADS"] = str(TORCH_THREADS)
+    if preload_app:
+        import inference_scheduler
+        import model_registry
+        import structured_logging
+        from shared_state import shared_state
+        from violation_index import violation_index
+        model_registry.reset_after_fork()
+        shared_state.reset_after_fork()
+        violation_index.reset_after_fork()
+        structured_logging.reset_after_fork()
+        inference_scheduler.reset_after_fork()
+    server.log.info(f"[GUNICORN] Worker {worker.pid} ready ({TORCH_THREADS} torch threads)")
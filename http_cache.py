@@ -0,0 +1,129 @@
+"""
+HTTP caching for the violation listings and snapshot images.
+
+The Dashboard polls /api/violation_images with the same filters over and
+over, and every poll re-ran the query and re-sent the same JSON. Listings are
+now cached by *generation*: a counter in the violation index that goes up
+whenever a snapshot is indexed or removed.
+
+* The ETag of a listing is derived from the generation and the normalised
+  query, so a client that sends If-None-Match with the current ETag gets an
+  empty 304 until a violation is written;
+* responses for hot queries are kept in a small in-process LRU cache
+  (HTTP_CACHE_SIZE entries) tagged with their generation; a new generation
+  makes every older entry a miss, so nothing is served stale;
+* listings are sent with ``Cache-Control: no-cache`` (the browser may keep
+  them but revalidates each time), snapshot images with
+  ``public, max-age=VIOLATION_IMAGE_MAX_AGE, immutable``: their file names carry
+  the capture time, so a given URL never changes content.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import Response, make_response, request
+
+HTTP_CACHE_SIZE = int(os.getenv("HTTP_CACHE_SIZE", "256"))
+# Larger responses are not kept in the server-side cache (ETags still apply)
+HTTP_CACHE_MAX_BODY = int(os.getenv("HTTP_CACHE_MAX_BODY", str(1024 * 1024)))
+VIOLATION_IMAGE_MAX_AGE = int(os.getenv("VIOLATION_IMAGE_MAX_AGE", str(365 * 24 * 3600)))
+
+IMMUTABLE_CACHE_CONTROL = f"public, max-age={VIOLATION_IMAGE_MAX_AGE}, immutable"
+# Response headers kept with a cached body
+_CACHED_HEADERS = ('Content-Type', 'X-Next-Cursor')
+
+
+def query_key(path, args):
+    """Cache key for a request: the path plus its query parameters in a fixed order."""
+    items = sorted((name, value) for name, values in args.lists() for value in values)
+    return f"{path}?{urlencode(items)}" if items else path
+
+
+def make_etag(generation, key):
+    """Strong ETag value (without quotes) for ``key`` at index ``generation``."""
+    return hashlib.sha1(f"{generation}|{key}".encode()).hexdigest()[:24]
+
+
+class ResponseCache:
+    """LRU of response bodies, each valid for one generation."""
+
+    def __init__(self, maxsize=HTTP_CACHE_SIZE, max_body=HTTP_CACHE_MAX_BODY):
+        self.maxsize = maxsize
+        self.max_body = max_body
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, generation):
+        """(body, headers) cached for ``key`` at ``generation``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1], entry[2]
+
+    def put(self, key, generation, body, headers):
+        if len(body) > self.max_body:
+            return
+        with self._lock:
+            self._entries[key] = (generation, body, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def status(self):
+        return dict(self.stats, entries=len(self._entries))
+
+
+def cached_by_generation(get_generation, cache):
+    """Decorator for GET views whose output only changes with ``get_generation()``.
+
+    Answers If-None-Match with 304, serves repeated queries from ``cache`` and
+    tags every 200 response with an ETag. Other statuses pass through untouched.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            generation = get_generation()
+            key = query_key(request.path, request.args)
+            etag = make_etag(generation, key)
+            if request.if_none_match.contains(etag):
+                cache.stats["not_modified"] += 1
+                response = Response(status=304)
+            else:
+                hit = cache.get(key, generation)
+                if hit is not None:
+                    body, headers = hit
+                    response = Response(body, status=200, headers=headers)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if not response.direct_passthrough:
+                        headers = {name: response.headers[name] for name in _CACHED_HEADERS if name in response.headers}
+                        cache.put(key, generation, response.get_data(), headers)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def immutable(response):
+    """Mark a response (a snapshot image) as cacheable forever."""
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
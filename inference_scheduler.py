@@ -0,0 +1,247 @@
+"""
+Inference slots shared by all camera streams of a worker.
+
+Each stream generator used to run the model on every frame it kept, so with
+many cameras on one CPU the stream whose loop ran fastest took most of the
+inference time. The generators now ask the scheduler for a slot before
+running the model and give it back right after:
+
+    if not inference_scheduler.acquire(camera_id, captured_at):
+        continue  # over its FPS budget, or the frame went stale while waiting
+    try:
+        processed_frame = detect(frame)
+    finally:
+        inference_scheduler.release(camera_id)
+
+INFERENCE_SLOTS inferences run at once. When more frames are waiting, slots
+go out by weighted fair queuing: every request gets a virtual finish time
+start + 1 / weight, where start is the later of the scheduler's virtual time
+and the camera's previous finish time, and the earliest finish goes first. A
+camera's weight is its priority (camera registry), multiplied by
+INFERENCE_BOOST for INFERENCE_BOOST_WINDOW seconds after it recorded a
+violation. A camera that was idle does not bank credit; one with twice the
+weight gets twice the slots while both are busy.
+
+A frame is dropped instead of queued when its camera already reached its
+FPS budget, and dropped from the queue when it is older than
+INFERENCE_DEADLINE_MS by the time a slot would be free; a dropped frame
+gives its finish time back, so drops do not cost the camera its share. That
+keeps the detections on screen current instead of working through a
+backlog. status()
+(/api/scheduler) shows each camera's target and achieved FPS, weight, wait
+times and drops.
+"""
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+
+from async_mode import native_lock
+
+INFERENCE_SLOTS = int(os.getenv("INFERENCE_SLOTS", "1"))
+INFERENCE_DEADLINE_MS = float(os.getenv("INFERENCE_DEADLINE_MS", "500"))
+INFERENCE_BOOST = float(os.getenv("INFERENCE_BOOST", "2"))
+INFERENCE_BOOST_WINDOW = float(os.getenv("INFERENCE_BOOST_WINDOW", "30"))
+# Seconds of grants the achieved FPS is measured over
+INFERENCE_FPS_WINDOW = float(os.getenv("INFERENCE_FPS_WINDOW", "10"))
+
+
+class _Camera:
+    def __init__(self, camera_id, priority=1, fps_budget=0.0):
+        self.id = camera_id
+        self.priority = max(priority, 1)
+        self.fps_budget = fps_budget
+        self.finish = 0.0
+        self.last_grant = None
+        self.last_violation = None
+        self.grants = deque()
+        self.stats = {"requests": 0, "granted": 0, "dropped_budget": 0, "dropped_stale": 0, "waiting": 0}
+        self.wait_total = 0.0
+
+
+class _Waiter:
+    __slots__ = ('camera', 'start', 'finish', 'captured_at', 'queued_at', 'lock', 'state')
+
+    def __init__(self, camera, start, finish, captured_at, queued_at, lock):
+        self.camera = camera
+        self.start = start
+        self.finish = finish
+        self.captured_at = captured_at
+        self.queued_at = queued_at
+        self.lock = lock
+        self.state = 'waiting'  # -> granted | dropped
+
+
+class InferenceScheduler:
+    """Weighted fair queuing of inference slots across cameras, with FPS budgets and stale-frame drops."""
+
+    def __init__(self, slots=INFERENCE_SLOTS, deadline_ms=INFERENCE_DEADLINE_MS, boost=INFERENCE_BOOST,
+                 boost_window=INFERENCE_BOOST_WINDOW, fps_window=INFERENCE_FPS_WINDOW,
+                 clock=time.monotonic, lock_factory=native_lock):
+        """
+        Args:
+            slots (int): Inferences allowed to run at the same time
+            deadline_ms (float): Frames older than this when a slot frees up are dropped (0 = never)
+            boost (float): Weight multiplier for cameras with a recent violation
+            boost_window (float): Seconds a violation keeps its camera boosted
+            fps_window (float): Seconds the achieved FPS is measured over
+            clock, lock_factory: Replaceable in tests; locks must work on native threads
+        """
+        self.slots = max(1, slots)
+        self.deadline = deadline_ms / 1000.0
+        self.boost = boost
+        self.boost_window = boost_window
+        self.fps_window = fps_window
+        self._clock = clock
+        self._lock_factory = lock_factory
+        self._lock = lock_factory()
+        self._cameras = {}
+        self._queue = []
+        self._seq = itertools.count()
+        self._busy = 0
+        self._virtual_time = 0.0
+
+    def reset_after_fork(self):
+        """Fresh lock and queue in a forked worker (held slots belong to the parent)."""
+        self._lock = self._lock_factory()
+        self._queue = []
+        self._busy = 0
+
+    def _camera(self, camera_id):
+        camera = self._cameras.get(camera_id)
+        if camera is None:
+            camera = self._cameras[camera_id] = _Camera(camera_id)
+        return camera
+
+    def configure(self, camera_id, priority=1, fps_budget=0.0):
+        """Set a camera's priority (weight) and FPS budget (0 = no limit). Unknown cameras get 1 and none."""
+        with self._lock:
+            camera = self._camera(camera_id)
+            camera.priority = max(int(priority), 1)
+            camera.fps_budget = float(fps_budget or 0)
+
+    def note_violation(self, camera_id):
+        """Boost ``camera_id`` for the next boost_window seconds."""
+        if camera_id is None:
+            return
+        with self._lock:
+            self._camera(camera_id).last_violation = self._clock()
+
+    def _weight(self, camera, now):
+        boosted = camera.last_violation is not None and now - camera.last_violation < self.boost_window
+        return camera.priority * (self.boost if boosted else 1)
+
+    def _grant(self, camera, start, now, queued_at):
+        self._busy += 1
+        self._virtual_time = max(self._virtual_time, start)
+        camera.last_grant = now
+        camera.grants.append(now)
+        self._trim_grants(camera, now)
+        camera.stats["granted"] += 1
+        camera.wait_total += now - queued_at
+
+    def _trim_grants(self, camera, now):
+        # Only the grants of the last fps_window seconds are kept
+        while camera.grants and now - camera.grants[0] > self.fps_window:
+            camera.grants.popleft()
+
+    def acquire(self, camera_id, captured_at=None):
+        """Wait for an inference slot for a frame of ``camera_id`` captured at ``captured_at`` (clock time).
+
+        Returns False, without a slot, when the camera is over its FPS budget or the
+        frame became older than the deadline while waiting. Call release() after a True.
+        """
+        now = self._clock()
+        captured_at = now if captured_at is None else captured_at
+        with self._lock:
+            camera = self._camera(camera_id)
+            camera.stats["requests"] += 1
+            if camera.fps_budget and camera.last_grant is not None and \
+                    now - camera.last_grant < 1.0 / camera.fps_budget:
+                camera.stats["dropped_budget"] += 1
+                return False
+            start = max(self._virtual_time, camera.finish)
+            camera.finish = start + 1.0 / self._weight(camera, now)
+            waiter = _Waiter(camera, start, camera.finish, captured_at, now, self._lock_factory())
+            waiter.lock.acquire()
+            heapq.heappush(self._queue, (waiter.finish, next(self._seq), waiter))
+            camera.stats["waiting"] += 1
+            # A free slot goes to the earliest finish tag, which may be this frame
+            self._dispatch()
+            if waiter.state == 'granted':
+                return True
+
+        timeout = max(0.0, captured_at + self.deadline - now) if self.deadline else -1
+        waiter.lock.acquire(timeout=timeout)
+        with self._lock:
+            if waiter.state == 'granted':
+                return True
+            if waiter.state == 'waiting':
+                # Timed out before a slot came up; the queue entry is skipped when popped
+                self._drop(waiter)
+            return False
+
+    def release(self, camera_id):
+        """Give back the slot acquired for ``camera_id`` and hand it to the next waiting frame."""
+        with self._lock:
+            self._busy = max(0, self._busy - 1)
+            self._dispatch()
+
+    def _dispatch(self):
+        now = self._clock()
+        while self._busy < self.slots and self._queue:
+            _, _, waiter = heapq.heappop(self._queue)
+            if waiter.state != 'waiting':
+                continue
+            if self.deadline and now - waiter.captured_at > self.deadline:
+                self._drop(waiter)
+            else:
+                waiter.state = 'granted'
+                waiter.camera.stats["waiting"] -= 1
+                self._grant(waiter.camera, waiter.start, now, waiter.queued_at)
+            waiter.lock.release()
+
+    def _drop(self, waiter):
+        camera = waiter.camera
+        waiter.state = 'dropped'
+        camera.stats["waiting"] -= 1
+        camera.stats["dropped_stale"] += 1
+        # A dropped frame used no slot time, so it must not push the camera's next tag back
+        if camera.finish == waiter.finish:
+            camera.finish = waiter.start
+
+    def status(self):
+        """Per-camera target vs achieved FPS, weight, waits and drops, plus slot usage."""
+        now = self._clock()
+        with self._lock:
+            cameras = {}
+            for camera in self._cameras.values():
+                # Grants older than the window are only dropped on the next grant
+                recent = sum(1 for granted_at in camera.grants if now - granted_at <= self.fps_window)
+                weight = self._weight(camera, now)
+                granted = camera.stats["granted"]
+                cameras[camera.id] = dict(
+                    camera.stats,
+                    priority=camera.priority,
+                    weight=weight,
+                    boosted=weight > camera.priority,
+                    target_fps=camera.fps_budget or None,
+                    achieved_fps=round(recent / self.fps_window, 2),
+                    avg_wait_ms=round(camera.wait_total / granted * 1000.0, 1) if granted else 0.0,
+                )
+            return {
+                "slots": self.slots,
+                "busy": self._busy,
+                "queued": sum(1 for _, _, waiter in self._queue if waiter.state == 'waiting'),
+                "deadline_ms": self.deadline * 1000.0,
+                "cameras": cameras,
+            }
+
+
+inference_scheduler = InferenceScheduler()
+
+
+def reset_after_fork():
+    """Called from gunicorn's post_fork hook."""
+    inference_scheduler.reset_after_fork()
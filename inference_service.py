@@ -0,0 +1,298 @@
+"""
+Standalone YOLO inference service with shared-memory frame transport.
+
+Every gunicorn worker that served a detection stream used to load its own
+copy of torch and ``bestest.pt``. This module lets one process per node own
+the model instead:
+
+    python inference_service.py            # start the service (one per host)
+
+Web workers then call load_detection_model(). When INFERENCE_SERVICE_ADDRESS
+is set it returns a RemoteModel, which the detection code uses exactly like a
+local YOLO model (``model(frame, imgsz=..., stream=True)`` yielding results
+with ``.boxes``). Without the variable a local YOLO model is loaded as before.
+
+Transport:
+
+* each RemoteModel creates a ring of frame slots in ``multiprocessing.shared_memory``
+  and copies the frame into a free slot; pixels never go through a socket;
+* a small request tuple (client id, request id, slot, shape, imgsz) goes to the
+  service over a multiprocessing manager queue;
+* the service attaches the segment, runs the model (micro-batching requests that
+  arrived together) and puts ``(request_id, boxes)`` on the client's response queue,
+  with boxes as plain (x1, y1, x2, y2, conf, cls) tuples.
+
+Shared memory only works between processes on the same host.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODEL_WEIGHTS = os.getenv("YOLO_WEIGHTS", "YOLO-Weights/bestest.pt")
+
+# host:port of the inference service; unset means "load the model in-process"
+INFERENCE_SERVICE_ADDRESS = os.getenv("INFERENCE_SERVICE_ADDRESS", "")
+INFERENCE_SERVICE_AUTHKEY = os.getenv("INFERENCE_SERVICE_AUTHKEY", "ppe-inference").encode()
+# torch intra-op threads used by the service
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "4"))
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "8"))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "5"))
+INFERENCE_RING_SLOTS = int(os.getenv("INFERENCE_RING_SLOTS", "4"))
+# Large enough for a 1080p BGR frame; letterboxed 640x640 canvases need far less
+INFERENCE_SLOT_BYTES = int(os.getenv("INFERENCE_SLOT_BYTES", str(1920 * 1080 * 3)))
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+
+class InferenceManager(BaseManager):
+    """Manager exposing the request queue and per-client response queues."""
+
+
+# ----------------------------------------------------------------------------
+# Client side (web workers)
+# ----------------------------------------------------------------------------
+
+class _RemoteBox:
+    """Duck-types the ultralytics Boxes item fields used by the detection code."""
+
+    __slots__ = ('xyxy', 'conf', 'cls')
+
+    def __init__(self, x1, y1, x2, y2, conf, cls):
+        self.xyxy = ((x1, y1, x2, y2),)
+        self.conf = (conf,)
+        self.cls = (cls,)
+
+
+class _RemoteResult:
+    __slots__ = ('boxes',)
+
+    def __init__(self, boxes):
+        self.boxes = [_RemoteBox(*box) for box in boxes]
+
+
+class FrameRing:
+    """Fixed ring of frame slots in one shared-memory segment."""
+
+    def __init__(self, slots=INFERENCE_RING_SLOTS, slot_bytes=INFERENCE_SLOT_BYTES):
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._free = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame, timeout=INFERENCE_TIMEOUT):
+        """Copy a frame into a free slot and return the slot index."""
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {frame.nbytes} bytes exceeds the {self.slot_bytes}-byte slot; "
+                             "letterbox it first or raise INFERENCE_SLOT_BYTES")
+        slot = self._free.get(timeout=timeout)
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+        np.copyto(view, frame)
+        return slot
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def close(self):
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RemoteModel:
+    """Client for the inference service, usable in place of a YOLO model.
+
+    Thread safe: concurrent calls use different ring slots and responses are routed
+    by request id.
+    """
+
+    def __init__(self, address=INFERENCE_SERVICE_ADDRESS, authkey=INFERENCE_SERVICE_AUTHKEY):
+        InferenceManager.register('get_request_queue')
+        InferenceManager.register('get_response_queue')
+        self._manager = InferenceManager(address=parse_address(address), authkey=authkey)
+        self._manager.connect()
+        self.client_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._requests = self._manager.get_request_queue()
+        self._responses = self._manager.get_response_queue(self.client_id)
+        self._ring = FrameRing()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._next_id = 0
+        self._receiver = threading.Thread(target=self._receive, name="inference-responses", daemon=True)
+        self._receiver.start()
+        atexit.register(self.close)
+        print(f"[INFERENCE] Connected to inference service at {address} as {self.client_id}")
+
+    def __call__(self, frame, imgsz=640, stream=False, **kwargs):
+        return [_RemoteResult(self.predict_boxes(frame, imgsz=imgsz))]
+
+    def predict_boxes(self, frame, imgsz=640):
+        """Return [(x1, y1, x2, y2, conf, cls), ...] in ``frame`` coordinates."""
+        frame = np.ascontiguousarray(frame)
+        slot = self._ring.write(frame)
+        done = threading.Event()
+        holder = {}
+        with self._pending_lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._pending[request_id] = (done, holder)
+        try:
+            self._requests.put((self.client_id, self._ring.name, request_id, slot,
+                                self._ring.slot_bytes, frame.shape, imgsz))
+            if not done.wait(INFERENCE_TIMEOUT):
+                raise TimeoutError(f"Inference service did not answer within {INFERENCE_TIMEOUT}s")
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            self._ring.release(slot)
+        if 'error' in holder:
+            raise RuntimeError(f"Inference service error: {holder['error']}")
+        return holder['boxes']
+
+    def _receive(self):
+        while True:
+            try:
+                request_id, boxes, error = self._responses.get()
+            except (EOFError, OSError):
+                print("[INFERENCE] Connection to inference service lost")
+                return
+            with self._pending_lock:
+                pending = self._pending.get(request_id)
+            if pending is None:
+                continue  # caller already timed out
+            done, holder = pending
+            if error:
+                holder['error'] = error
+            else:
+                holder['boxes'] = boxes
+            done.set()
+
+    def close(self):
+        self._ring.close()
+
+
+def load_detection_model(weights=MODEL_WEIGHTS):
+    """Return a RemoteModel when INFERENCE_SERVICE_ADDRESS is set, else a local YOLO model."""
+    if INFERENCE_SERVICE_ADDRESS:
+        try:
+            return RemoteModel()
+        except (ConnectionError, OSError) as e:
+            print(f"[INFERENCE] Inference service unavailable ({e}), loading model in-process")
+    from ultralytics import YOLO
+    return YOLO(weights)
+
+
+# ----------------------------------------------------------------------------
+# Service side
+# ----------------------------------------------------------------------------
+
+class InferenceService:
+    """Owns the model and answers requests from the web workers."""
+
+    def __init__(self, weights=MODEL_WEIGHTS, threads=INFERENCE_THREADS, max_batch=INFERENCE_MAX_BATCH):
+        import torch
+        from ultralytics import YOLO
+
+        torch.set_num_threads(threads)
+        self.model = YOLO(weights)
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self._responses = {}
+        self._responses_lock = threading.Lock()
+        self._segments = {}
+        self.served = 0
+        print(f"[INFERENCE] Loaded {weights} with {threads} torch threads, max batch {max_batch}")
+
+    def response_queue(self, client_id):
+        with self._responses_lock:
+            if client_id not in self._responses:
+                self._responses[client_id] = queue.Queue()
+            return self._responses[client_id]
+
+    def _segment(self, name):
+        shm = self._segments.get(name)
+        if shm is None:
+            shm = shared_memory.SharedMemory(name=name)
+            # The client owns the segment; don't let this process' tracker unlink it
+            resource_tracker.unregister(shm._name, 'shared_memory')
+            self._segments[name] = shm
+        return shm
+
+    def _next_batch(self):
+        batch = [self.requests.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def serve_forever(self):
+        while True:
+            batch = self._next_batch()
+            # Requests with the same input size are batched into one forward pass
+            by_size = {}
+            for request in batch:
+                by_size.setdefault(request[-1], []).append(request)
+            for imgsz, requests in by_size.items():
+                self._run(requests, imgsz)
+
+    def _run(self, requests, imgsz):
+        frames = []
+        for client_id, shm_name, request_id, slot, slot_bytes, shape, _ in requests:
+            buf = self._segment(shm_name).buf
+            frames.append(np.ndarray(shape, dtype=np.uint8, buffer=buf, offset=slot * slot_bytes))
+        start = time.perf_counter()
+        try:
+            results = self.model(frames, imgsz=imgsz, verbose=False)
+            error = None
+        except Exception as e:
+            results, error = [None] * len(requests), str(e)
+        for request, result in zip(requests, results):
+            client_id, _, request_id = request[:3]
+            boxes = []
+            if result is not None:
+                for box in result.boxes:
+                    x1, y1, x2, y2 = (float(v) for v in box.xyxy[0])
+                    boxes.append((x1, y1, x2, y2, float(box.conf[0]), int(box.cls[0])))
+            self.response_queue(client_id).put((request_id, boxes, error))
+        self.served += len(requests)
+        if self.served % 500 < len(requests):
+            elapsed = (time.perf_counter() - start) * 1000.0
+            print(f"[INFERENCE] Served {self.served} frames (last batch {len(requests)} in {elapsed:.1f}ms)")
+
+
+def run_service(address=None):
+    """Start the inference service and block forever."""
+    address = address or INFERENCE_SERVICE_ADDRESS or "127.0.0.1:50055"
+    service = InferenceService()
+    InferenceManager.register('get_request_queue', callable=lambda: service.requests)
+    InferenceManager.register('get_response_queue', callable=service.response_queue)
+    manager = InferenceManager(address=parse_address(address), authkey=INFERENCE_SERVICE_AUTHKEY)
+    server = manager.get_server()
+    threading.Thread(target=server.serve_forever, name="inference-manager", daemon=True).start()
+    print(f"[INFERENCE] Listening on {address}")
+    service.serve_forever()
+
+
+if __name__ == "__main__":
+    run_service()
@@ -0,0 +1,266 @@
+"""
+JPEG encoding for streamed frames.
+
+Frames are encoded through a backend chosen once per process: TurboJPEG
+(PyTurboJPEG on top of libjpeg-turbo) when it is installed, OpenCV otherwise.
+Set JPEG_ENCODER_BACKEND=turbojpeg|opencv|auto to force a backend.
+
+Named profiles bundle quality, chroma subsampling and the optimize flag.
+Streams pick a profile by name (``?profile=`` on the stream routes) or from the
+client's bandwidth (``?bandwidth_kbps=``); otherwise a default is derived from
+the frame size, matching the quality tiers the generators used before.
+"""
+import os
+import threading
+import time
+import weakref
+from collections import namedtuple
+
+import cv2
+
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420, TJSAMP_422, TJSAMP_444, TJFLAG_OPTIMIZE
+except ImportError:  # PyTurboJPEG or libjpeg-turbo not installed
+    TurboJPEG = None
+
+JPEG_ENCODER_BACKEND = os.getenv("JPEG_ENCODER_BACKEND", "auto").lower()
+
+MULTIPART_FRAME_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+MULTIPART_FRAME_TRAILER = b'\r\n'
+
+# subsampling: '444' keeps full chroma, '420' halves it in both directions
+EncoderProfile = namedtuple('EncoderProfile', 'name quality subsampling optimize')
+
+PROFILES = {
+    'high': EncoderProfile('high', 90, '444', False),
+    'balanced': EncoderProfile('balanced', 80, '420', False),
+    'large': EncoderProfile('large', 60, '420', False),
+    'low': EncoderProfile('low', 50, '420', False),
+    'minimal': EncoderProfile('minimal', 35, '420', False),
+    # Smallest files for stored snapshots; the extra Huffman pass is paid once, not per frame
+    'archive': EncoderProfile('archive', 85, '420', True),
+}
+
+DEFAULT_PROFILE = 'balanced'
+
+# Lowest client bandwidth (kbit/s) each streaming profile is suitable for, best first
+BANDWIDTH_TIERS = [
+    (8000, 'high'),
+    (3000, 'balanced'),
+    (1500, 'large'),
+    (700, 'low'),
+    (0, 'minimal'),
+]
+
+
+def get_profile(name):
+    """Return the named profile, falling back to the default for unknown names."""
+    return PROFILES.get(name, PROFILES[DEFAULT_PROFILE])
+
+
+def select_profile(frame_shape=None, profile_name=None, bandwidth_kbps=None):
+    """Pick an encoder profile for a stream.
+
+    An explicit profile name wins, then the client bandwidth, then the frame size.
+
+    Args:
+        frame_shape (tuple): Shape of the frame being encoded (h, w[, c])
+        profile_name (str): Profile requested for the stream, e.g. 'low'
+        bandwidth_kbps (float): Bandwidth reported by or measured for the client
+    """
+    if profile_name in PROFILES:
+        return PROFILES[profile_name]
+    if bandwidth_kbps is not None:
+        for min_kbps, name in BANDWIDTH_TIERS:
+            if bandwidth_kbps >= min_kbps:
+                return PROFILES[name]
+    if frame_shape is not None:
+        h, w = frame_shape[:2]
+        if h * w > 1920 * 1080:
+            return PROFILES['large']
+    return PROFILES[DEFAULT_PROFILE]
+
+
+def profile_from_request_args(args):
+    """Read ``profile`` and ``bandwidth_kbps`` from request args.
+
+    Returns:
+        tuple: (profile_name or None, bandwidth_kbps or None)
+    """
+    profile_name = args.get('profile')
+    try:
+        bandwidth_kbps = float(args['bandwidth_kbps']) if 'bandwidth_kbps' in args else None
+    except (TypeError, ValueError):
+        bandwidth_kbps = None
+    return profile_name, bandwidth_kbps
+
+
+class EncodeStats:
+    """Per-encoder timing, kept cheap enough to update on every frame."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_bytes = 0
+
+    def record(self, elapsed_ms, size):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.last_ms = elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+        self.total_bytes += size
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "last_ms": round(self.last_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "avg_bytes": int(self.total_bytes / self.count) if self.count else 0,
+        }
+
+
+class OpenCVJpegEncoder:
+    """Encode with cv2.imencode."""
+
+    name = 'opencv'
+
+    _SAMPLING = {
+        '444': getattr(cv2, 'IMWRITE_JPEG_SAMPLING_FACTOR_444', None),
+        '422': getattr(cv2, 'IMWRITE_JPEG_SAMPLING_FACTOR_422', None),
+        '420': getattr(cv2, 'IMWRITE_JPEG_SAMPLING_FACTOR_420', None),
+    }
+
+    def __init__(self):
+        self._params = {}
+
+    def _encode_params(self, profile):
+        params = self._params.get(profile)
+        if params is None:
+            params = [cv2.IMWRITE_JPEG_QUALITY, profile.quality,
+                      cv2.IMWRITE_JPEG_OPTIMIZE, 1 if profile.optimize else 0]
+            sampling = self._SAMPLING.get(profile.subsampling)
+            if sampling is not None and hasattr(cv2, 'IMWRITE_JPEG_SAMPLING_FACTOR'):
+                params += [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, sampling]
+            self._params[profile] = params
+        return params
+
+    def encode(self, frame, profile):
+        """Return the JPEG as a bytes-like object, or None on failure."""
+        ok, buffer = cv2.imencode('.jpg', frame, self._encode_params(profile))
+        if not ok or buffer is None:
+            return None
+        # Skip tobytes(): multipart_chunk() copies the encoded data exactly once
+        return buffer.reshape(-1).data
+
+
+class TurboJpegEncoder:
+    """Encode with libjpeg-turbo through PyTurboJPEG."""
+
+    name = 'turbojpeg'
+
+    def __init__(self):
+        self._jpeg = TurboJPEG()
+        self._subsampling = {'444': TJSAMP_444, '422': TJSAMP_422, '420': TJSAMP_420}
+
+    def encode(self, frame, profile):
+        """Return the JPEG as bytes, or None on failure."""
+        return self._jpeg.encode(
+            frame,
+            quality=profile.quality,
+            jpeg_subsample=self._subsampling.get(profile.subsampling, TJSAMP_420),
+            flags=TJFLAG_OPTIMIZE if profile.optimize else 0,
+        )
+
+
+def _create_backend():
+    if JPEG_ENCODER_BACKEND in ('auto', 'turbojpeg') and TurboJPEG is not None:
+        try:
+            return TurboJpegEncoder()
+        except Exception as e:  # Python binding present but libturbojpeg missing
+            print(f"[JPEG] TurboJPEG unavailable, falling back to OpenCV: {e}")
+    elif JPEG_ENCODER_BACKEND == 'turbojpeg':
+        print("[JPEG] JPEG_ENCODER_BACKEND=turbojpeg but PyTurboJPEG is not installed, using OpenCV")
+    return OpenCVJpegEncoder()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide encoder backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+
+_active_encoders = weakref.WeakSet()
+
+
+def encoder_stats():
+    """Timing statistics of every live stream encoder, for the stats API."""
+    return [
+        {"stream": encoder.label, "backend": encoder.backend.name,
+         "profile": encoder._profile.name if encoder._profile else None,
+         **encoder.stats.as_dict()}
+        for encoder in list(_active_encoders)
+    ]
+
+
+class FrameEncoder:
+    """Per-stream encoder: fixed or adaptive profile plus timing statistics."""
+
+    def __init__(self, label='stream', profile_name=None, bandwidth_kbps=None):
+        self.label = label
+        self.backend = get_backend()
+        self.profile_name = profile_name
+        self.bandwidth_kbps = bandwidth_kbps
+        self.stats = EncodeStats()
+        self._profile = None
+        self._profile_shape = None
+        _active_encoders.add(self)
+
+    def profile_for(self, frame):
+        """Resolve the profile for this frame size (cached until the size changes)."""
+        shape = frame.shape[:2]
+        if self._profile is None or shape != self._profile_shape:
+            self._profile = select_profile(shape, self.profile_name, self.bandwidth_kbps)
+            self._profile_shape = shape
+        return self._profile
+
+    def set_bandwidth(self, bandwidth_kbps):
+        """Update the client bandwidth; the profile is re-selected on the next frame."""
+        self.bandwidth_kbps = bandwidth_kbps
+        self._profile = None
+
+    def encode(self, frame):
+        """Encode a frame to JPEG, recording how long it took.
+
+        Returns:
+            bytes-like or None: JPEG data, valid until the next encode() call.
+        """
+        start = time.perf_counter()
+        jpeg = self.backend.encode(frame, self.profile_for(frame))
+        if jpeg is None:
+            return None
+        self.stats.record((time.perf_counter() - start) * 1000.0, len(jpeg))
+        return jpeg
+
+    def encode_multipart(self, frame):
+        """Encode a frame and wrap it as one multipart/x-mixed-replace part, or return None."""
+        jpeg = self.encode(frame)
+        if jpeg is None:
+            return None
+        return multipart_chunk(jpeg)
+
+
+def multipart_chunk(jpeg):
+    """Wrap JPEG bytes in a multipart frame with a single copy."""
+    return b''.join((MULTIPART_FRAME_HEADER, jpeg, MULTIPART_FRAME_TRAILER))
@@ -0,0 +1,109 @@
+"""
+Measure the memory of a running gunicorn master and its workers (Linux).
+
+RSS counts shared pages in full for every process, so it hides copy-on-write
+sharing. PSS (proportional set size) divides each shared page between the
+processes mapping it; the sum of PSS over master and workers is what the
+server really costs. Compare:
+
+    GUNICORN_PRELOAD=0 gunicorn -c gunicorn.conf.py wsgi:app &
+    python measure_worker_rss.py                   # after one request per worker
+
+    GUNICORN_PRELOAD=1 gunicorn -c gunicorn.conf.py wsgi:app &
+    python measure_worker_rss.py
+
+Without preload every worker loads torch and the weights on its first
+detection request, so send a stream request to each worker (or use
+MODEL_PRELOAD=eager) before measuring.
+
+Usage:
+    python measure_worker_rss.py [master_pid] [--json]
+
+Without a pid the oldest process whose command line contains "gunicorn" and
+"wsgi:app" is used.
+"""
+import json
+import os
+import sys
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_smaps_rollup(pid):
+    """Return {field: kB} from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(':') in FIELDS:
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def find_master():
+    candidates = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read().replace(b"\0", b" ").decode(errors="replace")
+            with open(f"/proc/{entry}/stat") as f:
+                start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        except (FileNotFoundError, ProcessLookupError, IndexError, ValueError):
+            continue
+        if "gunicorn" in cmdline and "wsgi:app" in cmdline:
+            candidates.append((start_ticks, int(entry)))
+    return min(candidates)[1] if candidates else None
+
+
+def measure(master_pid):
+    """Memory of the master and each worker, plus totals, in kB."""
+    processes = [("master", master_pid)] + [("worker", pid) for pid in children(master_pid)]
+    rows = []
+    for role, pid in processes:
+        try:
+            rows.append(dict(read_smaps_rollup(pid), role=role, pid=pid))
+        except FileNotFoundError:
+            continue
+    totals = {field: sum(row.get(field, 0) for row in rows) for field in FIELDS}
+    return {"processes": rows, "totals": totals}
+
+
+def main(argv):
+    as_json = "--json" in argv
+    args = [arg for arg in argv if arg != "--json"]
+    master_pid = int(args[0]) if args else find_master()
+    if master_pid is None:
+        print("No gunicorn master found; pass its pid")
+        return 1
+
+    data = measure(master_pid)
+    if as_json:
+        print(json.dumps(data, indent=2))
+        return 0
+
+    print(f"{'role':<8}{'pid':>8}" + "".join(f"{field:>15}" for field in FIELDS))
+    for row in data["processes"]:
+        print(f"{row['role']:<8}{row['pid']:>8}" + "".join(f"{row.get(field, 0):>15}" for field in FIELDS))
+    totals = data["totals"]
+    print(f"{'total':<16}" + "".join(f"{totals[field]:>15}" for field in FIELDS))
+    workers = [row for row in data["processes"] if row["role"] == "worker"]
+    if workers:
+        print(f"\nAverage per worker: RSS {sum(r.get('Rss', 0) for r in workers) / len(workers) / 1024:.1f} MiB, "
+              f"PSS {sum(r.get('Pss', 0) for r in workers) / len(workers) / 1024:.1f} MiB, "
+              f"private {sum(r.get('Private_Dirty', 0) + r.get('Private_Clean', 0) for r in workers) / len(workers) / 1024:.1f} MiB")
+    print(f"Server total (PSS): {totals['Pss'] / 1024:.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
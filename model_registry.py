@@ -0,0 +1,212 @@
+"""
+Process-wide registry of detection models, loaded on first use.
+
+Importing flaskapp no longer imports ultralytics/torch: the first inference
+route (or the optional background preload) calls get_model(), which loads the
+model once per process through inference_service.load_detection_model() and
+hands the same instance to every stream afterwards.
+
+MODEL_PRELOAD controls when that happens:
+
+    lazy        on the first inference request (default)
+    background  in a daemon thread right after startup; requests that need the
+                model before it is ready wait for it
+    eager       synchronously during startup
+
+The first inference after a load is much slower than the rest (lazy kernel
+initialisation, allocator growth), so preloaded models are warmed up with a
+few dummy inferences at every size in WARMUP_SIZES before they count as
+ready. is_ready() backs the /ready probe: a worker only reports ready once its
+model is loaded and warmed.
+
+A local model is not safe to call from several threads at once, so each one
+gets an inference lock (model_lock()); models served by the inference service
+do not need one. Under gunicorn with preload_app the model is loaded in the
+master and reset_after_fork() gives every worker fresh locks.
+"""
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+from async_mode import native_lock
+from inference_service import MODEL_WEIGHTS, RemoteModel, load_detection_model
+
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "lazy").lower()
+
+# Input sizes the streams run the model at (FramePreprocessor uses 640)
+WARMUP_SIZES = [int(size) for size in os.getenv("WARMUP_SIZES", "640").split(",") if size.strip()]
+WARMUP_RUNS = int(os.getenv("WARMUP_RUNS", "2"))
+
+DEFAULT_MODEL = 'ppe'
+
+# Registered model names and their weights
+MODEL_WEIGHTS_BY_NAME = {
+    DEFAULT_MODEL: MODEL_WEIGHTS,
+}
+
+_models = {}
+_load_times = {}
+_errors = {}
+_warmup_times = {}
+_lock = threading.Lock()
+_warmup_lock = threading.Lock()
+_preload_lock = threading.Lock()
+_preload_thread = None
+_inference_locks = {}
+
+
+def get_model(name=DEFAULT_MODEL):
+    """Return the loaded model ``name``, loading it on first use (thread safe)."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(name)
+        if model is None:
+            start = time.perf_counter()
+            print(f"[MODELS] Loading model '{name}' from {MODEL_WEIGHTS_BY_NAME[name]}...")
+            try:
+                model = load_detection_model(MODEL_WEIGHTS_BY_NAME[name])
+            except Exception as e:
+                _errors[name] = str(e)
+                raise
+            _load_times[name] = (time.perf_counter() - start) * 1000.0
+            _errors.pop(name, None)
+            if not isinstance(model, RemoteModel):
+                _inference_locks[name] = native_lock()
+            _models[name] = model
+            print(f"[MODELS] Model '{name}' loaded in {_load_times[name]:.0f}ms")
+    return model
+
+
+def is_loaded(name=DEFAULT_MODEL):
+    return name in _models
+
+
+def model_lock(model):
+    """Context manager serialising inference on ``model`` within this process.
+
+    A no-op for models served by the inference service, which batches
+    concurrent requests itself.
+    """
+    for name, loaded in _models.items():
+        if loaded is model:
+            return _inference_locks.get(name) or nullcontext()
+    return nullcontext()
+
+
+def reset_after_fork():
+    """Replace every lock inherited from the parent; called in gunicorn's post_fork.
+
+    A lock held by a parent thread at fork time would stay locked forever in the child.
+    """
+    global _lock, _warmup_lock, _preload_lock, _preload_thread
+    _lock = threading.Lock()
+    _warmup_lock = threading.Lock()
+    _preload_lock = threading.Lock()
+    _preload_thread = None
+    for name in list(_inference_locks):
+        _inference_locks[name] = native_lock()
+
+
+def is_ready(name=DEFAULT_MODEL):
+    """True once the model is loaded and warmed up."""
+    return name in _warmup_times
+
+
+def warm_up(name=DEFAULT_MODEL, model=None, sizes=None, runs=None):
+    """Run dummy inferences at every size so the first real frame is not the slow one.
+
+    Args:
+        name (str): Registered model name
+        model: The loaded model (default: get_model(name))
+        sizes (list): Square input sizes to run (default: WARMUP_SIZES)
+        runs (int): Inferences per size (default: WARMUP_RUNS)
+
+    Returns:
+        bool: True if the model is warm (now or already), False if warm-up failed
+    """
+    if name in _warmup_times:
+        return True
+    sizes = WARMUP_SIZES if sizes is None else sizes
+    runs = WARMUP_RUNS if runs is None else runs
+    with _warmup_lock:
+        if name in _warmup_times:
+            return True
+        model = model if model is not None else get_model(name)
+        start = time.perf_counter()
+        try:
+            for size in sizes:
+                # Same gray the letterbox pads with, so nothing is detected
+                dummy = np.full((size, size, 3), 114, dtype=np.uint8)
+                for _ in range(runs):
+                    with model_lock(model):
+                        list(model(dummy, imgsz=size, stream=True, verbose=False))
+        except Exception as e:
+            _errors[name] = f"warm-up failed: {e}"
+            print(f"[MODELS] Warm-up of '{name}' failed: {e}")
+            return False
+        _warmup_times[name] = (time.perf_counter() - start) * 1000.0
+        print(f"[MODELS] Model '{name}' warmed up at sizes {sizes} in {_warmup_times[name]:.0f}ms")
+    return True
+
+
+def model_status():
+    """Load and warm-up state of every registered model, for the status endpoints."""
+    return {
+        name: {
+            "loaded": name in _models,
+            "load_ms": round(_load_times[name], 1) if name in _load_times else None,
+            "warmed": name in _warmup_times,
+            "warmup_ms": round(_warmup_times[name], 1) if name in _warmup_times else None,
+            "error": _errors.get(name),
+        }
+        for name in MODEL_WEIGHTS_BY_NAME
+    }
+
+
+def preload_async(names=(DEFAULT_MODEL,), on_loaded=warm_up):
+    """Load models in a daemon thread. on_loaded(name, model) runs after each load."""
+    def _preload():
+        for name in names:
+            try:
+                model = get_model(name)
+            except Exception as e:
+                print(f"[MODELS] Background preload of '{name}' failed: {e}")
+                continue
+            if on_loaded is not None:
+                on_loaded(name, model)
+
+    thread = threading.Thread(target=_preload, name="model-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def ensure_ready_async():
+    """Start loading and warming the default model in the background unless that already happened.
+
+    Called by the readiness probe, so a lazily loading worker becomes ready without
+    a stream request having to pay for the load.
+    """
+    global _preload_thread
+    if is_ready() or (_preload_thread is not None and _preload_thread.is_alive()):
+        return
+    with _preload_lock:
+        if _preload_thread is None or not _preload_thread.is_alive():
+            _preload_thread = preload_async()
+
+
+def preload_from_env(on_loaded=warm_up):
+    """Apply MODEL_PRELOAD: nothing for 'lazy', a background thread or a blocking load."""
+    global _preload_thread
+    if MODEL_PRELOAD == 'background':
+        _preload_thread = preload_async(on_loaded=on_loaded)
+        return _preload_thread
+    if MODEL_PRELOAD == 'eager':
+        model = get_model()
+        if on_loaded is not None:
+            on_loaded(DEFAULT_MODEL, model)
+    return None
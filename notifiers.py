@@ -0,0 +1,318 @@
+"""
+Email/SMS delivery for violation alerts: pooled clients, retries and a circuit breaker.
+
+Every alert used to open a new SMTP connection (connect, STARTTLS, login) and
+build a new Twilio client, on the request thread. Here:
+
+* transports keep one long-lived client: SMTPTransport holds the logged-in
+  connection, probes it with NOOP after NOTIFY_SMTP_PROBE_AFTER idle seconds,
+  drops it after NOTIFY_SMTP_IDLE_TIMEOUT and reconnects on disconnects;
+  TwilioTransport creates the Client (and its HTTP session) once;
+* Notifier retries a failed send up to NOTIFY_MAX_ATTEMPTS times with full
+  jitter backoff, and a CircuitBreaker stops calling a provider that keeps
+  failing for NOTIFY_BREAKER_RESET seconds, so an outage costs one fast
+  rejection per alert instead of a timeout;
+* NotificationDispatcher sends from a background thread with a bounded queue,
+  so the alert request returns immediately.
+
+For offline load tests set ALERT_EMAIL_TRANSPORT=sink and ALERT_SMS_TRANSPORT=fake:
+messages are recorded in memory (with optional simulated latency) instead of
+leaving the machine. SMTPTransport also works against a local SMTP sink such as
+``python -m aiosmtpd -n -l localhost:1025`` with NOTIFY_SMTP_TLS=0.
+"""
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+from collections import deque
+
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "3"))
+NOTIFY_BACKOFF_BASE = float(os.getenv("NOTIFY_BACKOFF_BASE", "0.5"))
+NOTIFY_BACKOFF_CAP = float(os.getenv("NOTIFY_BACKOFF_CAP", "5"))
+NOTIFY_BREAKER_THRESHOLD = int(os.getenv("NOTIFY_BREAKER_THRESHOLD", "5"))
+NOTIFY_BREAKER_RESET = float(os.getenv("NOTIFY_BREAKER_RESET", "60"))
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+NOTIFY_SMTP_TLS = os.getenv("NOTIFY_SMTP_TLS", "1").lower() in ("1", "true", "yes")
+NOTIFY_SMTP_TIMEOUT = float(os.getenv("NOTIFY_SMTP_TIMEOUT", "10"))
+NOTIFY_SMTP_PROBE_AFTER = float(os.getenv("NOTIFY_SMTP_PROBE_AFTER", "30"))
+NOTIFY_SMTP_IDLE_TIMEOUT = float(os.getenv("NOTIFY_SMTP_IDLE_TIMEOUT", "240"))
+NOTIFY_SINK_LATENCY_MS = float(os.getenv("NOTIFY_SINK_LATENCY_MS", "0"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider while its circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed -> open after ``threshold`` consecutive failures -> half-open after ``reset_timeout``.
+
+    In the half-open state one call is let through; its outcome closes or re-opens
+    the circuit.
+    """
+
+    def __init__(self, threshold=NOTIFY_BREAKER_THRESHOLD, reset_timeout=NOTIFY_BREAKER_RESET, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+
+def backoff_delay(attempt, base=NOTIFY_BACKOFF_BASE, cap=NOTIFY_BACKOFF_CAP):
+    """Full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# ----------------------------------------------------------------------------
+# Transports
+# ----------------------------------------------------------------------------
+
+class SMTPTransport:
+    """One logged-in SMTP connection, reused across messages and reopened when needed."""
+
+    def __init__(self, host, port, user=None, password=None, use_tls=NOTIFY_SMTP_TLS, timeout=NOTIFY_SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._server = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self.connects = 0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
+        self.connects += 1
+        return server
+
+    def _connection(self):
+        idle = time.monotonic() - self._last_used
+        if self._server is not None and idle > NOTIFY_SMTP_IDLE_TIMEOUT:
+            self.close()  # the server has most likely dropped us already
+        elif self._server is not None and idle > NOTIFY_SMTP_PROBE_AFTER:
+            try:
+                if self._server.noop()[0] != 250:
+                    self.close()
+            except smtplib.SMTPException:
+                self.close()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def send(self, sender, recipient, subject, body):
+        message = f"Subject: {subject}\n\n{body}"
+        with self._lock:
+            try:
+                self._connection().sendmail(sender, recipient, message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Stale connection: reconnect once here, anything else is up to the retry policy
+                self.close()
+                self._connection().sendmail(sender, recipient, message)
+            except Exception:
+                self.close()
+                raise
+            self._last_used = time.monotonic()
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+
+class TwilioTransport:
+    """Twilio client created on first use and kept for the life of the process."""
+
+    def __init__(self, sid, token):
+        self.sid = sid
+        self.token = token
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.rest import Client  # imported on first SMS, not at app startup
+                    self._client = Client(self.sid, self.token)
+        return self._client
+
+    def send(self, sender, recipient, body):
+        self._get_client().messages.create(body=body, from_=sender, to=recipient)
+
+    def close(self):
+        self._client = None
+
+
+class SinkEmailTransport:
+    """Local stand-in for SMTP: records messages in memory instead of sending them."""
+
+    def __init__(self, latency_ms=NOTIFY_SINK_LATENCY_MS, keep=1000):
+        self.latency = latency_ms / 1000.0
+        self.messages = deque(maxlen=keep)
+        self.sent = 0
+
+    def send(self, sender, recipient, subject, body):
+        if self.latency:
+            time.sleep(self.latency)
+        self.messages.append({"from": sender, "to": recipient, "subject": subject, "body": body})
+        self.sent += 1
+
+    def close(self):
+        pass
+
+
+class FakeSMSGateway:
+    """Local stand-in for Twilio: records messages in memory instead of sending them."""
+
+    def __init__(self, latency_ms=NOTIFY_SINK_LATENCY_MS, keep=1000):
+        self.latency = latency_ms / 1000.0
+        self.messages = deque(maxlen=keep)
+        self.sent = 0
+
+    def send(self, sender, recipient, body):
+        if self.latency:
+            time.sleep(self.latency)
+        self.messages.append({"from": sender, "to": recipient, "body": body})
+        self.sent += 1
+
+    def close(self):
+        pass
+
+
+# ----------------------------------------------------------------------------
+# Retry/breaker wrapper and background dispatch
+# ----------------------------------------------------------------------------
+
+class Notifier:
+    """Sends through a transport with bounded, jittered retries behind a circuit breaker."""
+
+    def __init__(self, name, transport, max_attempts=NOTIFY_MAX_ATTEMPTS, breaker=None, sleep=time.sleep):
+        """
+        Args:
+            name (str): Channel name used in logs and stats ('email', 'sms')
+            transport: Object with send(...) and close()
+            max_attempts (int): Attempts per message, including the first
+            breaker (CircuitBreaker): Breaker for this provider (default: a new one)
+            sleep (callable): Used between attempts; replaceable in tests
+        """
+        self.name = name
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self.stats = {"sent": 0, "failed": 0, "retries": 0, "rejected": 0}
+
+    def send(self, *args):
+        """Send one message. Raises the last error (or CircuitOpenError) if it could not be sent."""
+        if not self.breaker.allow():
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(f"{self.name} circuit open, message not sent")
+        for attempt in range(self.max_attempts):
+            try:
+                self.transport.send(*args)
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts:
+                    self.breaker.record_failure()
+                    self.stats["failed"] += 1
+                    print(f"[NOTIFY] {self.name} failed after {self.max_attempts} attempts: {e}")
+                    raise
+                self.stats["retries"] += 1
+                self._sleep(backoff_delay(attempt))
+            else:
+                self.breaker.record_success()
+                self.stats["sent"] += 1
+                return
+
+    def status(self):
+        return dict(self.stats, circuit=self.breaker.state)
+
+
+class NotificationDispatcher:
+    """Runs notification calls on a background thread so alert requests do not wait for them."""
+
+    def __init__(self, maxsize=NOTIFY_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notifications", daemon=True)
+                self._thread.start()
+
+    def submit(self, func, *args):
+        """Queue func(*args). Returns False (and counts a drop) if the queue is full."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((func, args))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"[NOTIFY] Queue full, dropped {getattr(func, '__name__', func)}")
+            return False
+
+    def _run(self):
+        while True:
+            func, args = self._queue.get()
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"[NOTIFY] {getattr(func, '__name__', func)} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until every queued notification has been handled."""
+        self._queue.join()
+
+    def status(self):
+        return {"queued": self._queue.qsize(), "dropped": self.dropped}
@@ -10,6 +10,12 @@ echo
 export FLASK_ENV=production
 export FLASK_DEBUG=False
 
+# Concurrency mode: gevent (default) serves hundreds of stream/Socket.IO clients per
+# worker; eventlet is the alternative; sync keeps the old one-stream-per-worker model
+export ASYNC_MODE=${ASYNC_MODE:-gevent}
+GUNICORN_WORKERS=${GUNICORN_WORKERS:-1}
+GUNICORN_CONNECTIONS=${GUNICORN_CONNECTIONS:-1000}
+
 # Activate virtual environment if it exists
 if [ -d "venv" ]; then
     echo "Activating virtual environment..."
@@ -21,5 +27,24 @@ fi
 # Install dependencies if needed
 pip install -r requirements.txt
 
-# Start with Gunicorn
-gunicorn --bind 0.0.0.0:5000 --workers 4 --timeout 120 wsgi:app
+# Socket.IO needs sticky sessions plus SOCKETIO_MESSAGE_QUEUE when running more than one worker
+if [ "$GUNICORN_WORKERS" -gt 1 ] && [ -z "$SOCKETIO_MESSAGE_QUEUE" ]; then
+    echo "Warning: GUNICORN_WORKERS>1 without SOCKETIO_MESSAGE_QUEUE; Socket.IO events will not reach every client."
+fi
+
+# Start with Gunicorn; worker class, preload and per-worker hooks are in gunicorn.conf.py
+case "$ASYNC_MODE" in
+    gevent)
+        echo "Async mode: gevent ($GUNICORN_WORKERS worker(s), $GUNICORN_CONNECTIONS connections each)"
+        ;;
+    eventlet)
+        echo "Async mode: eventlet ($GUNICORN_WORKERS worker(s), $GUNICORN_CONNECTIONS connections each)"
+        ;;
+    *)
+        echo "Async mode: sync workers (one stream per worker)"
+        export ASYNC_MODE=threading
+        GUNICORN_WORKERS=4
+        ;;
+esac
+export GUNICORN_WORKERS GUNICORN_CONNECTIONS
+gunicorn -c gunicorn.conf.py wsgi:app
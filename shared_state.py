@@ -0,0 +1,297 @@
+"""
+State shared between gunicorn workers.
+
+Module globals such as ``config.violation_recording_enabled`` or the webcam
+capture only exist in the worker that changed them. SharedState keeps flags
+and the active-stream registry in Redis (the same server used by
+violation_alerts) and fans changes out over pub/sub:
+
+* flags: set_flag() writes the Redis hash and publishes the new value; every
+  worker's listener stores it in a local cache and calls the watchers, so reads
+  (get_flag(), or a module attribute kept up to date by a watcher) never hit
+  the network;
+* commands: broadcast('release_webcam') runs the handlers registered with
+  on_command() in every worker, including the one holding the resource;
+* streams: register_stream()/touch_stream()/unregister_stream() record which
+  worker serves which stream; entries not touched for STREAM_TTL seconds are
+  treated as dead and removed when the streams are next listed.
+
+Nothing touches the network at import time: start() connects and syncs the
+flags, and flaskapp calls it before the first request is handled. Without a
+reachable Redis the same API works process-locally, which is the
+single-worker behaviour the app had before.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "ppe")
+STREAM_TTL = 30  # seconds without touch_stream() before a stream counts as gone
+STREAM_TOUCH_INTERVAL = 5
+# Seconds to wait for Redis: start() runs in the first request of every worker
+SHARED_STATE_REDIS_TIMEOUT = float(os.getenv("SHARED_STATE_REDIS_TIMEOUT", "1.0"))
+
+
+class SharedState:
+    """Redis-backed flags, commands and stream registry with a local cache."""
+
+    def __init__(self, redis_client=None, prefix=STATE_PREFIX, connect=None):
+        """
+        Args:
+            redis_client: Redis client to use, or None for process-local state
+            prefix (str): Key and channel prefix
+            connect (callable): Optional factory returning a Redis client or None,
+                called by start() instead of passing redis_client up front
+        """
+        self.prefix = prefix
+        self.channel = f"{prefix}:events"
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._redis = redis_client
+        self._connect = connect
+        self._started = False
+        self._defaults = {}
+        self._flags = {}
+        self._watchers = {}
+        self._handlers = {}
+        self._local_streams = {}
+        self._touched = {}
+        self._lock = threading.RLock()
+        self._listener = None
+        self._listener_pid = None
+        self._origin = uuid.uuid4().hex
+
+    def _key(self, name):
+        return f"{self.prefix}:{name}"
+
+    @property
+    def distributed(self):
+        return self._redis is not None
+
+    @property
+    def redis(self):
+        """The connected Redis client, or None while state is process-local."""
+        return self._redis
+
+    def start(self):
+        """Connect (if a factory was given), sync the flags and start the listener. Idempotent."""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            if self._redis is None and self._connect is not None:
+                self._redis = self._connect()
+            self._started = True
+        for name, default in list(self._defaults.items()):
+            self._sync_flag(name, default)
+        self.ensure_listener()
+
+    # -- flags -----------------------------------------------------------------
+
+    def init_flag(self, name, default):
+        """Declare a flag with its default.
+
+        The value is seeded in Redis unless another worker already did, and the
+        current shared value is cached. Before start() only the default is cached.
+        """
+        self._defaults[name] = default
+        if not self._started:
+            self._store_flag(name, default)
+            return default
+        value = self._sync_flag(name, default)
+        self.ensure_listener()
+        return value
+
+    def _sync_flag(self, name, default):
+        value = default
+        if self._redis is not None:
+            try:
+                self._redis.hsetnx(self._key("flags"), name, json.dumps(default))
+                raw = self._redis.hget(self._key("flags"), name)
+                value = json.loads(raw) if raw is not None else default
+            except Exception as e:
+                print(f"[STATE] Could not read flag '{name}' from Redis: {e}")
+        self._store_flag(name, value)
+        return value
+
+    def get_flag(self, name, default=None):
+        """Cached flag value; no network round trip."""
+        return self._flags.get(name, default)
+
+    def set_flag(self, name, value):
+        self._store_flag(name, value)
+        if self._redis is None:
+            return
+        try:
+            self._redis.hset(self._key("flags"), name, json.dumps(value))
+            self._publish({"type": "flag", "name": name, "value": value})
+        except Exception as e:
+            print(f"[STATE] Could not publish flag '{name}': {e}")
+
+    def watch_flag(self, name, callback):
+        """Call callback(value) now (if the flag is known) and whenever the flag changes."""
+        with self._lock:
+            self._watchers.setdefault(name, []).append(callback)
+        if name in self._flags:
+            callback(self._flags[name])
+
+    def _store_flag(self, name, value):
+        with self._lock:
+            changed = self._flags.get(name) != value or name not in self._flags
+            self._flags[name] = value
+            watchers = list(self._watchers.get(name, ()))
+        if changed:
+            for callback in watchers:
+                callback(value)
+
+    # -- commands --------------------------------------------------------------
+
+    def on_command(self, name, handler):
+        """Register handler(payload) for a command broadcast by any worker."""
+        with self._lock:
+            self._handlers.setdefault(name, []).append(handler)
+        self.ensure_listener()
+
+    def broadcast(self, name, payload=None):
+        """Run a command in every worker. Returns the local handlers' results."""
+        results = self._run_handlers(name, payload)
+        if self._redis is not None:
+            try:
+                self._publish({"type": "command", "name": name, "payload": payload})
+            except Exception as e:
+                print(f"[STATE] Could not broadcast '{name}': {e}")
+        return results
+
+    def _run_handlers(self, name, payload):
+        results = []
+        for handler in list(self._handlers.get(name, ())):
+            try:
+                results.append(handler(payload))
+            except Exception as e:
+                print(f"[STATE] Handler for '{name}' failed: {e}")
+        return results
+
+    # -- stream registry -------------------------------------------------------
+
+    def register_stream(self, stream_id, **info):
+        entry = dict(info, worker=self.worker_id, started=time.time(), last_seen=time.time())
+        with self._lock:
+            self._local_streams[stream_id] = entry
+        self._write_stream(stream_id, entry)
+
+    def touch_stream(self, stream_id):
+        """Refresh a stream's liveness, at most every STREAM_TOUCH_INTERVAL seconds."""
+        now = time.monotonic()
+        if now - self._touched.get(stream_id, 0) < STREAM_TOUCH_INTERVAL:
+            return
+        self._touched[stream_id] = now
+        with self._lock:
+            entry = self._local_streams.get(stream_id)
+            if entry is None:
+                return
+            entry["last_seen"] = time.time()
+        self._write_stream(stream_id, entry)
+
+    def unregister_stream(self, stream_id):
+        with self._lock:
+            self._local_streams.pop(stream_id, None)
+        self._touched.pop(stream_id, None)
+        if self._redis is not None:
+            try:
+                self._redis.hdel(self._key("streams"), stream_id)
+            except Exception as e:
+                print(f"[STATE] Could not unregister stream {stream_id}: {e}")
+
+    def active_streams(self):
+        """All live streams across workers: {stream_id: info}."""
+        if self._redis is None:
+            with self._lock:
+                return {sid: dict(entry) for sid, entry in self._local_streams.items()}
+        try:
+            raw = self._redis.hgetall(self._key("streams"))
+        except Exception as e:
+            print(f"[STATE] Could not list streams: {e}")
+            return {}
+        cutoff = time.time() - STREAM_TTL
+        streams = {}
+        stale = []
+        for stream_id, value in raw.items():
+            entry = json.loads(value)
+            if entry.get("last_seen", 0) >= cutoff:
+                streams[stream_id.decode() if isinstance(stream_id, bytes) else stream_id] = entry
+            else:
+                stale.append(stream_id)
+        if stale:
+            # Streams of workers that died without unregistering them
+            try:
+                self._redis.hdel(self._key("streams"), *stale)
+            except Exception as e:
+                print(f"[STATE] Could not remove stale streams: {e}")
+        return streams
+
+    def _write_stream(self, stream_id, entry):
+        if self._redis is None:
+            return
+        try:
+            self._redis.hset(self._key("streams"), stream_id, json.dumps(entry))
+        except Exception as e:
+            print(f"[STATE] Could not register stream {stream_id}: {e}")
+
+    # -- pub/sub ---------------------------------------------------------------
+
+    def _publish(self, message):
+        message["origin"] = self._origin
+        self._redis.publish(self.channel, json.dumps(message))
+
+    def ensure_listener(self):
+        """Start the pub/sub listener in this process (again after a fork)."""
+        if self._redis is None or self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.channel: self._on_message})
+                self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+                self._listener_pid = os.getpid()
+            except Exception as e:
+                print(f"[STATE] Pub/sub unavailable, changes from other workers will not be seen: {e}")
+
+    def reset_after_fork(self):
+        """Forget the parent's listener thread and origin so the child starts its own."""
+        self._listener = None
+        self._listener_pid = None
+        self._origin = uuid.uuid4().hex
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.ensure_listener()
+
+    def _on_message(self, message):
+        try:
+            data = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if data.get("origin") == self._origin:
+            return  # already applied locally
+        if data.get("type") == "flag":
+            self._store_flag(data["name"], data["value"])
+        elif data.get("type") == "command":
+            self._run_handlers(data["name"], data.get("payload"))
+
+
+def _connect():
+    try:
+        from violation_alerts import get_redis_client
+        client = get_redis_client(socket_timeout=SHARED_STATE_REDIS_TIMEOUT,
+                                  socket_connect_timeout=SHARED_STATE_REDIS_TIMEOUT)
+        client.ping()
+        return client
+    except Exception as e:
+        print(f"[STATE] Redis unavailable, shared state is local to this process: {e}")
+        return None
+
+
+shared_state = SharedState(connect=_connect)
@@ -0,0 +1,119 @@
+"""
+Admission control for violation snapshots: skip near-identical frames.
+
+While recording, record_violations() saved a full frame for every frame with a
+violation, and consecutive frames from a camera are nearly identical. Before a
+snapshot is written, SnapshotAdmission computes a difference hash (dHash) of
+the frame: the frame shrunk to 9x8 gray pixels, one bit per horizontally
+adjacent pair (left brighter than right), 64 bits in all. The snapshot is
+rejected when, for every violation class in the frame, a snapshot saved for
+the same camera, domain and class less than SNAPSHOT_DEDUP_WINDOW seconds ago
+has a hash within SNAPSHOT_DHASH_THRESHOLD bits of it. A new class, a changed
+scene or an expired window admits the frame.
+
+Rejections are counted here (status()) and, by record_violations(), in the
+``snapshots_rejected`` violation counter. record_violations() asks even when
+recording is off: an admitted frame is one violation event for the dashboard.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+SNAPSHOT_DEDUP = os.getenv("SNAPSHOT_DEDUP", "1").lower() in ("1", "true", "yes")
+SNAPSHOT_DHASH_THRESHOLD = int(os.getenv("SNAPSHOT_DHASH_THRESHOLD", "6"))
+SNAPSHOT_DEDUP_WINDOW = float(os.getenv("SNAPSHOT_DEDUP_WINDOW", "30"))
+
+HASH_SIZE = 8
+
+
+def dhash_bits(gray):
+    """64-bit dHash of a HASH_SIZE rows x HASH_SIZE+1 columns gray image (any 2-D indexable)."""
+    value = 0
+    for row in range(HASH_SIZE):
+        pixels = gray[row]
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (1 if pixels[col] > pixels[col + 1] else 0)
+    return value
+
+
+def dhash(frame):
+    """dHash of a BGR (or gray) frame."""
+    import cv2
+    # Shrink first: converting 72 pixels to gray is cheaper than a whole frame
+    small = cv2.resize(frame, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return dhash_bits(small.tolist())
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class SnapshotAdmission:
+    """Remembers the last saved snapshot hash per (camera, domain, class) and rejects repeats."""
+
+    def __init__(self, threshold=SNAPSHOT_DHASH_THRESHOLD, window=SNAPSHOT_DEDUP_WINDOW,
+                 enabled=SNAPSHOT_DEDUP, hasher=dhash, clock=time.monotonic):
+        """
+        Args:
+            threshold (int): Maximum Hamming distance (bits) for a frame to count as a repeat
+            window (float): Seconds a saved snapshot suppresses repeats
+            enabled (bool): When False every frame is admitted
+            hasher (callable): frame -> 64-bit hash; replaceable in tests
+            clock (callable): Monotonic seconds; replaceable in tests
+        """
+        self.threshold = threshold
+        self.window = window
+        self.enabled = enabled
+        self._hasher = hasher
+        self._clock = clock
+        self._last = {}  # (camera, domain, class) -> (hash, saved_at)
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "rejected": 0}
+        self.rejected_by_class = Counter()
+
+    def admit(self, frame, camera, domain_name, violation_classes):
+        """Whether to save ``frame`` as a snapshot; records it as the latest snapshot if so.
+
+        Args:
+            frame: Frame the violations were detected on (before overlays are added)
+            camera (str): Camera the frame came from (None is treated as one camera)
+            domain_name (str): Domain display name
+            violation_classes (iterable): Violation classes present in the frame
+        """
+        if not self.enabled:
+            return True
+        frame_hash = self._hasher(frame)
+        now = self._clock()
+        keys = [(camera or 'unknown', domain_name, cls) for cls in sorted(set(violation_classes))]
+        with self._lock:
+            repeat = bool(keys) and all(self._is_repeat(key, frame_hash, now) for key in keys)
+            if repeat:
+                self.stats["rejected"] += 1
+                self.rejected_by_class.update(cls for _, _, cls in keys)
+                return False
+            for key in keys:
+                self._last[key] = (frame_hash, now)
+            self.stats["admitted"] += 1
+            if len(self._last) > 1024:
+                self._purge(now)
+            return True
+
+    def _is_repeat(self, key, frame_hash, now):
+        last = self._last.get(key)
+        if last is None or now - last[1] >= self.window:
+            return False
+        return hamming(frame_hash, last[0]) <= self.threshold
+
+    def _purge(self, now):
+        for key in [key for key, (_, saved_at) in self._last.items() if now - saved_at >= self.window]:
+            del self._last[key]
+
+    def status(self):
+        return dict(self.stats, enabled=self.enabled, threshold=self.threshold, window=self.window,
+                    rejected_by_class=dict(self.rejected_by_class))
+
+
+snapshot_admission = SnapshotAdmission()
@@ -0,0 +1,162 @@
+"""
+Startup timing: where does importing flaskapp spend its time?
+
+Two kinds of measurements are collected:
+
+* phases: mark('name') records the wall time since the previous mark, giving a
+  coarse breakdown of module initialisation (imports, logging, Socket.IO, ...);
+* imports: with STARTUP_TIMING=1, install() puts an import hook first on
+  sys.meta_path that times every module import (total and self time, i.e.
+  excluding the modules it imported itself).
+
+report() returns both, sorted by cost; flaskapp serves it at /api/startup_report
+and logs the slowest entries once the app is initialised. For a one-off look
+``python -X importtime -c "import flaskapp"`` gives similar numbers.
+"""
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+STARTUP_TIMING = os.getenv("STARTUP_TIMING", "0").lower() in ("1", "true", "yes")
+
+_process_start = time.perf_counter()
+_last_mark = _process_start
+_phases = []
+_imports = {}
+
+
+def mark(name):
+    """Record the time spent since the previous mark under ``name``."""
+    global _last_mark
+    now = time.perf_counter()
+    _phases.append((name, (now - _last_mark) * 1000.0))
+    _last_mark = now
+
+
+class _TimingLoader:
+    """Wraps a module loader for the duration of one import to time it."""
+
+    def __init__(self, loader, finder):
+        self._loader = loader
+        self._finder = finder
+
+    def create_module(self, spec):
+        # Extension modules do their expensive work (dlopen) here
+        self._finder._enter(spec.name)
+        try:
+            return self._loader.create_module(spec)
+        finally:
+            self._finder._pause(spec.name)
+
+    def exec_module(self, module):
+        name = module.__spec__.name
+        self._finder._enter(name)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._finder._exit(name)
+            # Hand the real loader back so nothing keeps seeing the wrapper
+            module.__spec__.loader = self._loader
+            module.__loader__ = self._loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _ImportTimer:
+    """Meta path finder timing every import it sees (total and self time)."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def find_spec(self, fullname, path=None, target=None):
+        if getattr(self._local, 'finding', False):
+            return None
+        self._local.finding = True
+        try:
+            spec = importlib.util.find_spec(fullname)
+        except (ImportError, ValueError):
+            return None
+        finally:
+            self._local.finding = False
+        if spec is None or spec.loader is None or not hasattr(spec.loader, 'exec_module'):
+            return spec
+        spec.loader = _TimingLoader(spec.loader, self)
+        return spec
+
+    def _enter(self, name):
+        stack = self._stack()
+        if stack and stack[-1][0] == name:
+            stack[-1][1] = time.perf_counter()  # resume after create_module
+            return
+        stack.append([name, time.perf_counter(), 0.0, 0.0])
+
+    def _pause(self, name):
+        entry = self._stack()[-1]
+        entry[3] += time.perf_counter() - entry[1]
+
+    def _exit(self, name):
+        stack = self._stack()
+        entry = stack.pop()
+        total = entry[3] + (time.perf_counter() - entry[1])
+        own = total - entry[2]
+        if stack:
+            stack[-1][2] += total
+        _imports[name] = (total * 1000.0, own * 1000.0)
+
+
+_timer = None
+
+
+def install():
+    """Install the import timing hook if STARTUP_TIMING is enabled (idempotent)."""
+    global _timer
+    if not STARTUP_TIMING or _timer is not None:
+        return
+    _timer = _ImportTimer()
+    sys.meta_path.insert(0, _timer)
+
+
+def uninstall():
+    global _timer
+    if _timer is not None and _timer in sys.meta_path:
+        sys.meta_path.remove(_timer)
+    _timer = None
+
+
+def report(top=25):
+    """Startup breakdown: phases in order, slowest imports by total and by self time."""
+    by_total = sorted(_imports.items(), key=lambda item: item[1][0], reverse=True)
+    by_self = sorted(_imports.items(), key=lambda item: item[1][1], reverse=True)
+    return {
+        "since_process_start_ms": round((_last_mark - _process_start) * 1000.0, 1),
+        "phases": [{"phase": name, "ms": round(ms, 1)} for name, ms in _phases],
+        "import_timing_enabled": _timer is not None,
+        "modules_timed": len(_imports),
+        "slowest_imports": [
+            {"module": name, "total_ms": round(total, 1), "self_ms": round(own, 1)}
+            for name, (total, own) in by_total[:top]
+        ],
+        "slowest_imports_self": [
+            {"module": name, "self_ms": round(own, 1)}
+            for name, (_, own) in by_self[:top]
+        ],
+    }
+
+
+def log_summary(logger, top=10):
+    """Log phases and the slowest top-level imports."""
+    data = report(top)
+    logger.info(f"[STARTUP] Initialised in {data['since_process_start_ms']:.0f}ms")
+    for phase in data["phases"]:
+        logger.info(f"[STARTUP]   phase {phase['phase']}: {phase['ms']:.1f}ms")
+    for item in data["slowest_imports"]:
+        logger.info(f"[STARTUP]   import {item['module']}: {item['total_ms']:.1f}ms (self {item['self_ms']:.1f}ms)")
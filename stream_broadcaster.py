@@ -0,0 +1,254 @@
+"""
+Binary frame streaming over Socket.IO.
+
+Multipart MJPEG responses hold one server thread (and, under gunicorn sync
+workers, one whole worker) per viewer for the lifetime of the stream. This
+module serves the same frames over the existing Socket.IO connection instead:
+
+* a client emits ``subscribe_stream`` with ``{"camera": "ipcamera"|"webcam"|<camera id>, "domain": "..."}``
+  (the domain defaults to the one configured for the camera) and joins the room
+  ``stream:<camera>:<domain>``;
+* one background task per room pulls frames from the pipeline once and pushes
+  ``stream_frame`` events (``{"meta": {...detections...}, "jpeg": <binary>}``)
+  to every subscriber;
+* a subscriber only receives the next frame after it has acknowledged the
+  previous one with ``frame_ack``, so slow clients get frames dropped on the
+  server instead of queueing up (acks older than ACK_TIMEOUT are assumed lost);
+* the producer stops, releasing the camera, when the last subscriber leaves.
+
+With ``"overlay": true`` in the subscription the client gets the raw camera
+frames instead and draws the boxes itself. All overlay subscribers of a camera
+share the room ``stream:<camera>:overlay`` whatever their domain; the producer
+runs the model once per frame for the union of watched domains and follows each
+``stream_frame`` with a small ``stream_detections`` event
+(``{"frame_id", "domain", "recording", "detections"}``) for that client's domain.
+The two events may be processed in either order on the client, which pairs them
+by frame_id and acknowledges the frame only after drawing it.
+"""
+import threading
+import time
+
+from flask import request
+from flask_socketio import join_room, leave_room
+
+from async_mode import offload_iter, run_blocking
+
+# A frame that has not been acknowledged within this many seconds is treated as lost
+ACK_TIMEOUT = 2.0
+
+FRAME_EVENT = 'stream_frame'
+DETECTIONS_EVENT = 'stream_detections'
+
+# Pseudo-domain of the shared raw-frame room used by overlay subscribers
+OVERLAY_ROOM = 'overlay'
+
+
+def stream_room(camera, domain):
+    return f"stream:{camera}:{domain}"
+
+
+class _Subscriber:
+    __slots__ = ('sid', 'domain', 'awaiting', 'sent_at', 'sent', 'dropped')
+
+    def __init__(self, sid, domain=None):
+        self.sid = sid
+        self.domain = domain
+        self.awaiting = None   # frame id sent but not yet acknowledged
+        self.sent_at = 0.0
+        self.sent = 0
+        self.dropped = 0
+
+    def ready(self, now):
+        return self.awaiting is None or now - self.sent_at > ACK_TIMEOUT
+
+
+class _Channel:
+    def __init__(self, room, camera, domain):
+        self.room = room
+        self.camera = camera
+        self.domain = domain
+        self.overlay = domain == OVERLAY_ROOM
+        self.subscribers = {}
+        self.frames = 0
+        self.running = False
+
+    def watched_domains(self):
+        """Domains the overlay subscribers are currently viewing."""
+        return {sub.domain for sub in list(self.subscribers.values())}
+
+
+class StreamBroadcaster:
+    """Fan out one frame pipeline per camera/domain room to many Socket.IO clients."""
+
+    def __init__(self, socketio, source_factory):
+        """
+        Args:
+            socketio: The application's SocketIO instance
+            source_factory: callable(camera, domain, overlay_domains) returning an
+                iterator of (jpeg_bytes, meta) tuples, or None if the source cannot be
+                opened. overlay_domains is None for burned-in streams; for overlay
+                streams it is a callable returning the watched domains and
+                meta['detections'] must map each of them to its detections
+        """
+        self.socketio = socketio
+        self.source_factory = source_factory
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, sid, camera, domain, overlay=False):
+        room = stream_room(camera, OVERLAY_ROOM if overlay else domain)
+        with self._lock:
+            channel = self._channels.get(room)
+            if channel is None:
+                channel = self._channels[room] = _Channel(room, camera, OVERLAY_ROOM if overlay else domain)
+            channel.subscribers[sid] = _Subscriber(sid, domain)
+            start = not channel.running
+            channel.running = True
+        if start:
+            self.socketio.start_background_task(self._run_channel, channel)
+        return room
+
+    def unsubscribe(self, sid, room=None):
+        """Remove a client from one room, or from every room when room is None."""
+        with self._lock:
+            rooms = [room] if room else list(self._channels)
+            for name in rooms:
+                channel = self._channels.get(name)
+                if channel is not None:
+                    channel.subscribers.pop(sid, None)
+
+    def ack(self, sid, room, frame_id):
+        with self._lock:
+            channel = self._channels.get(room)
+            subscriber = channel.subscribers.get(sid) if channel else None
+            if subscriber is not None and subscriber.awaiting == frame_id:
+                subscriber.awaiting = None
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    "room": channel.room,
+                    "frames": channel.frames,
+                    "subscribers": [
+                        {"sid": sub.sid, "domain": sub.domain, "sent": sub.sent, "dropped": sub.dropped}
+                        for sub in channel.subscribers.values()
+                    ],
+                }
+                for channel in self._channels.values()
+            ]
+
+    def _run_channel(self, channel):
+        print(f"[STREAM] Starting producer for {channel.room}")
+        source = None
+        try:
+            # Opening the camera and producing frames block; keep them off the event loop
+            if channel.overlay:
+                source = run_blocking(self.source_factory, channel.camera, None, channel.watched_domains)
+            else:
+                source = run_blocking(self.source_factory, channel.camera, channel.domain, None)
+            if source is None:
+                self.socketio.emit('stream_error', {"room": channel.room, "error": "source unavailable"},
+                                   to=channel.room)
+                return
+            source = offload_iter(source)
+            for jpeg, meta in source:
+                targets = self._ready_targets(channel, meta)
+                if targets is None:
+                    break  # no subscribers left
+                if not targets:
+                    continue
+                if channel.overlay:
+                    self._emit_overlay(channel, jpeg, meta, targets)
+                    continue
+                payload = {"meta": dict(meta, room=channel.room), "jpeg": bytes(jpeg)}
+                for sid, _ in targets:
+                    self.socketio.emit(FRAME_EVENT, payload, to=sid)
+            self.socketio.emit('stream_end', {"room": channel.room}, to=channel.room)
+        except Exception as e:
+            print(f"[STREAM] Producer for {channel.room} failed: {e}")
+            self.socketio.emit('stream_error', {"room": channel.room, "error": str(e)}, to=channel.room)
+        finally:
+            if source is not None and hasattr(source, 'close'):
+                source.close()
+            with self._lock:
+                channel.running = False
+                if self._channels.get(channel.room) is channel:
+                    del self._channels[channel.room]
+            print(f"[STREAM] Producer for {channel.room} stopped after {channel.frames} frames")
+
+    def _emit_overlay(self, channel, jpeg, meta, targets):
+        """Send the raw frame once per target, then that target's domain detections."""
+        detections = meta.get("detections") or {}
+        frame_meta = {key: value for key, value in meta.items() if key != "detections"}
+        frame_meta["room"] = channel.room
+        payload = {"meta": frame_meta, "jpeg": bytes(jpeg)}
+        for sid, domain in targets:
+            self.socketio.emit(FRAME_EVENT, payload, to=sid)
+            self.socketio.emit(DETECTIONS_EVENT, {
+                "frame_id": meta["frame_id"],
+                "domain": domain,
+                "recording": meta.get("recording"),
+                "detections": detections.get(domain, []),
+            }, to=sid)
+
+    def _ready_targets(self, channel, meta):
+        """Pick the (sid, domain) pairs ready for this frame; None means nobody is subscribed.
+
+        An empty channel is retired under the same lock hold, so a subscribe() racing
+        with the producer's shutdown creates a new channel (and producer) instead of
+        joining one that is about to stop.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not channel.subscribers:
+                channel.running = False
+                if self._channels.get(channel.room) is channel:
+                    del self._channels[channel.room]
+                return None
+            channel.frames += 1
+            targets = []
+            for subscriber in channel.subscribers.values():
+                if subscriber.ready(now):
+                    subscriber.awaiting = meta["frame_id"]
+                    subscriber.sent_at = now
+                    subscriber.sent += 1
+                    targets.append((subscriber.sid, subscriber.domain))
+                else:
+                    subscriber.dropped += 1
+            return targets
+
+
+def register_stream_socket_handlers(socketio, broadcaster, valid_cameras, valid_domains, default_domain=None):
+    """Register the subscribe/unsubscribe/ack Socket.IO events for the frame channel.
+
+    ``default_domain(camera)`` gives the domain of a subscription that names none
+    (default 'general'). Disconnect cleanup is left to the application's own
+    disconnect handler, which should call ``broadcaster.unsubscribe(request.sid)``.
+    """
+    default_domain = default_domain or (lambda camera: 'general')
+
+    @socketio.on('subscribe_stream')
+    def handle_subscribe_stream(data):
+        data = data or {}
+        camera = data.get('camera', 'ipcamera')
+        domain = data.get('domain') or default_domain(camera)
+        overlay = bool(data.get('overlay', False))
+        if camera not in valid_cameras or domain not in valid_domains:
+            return {"error": f"Invalid stream {camera}/{domain}"}
+        room = broadcaster.subscribe(request.sid, camera, domain, overlay=overlay)
+        join_room(room)
+        return {"room": room, "overlay": overlay}
+
+    @socketio.on('unsubscribe_stream')
+    def handle_unsubscribe_stream(data):
+        room = (data or {}).get('room')
+        if room:
+            leave_room(room)
+        broadcaster.unsubscribe(request.sid, room)
+        return {"room": room}
+
+    @socketio.on('frame_ack')
+    def handle_frame_ack(data):
+        data = data or {}
+        broadcaster.ack(request.sid, data.get('room'), data.get('frame_id'))
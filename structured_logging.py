@@ -0,0 +1,246 @@
+"""
+Non-blocking, structured logging for the streaming and detection hot paths.
+
+Frame generators and record_violations() used to print() on every frame, and
+setup_logging() attached a RotatingFileHandler directly to the root logger,
+so each message was formatted and written to disk on the thread delivering
+frames. Here:
+
+* the root logger has one handler, a QueueHandler that only puts the record
+  on a bounded in-memory queue (LOG_QUEUE_SIZE); a QueueListener thread does
+  the formatting and the file/console I/O. When the queue is full the record
+  is dropped and counted instead of blocking the caller;
+* records carry structured fields (camera, domain, frame_id), appended as
+  ``key=value`` (or emitted as JSON lines with LOG_FORMAT=json);
+* per-frame events go through StructuredLogger.every() (at most
+  LOG_RATE_LIMIT messages per key per LOG_RATE_WINDOW seconds, with a count
+  of what was suppressed) or StructuredLogger.sampled() (one DEBUG message in
+  LOG_SAMPLE_EVERY). Both decide before any formatting or queueing happens.
+
+gunicorn workers call reset_after_fork() to get their own queue and listener
+thread, since the parent's listener thread does not exist after a fork.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_CONSOLE_LEVEL = os.getenv("LOG_CONSOLE_LEVEL", "INFO").upper()
+LOG_FILE_LEVEL = os.getenv("LOG_FILE_LEVEL", "DEBUG").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "5"))
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", "10"))
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+
+FIELDS = ('camera', 'domain', 'frame_id')
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructuredFormatter(logging.Formatter):
+    """Text lines with ``key=value`` structured fields appended, or JSON lines."""
+
+    def __init__(self, fmt=None, json_lines=False):
+        super().__init__(fmt)
+        self.json_lines = json_lines
+
+    def format(self, record):
+        fields = {name: getattr(record, name) for name in FIELDS if getattr(record, name, None) is not None}
+        if self.json_lines:
+            entry = {
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                entry["exception"] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+        text = super().format(record)
+        if fields:
+            text += " " + " ".join(f"{name}={value}" for name, value in fields.items())
+        return text
+
+
+class RateLimiter:
+    """Allows ``limit`` events per key per ``window`` seconds and counts the rest."""
+
+    def __init__(self, limit=LOG_RATE_LIMIT, window=LOG_RATE_WINDOW, clock=time.monotonic):
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._windows = {}  # key -> [window start, allowed, suppressed]
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def allow(self, key):
+        """(allowed, suppressed since the last allowed event) for one event of ``key``."""
+        now = self._clock()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                self._windows[key] = [now, 1, 0]
+                if len(self._windows) > 4096:
+                    self._purge(now)
+                return True, suppressed
+            if state[1] < self.limit:
+                state[1] += 1
+                suppressed, state[2] = state[2], 0
+                return True, suppressed
+            state[2] += 1
+            self.suppressed += 1
+            return False, 0
+
+    def _purge(self, now):
+        for key in [key for key, state in self._windows.items() if now - state[0] >= self.window]:
+            del self._windows[key]
+
+
+_limiter = RateLimiter()
+_sample_counts = {}
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Logger with bound structured fields and rate-limited/sampled helpers for per-frame events."""
+
+    def __init__(self, logger, fields=None, limiter=None, sample_every=LOG_SAMPLE_EVERY):
+        super().__init__(logger, dict(fields or {}))
+        self.limiter = limiter or _limiter
+        self.sample_every = sample_every
+
+    def process(self, msg, kwargs):
+        extra = dict(self.extra)
+        extra.update(kwargs.get('extra') or {})
+        kwargs['extra'] = extra
+        return msg, kwargs
+
+    def bind(self, **fields):
+        """A logger with more structured fields bound."""
+        return StructuredLogger(self.logger, dict(self.extra, **fields), self.limiter, self.sample_every)
+
+    def _key(self, key):
+        return (self.logger.name, key, self.extra.get('camera'), self.extra.get('domain'))
+
+    def every(self, key, level, msg, *args, **kwargs):
+        """Log at most LOG_RATE_LIMIT times per LOG_RATE_WINDOW for this key, camera and domain."""
+        if not self.isEnabledFor(level):
+            return
+        allowed, suppressed = self.limiter.allow(self._key(key))
+        if not allowed:
+            return
+        if suppressed:
+            msg = f"{msg} ({suppressed} similar messages suppressed)"
+        kwargs.setdefault('stacklevel', 2)  # report the caller's file:line, not this one
+        self.log(level, msg, *args, **kwargs)
+
+    def sampled(self, key, msg, *args, **kwargs):
+        """DEBUG message logged once every ``sample_every`` calls for this key, camera and domain."""
+        if not self.isEnabledFor(logging.DEBUG):
+            return
+        full_key = self._key(key)
+        count = _sample_counts.get(full_key, 0)
+        _sample_counts[full_key] = count + 1
+        if count % self.sample_every == 0:
+            kwargs.setdefault('stacklevel', 2)
+            self.debug(msg, *args, **kwargs)
+
+
+def get_logger(name, **fields):
+    """StructuredLogger for ``name`` with ``fields`` (camera, domain, ...) bound."""
+    return StructuredLogger(logging.getLogger(name), fields)
+
+
+_state = {"handler": None, "listener": None, "targets": ()}
+_setup_lock = threading.Lock()
+
+
+def _start(targets):
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(log_queue)
+    listener = QueueListener(log_queue, *targets, respect_handler_level=True)
+    listener.start()
+    root = logging.getLogger()
+    if _state["handler"] is not None:
+        root.removeHandler(_state["handler"])
+    root.addHandler(handler)
+    _state.update(handler=handler, listener=listener, targets=targets)
+
+
+def reset_after_fork():
+    """Give a forked worker its own queue and listener thread; called in gunicorn's post_fork.
+
+    The parent's listener thread does not exist in the child, so records put on the
+    inherited queue would never be written.
+    """
+    if _state["listener"] is not None:
+        _start(_state["targets"])
+
+
+def setup_logging(log_dir=LOG_DIR, log_file='flaskapp.log'):
+    """Route the root logger through a queue to a rotating file and the console. Idempotent.
+
+    Returns:
+        DroppingQueueHandler: The root logger's only handler
+    """
+    with _setup_lock:
+        if _state["listener"] is not None:
+            return _state["handler"]
+        os.makedirs(log_dir, exist_ok=True)
+        json_lines = LOG_FORMAT == 'json'
+
+        file_handler = RotatingFileHandler(
+            os.path.join(log_dir, log_file),
+            maxBytes=10 * 1024 * 1024,  # 10MB
+            backupCount=5
+        )
+        file_handler.setLevel(LOG_FILE_LEVEL)
+        file_handler.setFormatter(StructuredFormatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s', json_lines))
+
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(LOG_CONSOLE_LEVEL)
+        console_handler.setFormatter(StructuredFormatter('%(asctime)s - %(levelname)s - %(message)s', json_lines))
+
+        root = logging.getLogger()
+        root.setLevel(logging.DEBUG)
+        root.handlers.clear()
+        _start((file_handler, console_handler))
+        atexit.register(stop_logging)
+        return _state["handler"]
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    listener = _state["listener"]
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+
+def logging_status():
+    handler = _state["handler"]
+    return {
+        "queued": handler.queue.qsize() if handler else 0,
+        "dropped": handler.dropped if handler else 0,
+        "rate_limited": _limiter.suppressed,
+    }
@@ -0,0 +1,22 @@
+import async_mode
+
+
+def test_offload_iter_closes_wrapped_generator():
+    """Closing the stream (client disconnect) must run the generator's cleanup."""
+    released = []
+
+    def frames():
+        try:
+            yield 1
+            yield 2
+        finally:
+            released.append(True)
+
+    stream = async_mode.offload_iter(frames())
+    assert next(stream) == 1
+    stream.close()
+    assert released == [True]
+
+
+def test_run_blocking_returns_result():
+    assert async_mode.run_blocking(sum, [1, 2, 3]) == 6
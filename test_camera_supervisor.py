@@ -0,0 +1,97 @@
+from camera_supervisor import (BACKOFF, CLOSED, CONNECTING, DEGRADED, FAILED, STREAMING, CameraHealth,
+                               CameraSupervisor, backoff_delay)
+
+
+class FakeCapture:
+    def __init__(self, frames, opened=True):
+        self.frames = list(frames)
+        self.opened = opened
+        self.released = False
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        if not self.frames:
+            return False, None
+        frame = self.frames.pop(0)
+        return frame is not None, frame
+
+    def release(self):
+        self.released = True
+
+
+class FakeOpener:
+    """Hands out the given captures in order and records the settings used."""
+
+    def __init__(self, *captures):
+        self.captures = list(captures)
+        self.settings = []
+
+    def __call__(self, source, settings):
+        self.settings.append(settings)
+        return self.captures.pop(0)
+
+
+def _supervisor(opener, **kwargs):
+    sleeps = []
+    health = CameraHealth()
+    camera = CameraSupervisor('rtsp://cam', name='ipcamera', settings=(('CAP_PROP_FPS', 10),), opener=opener,
+                              health=health, sleep=sleeps.append, rand=lambda: 1.0, **kwargs)
+    return camera, sleeps, health
+
+
+def test_backoff_grows_exponentially_with_jitter_and_a_cap():
+    assert [backoff_delay(n, base=1, maximum=8, rand=lambda: 1.0) for n in range(1, 6)] == [1, 2, 4, 8, 8]
+    assert backoff_delay(3, base=1, maximum=8, rand=lambda: 0.0) == 2
+
+
+def test_read_failures_degrade_then_reconnect_with_the_same_settings():
+    first = FakeCapture(['f1', None, None, None])
+    second = FakeCapture(['f2'])
+    opener = FakeOpener(first, second)
+    camera, sleeps, health = _supervisor(opener, max_read_failures=3, backoff_base=1)
+    events = []
+    camera.subscribe(events.append)
+
+    assert camera.connect()
+    assert camera.read() == (True, 'f1')
+    assert camera.read() == (False, None)
+    assert camera.state == DEGRADED
+    camera.read()
+    assert camera.read() == (False, None)  # third failure: reconnects before returning
+    assert first.released and camera.state == STREAMING
+    assert camera.read() == (True, 'f2')
+
+    assert opener.settings == [(('CAP_PROP_FPS', 10),)] * 2
+    assert sleeps == [1.0]
+    assert [event['state'] for event in events] == [STREAMING, DEGRADED, BACKOFF, CONNECTING, STREAMING]
+    assert health.status()['cameras'][0]['reconnects'] == 1
+
+
+def test_gives_up_after_max_reconnects():
+    opener = FakeOpener(*(FakeCapture([], opened=False) for _ in range(3)))
+    camera, sleeps, health = _supervisor(opener, max_reconnects=3, backoff_base=1, backoff_max=30)
+
+    assert not camera.connect()
+    assert camera.state == FAILED
+    assert sleeps == [1.0, 2.0]
+    assert camera.read() == (False, None)
+    assert health.status()['events'][-1]['state'] == FAILED
+    camera.release()
+    assert health.status()['cameras'] == []
+
+
+def test_close_releases_the_capture_and_stops_reconnects():
+    capture = FakeCapture(['f1', 'f2'])
+    opener = FakeOpener(capture)
+    camera, sleeps, health = _supervisor(opener, max_read_failures=1)
+
+    assert camera.connect()
+    assert camera.read() == (True, 'f1')
+    camera.close()
+    assert capture.released and camera.state == CLOSED and camera.stopped
+    assert camera.read() == (False, None)
+    assert not camera.connect()
+    assert opener.settings == [(('CAP_PROP_FPS', 10),)] and sleeps == []
+    assert health.status()['cameras'] == []
@@ -0,0 +1,81 @@
+import io
+
+import numpy as np
+import pytest
+
+from capture_backends import (CaptureOptions, FFmpegCapture, capture_options, ffmpeg_command, parse_scale,
+                              resolve_backend, substream_url)
+
+
+def test_per_camera_options_override_global_ones():
+    environ = {'CAPTURE_SCALE': '640x480', 'CAPTURE_IPCAMERA_SCALE': '1281x721',
+               'CAPTURE_KEYFRAMES_ONLY': 'yes', 'CAPTURE_IPCAMERA_DECODE_THREADS': '4'}
+    options = capture_options('ipcamera', environ=environ)
+    assert options == CaptureOptions('auto', 4, '', False, (1280, 720), True, 10.0)
+    assert capture_options('webcam', environ=environ).scale == (640, 480)
+    assert capture_options('ipcamera', {'scale': '', 'backend': 'pyav'}, environ=environ)[:5] == (
+        'pyav', 4, '', False, None)
+    with pytest.raises(ValueError):
+        capture_options('ipcamera', {'backend': 'gstreamer'}, environ={})
+    with pytest.raises(ValueError):
+        parse_scale('720p')
+
+
+def test_substream_url_only_touches_realmonitor_urls():
+    url = 'rtsp://admin:pw@10.0.0.2:554/cam/realmonitor?channel=1&subtype=0'
+    assert substream_url(url) == 'rtsp://admin:pw@10.0.0.2:554/cam/realmonitor?channel=1&subtype=1'
+    assert substream_url('rtsp://10.0.0.2/cam/realmonitor?channel=1') == \
+        'rtsp://10.0.0.2/cam/realmonitor?channel=1&subtype=1'
+    assert substream_url('rtsp://10.0.0.2/live') == 'rtsp://10.0.0.2/live'
+
+
+def test_auto_backend_uses_ffmpeg_only_when_it_saves_decode_work():
+    scaled = capture_options('cam', {'scale': '640x360'}, environ={})
+    assert resolve_backend(scaled, which=lambda name: '/usr/bin/ffmpeg') == 'ffmpeg'
+    assert resolve_backend(scaled, which=lambda name: None) == 'opencv'
+    assert resolve_backend(capture_options('cam', environ={}), which=lambda name: '/usr/bin/ffmpeg') == 'opencv'
+
+    options = capture_options('cam', {'scale': '640x360', 'keyframes_only': '1', 'decode_threads': '2',
+                                      'hwaccel': 'cuda'}, environ={})
+    command = ffmpeg_command('rtsp://cam/stream', options, (640, 360))
+    assert command[command.index('-hwaccel') + 1] == 'cuda'
+    assert command[command.index('-threads') + 1] == '2'
+    assert command[command.index('-skip_frame') + 1] == 'nokey'
+    assert command[command.index('-timeout') + 1] == '10000000'
+    assert command[command.index('-vf') + 1] == 'scale=640:360'
+    assert command[-5:] == ['-pix_fmt', 'bgr24', '-f', 'rawvideo', 'pipe:1']
+
+
+class FakeProcess:
+    def __init__(self, data):
+        self.stdout = io.BufferedReader(io.BytesIO(data))
+        self.killed = False
+
+    def kill(self):
+        self.killed = True
+
+    def wait(self):
+        return 0
+
+
+def test_ffmpeg_capture_reads_raw_frames_and_keeps_the_newest():
+    frames = [np.full((4, 6, 3), value, np.uint8) for value in (10, 20, 30)]
+    process = FakeProcess(b''.join(frame.tobytes() for frame in frames))
+    commands = []
+
+    def popen(command, **kwargs):
+        commands.append(command)
+        return process
+
+    options = capture_options('cam', {'scale': '6x4', 'backend': 'ffmpeg', 'timeout': '1'}, environ={})
+    cap = FFmpegCapture('rtsp://cam/stream', options, popen=popen, probe=None)
+    cap._thread.join(1)  # the fake stream ends after three frames
+
+    assert commands[0][commands[0].index('-i') + 1] == 'rtsp://cam/stream'
+    success, frame = cap.read()
+    assert success and frame.shape == (4, 6, 3) and frame[0, 0, 0] == 30
+    assert cap.get(3) == 6 and cap.get(4) == 4
+    assert cap.read() == (False, None)  # no newer frame and the stream has ended
+    assert not cap.isOpened()
+    cap.release()
+    assert process.killed
@@ -0,0 +1,106 @@
+from dedup import LocalDedupBackend, RedisDedupBackend, TieredDedupBackend, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """SET NX EX / PTTL over a dict, with a switch to simulate an outage."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+        self.calls = 0
+        self.down = False
+
+    def _check(self):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("redis down")
+
+    def set(self, key, value, nx=False, ex=None):
+        self._check()
+        expires_at = self.data.get(key)
+        if nx and expires_at is not None and expires_at > self.clock():
+            return None
+        self.data[key] = self.clock() + ex
+        return True
+
+    def pttl(self, key):
+        self._check()
+        expires_at = self.data.get(key)
+        if expires_at is None or expires_at <= self.clock():
+            return -2
+        return int((expires_at - self.clock()) * 1000)
+
+
+def test_ttl_cache_expires_and_stays_bounded():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=3, clock=clock)
+    assert cache.add_if_absent('a', 10)
+    assert not cache.add_if_absent('a', 10)
+    clock.now = 10
+    assert cache.add_if_absent('a', 10)
+
+    for key, ttl in (('b', 1), ('c', 50), ('d', 60)):
+        cache.add(key, ttl)
+    assert len(cache) == 3
+    # 'b' expires first, so it is the one evicted to stay within maxsize
+    assert 'b' not in cache and 'a' in cache and 'd' in cache
+
+
+def test_local_backend_claims_once_per_cooldown():
+    clock = FakeClock()
+    backend = LocalDedupBackend(TTLCache(clock=clock))
+    assert backend.claim('k', 5)
+    assert not backend.claim('k', 5)
+    clock.now = 5
+    assert backend.claim('k', 5)
+
+
+def test_tiered_backend_answers_repeats_locally():
+    clock = FakeClock()
+    redis = FakeRedis(clock)
+    backend = TieredDedupBackend(RedisDedupBackend(redis), LocalDedupBackend(TTLCache(clock=clock)), clock=clock)
+    assert backend.claim('k', 20)
+    calls = redis.calls
+    for _ in range(10):
+        assert not backend.claim('k', 20)
+    assert redis.calls == calls
+
+
+def test_tiered_backend_respects_claims_from_other_workers():
+    clock = FakeClock()
+    redis = FakeRedis(clock)
+    other = RedisDedupBackend(redis)
+    backend = TieredDedupBackend(RedisDedupBackend(redis), LocalDedupBackend(TTLCache(clock=clock)), clock=clock)
+    assert other.claim('k', 20)
+    clock.now = 5
+    assert not backend.claim('k', 20)
+    # Cached only for the 15s left of the other worker's cooldown
+    clock.now = 20
+    assert backend.claim('k', 20)
+
+
+def test_tiered_backend_falls_back_to_local_and_retries_redis_later():
+    clock = FakeClock()
+    redis = FakeRedis(clock)
+    backend = TieredDedupBackend(RedisDedupBackend(redis), LocalDedupBackend(TTLCache(clock=clock)),
+                                 retry_after=30, clock=clock)
+    redis.down = True
+    assert backend.claim('k', 20)
+    assert not backend.claim('k', 20)
+    assert not backend.remote_available
+    calls = redis.calls
+    assert backend.claim('other', 20)
+    assert redis.calls == calls  # Redis not retried during the back-off
+
+    clock.now = 30
+    redis.down = False
+    assert backend.claim('k', 20)
+    assert backend.remote_available
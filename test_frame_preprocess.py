@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from frame_preprocess import FramePreprocessor, LetterboxInfo
+
+
+def test_letterbox_reuses_canvas_and_pads():
+    """Letterboxing a 16:9 frame keeps a single canvas and pads top/bottom with gray."""
+    pre = FramePreprocessor(input_size=640)
+    frame = np.full((720, 1280, 3), 200, dtype=np.uint8)
+
+    canvas1, info = pre.letterbox(frame)
+    canvas2, _ = pre.letterbox(frame)
+
+    assert canvas1 is canvas2
+    assert canvas1.shape == (640, 640, 3)
+    assert info.scale == pytest.approx(0.5)
+    assert (info.pad_x, info.pad_y) == (0, 140)
+    assert canvas1[0, 0, 0] == 114
+    assert canvas1[320, 320, 0] == 200
+
+
+def test_boxes_map_back_to_source_coordinates():
+    """A box in letterbox space maps back to the original frame by arithmetic."""
+    info = LetterboxInfo(scale=0.5, pad_x=0, pad_y=140, src_w=1280, src_h=720)
+    assert info.to_source((50, 190, 150, 290)) == (100, 100, 300, 300)
+    # Boxes touching the padding are clipped to the frame
+    assert info.to_source((-10, 0, 700, 700)) == (0, 0, 1279, 719)
+
+
+def test_cached_frame_is_not_aliased():
+    """Drawing on the restored frame must not modify the cache."""
+    pre = FramePreprocessor()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    pre.cache(frame)
+
+    restored = pre.restore_cached()
+    restored[:] = 255
+
+    assert pre.restore_cached().max() == 0
+
+
+def test_fit_display_downscales_large_frames_only():
+    pre = FramePreprocessor(max_display_size=(1280, 720))
+    small = np.zeros((480, 640, 3), dtype=np.uint8)
+    large = np.zeros((2160, 3840, 3), dtype=np.uint8)
+
+    assert pre.fit_display(small) is small
+    assert pre.fit_display(large).shape == (720, 1280, 3)
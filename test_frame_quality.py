@@ -0,0 +1,42 @@
+import numpy as np
+
+from frame_quality import FrameQualityChecker, quality_report
+
+
+def _noise(seed, shape=(480, 640, 3)):
+    return np.random.default_rng(seed).integers(30, 220, size=shape, dtype=np.uint8)
+
+
+def test_black_white_and_out_of_range_frames_are_invalid():
+    checker = FrameQualityChecker(camera='test-range')
+    assert checker.check(np.zeros((480, 640, 3), np.uint8)).reason == 'dark'
+    assert checker.check(np.full((480, 640, 3), 255, np.uint8)).reason == 'bright'
+    assert checker.check(np.zeros((40, 640, 3), np.uint8)).reason == 'dimensions'
+    assert checker.check(None).reason == 'empty'
+    assert checker.check(_noise(1)).valid
+    report = quality_report()['test-range']
+    assert {key: report[key] for key in ('checked', 'dark', 'bright', 'dimensions', 'empty')} == {
+        'checked': 5, 'dark': 1, 'bright': 1, 'dimensions': 1, 'empty': 1}
+
+
+def test_gray_band_at_the_bottom_is_partial_decode_corruption():
+    checker = FrameQualityChecker(camera='test-band')
+    frame = _noise(2)
+    frame[360:] = 128  # bottom quarter lost
+    result = checker.check(frame)
+    assert (result.valid, result.reason) == (False, 'band')
+
+    # A uniformly gray scene is not a lost slice
+    assert checker.check(np.full((480, 640, 3), 128, np.uint8)).valid
+
+
+def test_frozen_frames_and_motion_are_reported():
+    checker = FrameQualityChecker(camera='test-frozen', frozen_limit=3)
+    frame = _noise(3)
+    results = [checker.check(frame.copy()) for _ in range(4)]
+    assert [r.frozen for r in results] == [0, 1, 2, 3]
+    assert [r.valid for r in results] == [True, True, True, False]
+    assert results[0].motion is None and results[1].motion == 0
+
+    moved = checker.check(_noise(4))
+    assert moved.valid and moved.frozen == 0 and moved.motion > 20
@@ -0,0 +1,77 @@
+import pytest
+
+flask = pytest.importorskip("flask")
+
+from http_cache import IMMUTABLE_CACHE_CONTROL, ResponseCache, cached_by_generation, immutable
+
+
+@pytest.fixture
+def app():
+    state = {"generation": 1, "calls": 0}
+    cache = ResponseCache(maxsize=2)
+    app = flask.Flask(__name__)
+
+    @app.route('/items')
+    @cached_by_generation(lambda: state["generation"], cache)
+    def items():
+        state["calls"] += 1
+        response = flask.jsonify([state["generation"], flask.request.args.get('q')])
+        response.headers['X-Next-Cursor'] = 'abc'
+        return response
+
+    @app.route('/bad')
+    @cached_by_generation(lambda: state["generation"], cache)
+    def bad():
+        return flask.jsonify({"error": "nope"}), 400
+
+    @app.route('/image')
+    def image():
+        return immutable(flask.Response(b'jpg', mimetype='image/jpeg'))
+
+    app.state, app.cache = state, cache
+    return app
+
+
+def test_repeated_query_is_served_from_cache_until_generation_changes(app):
+    client = app.test_client()
+    first = client.get('/items?q=1&limit=5')
+    again = client.get('/items?limit=5&q=1')  # same query, other parameter order
+    assert first.status_code == again.status_code == 200
+    assert again.get_json() == first.get_json()
+    assert again.headers['X-Next-Cursor'] == 'abc'
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert app.state["calls"] == 1
+
+    app.state["generation"] += 1
+    fresh = client.get('/items?q=1&limit=5')
+    assert fresh.get_json()[0] == 2
+    assert fresh.headers['ETag'] != first.headers['ETag']
+    assert app.state["calls"] == 2
+
+
+def test_matching_if_none_match_returns_304(app):
+    client = app.test_client()
+    etag = client.get('/items').headers['ETag']
+    not_modified = client.get('/items', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+    assert not_modified.headers['ETag'] == etag
+    assert not_modified.headers['Cache-Control'] == 'no-cache'
+
+    app.state["generation"] += 1
+    assert client.get('/items', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_errors_are_not_cached_or_tagged(app):
+    response = app.test_client().get('/bad')
+    assert response.status_code == 400
+    assert 'ETag' not in response.headers
+    assert len(app.cache) == 0
+
+
+def test_cache_is_bounded_and_images_are_immutable(app):
+    client = app.test_client()
+    for q in range(4):
+        client.get(f'/items?q={q}')
+    assert len(app.cache) == 2
+    assert client.get('/image').headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
@@ -0,0 +1,154 @@
+import threading
+import time
+
+from inference_scheduler import InferenceScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _scheduler(clock, **kwargs):
+    return InferenceScheduler(clock=clock, lock_factory=threading.Lock, **kwargs)
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_fps_budget_drops_frames_without_queueing():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    scheduler.configure('gate', priority=1, fps_budget=5)
+
+    assert scheduler.acquire('gate')
+    scheduler.release('gate')
+    clock.now = 0.1
+    assert not scheduler.acquire('gate')
+    clock.now = 0.25
+    assert scheduler.acquire('gate')
+    scheduler.release('gate')
+
+    gate = scheduler.status()['cameras']['gate']
+    assert (gate['requests'], gate['granted'], gate['dropped_budget']) == (3, 2, 1)
+    assert gate['target_fps'] == 5 and gate['achieved_fps'] == 0.2
+
+
+def test_slots_are_shared_by_weighted_fair_queuing():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, deadline_ms=0)
+    scheduler.configure('busy', priority=2)
+    scheduler.configure('quiet', priority=1)
+    assert scheduler.acquire('holder')  # every other request has to queue
+
+    order = []
+    order_lock = threading.Lock()
+
+    def request(camera_id):
+        assert scheduler.acquire(camera_id)
+        with order_lock:
+            order.append(camera_id)
+        scheduler.release(camera_id)
+
+    threads = []
+    for camera_id in ['quiet', 'quiet', 'busy', 'busy', 'busy', 'busy']:
+        thread = threading.Thread(target=request, args=(camera_id,))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: scheduler.status()['queued'] == len(threads))
+
+    scheduler.release('holder')
+    for thread in threads:
+        thread.join(2)
+    # Finish tags: quiet 1, 2; busy 0.5, 1, 1.5, 2 (ties in arrival order)
+    assert order == ['busy', 'quiet', 'busy', 'busy', 'quiet', 'busy']
+
+
+def test_frames_that_go_stale_in_the_queue_are_dropped():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, deadline_ms=500)
+    assert scheduler.acquire('holder')
+    results = []
+    thread = threading.Thread(target=lambda: results.append(scheduler.acquire('gate', captured_at=0.0)))
+    thread.start()
+    _wait_for(lambda: scheduler.status()['queued'] == 1)
+
+    clock.now = 1.0  # the frame is a second old when the slot frees up
+    scheduler.release('holder')
+    thread.join(2)
+    assert results == [False]
+    status = scheduler.status()
+    assert status['busy'] == 0 and status['cameras']['gate']['dropped_stale'] == 1
+    assert scheduler.acquire('gate', captured_at=1.0)
+
+
+def test_recent_violations_boost_the_camera_weight():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, boost=3, boost_window=30)
+    scheduler.configure('gate', priority=2)
+    scheduler.note_violation('gate')
+    assert scheduler.status()['cameras']['gate']['weight'] == 6
+    assert scheduler.status()['cameras']['gate']['boosted']
+    clock.now = 31
+    assert scheduler.status()['cameras']['gate']['weight'] == 2
+
+
+def test_stale_drops_do_not_cost_the_camera_its_share():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, deadline_ms=2000)
+    scheduler.configure('holder', priority=1000)  # re-acquiring barely moves the virtual time
+    assert scheduler.acquire('holder')
+
+    # Three 'gate' frames go stale in the queue while the slot is held
+    for _ in range(3):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(scheduler.acquire('gate', captured_at=clock.now)))
+        thread.start()
+        _wait_for(lambda: scheduler.status()['queued'] == 1)
+        clock.now += 3
+        scheduler.release('holder')
+        thread.join(2)
+        assert results == [False]
+        assert scheduler.acquire('holder')
+
+    order = []
+    order_lock = threading.Lock()
+
+    def request(camera_id):
+        if scheduler.acquire(camera_id, captured_at=clock.now):
+            with order_lock:
+                order.append(camera_id)
+            scheduler.release(camera_id)
+
+    threads = []
+    for camera_id in ['gate', 'yard', 'gate', 'yard']:
+        thread = threading.Thread(target=request, args=(camera_id,))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: scheduler.status()['queued'] == len(threads))
+
+    scheduler.release('holder')
+    for thread in threads:
+        thread.join(2)
+    # Without rolling back the dropped tags 'gate' would queue behind both 'yard' frames
+    assert order == ['gate', 'yard', 'gate', 'yard']
+    assert scheduler.status()['cameras']['gate']['dropped_stale'] == 3
+
+
+def test_grant_history_is_bounded_by_the_fps_window():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, fps_window=10)
+    for step in range(100):
+        clock.now = step * 0.5
+        assert scheduler.acquire('gate')
+        scheduler.release('gate')
+    assert len(scheduler._cameras['gate'].grants) == 21  # the last 10 seconds at 2 fps
+    clock.now = 100
+    assert scheduler.status()['cameras']['gate']['achieved_fps'] == 0.0
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from inference_service import FrameRing, _RemoteResult
+
+
+def test_frame_ring_round_trip_and_slot_reuse():
+    ring = FrameRing(slots=2, slot_bytes=64 * 64 * 3)
+    try:
+        frame = np.arange(64 * 64 * 3, dtype=np.uint8).reshape(64, 64, 3)
+        slot = ring.write(frame)
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=ring.shm.buf, offset=slot * ring.slot_bytes)
+        assert np.array_equal(view, frame)
+
+        other = ring.write(frame)
+        assert other != slot
+        ring.release(slot)
+        assert ring.write(frame) == slot
+    finally:
+        ring.close()
+
+
+def test_frame_ring_rejects_oversized_frames():
+    ring = FrameRing(slots=1, slot_bytes=16)
+    try:
+        with pytest.raises(ValueError):
+            ring.write(np.zeros((4, 4, 3), dtype=np.uint8))
+    finally:
+        ring.close()
+
+
+def test_remote_result_matches_ultralytics_box_access():
+    """Detection code reads box.xyxy[0], box.conf[0] and box.cls[0]."""
+    result = _RemoteResult([(1.0, 2.0, 3.0, 4.0, 0.9, 5)])
+    box = result.boxes[0]
+    x1, y1, x2, y2 = box.xyxy[0]
+    assert (x1, y1, x2, y2) == (1.0, 2.0, 3.0, 4.0)
+    assert float(box.conf[0]) == 0.9
+    assert int(box.cls[0]) == 5
@@ -0,0 +1,26 @@
+from jpeg_encoder import PROFILES, multipart_chunk, select_profile
+
+
+def test_explicit_profile_wins_over_bandwidth():
+    assert select_profile((720, 1280), profile_name='low', bandwidth_kbps=50000).name == 'low'
+
+
+def test_bandwidth_selects_tier():
+    assert select_profile((720, 1280), bandwidth_kbps=10000).name == 'high'
+    assert select_profile((720, 1280), bandwidth_kbps=2000).name == 'large'
+    assert select_profile((720, 1280), bandwidth_kbps=100).name == 'minimal'
+
+
+def test_frame_size_default_matches_previous_quality_tiers():
+    assert select_profile((2160, 3840)).quality == 60
+    assert select_profile((480, 640)).quality == 80
+
+
+def test_streaming_profiles_skip_optimize_pass():
+    """Only the archive profile pays for the second Huffman pass."""
+    assert [p.name for p in PROFILES.values() if p.optimize] == ['archive']
+
+
+def test_multipart_chunk_layout():
+    chunk = multipart_chunk(memoryview(b'JPEGDATA'))
+    assert chunk == b'--frame\r\nContent-Type: image/jpeg\r\n\r\nJPEGDATA\r\n'
@@ -0,0 +1,82 @@
+import pytest
+
+import model_registry
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, frame, imgsz=640, stream=False, **kwargs):
+        self.calls.append((frame.shape, imgsz))
+        return iter([])
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    loads = []
+
+    def fake_load(weights):
+        loads.append(weights)
+        return FakeModel()
+
+    monkeypatch.setattr(model_registry, "load_detection_model", fake_load)
+    monkeypatch.setattr(model_registry, "_models", {})
+    monkeypatch.setattr(model_registry, "_load_times", {})
+    monkeypatch.setattr(model_registry, "_errors", {})
+    monkeypatch.setattr(model_registry, "_warmup_times", {})
+    monkeypatch.setattr(model_registry, "_preload_thread", None)
+    monkeypatch.setattr(model_registry, "_inference_locks", {})
+    return loads
+
+
+def test_model_is_loaded_once_and_not_ready_before_warm_up(registry):
+    model = model_registry.get_model()
+    assert model_registry.get_model() is model
+    assert len(registry) == 1
+    assert model_registry.is_loaded()
+    assert not model_registry.is_ready()
+
+
+def test_warm_up_runs_every_size_and_marks_ready(registry):
+    assert model_registry.warm_up(sizes=[320, 640], runs=2)
+    model = model_registry.get_model()
+    assert model.calls == [((320, 320, 3), 320)] * 2 + [((640, 640, 3), 640)] * 2
+    assert model_registry.is_ready()
+    status = model_registry.model_status()[model_registry.DEFAULT_MODEL]
+    assert status["loaded"] and status["warmed"]
+
+    # Already warm: no further inferences
+    assert model_registry.warm_up(sizes=[320], runs=1)
+    assert len(model.calls) == 4
+
+
+def test_failed_warm_up_is_not_ready(registry, monkeypatch):
+    def broken(frame, **kwargs):
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(model_registry, "load_detection_model", lambda weights: broken)
+    assert not model_registry.warm_up(sizes=[640], runs=1)
+    assert not model_registry.is_ready()
+    assert "out of memory" in model_registry.model_status()[model_registry.DEFAULT_MODEL]["error"]
+
+
+def test_ensure_ready_async_loads_and_warms_in_background(registry):
+    model_registry.ensure_ready_async()
+    model_registry._preload_thread.join(timeout=5)
+    assert model_registry.is_ready()
+    assert len(registry) == 1
+
+
+def test_local_models_get_an_inference_lock_that_is_replaced_after_fork(registry):
+    model = model_registry.get_model()
+    lock = model_registry.model_lock(model)
+    with lock:
+        assert lock.locked()
+        # A lock held at fork time must not stay held in the child
+        model_registry.reset_after_fork()
+        fresh = model_registry.model_lock(model)
+        assert fresh is not lock and not fresh.locked()
+    # Unregistered models (and remote ones) are not locked
+    with model_registry.model_lock(object()):
+        pass
@@ -0,0 +1,123 @@
+import smtplib
+
+import pytest
+
+import notifiers
+from notifiers import (CircuitBreaker, CircuitOpenError, FakeSMSGateway, NotificationDispatcher,
+                       Notifier, SinkEmailTransport, SMTPTransport)
+
+
+class FlakyTransport:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def send(self, *args):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("provider down")
+
+    def close(self):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_notifier_retries_with_backoff_then_succeeds():
+    delays = []
+    notifier = Notifier('sms', FlakyTransport(failures=2), max_attempts=3, sleep=delays.append)
+    notifier.send('+1', '+2', 'hi')
+    assert notifier.transport.calls == 3
+    assert len(delays) == 2
+    assert all(0 <= d <= notifiers.NOTIFY_BACKOFF_CAP for d in delays)
+    assert notifier.status()["sent"] == 1 and notifier.status()["retries"] == 2
+
+
+def test_breaker_opens_rejects_and_recovers_after_reset_timeout():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, reset_timeout=10, clock=clock)
+    transport = FlakyTransport(failures=100)
+    notifier = Notifier('email', transport, max_attempts=1, breaker=breaker, sleep=lambda s: None)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            notifier.send('a', 'b', 's', 'body')
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        notifier.send('a', 'b', 's', 'body')
+    assert transport.calls == 2  # the provider was not called while open
+
+    clock.now = 10
+    assert breaker.state == 'half-open'
+    transport.failures = 0
+    notifier.send('a', 'b', 's', 'body')
+    assert breaker.state == 'closed'
+
+
+def test_failed_half_open_trial_reopens_the_circuit():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=3, reset_timeout=5, clock=clock)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 5
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial call at a time
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+
+def test_smtp_connection_is_reused_and_reopened_after_disconnect(monkeypatch):
+    opened = []
+
+    class FakeSMTP:
+        def __init__(self, host, port, timeout=None):
+            self.sent = []
+            self.drop_next = False
+            opened.append(self)
+
+        def starttls(self):
+            pass
+
+        def login(self, user, password):
+            pass
+
+        def sendmail(self, sender, recipient, message):
+            if self.drop_next:
+                raise smtplib.SMTPServerDisconnected("gone")
+            self.sent.append(message)
+
+        def noop(self):
+            return (250, b'OK')
+
+        def quit(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    transport = SMTPTransport("smtp.example.com", 587, "user", "pass")
+    transport.send("a", "b", "s1", "one")
+    transport.send("a", "b", "s2", "two")
+    assert len(opened) == 1 and len(opened[0].sent) == 2
+
+    opened[0].drop_next = True
+    transport.send("a", "b", "s3", "three")
+    assert len(opened) == 2 and opened[1].sent == ["Subject: s3\n\nthree"]
+
+
+def test_dispatcher_sends_in_background_and_local_stand_ins_record():
+    email, sms = SinkEmailTransport(), FakeSMSGateway()
+    dispatcher = NotificationDispatcher(maxsize=10)
+    for i in range(5):
+        assert dispatcher.submit(Notifier('email', email).send, 'a', 'b', f's{i}', 'body')
+        assert dispatcher.submit(Notifier('sms', sms).send, '+1', '+2', f'm{i}')
+    dispatcher.join()
+    assert email.sent == 5 and sms.sent == 5
+    assert email.messages[-1]["subject"] == 's4'
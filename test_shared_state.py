@@ -0,0 +1,64 @@
+import json
+
+from shared_state import SharedState
+
+
+def test_flag_watchers_follow_local_and_remote_changes():
+    state = SharedState(redis_client=None)
+    seen = []
+    state.watch_flag('violation_recording_enabled', seen.append)
+    state.init_flag('violation_recording_enabled', False)
+    state.set_flag('violation_recording_enabled', True)
+
+    # A change published by another worker arrives through the pub/sub listener
+    state._on_message({"data": json.dumps({"type": "flag", "name": "violation_recording_enabled",
+                                           "value": False, "origin": "other-worker"})})
+
+    assert seen == [False, True, False]
+    assert state.get_flag('violation_recording_enabled') is False
+
+
+def test_own_messages_are_not_applied_twice():
+    state = SharedState(redis_client=None)
+    calls = []
+    state.on_command('release_webcam', lambda payload: calls.append(payload) or True)
+
+    assert state.broadcast('release_webcam') == [True]
+    state._on_message({"data": json.dumps({"type": "command", "name": "release_webcam",
+                                           "payload": None, "origin": state._origin})})
+    assert calls == [None]
+
+
+def test_local_stream_registry():
+    state = SharedState(redis_client=None)
+    state.register_stream('s1', path='/api/webcam_raw')
+
+    assert state.active_streams()['s1']['path'] == '/api/webcam_raw'
+
+    state.unregister_stream('s1')
+    assert state.active_streams() == {}
+
+
+class FakeStreamsRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field.encode()] = value.encode()
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+
+def test_streams_of_dead_workers_are_removed_when_listed():
+    redis = FakeStreamsRedis()
+    state = SharedState(redis_client=redis)
+    state.register_stream('live', path='/ipcamera')
+    redis.hset(state._key("streams"), 'dead', json.dumps({"path": "/ipcamera", "last_seen": 0}))
+
+    assert list(state.active_streams()) == ['live']
+    assert list(redis.hashes[state._key("streams")]) == [b'live']
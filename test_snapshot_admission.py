@@ -0,0 +1,49 @@
+from snapshot_admission import SnapshotAdmission, dhash_bits, hamming
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _admission(clock, **kwargs):
+    # "Frames" are their own hashes
+    return SnapshotAdmission(threshold=2, window=30, enabled=True, hasher=lambda frame: frame, clock=clock, **kwargs)
+
+
+def test_dhash_bits_compares_horizontal_neighbours():
+    falling = [[9 - col for col in range(9)] for _ in range(8)]
+    rising = [list(range(9)) for _ in range(8)]
+    assert dhash_bits(falling) == 2 ** 64 - 1
+    assert dhash_bits(rising) == 0
+    assert hamming(0b1011, 0b0001) == 2
+
+
+def test_near_identical_frames_are_rejected_within_the_window():
+    clock = FakeClock()
+    admission = _admission(clock)
+    assert admission.admit(0b0000, "cam1", "Construction", ["NO-Hardhat"])
+    clock.now = 1
+    assert not admission.admit(0b0011, "cam1", "Construction", ["NO-Hardhat"])  # 2 bits apart
+    assert admission.admit(0b0111, "cam1", "Construction", ["NO-Hardhat"])  # 3 bits: scene changed
+    clock.now = 40
+    assert admission.admit(0b0111, "cam1", "Construction", ["NO-Hardhat"])  # window expired
+    assert admission.stats == {"admitted": 3, "rejected": 1}
+    assert admission.rejected_by_class == {"NO-Hardhat": 1}
+
+
+def test_other_cameras_and_new_classes_are_admitted():
+    clock = FakeClock()
+    admission = _admission(clock)
+    assert admission.admit(0, "cam1", "Construction", ["NO-Hardhat"])
+    assert admission.admit(0, "cam2", "Construction", ["NO-Hardhat"])
+    assert admission.admit(0, "cam1", "Construction", ["NO-Hardhat", "NO-Safety Vest"])
+    assert not admission.admit(0, "cam1", "Construction", ["NO-Safety Vest", "NO-Hardhat"])
+
+
+def test_disabled_admission_keeps_everything():
+    admission = SnapshotAdmission(enabled=False, hasher=lambda frame: 0)
+    assert all(admission.admit(0, "cam", "Healthcare", ["NO-Mask"]) for _ in range(3))
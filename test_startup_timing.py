@@ -0,0 +1,32 @@
+import sys
+
+import startup_timing
+
+
+def test_import_hook_records_total_and_self_time(tmp_path, monkeypatch):
+    (tmp_path / "timed_child_mod.py").write_text("X = 1\n")
+    (tmp_path / "timed_parent_mod.py").write_text("import timed_child_mod\nY = timed_child_mod.X\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(startup_timing, "STARTUP_TIMING", True)
+
+    startup_timing.install()
+    try:
+        import timed_parent_mod
+    finally:
+        startup_timing.uninstall()
+        sys.modules.pop("timed_parent_mod", None)
+        sys.modules.pop("timed_child_mod", None)
+
+    assert timed_parent_mod.Y == 1
+    # The real loader is restored once the module has executed
+    assert not isinstance(timed_parent_mod.__loader__, startup_timing._TimingLoader)
+    timed = {item["module"]: item for item in startup_timing.report(top=1000)["slowest_imports"]}
+    assert {"timed_parent_mod", "timed_child_mod"} <= set(timed)
+    assert timed["timed_parent_mod"]["total_ms"] >= timed["timed_child_mod"]["total_ms"]
+
+
+def test_marks_are_reported_in_order():
+    startup_timing.mark("phase_a")
+    startup_timing.mark("phase_b")
+    phases = [p["phase"] for p in startup_timing.report()["phases"]]
+    assert phases[-2:] == ["phase_a", "phase_b"]
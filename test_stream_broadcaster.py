@@ -0,0 +1,93 @@
+import pytest
+
+pytest.importorskip("flask_socketio")
+
+from stream_broadcaster import StreamBroadcaster, stream_room
+
+
+class RecordingSocketIO:
+    """Records emitted events; background tasks are started by the test itself."""
+
+    def __init__(self):
+        self.emitted = []
+        self.tasks = []
+
+    def start_background_task(self, target, *args):
+        self.tasks.append((target, args))
+
+    def emit(self, event, data, to=None):
+        self.emitted.append((event, data, to))
+
+
+def test_unacknowledged_frames_are_dropped_per_client():
+    """Only the client that acknowledged frame 1 receives frame 2."""
+    socketio = RecordingSocketIO()
+    room = stream_room('webcam', 'general')
+
+    def source(camera, domain, overlay_domains):
+        for frame_id in range(1, 4):
+            if frame_id == 2:
+                broadcaster.ack('fast', room, 1)
+            yield b'jpeg', {"frame_id": frame_id}
+
+    broadcaster = StreamBroadcaster(socketio, source)
+    broadcaster.subscribe('fast', 'webcam', 'general')
+    broadcaster.subscribe('slow', 'webcam', 'general')
+    assert len(socketio.tasks) == 1  # one producer per room
+
+    target, args = socketio.tasks[0]
+    target(*args)
+
+    frames = [(data["meta"]["frame_id"], to) for event, data, to in socketio.emitted if event == 'stream_frame']
+    assert frames == [(1, 'fast'), (1, 'slow'), (2, 'fast')]
+    # The producer removes its room once the source is exhausted
+    assert broadcaster.stats() == []
+
+
+def test_subscribe_while_the_last_producer_stops_starts_a_new_one():
+    """A client subscribing after the room emptied but before the producer exited still gets frames."""
+    socketio = RecordingSocketIO()
+
+    def source(camera, domain, overlay_domains):
+        try:
+            yield b'jpeg', {"frame_id": 1}
+            broadcaster.unsubscribe('early')
+            yield b'jpeg', {"frame_id": 2}
+        finally:
+            # Runs after the producer saw the empty room, before its own cleanup
+            broadcaster.subscribe('late', 'webcam', 'general')
+
+    broadcaster = StreamBroadcaster(socketio, source)
+    room = broadcaster.subscribe('early', 'webcam', 'general')
+    target, args = socketio.tasks[0]
+    target(*args)
+
+    assert len(socketio.tasks) == 2  # the late subscriber got its own producer
+    assert [channel["room"] for channel in broadcaster.stats()] == [room]
+    assert broadcaster.stats()[0]["subscribers"][0]["sid"] == 'late'
+
+
+def test_overlay_subscribers_share_one_raw_stream():
+    """Two domain views of one camera get the same frame plus their own detections."""
+    socketio = RecordingSocketIO()
+    watched = []
+
+    def source(camera, domain, overlay_domains):
+        watched.append(overlay_domains())
+        yield b'raw', {"frame_id": 1, "recording": False,
+                       "detections": {"healthcare": [{"class": "NO-Mask"}], "construction": []}}
+
+    broadcaster = StreamBroadcaster(socketio, source)
+    room = broadcaster.subscribe('a', 'ipcamera', 'healthcare', overlay=True)
+    assert broadcaster.subscribe('b', 'ipcamera', 'construction', overlay=True) == room
+    assert len(socketio.tasks) == 1
+
+    target, args = socketio.tasks[0]
+    target(*args)
+
+    assert watched == [{'healthcare', 'construction'}]
+    detections = {to: data for event, data, to in socketio.emitted if event == 'stream_detections'}
+    assert detections['a']['detections'] == [{"class": "NO-Mask"}]
+    assert detections['b']['detections'] == []
+    frames = [data for event, data, _ in socketio.emitted if event == 'stream_frame']
+    assert all("detections" not in data["meta"] for data in frames)
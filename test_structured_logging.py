@@ -0,0 +1,76 @@
+import json
+import logging
+import queue
+
+from structured_logging import (DroppingQueueHandler, RateLimiter, StructuredFormatter, StructuredLogger)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _logger(name, clock, **kwargs):
+    handler = ListHandler()
+    logger = logging.getLogger(name)
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    adapter = StructuredLogger(logger, {'camera': 'cam1', 'domain': 'manufacturing'},
+                               limiter=RateLimiter(limit=2, window=10, clock=clock), **kwargs)
+    return adapter, handler.records
+
+
+def test_every_rate_limits_per_key_and_reports_suppressed():
+    clock = FakeClock()
+    log, records = _logger('test.every', clock)
+    for frame_id in range(5):
+        log.every('read_failed', logging.WARNING, "Failed to read frame", extra={'frame_id': frame_id})
+    log.every('encode_failed', logging.WARNING, "Error encoding frame")
+    assert [r.getMessage() for r in records] == ["Failed to read frame"] * 2 + ["Error encoding frame"]
+    assert [getattr(r, 'frame_id', None) for r in records] == [0, 1, None]
+
+    clock.now = 11
+    log.every('read_failed', logging.WARNING, "Failed to read frame")
+    assert records[-1].getMessage() == "Failed to read frame (3 similar messages suppressed)"
+    assert records[-1].camera == 'cam1'
+
+
+def test_sampled_logs_one_in_n_per_camera():
+    log, records = _logger('test.sampled', FakeClock(), sample_every=3)
+    other = log.bind(camera='cam2')
+    for frame_id in range(7):
+        log.sampled('progress', "Processed %d frames", frame_id)
+    other.sampled('progress', "Processed %d frames", 0)
+    assert [(r.getMessage(), r.camera) for r in records] == [
+        ("Processed 0 frames", 'cam1'), ("Processed 3 frames", 'cam1'),
+        ("Processed 6 frames", 'cam1'), ("Processed 0 frames", 'cam2'),
+    ]
+
+
+def test_formatter_appends_fields_or_writes_json():
+    record = logging.LogRecord('flaskapp.stream', logging.INFO, __file__, 1, "Camera released", None, None)
+    record.camera, record.domain = 'ipcamera', 'oilgas'
+    assert StructuredFormatter('%(message)s').format(record) == "Camera released camera=ipcamera domain=oilgas"
+    entry = json.loads(StructuredFormatter(json_lines=True).format(record))
+    assert entry['message'] == "Camera released" and entry['domain'] == 'oilgas' and 'frame_id' not in entry
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    for _ in range(3):
+        handler.handle(logging.LogRecord('x', logging.INFO, __file__, 1, "msg", None, None))
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
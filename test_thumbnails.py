@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+pytest.importorskip("werkzeug")
+
+from thumbnails import ThumbnailStore
+
+
+def _snapshot(source_dir, rel_path):
+    path = source_dir / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"full-size jpeg")
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    source, thumbs = tmp_path / "violations", tmp_path / "thumbs"
+    source.mkdir()
+    return source, thumbs
+
+
+def _store(dirs, max_bytes=1000, encoder=None):
+    source, thumbs = dirs
+    return ThumbnailStore(
+        source_dir=str(source), thumb_dir=str(thumbs), max_bytes=max_bytes,
+        reader=lambda path: ("image", path),
+        encoder=encoder or (lambda image, fmt: b"x" * 100))
+
+
+def test_get_renders_missing_thumbnails_once_and_rejects_escaping_paths(dirs):
+    source, _ = dirs
+    _snapshot(source, "Manu/violation_Manufacturing_20250712_070000_1.jpg")
+    store = _store(dirs)
+
+    path = store.get("Manu/violation_Manufacturing_20250712_070000_1.jpg")
+    assert path.endswith(".jpg.webp") and os.path.getsize(path) == 100
+    assert store.get("Manu/violation_Manufacturing_20250712_070000_1.jpg") == path
+    assert store.stats["rendered"] == 1
+    assert store.get("Manu/missing.jpg") is None
+    assert store.get("../../etc/passwd") is None
+
+
+def test_falls_back_to_jpeg_when_webp_cannot_be_encoded(dirs):
+    source, _ = dirs
+    _snapshot(source, "Cons/a.jpg")
+    store = _store(dirs, encoder=lambda image, fmt: None if fmt == 'webp' else b"j")
+    assert store.get("Cons/a.jpg").endswith(".jpg.jpg")
+    assert store.mimetype == "image/jpeg"
+
+
+def test_size_bound_evicts_least_recently_served(dirs):
+    source, _ = dirs
+    for name in "abcd":
+        _snapshot(source, f"Heal/{name}.jpg")
+    store = _store(dirs, max_bytes=300)
+    first = store.get("Heal/a.jpg")
+    store.get("Heal/b.jpg")
+    store.get("Heal/c.jpg")
+    store.get("Heal/a.jpg")  # served again, so b is now the oldest
+    store.get("Heal/d.jpg")
+    assert os.path.exists(first)
+    assert not os.path.exists(store.thumb_path("Heal/b.jpg"))
+    assert store.usage()["bytes"] == 300
+
+
+def test_backfill_skips_existing_and_stops_at_the_bound(dirs):
+    source, _ = dirs
+    names = [f"OilG/{i}.jpg" for i in range(5)]
+    for name in names:
+        _snapshot(source, name)
+    store = _store(dirs, max_bytes=300)
+    store.get(names[0])
+    assert store.backfill(names) == 2
+    assert store.usage()["files"] == 3
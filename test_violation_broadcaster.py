@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("flask_socketio")
+
+from violation_broadcaster import ALL_ROOM, BATCH_EVENT, ViolationBroadcaster, violation_room
+
+
+class RecordingSocketIO:
+    """Records emitted events; the flush loop is driven by the test itself."""
+
+    def __init__(self):
+        self.emitted = []
+        self.tasks = []
+
+    def start_background_task(self, target, *args):
+        self.tasks.append((target, args))
+
+    def emit(self, event, data, to=None):
+        self.emitted.append((event, data, to))
+
+    def sleep(self, seconds):
+        pass
+
+
+def test_violations_are_batched_per_room_with_duplicate_counts():
+    socketio = RecordingSocketIO()
+    broadcaster = ViolationBroadcaster(socketio, rate=2)
+    helmet = {'type': 'No Helmet', 'camera': 'ipcamera', 'domain': 'construction', 'location': 'Zone A'}
+    vest = {'type': 'No Vest', 'camera': 'ipcamera', 'domain': 'construction', 'location': 'Zone A'}
+    mask = {'type': 'No Mask', 'camera': 'webcam', 'domain': 'healthcare', 'location': 'Ward 3'}
+
+    for violation in (helmet, helmet, vest, mask):
+        broadcaster.publish(violation)
+    broadcaster.publish(helmet, suppressed=True)
+    assert len(socketio.tasks) == 1  # one flusher for all rooms
+    assert socketio.emitted == []
+
+    assert broadcaster.flush() == 2
+    # Each batch goes out once, to its room and the overview room together
+    assert all(to[1] == ALL_ROOM for _, _, to in socketio.emitted)
+    by_room = {to[0]: data for event, data, to in socketio.emitted if event == BATCH_EVENT}
+    construction = by_room[violation_room('ipcamera', 'construction')]
+    assert [(v['type'], v['count']) for v in construction['violations']] == [('No Helmet', 2), ('No Vest', 1)]
+    assert construction['suppressed'] == 1
+    assert [v['type'] for v in by_room[violation_room('webcam', 'healthcare')]['violations']] == ['No Mask']
+    assert len(socketio.emitted) == 2
+
+
+def test_flush_loop_stops_when_idle_and_batch_size_is_bounded():
+    socketio = RecordingSocketIO()
+    broadcaster = ViolationBroadcaster(socketio, rate=1, max_batch=2)
+    for i in range(5):
+        broadcaster.publish({'type': f'T{i}', 'location': 'Zone A'})
+
+    target, args = socketio.tasks[0]
+    target(*args)
+    [(_, batch, _)] = socketio.emitted
+    assert len(batch['violations']) == 2 and batch['dropped'] == 3
+
+    # The loop exited; the next violation starts a new one
+    broadcaster.publish({'type': 'T9', 'location': 'Zone A'})
+    assert len(socketio.tasks) == 2
@@ -0,0 +1,130 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from violation_index import ViolationIndex, decode_cursor, encode_cursor, parse_fields, parse_limit
+
+
+def _touch(base, domain_short, domain, stamp, micro="000001"):
+    path = base / domain_short / f"violation_{domain}_{stamp}_{micro}.jpg"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"jpg")
+    return path
+
+
+@pytest.fixture
+def index(tmp_path):
+    base = tmp_path / "violations"
+    base.mkdir()
+    return ViolationIndex(path=str(tmp_path / "index.db"), base_dir=str(base), sync_interval=0)
+
+
+def test_pages_are_newest_first_and_cursor_continues_without_overlap(index):
+    base = Path(index.base_dir)
+    for minute in range(5):
+        _touch(base, "Manu", "Manufacturing", f"20250712_2100{minute}0")
+        _touch(base, "Cons", "Construction", f"20250712_2100{minute}0")
+    assert index.sync() == 10
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor = index.page(limit=3, cursor=cursor)
+        seen.extend(rows)
+        if cursor is None:
+            break
+    assert len(seen) == 10
+    assert len({row['id'] for row in seen}) == 10
+    keys = [(row['ts'], row['id']) for row in seen]
+    assert keys == sorted(keys, reverse=True)
+    assert seen[0]['path'].startswith(("Manu/", "Cons/"))
+    assert seen[0]['timestamp'] == "2025-07-12 21:00:40"
+
+
+def test_filters_by_domain_date_and_time(index):
+    base = Path(index.base_dir)
+    _touch(base, "Manu", "Manufacturing", "20250712_070000")
+    _touch(base, "Manu", "Manufacturing", "20250712_073000")
+    _touch(base, "Manu", "Manufacturing", "20250713_073000")
+    _touch(base, "Heal", "Healthcare", "20250712_073000")
+    index.sync()
+
+    rows, _ = index.page(domains=["Manu"], date="2025-07-12", time_from="07:15:00", time_to="08:00:00")
+    assert [row['time'] for row in rows] == ["07:30:00"]
+    assert index.page(domains=[])[0] == []
+
+
+def test_sync_picks_up_external_changes_and_add_skips_relisting(index):
+    base = Path(index.base_dir)
+    old = _touch(base, "Cons", "Construction", "20250712_080000")
+    index.sync()
+    assert index.count() == 1
+    generation = index.generation()
+
+    new = _touch(base, "Cons", "Construction", "20250712_090000")
+    assert index.add(str(new), confidence=0.91, camera="ipcamera")
+    assert index.generation() == generation + 1
+    assert index.sync() == 0  # already indexed, directory not re-listed
+    assert index.generation() == generation + 1
+    rows, _ = index.page(limit=1)
+    assert rows[0]['confidence'] == 0.91 and rows[0]['camera'] == "ipcamera"
+
+    os.remove(old)
+    os.utime(base / "Cons", ns=(1, 1))  # make sure the mtime differs from the recorded one
+    assert index.sync() == 1
+    assert index.count() == 1
+    assert index.generation() == generation + 2
+
+
+def test_cursor_and_parameter_parsing():
+    row = {'ts': "2025-07-12 21:00:00.000001", 'id': "Manu_20250712_210000_000001"}
+    assert decode_cursor(encode_cursor(row)) == (row['ts'], row['id'])
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+    assert parse_limit(None, default=10) == 10
+    assert parse_limit("5000", maximum=1000) == 1000
+    assert parse_limit("0") == 1
+    assert parse_limit("abc", default=7) == 7
+    assert parse_fields("filename, timestamp", ("filename", "timestamp")) == ["filename", "timestamp"]
+    with pytest.raises(ValueError):
+        parse_fields("filename,secret", ("filename",))
+
+
+def test_bucket_counts_group_by_bucket_domain_and_types(index):
+    base = Path(index.base_dir)
+    recorded = _touch(base, "Cons", "Construction", "20250712_210000")
+    assert index.add(str(recorded), types={"NO-hardhat", "NO-Mask"})
+    _touch(base, "Cons", "Construction", "20250712_211500")
+    _touch(base, "Manu", "Manufacturing", "20250713_080000")
+    index.sync()
+    assert [row['id'] for row in index.untyped()] == ["Cons_20250712_211500_000001", "Manu_20250713_080000_000001"]
+    index.set_types({"Cons_20250712_211500_000001": ["NO-hardhat"], "Manu_20250713_080000_000001": []})
+    assert index.untyped() == []
+
+    assert sorted(index.bucket_counts(10, "2025-07-12", "2025-07-13")) == [
+        ("2025-07-12", "Construction", ["NO-Mask", "NO-hardhat"], 1),
+        ("2025-07-12", "Construction", ["NO-hardhat"], 1),
+        ("2025-07-13", "Manufacturing", [], 1),
+    ]
+    assert sorted(index.bucket_counts(13, "2025-07-12 21", "2025-07-12 21")) == [
+        ("2025-07-12 21", "Construction", ["NO-Mask", "NO-hardhat"], 1),
+        ("2025-07-12 21", "Construction", ["NO-hardhat"], 1),
+    ]
+
+
+def test_version_2_index_gains_the_types_column(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "index.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE snapshots (id TEXT PRIMARY KEY, ts TEXT NOT NULL, date TEXT NOT NULL, time TEXT NOT NULL,"
+        " domain_short TEXT NOT NULL, domain TEXT NOT NULL, dir TEXT NOT NULL, filename TEXT NOT NULL,"
+        " size INTEGER, confidence REAL, camera TEXT);"
+        " INSERT INTO snapshots VALUES ('Manu_1', '2025-07-12 21:00:00.000001', '2025-07-12', '21:00:00',"
+        " 'Manu', 'Manufacturing', 'Manu', 'violation_Manufacturing_20250712_210000_000001.jpg', 3, 0.9, 'gate');"
+        " PRAGMA user_version = 2;")
+    conn.close()
+
+    index = ViolationIndex(path=path, base_dir=str(tmp_path), sync_interval=0)
+    rows, _ = index.page()
+    assert rows[0]['camera'] == 'gate' and rows[0]['types'] is None
@@ -0,0 +1,176 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from violation_stats import ViolationStats, bucket_keys, compliance
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def hincrby(self, key, field, amount):
+        self.ops.append(('hincrby', key, field, amount))
+
+    def expire(self, key, seconds):
+        self.ops.append(('expire', key, seconds))
+
+    def hgetall(self, key):
+        self.ops.append(('hgetall', key))
+
+    def execute(self):
+        self.redis.round_trips += 1
+        results = []
+        for op in self.ops:
+            if op[0] == 'hincrby':
+                bucket = self.redis.hashes.setdefault(op[1], {})
+                bucket[op[2].encode()] = str(int(bucket.get(op[2].encode(), 0)) + op[3]).encode()
+                results.append(None)
+            elif op[0] == 'hgetall':
+                results.append(dict(self.redis.hashes.get(op[1], {})))
+            else:
+                results.append(True)
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+        self.round_trips = 0
+        self.keys = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def set(self, key, value, nx=False):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    def get(self, key):
+        value = self.keys.get(key)
+        return None if value is None else str(value).encode()
+
+
+BOXES = [('NO-hardhat', 0.9, (0, 0, 1, 1)), ('Hardhat', 0.8, (0, 0, 1, 1)),
+         ('Hardhat', 0.8, (0, 0, 1, 1)), ('Person', 0.9, (0, 0, 1, 1))]
+NEGATIVE = ['NO-hardhat', 'NO-Mask', 'NO-Safety Vest']
+
+
+def test_bucket_keys_cover_the_range_inclusively():
+    start = datetime(2025, 7, 12, 23, 59, 30)
+    assert bucket_keys('minute', start, datetime(2025, 7, 13, 0, 1)) == [
+        '2025-07-12 23:59', '2025-07-13 00:00', '2025-07-13 00:01']
+    assert bucket_keys('day', datetime(2025, 7, 1, 15), datetime(2025, 7, 3)) == [
+        '2025-07-01', '2025-07-02', '2025-07-03']
+
+
+def test_detections_update_minute_hour_and_day_buckets():
+    clock = FakeClock(datetime(2025, 7, 12, 10, 30))
+    stats = ViolationStats(clock=clock)
+    stats.record_detections('Construction', BOXES, NEGATIVE)
+    stats.record_event('Construction', {'NO-hardhat'}, camera='ipcamera')
+    clock.now = datetime(2025, 7, 12, 11, 5)
+    for _ in range(3):  # the same violation on consecutive frames is still one event
+        stats.record_detections('Construction', BOXES, NEGATIVE)
+    stats.record_event('Construction', {'NO-hardhat'}, camera='webcam')
+
+    day = stats.day()
+    assert day['violations'] == 2 and day['type:NO-hardhat'] == 2
+    assert day['camera:ipcamera'] == 1 and day['camera:webcam'] == 1
+    assert day['box:NO-hardhat'] == 4 and day['seen:Hardhat'] == 8
+    hours = stats.buckets('hour', datetime(2025, 7, 12, 9), clock.now)
+    assert [counts['violations'] for _, counts in hours] == [0, 1, 1]
+
+    overall, per_item, alerts = compliance(day)
+    assert per_item == {'Helmet': 67} and alerts == {'Helmet': 2} and overall == 67
+
+
+def test_local_buckets_are_pruned_to_retention():
+    clock = FakeClock(datetime(2025, 7, 12))
+    stats = ViolationStats(clock=clock)
+    for minute in range(24 * 60 + 5):
+        clock.now = datetime(2025, 7, 12) + timedelta(minutes=minute)
+        stats.add(Counter(violations=1))
+    assert len(stats._local['minute']) == 24 * 60
+    assert '2025-07-12 00:00' not in stats._local['minute']
+
+
+def test_redis_updates_are_buffered_and_shared():
+    redis = FakeRedis()
+    clock = FakeClock(datetime(2025, 7, 12, 10, 30))
+    writer = ViolationStats(redis_getter=lambda: redis, clock=clock, flush_interval=3600)
+    reader = ViolationStats(redis_getter=lambda: redis, clock=clock, flush_interval=3600)
+    for _ in range(5):
+        writer.record_snapshot('Healthcare', {'NO-Mask'})
+    assert redis.round_trips == 0  # still buffered
+    writer.flush()
+    assert redis.round_trips == 1
+    day = reader.day()
+    assert day['snapshots'] == 5 and day['snap_type:NO-Mask'] == 5 and day['snap_domain:Healthcare'] == 5
+
+
+def test_backfill_runs_once_per_store():
+    redis = FakeRedis()
+    clock = FakeClock(datetime(2025, 7, 12, 10))
+    scans = []
+
+    def scan():
+        scans.append(True)
+        return [(datetime(2025, 7, 11, 9), 'Manufacturing', ['NO-hardhat']),
+                (datetime(2025, 7, 12, 8), 'Manufacturing', [])]
+
+    first = ViolationStats(redis_getter=lambda: redis, clock=clock)
+    second = ViolationStats(redis_getter=lambda: redis, clock=clock)
+    first.backfill_once(scan)
+    second.backfill_once(scan)
+    assert len(scans) == 1
+    timeline = second.buckets('day', datetime(2025, 7, 11), clock.now)
+    assert [counts['snapshots'] for _, counts in timeline] == [1, 1]
+    assert [counts['snap_type:NO-hardhat'] for _, counts in timeline] == [1, 0]
+
+
+def test_backfill_skips_snapshots_already_counted_live():
+    clock = FakeClock(datetime(2025, 7, 12, 10))
+    stats = ViolationStats(clock=clock)
+    stats.record_snapshot('Construction', {'NO-hardhat'})
+    stats.backfill_once(lambda: [(clock.now, 'Construction', [])])
+    assert stats.day()['snapshots'] == 1
+
+
+def test_backfill_in_a_later_worker_skips_snapshots_counted_by_earlier_ones():
+    redis = FakeRedis()
+    clock = FakeClock(datetime(2025, 7, 12, 10))
+    first = ViolationStats(redis_getter=lambda: redis, clock=clock)
+    clock.now = datetime(2025, 7, 12, 10, 2)
+    first.record_snapshot('Construction', {'NO-hardhat'})
+    first.flush()
+
+    clock.now = datetime(2025, 7, 12, 10, 5)
+    second = ViolationStats(redis_getter=lambda: redis, clock=clock)
+    second.backfill_once(lambda: [(datetime(2025, 7, 12, 9), 'Construction', []),
+                                  (datetime(2025, 7, 12, 10, 2), 'Construction', [])])
+    assert second.day()['snapshots'] == 2
+
+
+def test_without_redis_snapshot_counts_come_from_the_shared_index():
+    rows = [('2025-07-12', 'Construction', ['NO-hardhat'], 2), ('2025-07-12', 'Healthcare', [], 1)]
+    clock = FakeClock(datetime(2025, 7, 12, 10))
+    # Two workers reading the same index see the same counts, whoever saved the snapshots
+    workers = [ViolationStats(clock=clock, snapshot_rows=lambda resolution, first, last: rows) for _ in range(2)]
+    workers[0].record_snapshot('Construction', {'NO-hardhat'})
+    workers[0].backfill_once(lambda: [(datetime(2025, 7, 11), 'Construction', [])])
+
+    for stats in workers:
+        day = stats.day()
+        assert day['snapshots'] == 3 and day['snap_type:NO-hardhat'] == 2
+        assert day['snap_domain:Construction'] == 2 and day['snap_domain:Healthcare'] == 1
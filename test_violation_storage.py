@@ -0,0 +1,101 @@
+import os
+import shutil
+from datetime import datetime
+
+import pytest
+
+from violation_index import ViolationIndex
+from violation_storage import ViolationStorage, shard_dir
+
+
+@pytest.fixture
+def storage(tmp_path):
+    base = tmp_path / "violations"
+    base.mkdir()
+    index = ViolationIndex(path=str(tmp_path / "index.db"), base_dir=str(base), sync_interval=0)
+    return ViolationStorage(index, base_dir=str(base), retention_days=0, max_bytes_per_domain=0,
+                            clock=lambda: datetime(2025, 7, 20, 12, 0))
+
+
+def _save(storage, domain_name, when, size=10):
+    path = storage.snapshot_path(domain_name, when)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    storage.index.add(path)
+    return path
+
+
+def test_snapshots_are_written_to_domain_date_hour_shards(storage):
+    path = _save(storage, "Oil & Gas", datetime(2025, 7, 12, 14, 3, 1, 123456))
+    rel = os.path.relpath(path, storage.base_dir).replace(os.sep, "/")
+    assert rel == "OilG/2025-07-12/14/violation_Oil & Gas_20250712_140301_123456.jpg"
+    rows, _ = storage.index.page()
+    assert rows[0]['path'] == rel
+    assert shard_dir("Manu", datetime(2025, 1, 2, 3)) == "Manu/2025-01-02/03"
+
+
+def test_evict_by_age_removes_files_rows_thumbnails_and_empty_shards(storage):
+    evicted = []
+    storage.on_evict(evicted.append)
+    storage.retention_days = 7
+    old = _save(storage, "Manufacturing", datetime(2025, 7, 1, 8, 0))
+    new = _save(storage, "Manufacturing", datetime(2025, 7, 19, 8, 0))
+
+    assert storage.evict() == {"age": 1, "size": 0}
+    assert not os.path.exists(old) and os.path.exists(new)
+    assert not os.path.exists(os.path.join(storage.base_dir, "Manu", "2025-07-01"))
+    assert storage.index.count() == 1
+    assert evicted == ["Manu/2025-07-01/08/" + os.path.basename(old)]
+
+
+def test_evict_by_size_keeps_the_newest_within_the_budget(storage):
+    storage.max_bytes_per_domain = 25
+    paths = [_save(storage, "Healthcare", datetime(2025, 7, 19, hour, 0), size=10) for hour in range(4)]
+    _save(storage, "Construction", datetime(2025, 7, 19, 1, 0), size=10)
+
+    assert storage.evict() == {"age": 0, "size": 2}
+    assert [os.path.exists(path) for path in paths] == [False, False, True, True]
+    assert storage.index.usage() == {"Heal": {"files": 2, "bytes": 20}, "Cons": {"files": 1, "bytes": 10}}
+
+
+def test_migrate_moves_flat_snapshots_into_shards_and_sync_follows_deleted_dirs(storage):
+    flat = os.path.join(storage.base_dir, "Cons")
+    os.makedirs(flat)
+    for stamp in ("20250712_070000_000001", "20250713_221500_000002"):
+        open(os.path.join(flat, f"violation_Construction_{stamp}.jpg"), "wb").close()
+    storage.index.sync(force=True)
+
+    assert storage.migrate(dry_run=True) == 2
+    assert storage.migrate() == 2
+    assert sorted(os.listdir(flat)) == ["2025-07-12", "2025-07-13"]
+    paths = sorted(storage.index.iter_paths())
+    assert paths == [
+        "Cons/2025-07-12/07/violation_Construction_20250712_070000_000001.jpg",
+        "Cons/2025-07-13/22/violation_Construction_20250713_221500_000002.jpg",
+    ]
+
+    shutil.rmtree(os.path.join(flat, "2025-07-13"))
+    storage.index.sync(force=True)
+    assert list(storage.index.iter_paths()) == paths[:1]
+
+
+def test_files_that_cannot_be_deleted_keep_their_index_rows(storage, monkeypatch):
+    storage.retention_days = 7
+    stuck = _save(storage, "Manufacturing", datetime(2025, 7, 1, 8, 0))
+    gone = _save(storage, "Manufacturing", datetime(2025, 7, 2, 8, 0))
+    real_remove = os.remove
+
+    def remove(path):
+        if path == stuck:
+            raise PermissionError("read-only")
+        real_remove(path)
+
+    monkeypatch.setattr(os, "remove", remove)
+    assert storage.evict() == {"age": 1, "size": 0}
+    assert os.path.exists(stuck) and not os.path.exists(gone)
+    rows, _ = storage.index.page()
+    assert [os.path.basename(row['path']) for row in rows] == [os.path.basename(stuck)]
+
+    monkeypatch.setattr(os, "remove", real_remove)
+    assert storage.evict() == {"age": 1, "size": 0}
+    assert storage.index.count() == 0
@@ -0,0 +1,293 @@
+"""
+Small thumbnails of violation snapshots for the dashboard gallery.
+
+/api/violation_images used to point ``thumbnail_path`` at the full-resolution
+snapshot, so a gallery page downloaded every full frame. ThumbnailStore keeps
+a downscaled copy of each snapshot (longest side THUMBNAIL_SIZE pixels, WebP
+when OpenCV can encode it, JPEG otherwise) under THUMBNAIL_DIR, mirroring the
+snapshot's path:
+
+* record_violations() hands the snapshot frame to submit_frame(); the frame is
+  resized right away (the caller keeps drawing on the original) and encoded and
+  written by a background thread;
+* get() returns a thumbnail for any snapshot, rendering it from the file on
+  disk if it is missing (older snapshots, or evicted ones);
+* start_backfill() renders thumbnails for existing snapshots, newest first,
+  on a background thread;
+* the directory is bounded to THUMBNAIL_CACHE_MB: the least recently served
+  thumbnails are deleted first. Thumbnails can always be re-rendered, so
+  eviction only costs a later render.
+
+Thumbnails are served at /violations/thumb/<snapshot path>.
+"""
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from werkzeug.security import safe_join
+
+THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR", "static/violation_thumbs")
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "320"))
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp").lower()
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "70"))
+THUMBNAIL_CACHE_MB = float(os.getenv("THUMBNAIL_CACHE_MB", "256"))
+THUMBNAIL_QUEUE_SIZE = int(os.getenv("THUMBNAIL_QUEUE_SIZE", "256"))
+
+MIMETYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+
+
+def resize_for_thumbnail(frame, size=THUMBNAIL_SIZE):
+    """Downscaled copy of ``frame`` whose longest side is at most ``size`` pixels."""
+    import cv2
+    height, width = frame.shape[:2]
+    scale = size / max(height, width)
+    if scale >= 1:
+        return frame.copy()
+    return cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def encode_thumbnail(image, fmt, quality=THUMBNAIL_QUALITY):
+    """Encoded bytes of ``image`` as 'webp' or 'jpg', or None if OpenCV cannot encode it."""
+    import cv2
+    if fmt == 'webp':
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    else:
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    try:
+        ok, buffer = cv2.imencode(f'.{fmt}', image, params)
+    except cv2.error:
+        return None
+    return buffer.tobytes() if ok else None
+
+
+def read_for_thumbnail(source_path, size=THUMBNAIL_SIZE):
+    """Snapshot file decoded at half resolution where that is still big enough, then resized."""
+    import cv2
+    # The JPEG decoder can skip detail we would throw away anyway
+    image = cv2.imread(source_path, cv2.IMREAD_REDUCED_COLOR_2)
+    if image is None or max(image.shape[:2]) < size:
+        image = cv2.imread(source_path, cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    return resize_for_thumbnail(image, size)
+
+
+class ThumbnailStore:
+    """Thumbnails on disk, rendered on write, on demand or by backfill, with a size bound."""
+
+    def __init__(self, source_dir="static/violations", thumb_dir=THUMBNAIL_DIR,
+                 max_bytes=int(THUMBNAIL_CACHE_MB * 1024 * 1024), fmt=THUMBNAIL_FORMAT,
+                 reader=read_for_thumbnail, encoder=encode_thumbnail):
+        """
+        Args:
+            source_dir (str): Directory the snapshot paths are relative to
+            thumb_dir (str): Directory for the thumbnails
+            max_bytes (int): Total size the thumbnails may take on disk
+            fmt (str): 'webp' or 'jpg'; webp falls back to jpg if it cannot be encoded
+            reader (callable): source_path -> downscaled image or None
+            encoder (callable): (image, fmt) -> bytes or None
+        """
+        self.source_dir = source_dir
+        self.thumb_dir = thumb_dir
+        self.max_bytes = max_bytes
+        self.fmt = 'jpg' if fmt in ('jpg', 'jpeg') else 'webp'
+        self._reader = reader
+        self._encoder = encoder
+        self._lru = None  # thumbnail path -> size, least recently used first
+        self._total = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=THUMBNAIL_QUEUE_SIZE)
+        self._worker = None
+        self._backfill = None
+        self.stats = {"rendered": 0, "on_demand": 0, "evicted": 0, "dropped": 0, "failed": 0}
+
+    @property
+    def mimetype(self):
+        return MIMETYPES[self.fmt]
+
+    def thumb_path(self, rel_path):
+        """Thumbnail file for a snapshot path such as 'Manu/violation_...jpg' (None if it escapes)."""
+        path = safe_join(self.thumb_dir, rel_path)
+        return f"{path}.{self.fmt}" if path else None
+
+    # -- size bound --------------------------------------------------------------
+
+    def _load_lru(self):
+        # Called with the lock held; existing thumbnails start in mtime order
+        entries = []
+        for root, _, files in os.walk(self.thumb_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, path, st.st_size))
+        entries.sort()
+        self._lru = OrderedDict((path, size) for _, path, size in entries)
+        self._total = sum(self._lru.values())
+
+    def _touch(self, path, size=None):
+        with self._lock:
+            if self._lru is None:
+                self._load_lru()
+            if size is not None:
+                self._total += size - self._lru.get(path, 0)
+                self._lru[path] = size
+            elif path not in self._lru:
+                return
+            self._lru.move_to_end(path)
+            while self._total > self.max_bytes and len(self._lru) > 1:
+                old_path, old_size = self._lru.popitem(last=False)
+                self._total -= old_size
+                self.stats["evicted"] += 1
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    def usage(self):
+        with self._lock:
+            if self._lru is None:
+                self._load_lru()
+            return {"files": len(self._lru), "bytes": self._total, "max_bytes": self.max_bytes}
+
+    # -- rendering ---------------------------------------------------------------
+
+    def _encode(self, image):
+        data = self._encoder(image, self.fmt)
+        if data is None and self.fmt == 'webp':
+            print("[THUMB] WebP encoding unavailable, using JPEG thumbnails")
+            self.fmt = 'jpg'
+            data = self._encoder(image, self.fmt)
+        return data
+
+    def _write(self, rel_path, image):
+        data = self._encode(image)
+        path = self.thumb_path(rel_path)
+        if data is None or path is None:
+            self.stats["failed"] += 1
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # readers never see a partial file
+        self.stats["rendered"] += 1
+        self._touch(path, len(data))
+        return path
+
+    def render(self, rel_path):
+        """Render the thumbnail of a snapshot from its file. Returns its path or None."""
+        source = safe_join(self.source_dir, rel_path)
+        if source is None or not os.path.isfile(source):
+            return None
+        image = self._reader(source)
+        if image is None:
+            self.stats["failed"] += 1
+            return None
+        return self._write(rel_path, image)
+
+    def get(self, rel_path):
+        """Path of the thumbnail for ``rel_path``, rendering it if needed; None if there is no such snapshot."""
+        path = self.thumb_path(rel_path)
+        if path is None:
+            return None
+        if os.path.isfile(path):
+            self._touch(path)
+            return path
+        self.stats["on_demand"] += 1
+        return self.render(rel_path)
+
+    def discard(self, rel_path):
+        """Delete the thumbnail of a snapshot that was deleted or moved."""
+        path = self.thumb_path(rel_path)
+        if path is None:
+            return
+        with self._lock:
+            if self._lru is not None and path in self._lru:
+                self._total -= self._lru.pop(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    # -- background work ---------------------------------------------------------
+
+    def submit_frame(self, rel_path, frame):
+        """Queue a thumbnail of a snapshot frame that was just written.
+
+        The frame is downscaled here, so the caller may keep modifying it. Returns
+        False if the queue is full (the thumbnail is then rendered on first request).
+        """
+        try:
+            small = resize_for_thumbnail(frame)
+        except Exception as e:
+            print(f"[THUMB] Could not resize {rel_path}: {e}")
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((rel_path, small))
+            return True
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="thumbnails", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            rel_path, image = self._queue.get()
+            try:
+                self._write(rel_path, image)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"[THUMB] Could not write thumbnail for {rel_path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until every queued thumbnail has been written."""
+        self._queue.join()
+
+    def backfill(self, rel_paths):
+        """Render missing thumbnails for ``rel_paths`` (newest first) until the size bound is reached.
+
+        Returns the number rendered.
+        """
+        count = 0
+        for rel_path in rel_paths:
+            path = self.thumb_path(rel_path)
+            if path is None or os.path.isfile(path):
+                continue
+            if self.render(rel_path):
+                count += 1
+            with self._lock:
+                if self._total >= self.max_bytes:
+                    break  # older snapshots would only evict newer thumbnails
+        print(f"[THUMB] Backfilled {count} thumbnails")
+        return count
+
+    def start_backfill(self, rel_paths_factory):
+        """Run backfill(rel_paths_factory()) on a background thread, once per process."""
+        with self._lock:
+            if self._backfill is not None:
+                return False
+            self._backfill = threading.Thread(
+                target=lambda: self.backfill(rel_paths_factory()), name="thumbnail-backfill", daemon=True)
+        self._backfill.start()
+        return True
+
+    def status(self):
+        return dict(self.stats, format=self.fmt, queued=self._queue.qsize(), **self.usage())
+
+
+thumbnail_store = ThumbnailStore()
@@ -1,15 +1,29 @@
+import os
 import redis
 import hashlib
-import time
-import smtplib
-from twilio.rest import Client
-from flask_socketio import SocketIO
+
+from dedup import DEDUP_REDIS_TIMEOUT, RedisDedupBackend, make_backend
+from notifiers import (FakeSMSGateway, NotificationDispatcher, Notifier, SinkEmailTransport,
+                       SMTPTransport, TwilioTransport)
 
 # Remove test code from main module; this should be in your test file, not here.
 # Redis and cooldown config
-redis_client = redis.Redis(host='localhost', port=6379, db=0)
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+
+def get_redis_client(db=0, **kwargs):
+    """Create a Redis client for the configured server (REDIS_HOST/REDIS_PORT).
+
+    Extra keyword arguments (e.g. socket_timeout) are passed to redis.Redis.
+    """
+    return redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=db, **kwargs)
+
 VIOLATION_ALERT_COOLDOWN = 20  # seconds
 
+# Local cache in front of Redis, falling back to it alone while Redis is down (see dedup.py)
+dedup_backend = make_backend(lambda: get_redis_client(socket_timeout=DEDUP_REDIS_TIMEOUT,
+                                                      socket_connect_timeout=DEDUP_REDIS_TIMEOUT))
+
 # Email/SMS config (replace with your credentials)
 EMAIL_FROM = "your@email.com"
 EMAIL_TO = "recipient@email.com"
@@ -23,33 +37,57 @@ TWILIO_TOKEN = "your_twilio_token"
 TWILIO_FROM = "+1234567890"
 TWILIO_TO = "+1987654321"
 
+# smtp | sink (in-memory stand-in for offline load tests)
+ALERT_EMAIL_TRANSPORT = os.getenv("ALERT_EMAIL_TRANSPORT", "smtp").lower()
+# twilio | fake (in-memory stand-in for offline load tests)
+ALERT_SMS_TRANSPORT = os.getenv("ALERT_SMS_TRANSPORT", "twilio").lower()
+
 # Hashing and deduplication
 
 def hash_violation(violation):
-    key = f"{violation['type']}|{violation['location']}|{violation.get('bbox', '')}"
+    key = (f"{violation['type']}|{violation['location']}|{violation.get('person_id', '')}"
+           f"|{violation.get('bbox', '')}")
     return hashlib.sha256(key.encode()).hexdigest()
 
 def should_send_alert(violation):
-    v_hash = hash_violation(violation)
-    last_sent = redis_client.get(v_hash)
-    now = int(time.time())
-    if last_sent and now - int(last_sent) < VIOLATION_ALERT_COOLDOWN:
-        return False
-    redis_client.setex(v_hash, VIOLATION_ALERT_COOLDOWN, now)
-    return True
+    return dedup_backend.claim(hash_violation(violation), VIOLATION_ALERT_COOLDOWN)
+
+def is_duplicate_alert(alert, client, cooldown=VIOLATION_ALERT_COOLDOWN):
+    """True if the same alert (type, location, person) was seen on ``client`` within ``cooldown`` seconds."""
+    return not RedisDedupBackend(client).claim(hash_violation(alert), cooldown)
+
+def dedup_status():
+    status = getattr(dedup_backend, 'status', None)
+    return dict(status(), backend=dedup_backend.name) if status else {"backend": dedup_backend.name}
 
 # Email/SMS/WebSocket
+# One long-lived client per channel, with retries and a circuit breaker (see notifiers.py)
+
+def _email_transport():
+    if ALERT_EMAIL_TRANSPORT == 'sink':
+        return SinkEmailTransport()
+    return SMTPTransport(SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASS)
+
+def _sms_transport():
+    if ALERT_SMS_TRANSPORT == 'fake':
+        return FakeSMSGateway()
+    return TwilioTransport(TWILIO_SID, TWILIO_TOKEN)
+
+email_notifier = Notifier('email', _email_transport())
+sms_notifier = Notifier('sms', _sms_transport())
+notification_dispatcher = NotificationDispatcher()
 
 def send_email(subject, body):
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.starttls()
-        server.login(SMTP_USER, SMTP_PASS)
-        message = f"Subject: {subject}\n\n{body}"
-        server.sendmail(EMAIL_FROM, EMAIL_TO, message)
+    email_notifier.send(EMAIL_FROM, EMAIL_TO, subject, body)
 
 def send_sms(body):
-    client = Client(TWILIO_SID, TWILIO_TOKEN)
-    client.messages.create(body=body, from_=TWILIO_FROM, to=TWILIO_TO)
+    sms_notifier.send(TWILIO_FROM, TWILIO_TO, body)
 
-def broadcast_violation(socketio: SocketIO, violation):
-    socketio.emit('violation_alert', violation)
+def notification_status():
+    """Delivery counters and circuit state of each channel, plus the dispatch queue."""
+    return {
+        "email": email_notifier.status(),
+        "sms": sms_notifier.status(),
+        "queue": notification_dispatcher.status(),
+        "dedup": dedup_status(),
+    }
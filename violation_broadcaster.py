@@ -0,0 +1,180 @@
+"""
+Batched, per-room Socket.IO violation broadcasts.
+
+/api/violation_alert used to emit one ``violation_alert`` event per violation
+to every connected client. ViolationBroadcaster groups them instead:
+
+* each violation belongs to the room ``violations:<camera>:<domain>``; clients
+  emit ``subscribe_violations`` with the camera/domain pairs they display and
+  only join those rooms (``{"all": true}`` joins ``violations:all``, which gets
+  every batch, for overview pages);
+* violations published for a room are buffered and sent as one
+  ``violation_batch`` event at most VIOLATION_BATCH_RATE times per second per room;
+* identical violations within a batch are merged into one entry with a
+  ``count``, and alerts suppressed by the dedup cooldown are only counted
+  (``suppressed``), so a crowded shift costs a bounded number of small events.
+
+Batch payload::
+
+    {"room", "camera", "domain", "violations": [{..., "count": n}], "suppressed": n,
+     "dropped": n, "first_seen", "last_seen"}
+"""
+import os
+import threading
+import time
+
+from flask_socketio import join_room, leave_room
+
+# Batched messages per second per room
+VIOLATION_BATCH_RATE = float(os.getenv("VIOLATION_BATCH_RATE", "2"))
+# Distinct violations kept per batch; further ones are counted as dropped
+VIOLATION_BATCH_MAX = int(os.getenv("VIOLATION_BATCH_MAX", "50"))
+
+BATCH_EVENT = 'violation_batch'
+ALL_ROOM = 'violations:all'
+
+
+def violation_room(camera, domain):
+    return f"violations:{camera}:{domain}"
+
+
+def room_for(violation):
+    """(room, camera, domain) of a violation; camera defaults to its location."""
+    camera = violation.get('camera') or violation.get('location') or 'unknown'
+    domain = violation.get('domain') or 'general'
+    return violation_room(camera, domain), camera, domain
+
+
+def _violation_key(violation):
+    return (violation.get('type'), violation.get('location'), violation.get('person_id'))
+
+
+class _Batch:
+    __slots__ = ('camera', 'domain', 'entries', 'suppressed', 'dropped', 'first_seen', 'last_seen')
+
+    def __init__(self, camera, domain):
+        self.camera = camera
+        self.domain = domain
+        self.entries = {}
+        self.suppressed = 0
+        self.dropped = 0
+        self.first_seen = None
+        self.last_seen = None
+
+
+class ViolationBroadcaster:
+    """Buffers violations per room and emits them as rate-limited batches."""
+
+    def __init__(self, socketio, rate=VIOLATION_BATCH_RATE, max_batch=VIOLATION_BATCH_MAX, clock=time.time):
+        """
+        Args:
+            socketio: The application's SocketIO instance
+            rate (float): Maximum batches per second per room
+            max_batch (int): Maximum distinct violations per batch
+            clock (callable): Wall clock for first_seen/last_seen; replaceable in tests
+        """
+        self.socketio = socketio
+        self.interval = 1.0 / rate
+        self.max_batch = max_batch
+        self._clock = clock
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flusher_running = False
+        self.stats = {"published": 0, "suppressed": 0, "batches": 0}
+
+    def publish(self, violation, suppressed=False):
+        """Queue a violation for its room. Suppressed (duplicate) alerts are only counted."""
+        room, camera, domain = room_for(violation)
+        now = self._clock()
+        with self._lock:
+            batch = self._pending.get(room)
+            if batch is None:
+                batch = self._pending[room] = _Batch(camera, domain)
+                batch.first_seen = now
+            batch.last_seen = now
+            if suppressed:
+                batch.suppressed += 1
+                self.stats["suppressed"] += 1
+            else:
+                key = _violation_key(violation)
+                entry = batch.entries.get(key)
+                if entry is not None:
+                    entry["count"] += 1
+                    entry["timestamp"] = violation.get("timestamp", entry.get("timestamp"))
+                elif len(batch.entries) < self.max_batch:
+                    batch.entries[key] = dict(violation, count=1)
+                else:
+                    batch.dropped += 1
+                self.stats["published"] += 1
+            start = not self._flusher_running
+            self._flusher_running = True
+        if start:
+            self.socketio.start_background_task(self._flush_loop)
+
+    def flush(self):
+        """Emit every pending batch now. Returns the number of batches sent."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for room, batch in pending.items():
+            payload = {
+                "room": room,
+                "camera": batch.camera,
+                "domain": batch.domain,
+                "violations": list(batch.entries.values()),
+                "suppressed": batch.suppressed,
+                "dropped": batch.dropped,
+                "first_seen": batch.first_seen,
+                "last_seen": batch.last_seen,
+            }
+            # One emit to both rooms: a client in both gets a single copy
+            self.socketio.emit(BATCH_EVENT, payload, to=[room, ALL_ROOM])
+        self.stats["batches"] += len(pending)
+        return len(pending)
+
+    def _flush_loop(self):
+        # One flush per interval covers every room, so no room gets more than `rate` batches per second
+        while True:
+            self.socketio.sleep(self.interval)
+            self.flush()
+            with self._lock:
+                if not self._pending:
+                    self._flusher_running = False
+                    return
+
+
+def register_violation_socket_handlers(socketio, valid_cameras=None, valid_domains=None):
+    """Register ``subscribe_violations``/``unsubscribe_violations``.
+
+    Payload: ``{"rooms": [{"camera": ..., "domain": ...}, ...]}`` or ``{"all": true}``.
+    Returns the joined/left room names to the client.
+    """
+
+    def _rooms(data):
+        data = data or {}
+        if data.get('all'):
+            return [ALL_ROOM]
+        rooms = []
+        for item in data.get('rooms') or []:
+            camera, domain = item.get('camera'), item.get('domain', 'general')
+            if not camera:
+                continue
+            if valid_cameras is not None and camera not in valid_cameras:
+                continue
+            if valid_domains is not None and domain not in valid_domains:
+                continue
+            rooms.append(violation_room(camera, domain))
+        return rooms
+
+    @socketio.on('subscribe_violations')
+    def handle_subscribe_violations(data):
+        rooms = _rooms(data)
+        for room in rooms:
+            join_room(room)
+        return {"rooms": rooms}
+
+    @socketio.on('unsubscribe_violations')
+    def handle_unsubscribe_violations(data):
+        rooms = _rooms(data)
+        for room in rooms:
+            leave_room(room)
+        return {"rooms": rooms}
@@ -0,0 +1,536 @@
+"""
+SQLite index of saved violation snapshots for the listing APIs.
+
+/api/violations, /api/violations/recent and /api/violation_images used to list
+every file under static/violations, build an entry for each one (re-reading
+detection_results.txt per image for its confidence) and sort the lot in Python
+on every request. The index keeps one row per snapshot, ordered by
+(timestamp, id), so a listing is a single indexed range scan that reads one
+page:
+
+* record_violations() adds a row as it writes each snapshot;
+* sync() picks up files written or deleted by anything else (older snapshots,
+  copies, manual clean-up). It walks the domain directories and their
+  date/hour shards (violation_storage.py); a directory is only re-listed when
+  its mtime differs from the one recorded in the index, and the walk runs at
+  most once per VIOLATION_INDEX_SYNC_INTERVAL seconds per process;
+* pages are keyset paginated: ``cursor`` is an opaque token for the
+  (timestamp, id) of the last row returned, and the next page starts strictly
+  after it, so pages stay stable while new snapshots arrive;
+* ``generation`` counts changes to the index (rows added or removed), for
+  HTTP caching of listings (http_cache.py);
+* bucket_counts() sums snapshots per minute/hour/day, domain and violation
+  classes (``types``), for the violation statistics when there is no Redis.
+
+The index is a file (VIOLATION_INDEX_PATH) shared by every worker on the host.
+Deleting it is safe; it is rebuilt from the snapshot files on the next sync.
+"""
+import base64
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+VIOLATION_INDEX_PATH = os.getenv("VIOLATION_INDEX_PATH", "violation_index.db")
+VIOLATION_INDEX_SYNC_INTERVAL = float(os.getenv("VIOLATION_INDEX_SYNC_INTERVAL", "30"))
+# Page size when a listing gets no ``limit``, and the largest page any listing returns
+VIOLATION_PAGE_DEFAULT = int(os.getenv("VIOLATION_PAGE_DEFAULT", "200"))
+VIOLATION_PAGE_MAX = int(os.getenv("VIOLATION_PAGE_MAX", "1000"))
+
+# violation_<domain>_<YYYYMMDD>_<HHMMSS>_<microseconds>.jpg
+SNAPSHOT_PATTERN = re.compile(r"violation_(?P<domain>.+?)_(?P<date>\d{8})_(?P<time>\d{6})_(?P<micro>\d+)\.jpg")
+
+FIELDS = ('id', 'filename', 'path', 'domain', 'domain_short', 'timestamp', 'date', 'time', 'confidence', 'camera')
+
+# Bumped when the snapshots table changes shape; an older index is rebuilt from the files,
+# except that a version 2 index only gains the ``types`` column
+SCHEMA_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id TEXT PRIMARY KEY,
+    ts TEXT NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    domain_short TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER,
+    confidence REAL,
+    camera TEXT,
+    types TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_ts ON snapshots (ts, id);
+CREATE INDEX IF NOT EXISTS snapshots_domain_ts ON snapshots (domain_short, ts, id);
+CREATE INDEX IF NOT EXISTS snapshots_dir ON snapshots (dir);
+CREATE INDEX IF NOT EXISTS snapshots_untyped ON snapshots (ts) WHERE types IS NULL;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_INSERT = (
+    "INSERT OR {conflict} INTO snapshots"
+    " (id, ts, date, time, domain_short, domain, dir, filename, size, confidence, camera, types)"
+    " VALUES (:id, :ts, :date, :time, :domain_short, :domain, :dir, :filename, :size, :confidence, :camera, :types)"
+)
+
+
+def parse_snapshot(rel_dir, fname):
+    """Index row for a snapshot file name, or None if it is not a snapshot.
+
+    Args:
+        rel_dir (str): Directory of the file relative to the snapshot root, with '/'
+            separators: 'Manu' (flat layout) or 'Manu/2025-07-12/14' (sharded)
+        fname (str): File name
+
+    ``ts`` sorts like the capture time (microseconds included); ``id`` is unique per
+    file and breaks ties.
+    """
+    match = SNAPSHOT_PATTERN.match(fname)
+    if not match:
+        return None
+    domain_short = rel_dir.split('/', 1)[0]
+    d, t, micro = match.group('date'), match.group('time'), match.group('micro')
+    date = f"{d[:4]}-{d[4:6]}-{d[6:]}"
+    clock = f"{t[:2]}:{t[2:4]}:{t[4:]}"
+    return {
+        'id': f"{domain_short}_{d}_{t}_{micro}",
+        'ts': f"{date} {clock}.{micro.rjust(6, '0')}",
+        'date': date,
+        'time': clock,
+        'domain_short': domain_short,
+        'domain': match.group('domain'),
+        'dir': rel_dir,
+        'filename': fname,
+        'size': None,
+        'confidence': None,
+        'camera': None,
+        'types': None,  # violation classes, comma separated ('' when none are known)
+    }
+
+
+def join_types(types):
+    """Violation classes as stored in the ``types`` column."""
+    return ','.join(sorted(set(types)))
+
+
+def split_types(value):
+    return value.split(',') if value else []
+
+
+def _parent(rel_dir):
+    return rel_dir.rsplit('/', 1)[0] if '/' in rel_dir else ''
+
+
+def encode_cursor(row):
+    """Opaque continuation token for the position just after ``row``."""
+    raw = json.dumps([row['ts'], row['id']], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(ts, id) from a token made by encode_cursor(). Raises ValueError if it is not one."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        ts, row_id = json.loads(raw)
+    except Exception:
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    if not isinstance(ts, str) or not isinstance(row_id, str):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return ts, row_id
+
+
+def parse_limit(value, default=VIOLATION_PAGE_DEFAULT, maximum=VIOLATION_PAGE_MAX):
+    """Page size from a query parameter, clamped to 1..maximum; ``default`` if missing or not a number."""
+    try:
+        limit = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def parse_fields(value, allowed):
+    """Field names from a comma separated ``fields`` parameter (None = all).
+
+    Raises ValueError naming any field not in ``allowed``.
+    """
+    if not value:
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def project(entry, fields):
+    """``entry`` reduced to ``fields`` (all of it when fields is None)."""
+    if fields is None:
+        return entry
+    return {name: entry[name] for name in fields}
+
+
+class ViolationIndex:
+    """Snapshot rows in SQLite, kept in step with static/violations."""
+
+    def __init__(self, path=VIOLATION_INDEX_PATH, base_dir="static/violations",
+                 sync_interval=VIOLATION_INDEX_SYNC_INTERVAL, pool_size=4):
+        """
+        Args:
+            path (str): SQLite database file (':memory:' is not shared between connections)
+            base_dir (str): Directory holding one sub-directory of snapshots per domain
+            sync_interval (float): Minimum seconds between directory checks in this process
+            pool_size (int): Connections kept open for concurrent requests
+        """
+        self.path = path
+        self.base_dir = base_dir
+        self.sync_interval = sync_interval
+        self._pool = queue.LifoQueue()
+        self._pool_size = pool_size
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._sync_lock = threading.Lock()
+        self._last_sync = None
+
+    # -- connections -------------------------------------------------------------
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._schema_lock:
+            if not self._schema_ready:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version == 2:
+                    conn.execute("ALTER TABLE snapshots ADD COLUMN types TEXT")
+                elif version < SCHEMA_VERSION:
+                    # Rebuilt by the next sync; the generation is kept so old ETags stay invalid
+                    conn.executescript("DROP TABLE IF EXISTS snapshots;"
+                                       " CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+                                       " DELETE FROM meta WHERE key LIKE 'dir:%';")
+                conn.executescript(_SCHEMA)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                self._schema_ready = True
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            if self._pool.qsize() < self._pool_size:
+                self._pool.put(conn)
+            else:
+                conn.close()
+
+    @contextmanager
+    def _transaction(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _bump_generation(conn):
+        conn.execute("INSERT INTO meta (key, value) VALUES ('generation', 1) ON CONFLICT (key)"
+                     " DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+    def reset_after_fork(self):
+        """Drop connections inherited from the parent process (SQLite handles must not cross a fork)."""
+        self._pool = queue.LifoQueue()
+        self._last_sync = None
+
+    # -- writes ------------------------------------------------------------------
+
+    def rel_dir(self, directory):
+        """Directory relative to the snapshot root, with '/' separators."""
+        return os.path.relpath(directory, self.base_dir).replace(os.sep, '/')
+
+    def rel_path(self, file_path):
+        """Snapshot path relative to the snapshot root ('Manu/2025-07-12/14/violation_...jpg')."""
+        return self.rel_dir(file_path)
+
+    def add(self, file_path, confidence=None, camera=None, types=None):
+        """Index a snapshot that was just written. Returns False if the name is not a snapshot's.
+
+        ``types`` are the violation classes the snapshot shows.
+        """
+        directory, fname = os.path.split(file_path)
+        rel_dir = self.rel_dir(directory)
+        row = parse_snapshot(rel_dir, fname)
+        if row is None:
+            return False
+        try:
+            row.update(size=os.path.getsize(file_path), confidence=confidence, camera=camera,
+                       types=None if types is None else join_types(types))
+            with self._connection() as conn, self._transaction(conn):
+                conn.execute(_INSERT.format(conflict='REPLACE'), row)
+                # The write that changed the directory is already indexed, so sync() need not re-list it
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             (f"dir:{rel_dir}", str(os.stat(directory).st_mtime_ns)))
+                self._bump_generation(conn)
+        except (sqlite3.Error, OSError) as e:
+            print(f"[INDEX] Could not index {file_path}: {e}")
+            return False
+        return True
+
+    def remove(self, ids):
+        """Drop rows of snapshots that were deleted. Returns the number removed."""
+        ids = list(ids)
+        if not ids:
+            return 0
+        with self._connection() as conn, self._transaction(conn):
+            removed = conn.executemany("DELETE FROM snapshots WHERE id = ?", [(row_id,) for row_id in ids]).rowcount
+            if removed:
+                self._bump_generation(conn)
+        return removed
+
+    def move(self, row_id, new_rel_dir):
+        """Record that a snapshot file moved to another directory (same file name)."""
+        with self._connection() as conn, self._transaction(conn):
+            conn.execute("UPDATE snapshots SET dir = ? WHERE id = ?", (new_rel_dir, row_id))
+            self._bump_generation(conn)
+
+    def set_confidence(self, values):
+        """Store confidences looked up later: {id: confidence}."""
+        if not values:
+            return
+        with self._connection() as conn:
+            conn.executemany("UPDATE snapshots SET confidence = ? WHERE id = ?",
+                             [(conf, row_id) for row_id, conf in values.items()])
+
+    def set_types(self, values):
+        """Store violation classes looked up later: {id: iterable of classes}."""
+        if not values:
+            return
+        with self._connection() as conn:
+            conn.executemany("UPDATE snapshots SET types = ? WHERE id = ?",
+                             [(join_types(types), row_id) for row_id, types in values.items()])
+
+    def sync(self, force=False):
+        """Bring the index up to date with the snapshot directories.
+
+        Only directories whose mtime changed since the last listing are re-read;
+        rows in directories that no longer exist are dropped.
+        Returns the number of rows added plus removed (0 when nothing was checked).
+        """
+        now = time.monotonic()
+        if not force and self._last_sync is not None and now - self._last_sync < self.sync_interval:
+            return 0
+        if not self._sync_lock.acquire(blocking=False):
+            return 0  # another request is already syncing
+        try:
+            self._last_sync = now
+            if not os.path.isdir(self.base_dir):
+                return 0
+            with self._connection() as conn:
+                known = {
+                    key[4:]: value
+                    for key, value in conn.execute("SELECT key, value FROM meta WHERE key LIKE 'dir:%'")
+                }
+                children = {}
+                for rel_dir in known:
+                    children.setdefault(_parent(rel_dir), []).append(rel_dir)
+                seen = set()
+                changed = 0
+                for entry in sorted(os.scandir(self.base_dir), key=lambda e: e.name):
+                    if entry.is_dir():
+                        changed += self._sync_tree(conn, entry.name, known, children, seen)
+                changed += self._drop_missing_dirs(conn, set(known) - seen)
+            if changed:
+                print(f"[INDEX] Synced violation index: {changed} rows added or removed")
+            return changed
+        finally:
+            self._sync_lock.release()
+
+    def _sync_tree(self, conn, rel_dir, known, children, seen):
+        """Sync ``rel_dir`` and the directories below it."""
+        seen.add(rel_dir)
+        directory = os.path.join(self.base_dir, *rel_dir.split('/'))
+        try:
+            mtime = str(os.stat(directory).st_mtime_ns)
+        except OSError:
+            return 0
+        if known.get(rel_dir) == mtime:
+            # Unchanged listing: same files and the same sub-directories as last time
+            changed, subdirs = 0, children.get(rel_dir, [])
+        else:
+            changed, subdirs = self._sync_files(conn, rel_dir, directory, mtime)
+        for subdir in sorted(subdirs):
+            changed += self._sync_tree(conn, subdir, known, children, seen)
+        return changed
+
+    def _sync_files(self, conn, rel_dir, directory, mtime):
+        """Re-list one directory. Returns (rows added + removed, sub-directories)."""
+        on_disk, subdirs = {}, []
+        for entry in os.scandir(directory):
+            if entry.is_dir():
+                subdirs.append(f"{rel_dir}/{entry.name}")
+                continue
+            row = parse_snapshot(rel_dir, entry.name)
+            if row is not None:
+                try:
+                    row['size'] = entry.stat().st_size
+                except OSError:
+                    continue
+                on_disk[row['id']] = row
+        indexed = {r[0] for r in conn.execute("SELECT id FROM snapshots WHERE dir = ?", (rel_dir,))}
+        added = [row for row_id, row in on_disk.items() if row_id not in indexed]
+        removed = [(row_id,) for row_id in indexed if row_id not in on_disk]
+        with self._transaction(conn):
+            conn.executemany(_INSERT.format(conflict='REPLACE'), added)
+            conn.executemany("DELETE FROM snapshots WHERE id = ? AND dir = ?", [(row_id, rel_dir) for row_id, in removed])
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"dir:{rel_dir}", mtime))
+            if added or removed:
+                self._bump_generation(conn)
+        return len(added) + len(removed), subdirs
+
+    def _drop_missing_dirs(self, conn, missing):
+        if not missing:
+            return 0
+        removed = 0
+        with self._transaction(conn):
+            for rel_dir in missing:
+                removed += conn.execute("DELETE FROM snapshots WHERE dir = ?", (rel_dir,)).rowcount
+                conn.execute("DELETE FROM meta WHERE key = ?", (f"dir:{rel_dir}",))
+            if removed:
+                self._bump_generation(conn)
+        return removed
+
+    # -- reads -------------------------------------------------------------------
+
+    def page(self, limit=VIOLATION_PAGE_DEFAULT, cursor=None, domains=None, date=None,
+             time_from=None, time_to=None):
+        """One page of snapshots, newest first.
+
+        Args:
+            limit (int): Rows per page
+            cursor (str): Token from a previous page's next_cursor; the page starts after it
+            domains (list): Only these domain directories (e.g. ['Manu', 'Cons'])
+            date (str): Only this day, YYYY-MM-DD
+            time_from (str): Earliest time of day, HH:MM:SS (inclusive)
+            time_to (str): Latest time of day, HH:MM:SS (inclusive)
+
+        Returns:
+            tuple: (rows, next_cursor); rows are dicts with FIELDS, next_cursor is None
+                on the last page
+
+        Raises:
+            ValueError: If ``cursor`` is not a valid token
+        """
+        where, params = [], []
+        if cursor:
+            ts, row_id = decode_cursor(cursor)
+            where.append("(ts < ? OR (ts = ? AND id < ?))")
+            params += [ts, ts, row_id]
+        if domains is not None:
+            if not domains:
+                return [], None
+            where.append(f"domain_short IN ({','.join('?' * len(domains))})")
+            params += list(domains)
+        if date:
+            where.append("date = ?")
+            params.append(date)
+        if time_from:
+            where.append("time >= ?")
+            params.append(time_from)
+        if time_to:
+            where.append("time <= ?")
+            params.append(time_to)
+        sql = "SELECT * FROM snapshots"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._connection() as conn:
+            rows = [self._entry(row) for row in conn.execute(sql, params)]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1])
+        return rows, next_cursor
+
+    @staticmethod
+    def _entry(row):
+        entry = dict(row)
+        entry['path'] = f"{entry['dir']}/{entry['filename']}"
+        entry['timestamp'] = entry['ts'][:19]
+        return entry
+
+    def iter_rows(self, page_size=VIOLATION_PAGE_MAX, **filters):
+        """Every matching row, newest first, read one page at a time."""
+        cursor = None
+        while True:
+            rows, cursor = self.page(limit=page_size, cursor=cursor, **filters)
+            yield from rows
+            if cursor is None:
+                return
+
+    def iter_paths(self, page_size=VIOLATION_PAGE_MAX, **filters):
+        """Snapshot paths ('Manu/2025-07-12/14/violation_...jpg'), newest first."""
+        for row in self.iter_rows(page_size, **filters):
+            yield row['path']
+
+    def oldest(self, domain_short, limit=500):
+        """The ``limit`` oldest rows of one domain directory, oldest first."""
+        with self._connection() as conn:
+            rows = conn.execute("SELECT * FROM snapshots WHERE domain_short = ? ORDER BY ts, id LIMIT ?",
+                                (domain_short, limit))
+            return [self._entry(row) for row in rows]
+
+    def untyped(self, limit=VIOLATION_PAGE_MAX):
+        """Up to ``limit`` rows whose violation classes were never looked up, oldest first."""
+        with self._connection() as conn:
+            rows = conn.execute("SELECT * FROM snapshots WHERE types IS NULL ORDER BY ts LIMIT ?", (limit,))
+            return [self._entry(row) for row in rows]
+
+    def bucket_counts(self, key_length, start, end):
+        """Snapshot counts grouped by bucket, domain and violation classes.
+
+        Args:
+            key_length (int): Leading characters of ``ts`` forming the bucket key
+                (10 = 'YYYY-MM-DD', 13 = 'YYYY-MM-DD HH', 16 = 'YYYY-MM-DD HH:MM')
+            start (str): First bucket key
+            end (str): Last bucket key (inclusive)
+
+        Returns:
+            list: (bucket key, domain display name, [classes], count) tuples
+        """
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT substr(ts, 1, ?) AS bucket, domain, types, COUNT(*) FROM snapshots"
+                " WHERE ts >= ? AND substr(ts, 1, ?) <= ? GROUP BY bucket, domain, types",
+                (key_length, start, key_length, end))
+            return [(bucket, domain, split_types(types), count) for bucket, domain, types, count in rows]
+
+    def usage(self):
+        """{domain_short: {"files": n, "bytes": n}} of the indexed snapshots."""
+        with self._connection() as conn:
+            rows = conn.execute("SELECT domain_short, COUNT(*), COALESCE(SUM(size), 0) FROM snapshots"
+                                " GROUP BY domain_short")
+            return {domain_short: {"files": files, "bytes": size} for domain_short, files, size in rows}
+
+    def generation(self):
+        """Number of changes made to the index so far (0 for a new index)."""
+        with self._connection() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def count(self):
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+
+
+violation_index = ViolationIndex()
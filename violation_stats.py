@@ -0,0 +1,358 @@
+"""
+Pre-aggregated violation counters in minute, hour and day buckets.
+
+The dashboard and the count/timeline/by_type endpoints used to list every
+snapshot in static/violations (and re-read detection_results.txt) on each
+call. record_violations() now updates counters as violations happen and the
+endpoints sum a bounded number of buckets instead.
+
+Every update adds to the bucket of the current minute, hour and day (local
+time; keys like ``2025-07-12 14:03``, ``2025-07-12 14`` and ``2025-07-12``).
+A bucket is a flat counter:
+
+    violations                  violation events: a frame whose violations were not
+                                near-identical repeats on that camera (snapshot_admission.py)
+    domain:<name>               ... per domain display name
+    camera:<camera>             ... per camera
+    type:<class>                ... per violation class (NO-hardhat, ...)
+    box:<class>                 violating boxes seen by the detectors, every frame
+    seen:<class>                compliant PPE boxes (Hardhat, Mask, ...); with box:<class>
+                                only used for compliance percentages
+    snapshots, snap_domain:<name>, snap_type:<class>
+                                the same for saved snapshots, which is what the
+                                count/timeline/by_type endpoints have always reported
+    snapshots_rejected          snapshots skipped as near-identical (snapshot_admission.py)
+
+Retention: 24 hours of minutes, 30 days of hours, 400 days of days.
+
+With Redis available (shared_state is connected) each bucket is a Redis hash
+shared by all workers; updates are buffered locally and written in one
+pipeline at most every STATS_FLUSH_INTERVAL seconds.
+
+Without Redis the snapshot fields are read from the violation index
+(violation_index.py), the SQLite file every worker on the host shares, so the
+count/timeline/by_type endpoints agree whichever worker answers. The other
+fields (events, boxes, rejections) then live in the process that saw them,
+which is only accurate with a single worker: run several gunicorn workers
+with Redis.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+STATS_PREFIX = os.getenv("SHARED_STATE_PREFIX", "ppe") + ":stats"
+STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "1.0"))
+
+# name -> (strftime key format, step, buckets kept)
+RESOLUTIONS = {
+    'minute': ('%Y-%m-%d %H:%M', timedelta(minutes=1), 24 * 60),
+    'hour': ('%Y-%m-%d %H', timedelta(hours=1), 30 * 24),
+    'day': ('%Y-%m-%d', timedelta(days=1), 400),
+}
+
+# Detector classes grouped into the PPE items shown on the dashboard: item -> (compliant, violation)
+PPE_ITEMS = {
+    'Helmet': ('Hardhat', 'NO-hardhat'),
+    'Mask': ('Mask', 'NO-Mask'),
+    'Vest': ('Safety Vest', 'NO-Safety Vest'),
+    'Gloves': ('Gloves', 'NO-Gloves'),
+    'Gown': ('Gown', 'NO-Gown'),
+}
+_COMPLIANT_CLASSES = {compliant for compliant, _ in PPE_ITEMS.values()}
+
+
+def bucket_key(resolution, when):
+    return when.strftime(RESOLUTIONS[resolution][0])
+
+
+def bucket_keys(resolution, start, end):
+    """Keys of every bucket from ``start`` to ``end`` (datetimes, inclusive), oldest first."""
+    fmt, step, _ = RESOLUTIONS[resolution]
+    # Align to the bucket start so stepping never skips a bucket
+    current = datetime.strptime(start.strftime(fmt), fmt)
+    keys = []
+    while current <= end:
+        keys.append(current.strftime(fmt))
+        current += step
+    return keys
+
+
+class ViolationStats:
+    """Minute/hour/day violation counters, in Redis when available, else in process."""
+
+    def __init__(self, redis_getter=None, prefix=STATS_PREFIX, flush_interval=STATS_FLUSH_INTERVAL,
+                 clock=datetime.now, snapshot_rows=None):
+        """
+        Args:
+            redis_getter (callable): Returns the Redis client to use, or None for local buckets.
+                Called on every flush/read so a connection made after import is picked up.
+            snapshot_rows (callable): (resolution, first key, last key) -> [(bucket key, domain name,
+                [classes], count)] of saved snapshots, used for the snapshot fields without Redis
+                (None keeps those in local buckets too)
+            prefix (str): Redis key prefix
+            flush_interval (float): Seconds between writes of buffered updates to Redis
+            clock (callable): Returns the current local datetime; replaceable in tests
+        """
+        self._redis_getter = redis_getter or (lambda: None)
+        self._snapshot_rows = snapshot_rows
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._local = {resolution: {} for resolution in RESOLUTIONS}
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._flush_timer = None
+        self._lock = threading.Lock()
+        self._backfilled = False
+        self._started = clock()
+        self._live_cutoff = None
+
+    def _key(self, resolution, bucket):
+        return f"{self.prefix}:{resolution}:{bucket}"
+
+    # -- updates -----------------------------------------------------------------
+
+    def add(self, counts, when=None):
+        """Add a Counter/dict of field -> amount to the current minute, hour and day buckets."""
+        if not counts:
+            return
+        when = when or self._clock()
+        redis = self._redis_getter()
+        with self._lock:
+            for resolution, (fmt, _, keep) in RESOLUTIONS.items():
+                bucket = when.strftime(fmt)
+                target = self._pending if redis is not None else self._local[resolution]
+                slot = (resolution, bucket) if redis is not None else bucket
+                counter = target.get(slot)
+                if counter is None:
+                    counter = target[slot] = Counter()
+                    if redis is None and len(target) > keep:
+                        for old in sorted(target)[:len(target) - keep]:
+                            del target[old]
+                counter.update(counts)
+        if redis is None:
+            return
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        elif self._flush_timer is None:
+            # Make sure the tail of a burst reaches Redis even if nothing else is recorded
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def record_detections(self, domain_name, boxes, negative_classes):
+        """Count the violating and compliant PPE boxes of one processed frame (for compliance).
+
+        Args:
+            domain_name (str): Domain display name, e.g. "Construction"
+            boxes (list): (class_name, conf, bbox) tuples from YOLO_Video.extract_boxes()
+            negative_classes (list): Classes counted as violations in this domain
+        """
+        counts = Counter()
+        for class_name, _, _ in boxes:
+            if class_name in negative_classes:
+                counts[f'box:{class_name}'] += 1
+            elif class_name in _COMPLIANT_CLASSES:
+                counts[f'seen:{class_name}'] += 1
+        self.add(counts)
+
+    def record_event(self, domain_name, violation_types, camera=None):
+        """Count one violation event (an admitted violation frame) and the classes it shows.
+
+        Args:
+            domain_name (str): Domain display name, e.g. "Construction"
+            violation_types (iterable): Violation classes present in the frame
+            camera (str): Camera the frame came from (default: 'unknown')
+        """
+        counts = Counter({'violations': 1, f'domain:{domain_name}': 1, f'camera:{camera or "unknown"}': 1})
+        for violation_type in violation_types:
+            counts[f'type:{violation_type}'] += 1
+        self.add(counts)
+
+    def record_snapshot(self, domain_name, violation_types, when=None):
+        """Count one saved violation snapshot and the violation classes it shows.
+
+        ``when`` is only given by backfill_once(); snapshots counted as they are
+        saved mark the store as live first, so a later backfill skips them.
+        """
+        if self._snapshot_rows is not None and self._redis_getter() is None:
+            return  # counted from the index row of the snapshot
+        if when is None:
+            self._live_since()
+        self.add(_snapshot_counts(domain_name, violation_types), when)
+
+    def flush(self):
+        """Write buffered updates to Redis in one pipeline."""
+        redis = self._redis_getter()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+            self._flush_timer = None
+        if not pending or redis is None:
+            return
+        try:
+            pipe = redis.pipeline(transaction=False)
+            for (resolution, bucket), counter in pending.items():
+                key = self._key(resolution, bucket)
+                for field, amount in counter.items():
+                    pipe.hincrby(key, field, amount)
+                _, step, keep = RESOLUTIONS[resolution]
+                pipe.expire(key, int(step.total_seconds() * (keep + 1)))
+            pipe.execute()
+        except Exception as e:
+            print(f"[STATS] Could not write violation counters to Redis: {e}")
+
+    # -- reads -------------------------------------------------------------------
+
+    def buckets(self, resolution, start, end):
+        """[(bucket_key, Counter)] for every bucket from start to end, empty buckets included."""
+        keys = bucket_keys(resolution, start, end)
+        redis = self._redis_getter()
+        if redis is None:
+            with self._lock:
+                local = self._local[resolution]
+                result = [(key, Counter(local.get(key, ()))) for key in keys]
+            if self._snapshot_rows is not None and keys:
+                by_key = dict(result)
+                for bucket, domain_name, violation_types, count in self._snapshot_rows(resolution, keys[0], keys[-1]):
+                    counter = by_key.get(bucket)
+                    if counter is not None:
+                        counter.update(_snapshot_counts(domain_name, violation_types, count))
+            return result
+        self.flush()
+        try:
+            pipe = redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.hgetall(self._key(resolution, key))
+            rows = pipe.execute()
+        except Exception as e:
+            print(f"[STATS] Could not read violation counters from Redis: {e}")
+            return [(key, Counter()) for key in keys]
+        return [(key, _decode(row)) for key, row in zip(keys, rows)]
+
+    def total(self, resolution, start, end):
+        """Sum of all buckets from start to end."""
+        total = Counter()
+        for _, counter in self.buckets(resolution, start, end):
+            total.update(counter)
+        return total
+
+    def day(self, date=None):
+        """Counter for one day (a date/datetime, default today)."""
+        when = date or self._clock()
+        when = datetime(when.year, when.month, when.day)
+        return self.total('day', when, when)
+
+    def all_days(self):
+        """Sum of every retained day bucket."""
+        now = self._clock()
+        return self.total('day', now - timedelta(days=RESOLUTIONS['day'][2] - 1), now)
+
+    # -- history -----------------------------------------------------------------
+
+    def _live_since(self):
+        """When snapshots started being counted as they are saved (shared by all workers with Redis).
+
+        The first process to ask stores its start time; every snapshot counted live
+        by any process is saved after that, so backfill_once() only counts older files.
+        """
+        if self._live_cutoff is not None:
+            return self._live_cutoff
+        cutoff = self._started
+        redis = self._redis_getter()
+        if redis is not None:
+            key = f"{self.prefix}:live_since"
+            try:
+                redis.set(key, cutoff.timestamp(), nx=True)
+                cutoff = datetime.fromtimestamp(float(redis.get(key)))
+            except Exception as e:
+                print(f"[STATS] Could not read live counting start: {e}")
+                return cutoff
+        self._live_cutoff = cutoff
+        return cutoff
+
+    def backfill_once(self, scan):
+        """Seed the snapshot counters from existing files, once per store.
+
+        Only snapshots saved before live counting started are counted, so files
+        already counted by record_snapshot() are not counted twice.
+
+        Args:
+            scan (callable): Returns an iterable of (datetime, domain_name, violation classes)
+                for each snapshot on disk. Only called if no process has backfilled yet.
+        """
+        if self._backfilled:
+            return
+        redis = self._redis_getter()
+        if redis is None and self._snapshot_rows is not None:
+            return  # the index already holds every snapshot
+        if redis is not None:
+            try:
+                if not redis.set(f"{self.prefix}:backfilled", int(time.time()), nx=True):
+                    self._backfilled = True
+                    return
+            except Exception as e:
+                print(f"[STATS] Could not check backfill marker: {e}")
+                return
+        self._backfilled = True
+        oldest_day = self._clock() - timedelta(days=RESOLUTIONS['day'][2])
+        live_since = self._live_since()
+        count = 0
+        for when, domain_name, violation_types in scan():
+            if when < oldest_day or when >= live_since:
+                continue
+            self.record_snapshot(domain_name, violation_types, when=when)
+            count += 1
+        self.flush()
+        print(f"[STATS] Backfilled {count} existing violation snapshots")
+
+
+def _snapshot_counts(domain_name, violation_types, count=1):
+    counts = Counter({'snapshots': count, f'snap_domain:{domain_name}': count})
+    for violation_type in violation_types:
+        counts[f'snap_type:{violation_type}'] += count
+    return counts
+
+
+def _decode(row):
+    return Counter({
+        (field.decode() if isinstance(field, bytes) else field): int(value)
+        for field, value in (row or {}).items()
+    })
+
+
+def compliance(counts):
+    """Per-PPE-item compliance percentage and violation event counts from one Counter.
+
+    Percentages compare compliant and violating boxes; the counts are violation events.
+
+    Returns:
+        tuple: (overall %, {item: %}, {item: violation events}); items never seen are left out
+    """
+    per_item, alerts = {}, {}
+    total_ok = total_bad = 0
+    for item, (compliant, violation) in PPE_ITEMS.items():
+        ok, bad = counts.get(f'seen:{compliant}', 0), counts.get(f'box:{violation}', 0)
+        if ok + bad == 0:
+            continue
+        per_item[item] = round(100 * ok / (ok + bad))
+        alerts[item] = counts.get(f'type:{violation}', 0)
+        total_ok += ok
+        total_bad += bad
+    overall = round(100 * total_ok / (total_ok + total_bad)) if total_ok + total_bad else 100
+    return overall, per_item, alerts
+
+
+def _shared_redis():
+    from shared_state import shared_state
+    return shared_state.redis
+
+
+def _index_snapshot_rows(resolution, first, last):
+    from violation_index import violation_index
+    return violation_index.bucket_counts(len(first), first, last)
+
+
+violation_stats = ViolationStats(redis_getter=_shared_redis, snapshot_rows=_index_snapshot_rows)
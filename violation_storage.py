@@ -0,0 +1,286 @@
+"""
+Date-sharded layout and retention for violation snapshots.
+
+Snapshots used to go into one flat directory per domain
+(static/violations/<Dom4>/), which grows without bound and makes every listing
+of it slower. New snapshots are written to one directory per domain, day and
+hour:
+
+    static/violations/<Dom4>/<YYYY-MM-DD>/<HH>/violation_<domain>_<YYYYMMDD>_<HHMMSS>_<micro>.jpg
+
+The file names are unchanged, only their directory differs; the violation
+index (violation_index.py) records the directory of every snapshot, so
+listings, thumbnails and /violations/<path> work with both layouts.
+
+Retention is enforced by a background evictor every VIOLATION_EVICT_INTERVAL
+seconds:
+
+* snapshots older than VIOLATION_RETENTION_DAYS are deleted (0, the default,
+  keeps them);
+* while a domain holds more than VIOLATION_MAX_MB_PER_DOMAIN of snapshots, its
+  oldest ones are deleted (0 means no limit).
+
+Both walk the index oldest first, delete the files, drop their rows and notify
+on_evict() callbacks (thumbnails), then remove shard directories left empty.
+With several workers only the one holding the evictor lock file runs it.
+
+Moving an existing flat layout into shards:
+
+    python violation_storage.py migrate [--dry-run]
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process runs its own evictor, deletions are idempotent
+    fcntl = None
+
+from violation_index import parse_snapshot, violation_index
+
+VIOLATIONS_DIR = "static/violations"
+# Off by default: deleting evidence is opt-in
+VIOLATION_RETENTION_DAYS = float(os.getenv("VIOLATION_RETENTION_DAYS", "0"))
+VIOLATION_MAX_MB_PER_DOMAIN = float(os.getenv("VIOLATION_MAX_MB_PER_DOMAIN", "0"))
+VIOLATION_EVICT_INTERVAL = float(os.getenv("VIOLATION_EVICT_INTERVAL", "600"))
+
+_EVICT_BATCH = 500
+
+
+def domain_short_name(domain_name):
+    """Directory name of a domain: its first four alphanumeric characters ('Oil & Gas' -> 'OilG')."""
+    return ''.join(c for c in domain_name if c.isalnum())[:4]
+
+
+def shard_dir(domain_short, when):
+    """Relative shard directory of a snapshot taken at ``when``."""
+    return f"{domain_short}/{when:%Y-%m-%d}/{when:%H}"
+
+
+class ViolationStorage:
+    """Where snapshots are written, how long they are kept, and moving old ones into shards."""
+
+    def __init__(self, index, base_dir=VIOLATIONS_DIR, retention_days=VIOLATION_RETENTION_DAYS,
+                 max_bytes_per_domain=int(VIOLATION_MAX_MB_PER_DOMAIN * 1024 * 1024),
+                 interval=VIOLATION_EVICT_INTERVAL, clock=datetime.now):
+        """
+        Args:
+            index (ViolationIndex): Index kept consistent with deletions and moves
+            base_dir (str): Snapshot root
+            retention_days (float): Maximum snapshot age in days (0 = no age limit)
+            max_bytes_per_domain (int): Maximum bytes of snapshots per domain (0 = no limit)
+            interval (float): Seconds between evictor runs
+            clock (callable): Returns the current local datetime; replaceable in tests
+        """
+        self.index = index
+        self.base_dir = base_dir
+        self.retention_days = retention_days
+        self.max_bytes_per_domain = max_bytes_per_domain
+        self.interval = interval
+        self._clock = clock
+        self._callbacks = []
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {"evicted_age": 0, "evicted_size": 0, "runs": 0, "last_run": None}
+
+    def snapshot_path(self, domain_name, when):
+        """Path to write the snapshot of ``domain_name`` taken at ``when`` (its directory is created)."""
+        directory = os.path.join(self.base_dir, *shard_dir(domain_short_name(domain_name), when).split('/'))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"violation_{domain_name}_{when:%Y%m%d_%H%M%S_%f}.jpg")
+
+    def on_evict(self, callback):
+        """Call callback(rel_path) for every snapshot deleted by retention or migrated away."""
+        self._callbacks.append(callback)
+
+    def _full_path(self, rel_path):
+        return os.path.join(self.base_dir, *rel_path.split('/'))
+
+    # -- retention ---------------------------------------------------------------
+
+    def _delete(self, rows):
+        """Delete the files of ``rows`` and their index rows. Returns the rows removed.
+
+        A file that cannot be deleted keeps its index row, so a later run retries it.
+        """
+        dirs = set()
+        removed = []
+        for row in rows:
+            try:
+                os.remove(self._full_path(row['path']))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[STORAGE] Could not delete {row['path']}: {e}")
+                continue
+            for callback in self._callbacks:
+                try:
+                    callback(row['path'])
+                except Exception as e:
+                    print(f"[STORAGE] Evict callback failed for {row['path']}: {e}")
+            dirs.add(row['dir'])
+            removed.append(row)
+        self.index.remove(row['id'] for row in removed)
+        for rel_dir in dirs:
+            self._remove_empty_dirs(rel_dir)
+        return removed
+
+    def _remove_empty_dirs(self, rel_dir):
+        # Hour, then day directory; never the domain directory itself
+        while rel_dir.count('/') >= 1:
+            try:
+                os.rmdir(self._full_path(rel_dir))
+            except OSError:
+                return  # not empty (or already gone)
+            rel_dir = rel_dir.rsplit('/', 1)[0]
+
+    def evict(self):
+        """Apply the age and size limits once. Returns {"age": n, "size": n} deleted."""
+        self.index.sync(force=True)
+        deleted = {"age": 0, "size": 0}
+        usage = self.index.usage()
+        cutoff = None
+        if self.retention_days > 0:
+            cutoff = (self._clock() - timedelta(days=self.retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+        for domain_short, used in usage.items():
+            remaining = used["bytes"]
+            while True:
+                rows = self.index.oldest(domain_short, _EVICT_BATCH)
+                if not rows:
+                    break
+                expired = [row for row in rows if cutoff is not None and row['ts'] < cutoff]
+                over = []
+                if self.max_bytes_per_domain > 0:
+                    excess = remaining - sum(row['size'] or 0 for row in expired) - self.max_bytes_per_domain
+                    for row in rows[len(expired):]:
+                        if excess <= 0:
+                            break
+                        over.append(row)
+                        excess -= row['size'] or 0
+                if not expired and not over:
+                    break
+                removed = {row['id'] for row in self._delete(expired + over)}
+                remaining -= sum(row['size'] or 0 for row in expired + over if row['id'] in removed)
+                deleted["age"] += sum(1 for row in expired if row['id'] in removed)
+                deleted["size"] += sum(1 for row in over if row['id'] in removed)
+                # Stop at files that could not be deleted; the next run tries them again
+                if len(removed) < len(rows):
+                    break
+        self.stats["evicted_age"] += deleted["age"]
+        self.stats["evicted_size"] += deleted["size"]
+        self.stats["runs"] += 1
+        self.stats["last_run"] = self._clock().isoformat(timespec='seconds')
+        if deleted["age"] or deleted["size"]:
+            print(f"[STORAGE] Evicted {deleted['age']} expired and {deleted['size']} over-quota snapshots")
+        return deleted
+
+    def _try_lock(self):
+        """Open and lock the evictor lock file; None if another process holds it."""
+        if fcntl is None:
+            return open(os.devnull)
+        os.makedirs(self.base_dir, exist_ok=True)
+        handle = open(os.path.join(self.base_dir, '.evictor.lock'), 'w')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+        return handle
+
+    def _run(self):
+        lock = None
+        while True:
+            if lock is None:
+                lock = self._try_lock()
+            if lock is not None:
+                try:
+                    self.evict()
+                except Exception as e:
+                    print(f"[STORAGE] Eviction failed: {e}")
+            time.sleep(self.interval)
+
+    def start_evictor(self):
+        """Start the background evictor (once per process) unless both limits are off.
+
+        Called from flaskapp's before_request hook and the recording path rather than at
+        import, so no thread is running in a gunicorn master when it forks.
+        """
+        if self.retention_days <= 0 and self.max_bytes_per_domain <= 0:
+            return False
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self._run, name="violation-evictor", daemon=True)
+            self._thread.start()
+        limits = []
+        if self.retention_days > 0:
+            limits.append(f"older than {self.retention_days:g} days")
+        if self.max_bytes_per_domain > 0:
+            limits.append(f"over {self.max_bytes_per_domain / (1024 * 1024):g} MB per domain")
+        print(f"[STORAGE] Evictor started: deleting violation snapshots {' and '.join(limits)}")
+        return True
+
+    # -- migration ---------------------------------------------------------------
+
+    def migrate(self, dry_run=False):
+        """Move snapshots from the flat per-domain layout into date/hour shards.
+
+        Returns the number of files moved (or that would be moved with dry_run).
+        """
+        moved = 0
+        if not os.path.isdir(self.base_dir):
+            return moved
+        for domain_entry in os.scandir(self.base_dir):
+            if not domain_entry.is_dir():
+                continue
+            for entry in os.scandir(domain_entry.path):
+                row = parse_snapshot(domain_entry.name, entry.name) if entry.is_file() else None
+                if row is None:
+                    continue
+                when = datetime.strptime(f"{row['date']} {row['time']}", '%Y-%m-%d %H:%M:%S')
+                new_dir = shard_dir(domain_entry.name, when)
+                moved += 1
+                if dry_run:
+                    continue
+                target_dir = self._full_path(new_dir)
+                os.makedirs(target_dir, exist_ok=True)
+                os.replace(entry.path, os.path.join(target_dir, entry.name))
+                self.index.move(row['id'], new_dir)
+                for callback in self._callbacks:
+                    callback(f"{domain_entry.name}/{entry.name}")
+                if moved % 1000 == 0:
+                    print(f"[STORAGE] Moved {moved} snapshots...")
+        self.index.sync(force=True)
+        return moved
+
+    def status(self):
+        return dict(self.stats, retention_days=self.retention_days,
+                    max_bytes_per_domain=self.max_bytes_per_domain, usage=self.index.usage())
+
+
+violation_storage = ViolationStorage(violation_index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the violation snapshot storage layout.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="move flat per-domain snapshots into date/hour shards")
+    migrate.add_argument("--dry-run", action="store_true", help="only count the files that would move")
+    sub.add_parser("evict", help="apply the retention limits once")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        # Thumbnails are keyed by path; the moved snapshots get new ones on first view
+        from thumbnails import thumbnail_store
+        violation_storage.on_evict(thumbnail_store.discard)
+        count = violation_storage.migrate(dry_run=args.dry_run)
+        print(f"{'Would move' if args.dry_run else 'Moved'} {count} snapshots into date/hour shards")
+    else:
+        print(violation_storage.evict())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
 """
 WSGI entry point for the PPE Detection Flask application.
 This file is used by production WSGI servers like Gunicorn or Waitress.
+
+With ASYNC_MODE=gevent or eventlet the standard library is monkey-patched
+before the application (and OpenCV/ultralytics) is imported.
 """
-from flaskapp import app
+import async_mode
+async_mode.monkey_patch()
+
+from flaskapp import app, socketio
 
 if __name__ == "__main__":
-    app.run()
+    socketio.run(app)